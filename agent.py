@@ -4,27 +4,48 @@ import logging
 from dotenv import load_dotenv
 import json
 import os
-from typing import Any
+import sys
+from datetime import datetime
 
 from livekit import rtc, api
 from livekit.agents import (
     AgentSession,
     Agent,
     JobContext,
+    JobProcess,
     function_tool,
     RunContext,
     get_job_context,
-    cli,
     WorkerOptions,
     RoomInputOptions,
 )
+from livekit.agents.llm import ChatContext, ChatMessage, StopResponse, ToolError
 from livekit.plugins import (
     openai,
     noise_cancellation, 
     google
 )
-from livekit.plugins.turn_detector.english import EnglishModel
 
+# shared call helpers live next to the interview agent
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "weruntesting"))
+from audio_cache import load_wav_frames, play_frames, prompt_path
+from audio_conditioning import TELEPHONY_SAMPLE_RATE, condition_session_audio, log_stats
+from batched_vad import shared_batcher
+from campaign_scheduler import CallOutcome, CallReport
+from call_costs import PREFETCH_PRICING, REALTIME_PRICING, CallUsage, shared_ledger
+from call_lifecycle import CallLifecycle, TeardownStage
+from call_state import DialInfo, HistoryWindow
+from endpointing import call_endpointing, register_turn_detector
+from call_load import LoopLagMonitor, NoiseCancellationGuard, log_load
+from phone_numbers import InvalidPhoneNumber, normalize, shared_dnc
+from prefetch import Intent, PrefetchedReply, ResponsePrefetcher, prefetch_enabled
+from sip_retry import dial_with_retries, shared_engine
+from trunk_pool import TrunksFull
+from schedule_store import Appointment, ScheduleConflict, ScheduleStore, shared_store
+from tool_runtime import TOOL_METRICS, ToolRuntime, timed_tool
+from voicemail_detector import AMDResult, AnsweredBy, detect_answering_machine, wait_for_greeting_end
+from warm_transfer import CallSummary, CallTransfer
+from worker_node import WorkerNode
 
 # load environment variables, this is optional, only used for local development
 load_dotenv(dotenv_path=".env")
@@ -32,6 +53,14 @@ logger = logging.getLogger("outbound-caller")
 logger.setLevel(logging.INFO)
 
 outbound_trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID")
+# prefetch mode ends turns on the English turn detector, loaded once per worker when it's been downloaded
+register_turn_detector("en")
+# trunks in this region are preferred while they have room (see trunk_pool.py)
+sip_region = os.getenv("SIP_REGION")
+
+SPOKEN_TIME = "%A, %B %d at %I:%M %p"
+# prefetched replies are synthesized in the realtime model's voice
+VOICE = "alloy"
 
 
 class OutboundCaller(Agent):
@@ -40,7 +69,11 @@ class OutboundCaller(Agent):
         *,
         name: str,
         appointment_time: str,
-        dial_info: dict[str, Any],
+        dial_info: DialInfo,
+        lifecycle: CallLifecycle,
+        schedule: ScheduleStore | None = None,
+        appointment: Appointment | None = None,
+        prefetch: ResponsePrefetcher | None = None,
     ):
         super().__init__(
             instructions=f"""
@@ -50,130 +83,444 @@ class OutboundCaller(Agent):
 
             When the user would like to be transferred to a human agent, first confirm with them. upon confirmation, use the transfer_call tool.
             The customer's name is {name}. His appointment is on {appointment_time}.
+            If they would like a different time, use check_availability to find open times and offer a few,
+            then use reschedule_appointment once they pick one. Today is {datetime.now():%A, %B %d, %Y}.
             """
         )
         # keep reference to the participant for transfers
         self.participant: rtc.RemoteParticipant | None = None
 
         self.dial_info = dial_info
+        self.lifecycle = lifecycle
+        self.schedule = schedule
+        # as last read from the store, version included, so a reschedule can't overwrite a concurrent change
+        self.appointment = appointment
+        # kept current during the call so a warm transfer can brief the human immediately
+        self.summary = CallSummary(name, appointment_time)
+        # replies to the predictable turns, synthesized while the patient is still speaking
+        self.prefetch = prefetch
+        filler_path = prompt_path("FILLER_PROMPT_PATH")
+        # the realtime model has no separate TTS, so fillers only play from cached audio
+        self.tool_runtime = ToolRuntime(filler_frames=load_wav_frames(filler_path) if filler_path else None)
+        # the conversation, bounded for long calls (CALL_HISTORY_ITEMS), here and on the realtime model's side
+        self.history = HistoryWindow(self)
+        # after a warm transfer: waits for the bridged call to end
+        self._bridge: asyncio.Task | None = None
 
     def set_participant(self, participant: rtc.RemoteParticipant):
         self.participant = participant
 
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        """Answer a predictable turn (confirm, reschedule, transfer, goodbye) with its prefetched audio"""
+        if self.prefetch is None:
+            return
+        reply = await self.prefetch.take(new_message.text_content or "")
+        if reply is None:
+            return  # a miss, the model answers
+        logger.info(f"answering with the prefetched {reply.intent.value} reply")
+        handle = self.prefetch.say(reply)
+        self.lifecycle.track_task(asyncio.create_task(self._after_prefetched(reply, handle, new_message)))
+        raise StopResponse()
+
+    async def _after_prefetched(self, reply: PrefetchedReply, handle, new_message: ChatMessage) -> None:
+        await handle.wait_for_playout()
+        # say() only adds the reply to this agent's context; the realtime model has the patient's audio
+        # and no answer to it, so it gets the context back with the turn as text and the reply after it
+        chat_ctx = self.chat_ctx.copy()
+        chat_ctx.insert(new_message)
+        await self.update_chat_ctx(chat_ctx)
+        if reply.intent is Intent.END and not handle.interrupted:
+            # the classifier can be wrong about a goodbye, so the model decides whether to end the call
+            self.prefetch.session.generate_reply(
+                instructions="You have just said goodbye. If the patient is done, call end_call without "
+                "saying anything else; if they still need something, help them."
+            )
+
     async def hangup(self):
-        """Helper function to hang up the call by deleting the room"""
-        job_ctx = get_job_context()
-        await job_ctx.api.room.delete_room(
-            api.DeleteRoomRequest(
-                room=job_ctx.room.name,
+        """Helper function to hang up the call: close the session, then delete the room
+
+        Doesn't wait for the teardown, since it is called from function tools and
+        closing the session waits for the running tool to finish.
+        """
+        self.lifecycle.start_teardown("hangup")
+
+    async def leave_voicemail(self, session: AgentSession, amd: AMDResult):
+        """Play the cached pre-recorded message (if configured) after the greeting's beep, and hang up"""
+        message_path = prompt_path("VOICEMAIL_MESSAGE_PATH")
+        if message_path:
+            if not amd.beep:
+                # AMD decides early in the greeting; the machine records only after it
+                await wait_for_greeting_end(self.participant)
+            logger.info(f"leaving voicemail for {self.participant.identity}")
+            frames = load_wav_frames(message_path)
+            handle = session.say(
+                "[pre-recorded voicemail message]",
+                audio=play_frames(frames),
+                allow_interruptions=False,
             )
-        )
+            await handle.wait_for_playout()
+        else:
+            logger.info("voicemail detected and no message configured, hanging up")
+
+        await self.hangup()
 
     @function_tool()
+    # a warm transfer rings the human for up to 30s, then may fall back to a cold one
+    @timed_tool(deadline=90.0, filler=True, serial="call-control")
     async def transfer_call(self, ctx: RunContext):
         """Transfer the call to a human agent, called after confirming with the user"""
 
-        transfer_to = self.dial_info["transfer_to"]
+        transfer_to = self.dial_info.transfer_to
         if not transfer_to:
             return "cannot transfer call"
 
-        logger.info(f"transferring call to {transfer_to}")
+        mode = self.dial_info.transfer_mode
+        logger.info(f"{mode} transferring call to {transfer_to}")
 
-        # let the message play fully before transferring
-        await ctx.session.generate_reply(
-            instructions="let the user know you'll be transferring them"
+        job_ctx = get_job_context()
+        hold_path = prompt_path("HOLD_PROMPT_PATH")
+        transfer = CallTransfer(
+            lk_api=job_ctx.api,
+            room_name=job_ctx.room.name,
+            trunk_id=None,
+            participant_identity=self.participant.identity,
+            hold_frames=load_wav_frames(hold_path) if hold_path else None,
         )
 
-        job_ctx = get_job_context()
+        if mode == "warm":
+            # the human's leg needs a free slot on a trunk, like the patient's did; a cold
+            # transfer is a REFER on the patient's leg and needs none
+            try:
+                lease = await shared_engine(outbound_trunk_id).pool.lease(self.dial_info.region or sip_region)
+            except TrunksFull:
+                lease = None
+                logger.warning("every trunk is full, making a cold transfer instead")
+            if lease is not None:
+                transfer.trunk_id = lease.trunk_id
+                try:
+                    result = await transfer.warm(ctx.session, transfer_to, self.summary.render())
+                finally:
+                    # once bridged (even if the tool ran out of time reading the summary) the agent leaves;
+                    # otherwise the human's leg was hung up, and its trunk slot is free again
+                    if transfer.bridged:
+                        self._leave_bridge(job_ctx, transfer, lease)
+                    else:
+                        await lease.aclose()
+                if result.connected:
+                    return None
+                logger.warning(f"warm transfer failed ({result.error}), trying a cold transfer")
+
+        result = await transfer.cold(ctx.session, transfer_to)
+        if result.connected:
+            logger.info(f"transferred call to {transfer_to} in {result.time_to_human:.2f}s")
+            return None
+
+        logger.error(f"error transferring call: {result.error}")
+        return "the transfer failed and no human agent is available right now, apologize and keep helping the patient"
+
+    def _leave_bridge(self, job_ctx, transfer: CallTransfer, lease) -> None:
+        """After a warm transfer the agent leaves, and the job stays until the bridged call ends
+
+        Both SIP legs stay up on their trunks, so their leases are released when
+        the bridged call ends rather than at the agent's teardown.
+        """
+        self.lifecycle.keep_room()
+        # both leases keep renewing while the call is bridged
+        releases = [*self.lifecycle.hold("trunk lease"), lease.aclose]
+        teardown = self.lifecycle.start_teardown("warm transfer complete")
+
+        async def until_the_bridge_ends():
+            try:
+                await teardown
+                await transfer.wait_for_bridge_end(job_ctx.room)
+                # one side hung up: deleting the room hangs up the other
+                await job_ctx.api.room.delete_room(api.DeleteRoomRequest(room=job_ctx.room.name))
+            except Exception as e:
+                logger.warning(f"couldn't end the bridged call: {e}")
+            finally:
+                for release in releases:
+                    await release()
+            job_ctx.shutdown("bridged call ended")
+
+        self._bridge = asyncio.create_task(until_the_bridge_ends(), name="warm_transfer_bridge")
+
+    @function_tool()
+    @timed_tool(deadline=5.0)
+    async def check_availability(self, ctx: RunContext, date: str):
+        """Look up open appointment times to offer the patient when they want to reschedule
+
+        Args:
+            date: the earliest day the patient could come in, as YYYY-MM-DD
+        """
+        if self.schedule is None or self.appointment is None:
+            return "the appointment isn't in the schedule, offer to transfer the patient to a human agent"
         try:
-            await job_ctx.api.sip.transfer_sip_participant(
-                api.TransferSIPParticipantRequest(
-                    room_name=job_ctx.room.name,
-                    participant_identity=self.participant.identity,
-                    transfer_to=f"tel:{transfer_to}",
-                )
-            )
+            after = max(datetime.fromisoformat(date), datetime.now())
+        except ValueError:
+            raise ToolError(f"{date!r} is not a date in YYYY-MM-DD form") from None
 
-            logger.info(f"transferred call to {transfer_to}")
-        except Exception as e:
-            logger.error(f"error transferring call: {e}")
-            await ctx.session.generate_reply(
-                instructions="there was an error transferring the call."
-            )
-            await self.hangup()
+        # answered from the in-memory index, no need to leave the event loop
+        slots = self.schedule.next_free_slots(
+            self.appointment.provider, after, count=3, minutes=self.appointment.minutes
+        )
+        return "open times: " + "; ".join(f"{slot:{SPOKEN_TIME}}" for slot in slots)
 
     @function_tool()
+    @timed_tool(deadline=5.0, serial="schedule")
+    async def reschedule_appointment(self, ctx: RunContext, new_time: str):
+        """Move the patient's appointment to a time they agreed to, from check_availability
+
+        Args:
+            new_time: the new start time, as YYYY-MM-DD HH:MM
+        """
+        if self.schedule is None or self.appointment is None:
+            return "the appointment isn't in the schedule, offer to transfer the patient to a human agent"
+        try:
+            when = datetime.fromisoformat(new_time)
+        except ValueError:
+            raise ToolError(f"{new_time!r} is not a time in YYYY-MM-DD HH:MM form") from None
+
+        try:
+            moved = await asyncio.to_thread(self.schedule.reschedule, self.appointment, when)
+        except ScheduleConflict as e:
+            logger.info(f"reschedule lost a race: {e}")
+            # the store reloaded this provider, pick up whatever changed
+            self.appointment = self.schedule.appointments.get(self.appointment.id, self.appointment)
+            raise ToolError("that time was just taken, check availability again and offer other times") from None
+        except ValueError as e:
+            raise ToolError(str(e)) from None
+
+        logger.info(f"rescheduled appointment {moved.id} to {moved.start}")
+        self.appointment = moved
+        self.summary.appointment_time = f"{moved.start:{SPOKEN_TIME}}"
+        if self.prefetch is not None:
+            self.prefetch.update(appointment_time=self.summary.appointment_time)
+        return f"the appointment is now on {moved.start:{SPOKEN_TIME}}"
+
+    @function_tool()
+    @timed_tool(deadline=15.0, serial="call-control")
     async def end_call(self, ctx: RunContext):
         """Called when the user wants to end the call"""
         logger.info(f"ending the call for {self.participant.identity}")
 
-        # let the agent finish speaking
-        current_speech = ctx.session.current_speech
-        if current_speech:
-            await current_speech.wait_for_playout()
+        try:
+            # let the agent finish speaking
+            current_speech = ctx.session.current_speech
+            if current_speech:
+                await current_speech.wait_for_playout()
+        finally:
+            # hang up even if the goodbye never finishes playing
+            await self.hangup()
+
+def prewarm(proc: JobProcess):
+    # the schedule index is loaded once per process, before its call rather than during it
+    shared_store()
+    if prefetch_enabled():
+        # prefetch mode detects turns locally, so load the VAD before calls arrive
+        shared_batcher()
 
-        await self.hangup()
 
 async def entrypoint(ctx: JobContext):
     logger.info(f"connecting to room {ctx.room.name}")
     await ctx.connect()
-    dial_info = json.loads(ctx.job.metadata)
-    participant_identity = phone_number = dial_info["phone_number"]
+    # slotted and interned, as every call on the worker holds one
+    dial_info = DialInfo.from_record(json.loads(ctx.job.metadata))
+    lifecycle = CallLifecycle()
+    lifecycle.attach_room(ctx.api, ctx.room.name)
+    ctx.add_shutdown_callback(lifecycle.teardown)
+    # a campaign's dispatch: the call's result goes back to the scheduler when it ends
+    report = None
+    contact_id = dict(dial_info.extra).get("contact_id")
+    if contact_id is not None:
+        report = CallReport(contact_id, dial_info.attempt)
+        lifecycle.on_teardown(TeardownStage.FLUSH, "campaign result", report.send)
+
+    # don't spend a SIP attempt on a number that can't or mustn't be called
+    try:
+        phone_number = normalize(dial_info.phone_number)
+    except InvalidPhoneNumber as e:
+        logger.error(f"not dialling: {e}")
+        if report is not None:
+            report.set(CallOutcome.FAILED)
+        await lifecycle.teardown("invalid phone number")
+        ctx.shutdown()
+        return
+    if phone_number in shared_dnc():
+        logger.warning(f"not dialling {phone_number}: on the do-not-call list")
+        if report is not None:
+            report.set(CallOutcome.FAILED)
+        await lifecycle.teardown("do not call")
+        ctx.shutdown()
+        return
+    participant_identity = phone_number
+    # opening the store loads its index, once per worker process
+    schedule = await asyncio.to_thread(shared_store)
+    appointment = schedule.for_patient(phone_number, datetime.now())
+    name = "Jayden"
+    appointment_time = f"{appointment.start:{SPOKEN_TIME}}" if appointment else "next Tuesday at 3pm"
+    prefetch = None
+    prefetching = dial_info.prefetch if dial_info.prefetch is not None else prefetch_enabled()
+    if prefetching:
+        prefetch = ResponsePrefetcher(name=name, appointment_time=appointment_time)
     agent = OutboundCaller(
-        name="Jayden",
-        appointment_time="next Tuesday at 3pm",
+        name=name,
+        appointment_time=appointment_time,
         dial_info=dial_info,
+        lifecycle=lifecycle,
+        schedule=schedule,
+        appointment=appointment,
+        prefetch=prefetch,
     )
 
-    # the following uses GPT-4o, Deepgram and Cartesia
-    session = AgentSession(
-        llm=openai.realtime.RealtimeModel(
-            model='gpt-4o-realtime-preview-2024-12-17',
+    if prefetch is None:
+        # the following uses GPT-4o, Deepgram and Cartesia
+        session = AgentSession(
+            llm=openai.realtime.RealtimeModel(
+                model='gpt-4o-realtime-preview-2024-12-17',
+            )
         )
-    )
-    # Start the session first before dialing, to ensure that when the user picks up the agent does not miss anything the user says
-    session_started = asyncio.create_task(
-        session.start(
-            agent=agent,
-            room=ctx.room,
-            room_input_options=RoomInputOptions(
-                noise_cancellation=noise_cancellation.BVCTelephony(),
+    else:
+        # the realtime model doesn't stream what the patient is saying, so the session detects turns
+        # itself on a streaming STT's partial transcripts, which the prefetcher classifies as they come;
+        # turns end on the English turn detector, after a delay fitted to the patient's pace
+        endpointing = call_endpointing("en", language=lambda: "en")
+        session = AgentSession(
+            llm=openai.realtime.RealtimeModel(
+                model='gpt-4o-realtime-preview-2024-12-17',
+                voice=VOICE,
+                turn_detection=None,
+                input_audio_transcription=None,
             ),
+            stt=openai.STT(model="gpt-4o-mini-transcribe", use_realtime=True),
+            vad=endpointing.vad(),
+            tts=openai.TTS(model="tts-1", voice=VOICE),
+            **endpointing.session_options(),
+        )
+        endpointing.attach_session(session)
+        lifecycle.on_teardown(TeardownStage.FLUSH, "endpointing", endpointing.log_summary)
+        prefetch.attach_session(session)
+        session.on("user_input_transcribed", prefetch.on_transcript)
+        session.on("metrics_collected", prefetch.on_metrics)
+        lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "prefetch", prefetch.aclose)
+    lifecycle.attach_session(session)
+    agent.tool_runtime.attach_session(session)
+    agent.history.attach_session(session)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "chat history", agent.history.log_summary)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "tool latency", TOOL_METRICS.log_summary)
+    # token usage and cost for this call, written at teardown with the campaign's figure so far
+    usage = CallUsage(call_id=ctx.room.name, campaign=dial_info.campaign)
+    session.on("metrics_collected", usage.on_metrics)
+
+    async def record_cost():
+        pricing = REALTIME_PRICING if prefetch is None else PREFETCH_PRICING
+        await asyncio.to_thread(lambda: shared_ledger().finish(usage, pricing))
+
+    lifecycle.on_teardown(TeardownStage.FLUSH, "call cost", record_cost)
+    session.on("conversation_item_added", lambda ev: agent.summary.add_message(ev.item))
+    nc_options = noise_cancellation.BVCTelephony()
+    # Start the session first before dialing, to ensure that when the user picks up the agent does not miss anything the user says
+    session_started = lifecycle.track_task(
+        asyncio.create_task(
+            session.start(
+                agent=agent,
+                room=ctx.room,
+                room_input_options=RoomInputOptions(
+                    # keep the caller at telephony rate, the conditioning stage upsamples it
+                    audio_sample_rate=TELEPHONY_SAMPLE_RATE,
+                    noise_cancellation=nc_options,
+                ),
+            )
         )
     )
 
-    # Start dialing the user using the create-sip-participant
+    if dial_info.detect_voicemail:
+        # keep the realtime model deaf (and unbilled) until we know a person picked up: its
+        # audio input is detached before the callee can be heard, so its server VAD can't
+        # answer a voicemail greeting or greet a person before we do
+        await session_started
+        session.input.set_audio_enabled(False)
+
+    # Start dialing the user using the create-sip-participant, on the least loaded healthy
+    # trunk; quick retries (another trunk) happen here, later ones are left to the next dispatch
     try:
-        await ctx.api.sip.create_sip_participant(
+        dial = await dial_with_retries(
+            ctx.api,
             api.CreateSIPParticipantRequest(
                 room_name=ctx.room.name,
-                sip_trunk_id=outbound_trunk_id,
                 sip_call_to=phone_number,
                 participant_identity=participant_identity,
                 wait_until_answered=True,
-            )
+            ),
+            # the first call in a process opens the SQLite stores, off the loop
+            await asyncio.to_thread(shared_engine, outbound_trunk_id),
+            region=dial_info.region or sip_region,
+            attempt=dial_info.attempt,
         )
+        if not dial.answered:
+            retry = f"retry in {dial.retry_after:.0f}s" if dial.retry_after is not None else "don't retry"
+            logger.error(f"call to {phone_number} failed ({dial.outcome.value}, attempt {dial.attempts}), {retry}")
+            if report is not None:
+                report.dial(dial)
+            await lifecycle.teardown(f"sip {dial.outcome.value}")
+            ctx.shutdown()
+            return
+        lifecycle.on_teardown(TeardownStage.FLUSH, "trunk lease", dial.lease.aclose)
 
         # Wait for the agent session start and participant join
         await session_started
+        # upsample the caller's audio to the realtime model's 24kHz (de-jittering it only if it
+        # arrives in bursts), dropping NC if this call's event loop falls behind real time
+        monitor = LoopLagMonitor()
+        load = monitor.register(ctx.room.name)
+        monitor.start()
+        conditioned = condition_session_audio(session, out_rate=24000)
+        nc_guard = NoiseCancellationGuard(conditioned.source, nc_options, monitor, load)
+        nc_guard.start()
+        lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "audio conditioning", conditioned.aclose)
+        lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "nc guard", nc_guard.aclose)
+        lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "loop lag monitor", monitor.aclose)
+        lifecycle.on_teardown(TeardownStage.FLUSH, "audio stats", lambda: log_stats(conditioned.stats))
+        lifecycle.on_teardown(TeardownStage.FLUSH, "audio load", lambda: log_load(load, conditioned.stats))
         participant = await ctx.wait_for_participant(identity=participant_identity)
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
 
+        if dial_info.detect_voicemail:
+            amd = await detect_answering_machine(participant)
+            if amd.answered_by == AnsweredBy.MACHINE:
+                await agent.leave_voicemail(session, amd)
+                return  # the result stays a retry: the patient hasn't heard from us
+
+            # attach the caller's audio only now that the detector says it's a person
+            session.clear_user_turn()
+            session.input.set_audio_enabled(True)
+            # the greeting audio was withheld from the model, so it speaks first
+            session.generate_reply(instructions="greet the patient and introduce yourself")
+
+        # a person picked up, so this call's cost counts towards a completed call
+        usage.completed = True
+        if report is not None:
+            report.set(CallOutcome.ANSWERED)
+
     except api.TwirpError as e:
         logger.error(
             f"error creating SIP participant: {e.message}, "
             f"SIP status: {e.metadata.get('sip_status_code')} "
             f"{e.metadata.get('sip_status')}"
         )
+        await lifecycle.teardown("sip participant failed")
         ctx.shutdown()
 
 
 if __name__ == "__main__":
-    cli.run_app(
+    # region and capacity labels, and a drain on SIGTERM that lets calls finish before a redeploy
+    node = WorkerNode()
+    node.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
             agent_name="outbound-caller",
+            **node.options(),
         )
     )
@@ -0,0 +1,717 @@
+"""
+Cached answers to the questions candidates ask about a job
+
+When the interviewer hands over to the candidate ("do you have any questions
+for me?"), candidates for the same job ask much the same things: salary,
+remote work, the team, next steps. Each answer would otherwise be written by
+gpt-4o-mini and spoken by TTS again for every candidate. This cache keeps,
+per job, every answer the model gave to a question, with the audio it was
+spoken with:
+
+- a question (the candidate's turn, when it's phrased as one and doesn't
+  depend on the conversation, like "can you repeat that?") is normalized and
+  embedded; OpenAI's text-embedding-3-small, or a local hashed n-gram
+  embedding for tests and benchmarks (ANSWER_CACHE_EMBEDDER=hashing)
+- the job's index is searched by cosine similarity: a NumPy matrix-vector
+  product over every cached question while it's small, and through an IVF
+  partition (k-means lists, a few probed per search) once it grows past
+  `ivf_from` entries
+- above the embedder's similarity threshold the stored answer is played,
+  from its cached audio when there is some, and the model isn't asked;
+  below it, the model's answer is stored once it has been spoken in full
+
+Entries expire after ANSWER_CACHE_TTL seconds (default a week). A job's
+answers are dropped as soon as a call arrives with a different job_context
+for it (a new salary range, a changed process), since they may no longer be
+true. Answers are kept per language, see languages.py. Audio is kept while
+the job's cached audio stays under `max_audio_bytes`; past that, hits are
+spoken by the session's TTS, which still saves the model's turn.
+
+Only answers that hold nothing specific to one candidate are stored: no
+number, date or proper name that isn't in the job_context (a salary range
+from it is fine, an interview slot or the candidate's company isn't), and
+nothing from the candidate's own context. A lookup has to finish within the
+turn: it's skipped when the time since the candidate stopped speaking plus
+the embedder's recent latency would run past `turn_budget`, and an embedding
+is given at most what's left of it, so a miss never costs the turn more.
+
+Interviews run one per job process by default, and LiveKit never reuses a
+job's process for another call, so an in-memory cache would die with each
+call. The answers are kept in SQLite (ANSWER_CACHE_DB, default
+answer_cache.db), shared by every job process on the machine, the way the
+schedule and the call ledger are. A process loads a job's questions and their
+vectors into its index once, in for_job(), and before each lookup or store
+catches up with the rows other processes have written since (rows only
+ever get new ids). Audio is read from the file when an answer is played.
+With thread executors (INTERVIEW_JOB_THREADS=1) a worker's calls also share
+the index itself. The cache is enabled with ANSWER_CACHE=1.
+
+    job = await asyncio.to_thread(shared_answer_cache().for_job, job_context, language)
+    answers = CallAnswers(job, embedder, job_context=job_context, candidate_context=candidate_context)
+    answers.attach_session(session)
+    ...
+    cached = await answers.lookup(new_message.text_content)  # in on_user_turn_completed
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass
+from functools import cache
+
+import numpy as np
+from livekit import rtc
+
+import clock
+from audio_cache import play_frames
+
+logger = logging.getLogger("answer-cache")
+
+DEFAULT_TTL = 7 * 24 * 3600.0
+QUESTION_WORDS = frozenset(
+    "what whats how hows is are do does did can could will would when where who why which should may".split()
+)
+# questions about the conversation rather than the job; their answers don't carry over
+CONTEXTUAL = (" repeat ", " again ", " you said ", " you mean ", " you mentioned ", " my answer ", " last question ")
+FILLERS = frozenset("um uh erm hmm so okay ok well like just yeah oh hey".split())
+_NOT_WORDS = re.compile(r"[^a-z0-9' ]+")
+DATE_WORDS = frozenset(
+    "january february march april june july august september october november december "
+    "monday tuesday wednesday thursday friday saturday sunday today tonight tomorrow yesterday".split()
+)
+_NUMBER = re.compile(r"\d+(?:[.,:]\d+)*")
+_WORD = re.compile(r"[A-Za-z][A-Za-z'&-]*")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Lower case, no punctuation or filler words, single spaces"""
+    words = _NOT_WORDS.sub(" ", text.lower().replace("’", "'").replace("'s", "s")).split()
+    return " ".join(word for word in words if word not in FILLERS)
+
+
+def is_cacheable_question(text: str) -> bool:
+    question = normalize_question(text)
+    words = question.split()
+    if len(words) < 3 or any(phrase in f" {question} " for phrase in CONTEXTUAL):
+        return False
+    return text.rstrip().endswith("?") or words[0] in QUESTION_WORDS
+
+
+def entities(text: str) -> set[str]:
+    """Numbers, dates and mid-sentence capitalized words in `text`, lower case: what could be about one candidate"""
+    found = set(_NUMBER.findall(text))
+    for sentence in _SENTENCES.split(text):
+        for i, word in enumerate(_WORD.findall(sentence)):
+            lower = word.lower()
+            if lower in DATE_WORDS or (i > 0 and word[0].isupper() and word != "I"):
+                found.add(lower)
+    return found
+
+
+def context_terms(context) -> set[str]:
+    """Every number and capitalized word of a job or candidate context's values, lower case"""
+    if context is None:
+        return set()
+    if not isinstance(context, dict):
+        context = context.to_dict()  # call_state.JobContext, CandidateContext
+    text = json.dumps(list(context.values()), default=str, ensure_ascii=False)
+    return set(_NUMBER.findall(text)) | {word.lower() for word in _WORD.findall(text) if word[0].isupper()}
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words, word pairs and character trigrams; local, for tests and benchmarks
+
+    Close wordings land close together, paraphrases don't; thresholds are
+    lower than for a learned embedding.
+    """
+
+    threshold = 0.8
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed_sync(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.split()
+            features = words + [" ".join(pair) for pair in zip(words, words[1:])]
+            padded = f" {text} "
+            features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+            for feature in features:
+                h = zlib.crc32(feature.encode())
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _unit(out)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+class OpenAIEmbedder:
+    """text-embedding-3-small, shortened to `dim` dimensions, over the worker's shared OpenAI client"""
+
+    threshold = 0.86
+
+    def __init__(self, client, *, model: str = "text-embedding-3-small", dim: int = 256):
+        self.client = client
+        self.model = model
+        self.dim = dim
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return _unit(np.array([item.embedding for item in response.data], dtype=np.float32))
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, *, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """`k` unit centroids for unit `vectors`, by cosine similarity"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        # an empty list keeps its old centroid
+        centroids[filled] = sums
+        centroids = _unit(centroids)
+    return centroids
+
+
+class _IVF:
+    """Inverted lists over the first `size` slots: each slot's vector, grouped by its nearest centroid"""
+
+    def __init__(self, vectors: np.ndarray, nlist: int, *, train_on: int = 16384, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        sample = vectors if len(vectors) <= train_on else vectors[rng.choice(len(vectors), train_on, replace=False)]
+        self.centroids = spherical_kmeans(sample, nlist, seed=seed)
+        assign = np.concatenate(
+            [np.argmax(vectors[i : i + 8192] @ self.centroids.T, axis=1) for i in range(0, len(vectors), 8192)]
+        )
+        self.size = len(vectors)
+        self.slots = np.argsort(assign, kind="stable")
+        self.vectors = vectors[self.slots]
+        self.offsets = np.searchsorted(assign[self.slots], np.arange(nlist + 1))
+        self.position = np.empty(self.size, dtype=np.int64)
+        self.position[self.slots] = np.arange(self.size)
+
+    def search(self, vector: np.ndarray, nprobe: int) -> tuple[int, float]:
+        closest = self.centroids @ vector
+        probe = np.argpartition(-closest, nprobe - 1)[:nprobe] if nprobe < len(closest) else range(len(closest))
+        best, best_score = -1, -np.inf
+        for lst in probe:
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            scores = self.vectors[start:end] @ vector
+            i = int(np.argmax(scores))
+            if scores[i] > best_score:
+                best, best_score = int(self.slots[start + i]), float(scores[i])
+        return best, best_score
+
+
+class VectorIndex:
+    """Unit vectors by slot, searched by cosine similarity
+
+    Exact (one matrix-vector product) below `ivf_from` vectors. Past that, an
+    IVF partition is built on a background thread, from a copy, and searched
+    once it's ready, together with an exact scan of the vectors added since;
+    it's rebuilt when those reach a quarter of it. Not thread-safe itself:
+    JobAnswers serializes access.
+    """
+
+    def __init__(self, dim: int, *, ivf_from: int = 20000, nprobe: int = 16):
+        self.dim = dim
+        self.ivf_from = ivf_from
+        self.nprobe = nprobe
+        self.size = 0  # slots used, removed ones included
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._ivf: _IVF | None = None
+        self._built: _IVF | None = None  # finished on the background thread, not yet in use
+        self._building = False
+
+    def add(self, vector: np.ndarray) -> int:
+        if self.size == len(self._vectors):
+            self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._alive = np.concatenate([self._alive, np.zeros_like(self._alive)])
+        slot = self.size
+        self._vectors[slot] = vector
+        self._alive[slot] = True
+        self.size += 1
+        trained = self._ivf.size if self._ivf is not None else 0
+        if self.size >= self.ivf_from and self.size - trained >= max(trained // 4, 1) and not self._building:
+            self._building = True
+            snapshot = self._vectors[: self.size].copy()
+            threading.Thread(target=self._build, args=(snapshot,), name="answer-cache-ivf", daemon=True).start()
+        return slot
+
+    def build(self) -> None:
+        """Build the IVF partition now, on this thread (benchmarks, tests)"""
+        self._build(self._vectors[: self.size].copy())
+        self._adopt()
+
+    def remove(self, slot: int) -> None:
+        """A removed slot scores 0 against everything"""
+        self._vectors[slot] = 0.0
+        self._alive[slot] = False
+        if self._ivf is not None and slot < self._ivf.size:
+            self._ivf.vectors[self._ivf.position[slot]] = 0.0
+
+    def search(self, vector: np.ndarray) -> tuple[int, float]:
+        """The closest slot and its cosine similarity, or (-1, -inf) when empty"""
+        self._adopt()
+        best, best_score = -1, -np.inf
+        tail = 0
+        if self._ivf is not None:
+            best, best_score = self._ivf.search(vector, self.nprobe)
+            tail = self._ivf.size
+        if tail < self.size:
+            scores = self._vectors[tail : self.size] @ vector
+            i = int(np.argmax(scores))
+            if scores[i] > best_score:
+                best, best_score = tail + i, float(scores[i])
+        return best, best_score
+
+    def _build(self, vectors: np.ndarray) -> None:
+        try:
+            self._built = _IVF(vectors, nlist=min(max(int(np.sqrt(len(vectors))), 16), 1024))
+        except Exception:
+            logger.exception("building the answer index failed, searching it exactly")
+            self._building = False
+
+    def _adopt(self) -> None:
+        ivf, self._built = self._built, None
+        if ivf is None:
+            return
+        # slots removed while it was being built
+        dead = np.flatnonzero(~self._alive[: ivf.size])
+        ivf.vectors[ivf.position[dead]] = 0.0
+        self._ivf = ivf
+        self._building = False
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    frames: tuple | None  # the audio it was spoken with, if kept (read from the store when first played)
+    expires_at: float
+    hits: int = 0
+    audio_bytes: int = 0
+    row: int | None = None  # in the AnswerStore
+
+    def __post_init__(self):
+        if self.frames:
+            self.audio_bytes = sum(len(frame.data) for frame in self.frames)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    question TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    expires REAL NOT NULL,
+    sample_rate INTEGER,
+    num_channels INTEGER,
+    samples_per_channel INTEGER,
+    audio BLOB
+);
+CREATE INDEX IF NOT EXISTS answers_job ON answers (job, id);
+"""
+
+
+class AnswerStore:
+    """Every job's answers in a SQLite file, shared by the worker processes on a machine"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def prune(self, job: str, fingerprint: str, now: float) -> int:
+        """Drop the job's answers given under another job_context, and expired ones"""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM answers WHERE job = ? AND (fingerprint != ? OR expires <= ?)", (job, fingerprint, now)
+            ).rowcount
+
+    def rows_after(self, job: str, fingerprint: str, after: int) -> list[tuple]:
+        """(id, question, vector, answer, expires, audio bytes) of the job's answers written after row `after`"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, question, vector, answer, expires, COALESCE(length(audio), 0) FROM answers "
+                "WHERE job = ? AND fingerprint = ? AND id > ? ORDER BY id",
+                (job, fingerprint, after),
+            ).fetchall()
+
+    def add(self, job: str, fingerprint: str, entry: CachedAnswer, vector: np.ndarray) -> int:
+        audio = rate = channels = samples = None
+        if entry.frames:
+            first = entry.frames[0]
+            rate, channels, samples = first.sample_rate, first.num_channels, first.samples_per_channel
+            audio = b"".join(bytes(frame.data) for frame in entry.frames)
+        with self._lock:
+            return self._db.execute(
+                "INSERT INTO answers (job, fingerprint, question, vector, answer, expires, sample_rate, num_channels, "
+                "samples_per_channel, audio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job, fingerprint, entry.question, vector.astype(np.float32).tobytes(), entry.answer, entry.expires_at,
+                 rate, channels, samples, audio),
+            ).lastrowid
+
+    def frames(self, row: int) -> tuple | None:
+        """The audio of an answer, as frames the length of the first one it was spoken with; None if it's gone"""
+        with self._lock:
+            found = self._db.execute(
+                "SELECT sample_rate, num_channels, samples_per_channel, audio FROM answers WHERE id = ?", (row,)
+            ).fetchone()
+        if found is None or found[3] is None:
+            return None
+        rate, channels, samples, audio = found
+        step = samples * channels * 2
+        return tuple(
+            rtc.AudioFrame(data=audio[i : i + step], sample_rate=rate, num_channels=channels,
+                           samples_per_channel=len(audio[i : i + step]) // (channels * 2))
+            for i in range(0, len(audio), step)
+        )
+
+    def remove(self, rows: list[int]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM answers WHERE id = ?", [(row,) for row in rows])
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def job_key(job_context: dict) -> str:
+    return str(job_context.get("job_id") or f"{job_context.get('company_name')}/{job_context.get('job_title')}")
+
+
+def fingerprint(job_context: dict) -> str:
+    return hashlib.sha256(json.dumps(job_context, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class JobAnswers:
+    """One job's cached answers; safe to share between the calls (threads) of a worker
+
+    With a `store`, its answers are the store's rows for the job, loaded at
+    construction and caught up with before each lookup and store; without
+    one (tests, benchmarks) they're only in memory.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        fingerprint: str,
+        *,
+        threshold: float,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = 100000,
+        max_audio_bytes: int = 256 * 1024 * 1024,
+        ivf_from: int = 20000,
+        store: AnswerStore | None = None,
+    ):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_audio_bytes = max_audio_bytes
+        self.ivf_from = ivf_from
+        self.audio_bytes = 0
+        self.lookups = 0
+        self.hits = 0
+        self._index: VectorIndex | None = None
+        self._entries: list[CachedAnswer | None] = []
+        self._live = 0
+        self._lock = threading.Lock()
+        self._store = store
+        self._seen = 0  # the last store row caught up with
+        self._mine: set[int] = set()  # rows this process stored and indexed, past `_seen`
+        if store is not None:
+            store.prune(key, fingerprint, clock.time())
+            self._catch_up()
+
+    def __len__(self) -> int:
+        return self._live
+
+    def lookup(self, vector: np.ndarray, now: float) -> CachedAnswer | None:
+        """The stored answer to the closest question above the threshold, if it hasn't expired"""
+        with self._lock:
+            self._catch_up()
+            self.lookups += 1
+            while self._index is not None:
+                slot, score = self._index.search(vector)
+                if slot < 0 or score < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry.expires_at > now and self._has_audio(entry):
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry
+                self._remove(slot)
+            return None
+
+    def store(self, question: str, vector: np.ndarray, answer: str, frames: tuple | None, now: float) -> bool:
+        """Cache the model's answer to a question; False if a close question is already cached"""
+        with self._lock:
+            self._catch_up()
+            if self._index is not None:
+                slot, score = self._index.search(vector)
+                if slot >= 0 and score >= self.threshold and self._entries[slot].expires_at > now:
+                    return False
+            if self._live >= self.max_entries:
+                self._evict(now)
+            entry = CachedAnswer(question, answer, frames, now + self.ttl)
+            if entry.audio_bytes and self.audio_bytes + entry.audio_bytes > self.max_audio_bytes:
+                entry.frames, entry.audio_bytes = None, 0
+            if self._store is not None:
+                entry.row = self._store.add(self.key, self.fingerprint, entry, vector)
+                self._mine.add(entry.row)
+            self._add(vector, entry)
+            return True
+
+    def _add(self, vector: np.ndarray, entry: CachedAnswer) -> None:
+        if self._index is None:
+            self._index = VectorIndex(len(vector), ivf_from=self.ivf_from)
+        self.audio_bytes += entry.audio_bytes
+        self._index.add(vector)
+        self._entries.append(entry)
+        self._live += 1
+
+    def _catch_up(self) -> None:
+        """Index the answers other processes stored since this one last looked"""
+        if self._store is None:
+            return
+        for row, question, vector, answer, expires, audio_bytes in self._store.rows_after(self.key, self.fingerprint, self._seen):
+            self._seen = row
+            if row in self._mine:
+                self._mine.discard(row)
+                continue
+            entry = CachedAnswer(question, answer, None, expires, audio_bytes=audio_bytes, row=row)
+            self._add(np.frombuffer(vector, dtype=np.float32), entry)
+
+    def _has_audio(self, entry: CachedAnswer) -> bool:
+        """Reads a stored answer's audio the first time it's played; False if another process removed the answer"""
+        if entry.frames or not entry.audio_bytes or self._store is None:
+            return True
+        entry.frames = self._store.frames(entry.row)
+        return entry.frames is not None
+
+    def _remove(self, slot: int) -> None:
+        entry = self._entries[slot]
+        self.audio_bytes -= entry.audio_bytes
+        self._entries[slot] = None
+        self._index.remove(slot)
+        self._live -= 1
+        if self._store is not None and entry.row is not None:
+            self._store.remove([entry.row])
+
+    def _evict(self, now: float) -> None:
+        """Drop expired answers, then the oldest tenth, and compact once half the slots are empty"""
+        live = [slot for slot, entry in enumerate(self._entries) if entry is not None]
+        for slot in live:
+            if self._entries[slot].expires_at <= now:
+                self._remove(slot)
+        live = [slot for slot in live if self._entries[slot] is not None]
+        if len(live) >= self.max_entries:
+            for slot in live[: max(len(live) // 10, 1)]:
+                self._remove(slot)
+        if self._live < len(self._entries) // 2:
+            vectors = self._index._vectors
+            index = VectorIndex(self._index.dim, ivf_from=self.ivf_from)
+            entries = []
+            for slot, entry in enumerate(self._entries):
+                if entry is not None:
+                    index.add(vectors[slot])
+                    entries.append(entry)
+            self._index, self._entries = index, entries
+
+
+class AnswerCache:
+    """Every job's answers in this worker"""
+
+    def __init__(self, *, threshold: float, ttl: float = DEFAULT_TTL, store: AnswerStore | None = None, **job_options):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.store = store
+        self.job_options = job_options
+        self._jobs: dict[str, JobAnswers] = {}
+        self._lock = threading.Lock()
+
+    def for_job(self, job_context, language: str = "en") -> JobAnswers:
+        """The job's answers in `language`, emptied first if its job_context isn't the one they were given under"""
+        if not isinstance(job_context, dict):
+            job_context = job_context.to_dict()  # call_state.JobContext
+        key, current = f"{job_key(job_context)}/{language}", fingerprint(job_context)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.fingerprint != current:
+                if job is not None:
+                    logger.info(f"job {key} changed, dropping {len(job)} cached answers")
+                job = self._jobs[key] = JobAnswers(
+                    key, current, threshold=self.threshold, ttl=self.ttl, store=self.store, **self.job_options
+                )
+            return job
+
+
+def answer_cache_enabled() -> bool:
+    return os.getenv("ANSWER_CACHE", "0") == "1"
+
+
+def make_embedder(client=None):
+    """ANSWER_CACHE_EMBEDDER: `openai` (default, over `client`) or `hashing`"""
+    if os.getenv("ANSWER_CACHE_EMBEDDER", "openai") == "hashing":
+        return HashingEmbedder()
+    return OpenAIEmbedder(client)
+
+
+@cache
+def shared_answer_cache() -> AnswerCache:
+    """The process's cache over ANSWER_CACHE_DB, with the threshold of the configured embedder and ANSWER_CACHE_TTL"""
+    threshold = HashingEmbedder.threshold if os.getenv("ANSWER_CACHE_EMBEDDER", "openai") == "hashing" else OpenAIEmbedder.threshold
+    return AnswerCache(
+        threshold=threshold,
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", DEFAULT_TTL)),
+        store=AnswerStore(os.getenv("ANSWER_CACHE_DB", "answer_cache.db")),
+    )
+
+
+class CallAnswers:
+    """One call's use of its job's answers: looks questions up, stores the model's answers to the rest"""
+
+    def __init__(
+        self,
+        job: JobAnswers,
+        embedder,
+        *,
+        job_context=None,
+        candidate_context=None,
+        embed_timeout: float = 0.3,
+        turn_budget: float = 0.8,
+    ):
+        self.job = job
+        self.embedder = embedder
+        self.embed_timeout = embed_timeout
+        self.turn_budget = turn_budget  # after the candidate stops speaking, by when a lookup has to be done
+        self.embed_latency = 0.0  # smoothed, timeouts counted in full
+        self.lookups = 0
+        self.hits = 0
+        self.stored = 0
+        self.skipped = 0
+        # what an answer may name, and what it mustn't
+        self._shared = context_terms(job_context)
+        self._personal = context_terms(candidate_context) - self._shared
+        self._speech_ended: float | None = None
+        self._session = None
+        self._pending: tuple[str, np.ndarray] | None = None
+        self._frames: list | None = None
+
+    def attach_session(self, session) -> None:
+        """The session cached answers are played on, and whose replies are stored"""
+        self._session = session
+        session.on("conversation_item_added", self._on_item)
+        session.on("user_state_changed", self._on_user_state)
+
+    async def lookup(self, text: str) -> CachedAnswer | None:
+        """At the end of the candidate's turn: the cached answer to their question, if there is one"""
+        self._pending = self._frames = None
+        if not is_cacheable_question(text):
+            return None
+        question = normalize_question(text)
+        spent = 0.0 if self._speech_ended is None else clock.monotonic() - self._speech_ended
+        left = min(self.embed_timeout, self.turn_budget - spent)
+        if self.embed_latency >= left:
+            # the turn can't afford it; skipped lookups let the estimate decay so a recovered embedder is tried again
+            self.skipped += 1
+            self.embed_latency /= 2
+            return None
+        started = clock.monotonic()
+        try:
+            vector = (await asyncio.wait_for(self.embedder.embed([question]), left))[0]
+        except Exception as e:
+            # a slow or failed embedding only costs the cache this turn
+            logger.warning(f"couldn't embed a question ({type(e).__name__}), asking the model")
+            return None
+        finally:
+            self.embed_latency = 0.7 * self.embed_latency + 0.3 * (clock.monotonic() - started)
+        self.lookups += 1
+        # the job's store is SQLite, kept off the call's event loop
+        entry = await asyncio.to_thread(self.job.lookup, vector, clock.time())
+        if entry is None:
+            self._pending, self._frames = (question, vector), []
+            return None
+        self.hits += 1
+        return entry
+
+    def say(self, entry: CachedAnswer):
+        if entry.frames:
+            return self._session.say(entry.answer, audio=play_frames(entry.frames))
+        return self._session.say(entry.answer)
+
+    async def capture(self, audio):
+        """Wraps the agent's tts_node: keeps the audio of the answer to a pending question"""
+        frames = self._frames
+        async for frame in audio:
+            if frames is not None:
+                frames.append(frame)
+            yield frame
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"answer cache: {self.hits}/{self.lookups} questions answered from the cache, {self.stored} answers stored, "
+            f"{self.skipped} lookups skipped over the turn budget, "
+            f"{len(self.job)} cached for job {self.job.key} ({self.job.hits}/{self.job.lookups} hits overall)"
+        )
+
+    def is_personal(self, answer: str) -> bool:
+        """Whether an answer names something that's only true for this candidate"""
+        names = {word.lower() for word in _WORD.findall(answer) if word[0].isupper()} | entities(answer)
+        return bool(entities(answer) - self._shared or names & self._personal)
+
+    def _on_user_state(self, ev) -> None:
+        if ev.old_state == "speaking":
+            self._speech_ended = clock.monotonic()
+
+    def _on_item(self, ev) -> None:
+        item = ev.item
+        if getattr(item, "role", None) != "assistant" or self._pending is None:
+            return
+        (question, vector), frames = self._pending, self._frames
+        self._pending = self._frames = None
+        answer = (item.text_content or "").strip()
+        if getattr(item, "interrupted", False) or not answer:
+            return
+        if self.is_personal(answer):
+            return  # not an answer for the next candidate
+        job = self.job
+        stored = asyncio.get_running_loop().run_in_executor(
+            None, job.store, question, vector, answer, tuple(frames) or None, clock.time()
+        )
+        stored.add_done_callback(self._on_stored)
+
+    def _on_stored(self, stored: asyncio.Future) -> None:
+        if stored.exception() is not None:
+            logger.warning(f"couldn't store an answer: {stored.exception()!r}")
+        else:
+            self.stored += stored.result()
@@ -0,0 +1,73 @@
+"""
+Cached pre-recorded audio prompts
+
+Voicemail messages, hold prompts and other fixed prompts are decoded once per
+worker process and replayed as `rtc.AudioFrame`s through `AgentSession.say(audio=...)`,
+so they cost no model time and start playing immediately. Prompts without a
+recording can be synthesized once with `synthesize_frames` and cached the same way.
+"""
+from __future__ import annotations
+
+import os
+import wave
+from functools import lru_cache
+
+from livekit import rtc
+
+
+@lru_cache(maxsize=16)
+def load_wav_frames(path: str, frame_ms: int = 20) -> tuple[rtc.AudioFrame, ...]:
+    """Load (and cache for the life of the worker) a 16-bit PCM WAV file as audio frames"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: cached prompts must be 16-bit PCM")
+        sample_rate = wav.getframerate()
+        num_channels = wav.getnchannels()
+        data = wav.readframes(wav.getnframes())
+
+    samples_per_channel = sample_rate * frame_ms // 1000
+    frame_bytes = samples_per_channel * num_channels * 2
+    frames = []
+    for start in range(0, len(data), frame_bytes):
+        chunk = data[start : start + frame_bytes]
+        if len(chunk) < frame_bytes:
+            chunk = chunk + b"\x00" * (frame_bytes - len(chunk))
+        frames.append(
+            rtc.AudioFrame(
+                data=chunk,
+                sample_rate=sample_rate,
+                num_channels=num_channels,
+                samples_per_channel=samples_per_channel,
+            )
+        )
+    return tuple(frames)
+
+
+def prompt_path(env_var: str) -> str | None:
+    """Path of a pre-recorded prompt configured through an environment variable, if it exists"""
+    path = os.getenv(env_var)
+    if path and os.path.exists(path):
+        return path
+    return None
+
+
+async def synthesize_frames(tts, text: str) -> tuple[rtc.AudioFrame, ...]:
+    """Run `text` through a TTS plugin once and keep the audio for replaying"""
+    frames = []
+    async with tts.synthesize(text) as stream:
+        async for audio in stream:
+            frames.append(audio.frame)
+    return tuple(frames)
+
+
+async def play_frames(frames):
+    """Async iterator adapter for `AgentSession.say(audio=...)`"""
+    for frame in frames:
+        yield frame
+
+
+async def loop_frames(frames):
+    """Repeat a prompt until the speech playing it is interrupted (e.g. hold music)"""
+    while True:
+        for frame in frames:
+            yield frame
@@ -0,0 +1,367 @@
+"""
+Input audio conditioning for SIP callers
+
+The room's audio stream already comes through WebRTC's own jitter buffer,
+which plays it out on a steady clock, so by default this stage only
+upsamples the caller's 8kHz telephony audio to the rate the models expect,
+frame by frame as it arrives, and adds no delay:
+
+    rtc.AudioStream @ 8kHz (BVCTelephony) -> Resampler -> AgentSession
+
+It also measures the inter-arrival jitter of the frames reaching the agent
+(RFC 3550 estimator). WebRTC's playout leaves that near zero; only when it
+rises above `buffer_above_ms` - frames reaching the agent in bursts WebRTC
+didn't smooth, e.g. behind a busy event loop - does a second JitterBuffer go in, re-timing frames onto a 20ms clock with a
+target depth that follows the jitter, capped at `max_delay_ms`; it comes out
+again once the jitter falls back under half the threshold.
+
+- Resampler: vectorised linear interpolation with precomputed weights.
+- JitterStats counts frames passed through and played from the buffer,
+  underruns (a tick with no audio ready: late, or never sent; this stage can't
+  tell them apart), late and dropped frames, and CPU time per stream, so the
+  stage can be held to a fixed CPU budget.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("audio-conditioning")
+
+TELEPHONY_SAMPLE_RATE = 8000
+
+
+class Resampler:
+    """Streaming linear-interpolation resampler for int16 mono PCM"""
+
+    def __init__(self, in_rate: int, out_rate: int):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self._last = np.zeros(1, dtype=np.float32)  # carried over so frame edges don't click
+        self._weights: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def _plan(self, n: int) -> tuple[np.ndarray, np.ndarray]:
+        # index/weight tables depend only on the frame length, so build them once
+        plan = self._weights.get(n)
+        if plan is None:
+            out_n = n * self.out_rate // self.in_rate
+            # output sample k sits at input position k * in/out, relative to the carried sample
+            pos = np.arange(1, out_n + 1, dtype=np.float64) * (self.in_rate / self.out_rate)
+            idx = np.minimum(np.floor(pos).astype(np.int64), n - 1)
+            frac = (pos - idx).astype(np.float32)
+            plan = self._weights[n] = (idx, frac)
+        return plan
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        if self.in_rate == self.out_rate or len(pcm) == 0:
+            return pcm
+        idx, frac = self._plan(len(pcm))
+        x = np.concatenate((self._last, pcm.astype(np.float32)))
+        out = x[idx] + (x[idx + 1] - x[idx]) * frac
+        self._last[0] = x[-1]
+        return out.astype(np.int16)
+
+
+@dataclass
+class JitterStats:
+    received: int = 0
+    passed: int = 0  # frames handed on as they arrived, with no jitter buffer
+    played: int = 0  # playout ticks while the jitter buffer was in
+    concealed: int = 0  # playout ticks with no audio ready (an underrun: late or never sent)
+    late: int = 0  # frames skipped to win back delay after audio arrived late in a burst
+    dropped: int = 0  # frames discarded to keep latency under the cap
+    buffered_runs: int = 0  # times the jitter buffer went in
+    jitter_ms: float = 0.0
+    target_depth: int = 0
+    cpu_seconds: float = 0.0
+
+    @property
+    def underrun_rate(self) -> float:
+        return self.concealed / max(self.played, 1)
+
+
+class JitterBuffer:
+    """Adaptive de-jitter buffer on a fixed frame clock, bounded by `max_delay_ms`"""
+
+    def __init__(
+        self,
+        *,
+        sample_rate: int = TELEPHONY_SAMPLE_RATE,
+        frame_ms: int = 20,
+        min_delay_ms: int = 20,
+        max_delay_ms: int = 120,
+        conceal_frames: int = 3,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_s = frame_ms / 1000
+        self.min_frames = max(min_delay_ms // frame_ms, 1)
+        self.max_frames = max(max_delay_ms // frame_ms, self.min_frames)
+        self.conceal_frames = conceal_frames
+        self.stats = JitterStats(target_depth=self.min_frames)
+
+        # fixed-size sample ring: no allocation per pushed frame
+        self._ring = np.zeros(self.frame_samples * (self.max_frames + 2), dtype=np.int16)
+        self._read = 0
+        self._size = 0
+        self._last_arrival: float | None = None
+        self._last_frame = np.zeros(self.frame_samples, dtype=np.int16)
+        self._concealed_run = 0
+        self._primed = False
+
+    @property
+    def depth(self) -> int:
+        """Whole frames currently buffered"""
+        return self._size // self.frame_samples
+
+    def measure(self, samples: int, arrival: float) -> float:
+        """Count a frame's arrival into the jitter estimate; returns it, in ms"""
+        self.stats.received += 1
+        if self._last_arrival is not None:
+            # RFC 3550 interarrival jitter, measured against the frame's own duration
+            d = abs((arrival - self._last_arrival) - samples / self.sample_rate)
+            self.stats.jitter_ms += (d * 1000 - self.stats.jitter_ms) / 16
+        self._last_arrival = arrival
+        self._retarget()
+        return self.stats.jitter_ms
+
+    def push(self, pcm: np.ndarray, arrival: float) -> None:
+        self.measure(len(pcm), arrival)
+        self.store(pcm)
+
+    def store(self, pcm: np.ndarray) -> None:
+        """Buffer a frame already measured"""
+        limit = self.max_frames * self.frame_samples
+        overflow = self._size + len(pcm) - limit
+        if overflow > 0:
+            # over the latency cap: drop the oldest audio rather than fall behind
+            self.stats.dropped += -(-overflow // self.frame_samples)
+            buffered_drop = min(overflow, self._size)
+            self._advance(buffered_drop)
+            pcm = pcm[overflow - buffered_drop :]
+
+        capacity = len(self._ring)
+        write = (self._read + self._size) % capacity
+        first = min(len(pcm), capacity - write)
+        self._ring[write : write + first] = pcm[:first]
+        self._ring[: len(pcm) - first] = pcm[first:]
+        self._size += len(pcm)
+
+    def pop(self) -> tuple[np.ndarray, bool]:
+        """Next frame for the playout clock, and whether it was concealed"""
+        if not self._primed:
+            if self.depth < self.stats.target_depth:
+                return np.zeros(self.frame_samples, dtype=np.int16), False
+            self._primed = True
+
+        self.stats.played += 1
+        if self._size < self.frame_samples:
+            # playout slips one frame, which is also how the delay grows under jitter
+            return self._conceal(), True
+        if self.depth > self.stats.target_depth + 1:
+            # more buffered than the jitter calls for (a burst after a stall): catch back up
+            self.stats.late += 1
+            self._advance(self.frame_samples)
+
+        start, end = self._read, self._read + self.frame_samples
+        if end <= len(self._ring):
+            frame = self._ring[start:end].copy()
+        else:
+            frame = np.concatenate((self._ring[start:], self._ring[: end - len(self._ring)]))
+        self._advance(self.frame_samples)
+        self._last_frame = frame
+        self._concealed_run = 0
+        return frame, False
+
+    def drain(self) -> np.ndarray:
+        """Everything buffered, oldest first; playout primes again next time"""
+        end = self._read + self._size
+        if end <= len(self._ring):
+            pcm = self._ring[self._read : end].copy()
+        else:
+            pcm = np.concatenate((self._ring[self._read :], self._ring[: end - len(self._ring)]))
+        self._advance(self._size)
+        self._primed = False
+        return pcm
+
+    def reset(self) -> None:
+        """Discard buffered audio (keeps the stats), e.g. while input is switched off"""
+        self._read = self._size = 0
+        self._last_arrival = None
+        self._concealed_run = 0
+        self._primed = False
+
+    def _conceal(self) -> np.ndarray:
+        self.stats.concealed += 1
+        self._advance(self._size)
+        self._concealed_run += 1
+        if self._concealed_run > self.conceal_frames:
+            return np.zeros(self.frame_samples, dtype=np.int16)
+        # fade the last good frame out over a few ticks instead of cutting to silence
+        gain = 1.0 - self._concealed_run / (self.conceal_frames + 1)
+        return (self._last_frame * gain).astype(np.int16)
+
+    def _advance(self, samples: int) -> None:
+        self._read = (self._read + samples) % len(self._ring)
+        self._size -= samples
+
+    def _retarget(self) -> None:
+        # hold about twice the measured jitter (plus the frame being played out)
+        jitter_frames = int(np.ceil(2 * self.stats.jitter_ms / 1000 / self.frame_s - 1e-6))
+        self.stats.target_depth = min(max(self.min_frames, jitter_frames + 1), self.max_frames)
+
+
+class ConditionedAudioInput(io.AudioInput):
+    """Wraps the session's room audio input with the resampler, and the jitter buffer while jitter calls for it"""
+
+    def __init__(
+        self,
+        source: io.AudioInput,
+        *,
+        in_rate: int = TELEPHONY_SAMPLE_RATE,
+        out_rate: int = 24000,
+        frame_ms: int = 20,
+        max_delay_ms: int = 120,
+        buffer_above_ms: float = 15.0,
+    ):
+        self.source = source
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.buffer_above_ms = buffer_above_ms
+        self.buffer = JitterBuffer(sample_rate=in_rate, frame_ms=frame_ms, max_delay_ms=max_delay_ms)
+        self.resampler = Resampler(in_rate, out_rate)
+        self.buffering = False
+        self._ready: deque[np.ndarray] = deque()  # frames to hand on as they are, oldest first
+        self._arrived = asyncio.Event()
+        self._reader: asyncio.Task | None = None
+        self._next_tick: float | None = None
+        self._attached = asyncio.Event()
+        self._attached.set()
+
+    @property
+    def stats(self) -> JitterStats:
+        return self.buffer.stats
+
+    def on_attached(self) -> None:
+        self.source.on_attached()
+        self._attached.set()
+
+    def on_detached(self) -> None:
+        # stop the playout clock too, otherwise it would keep feeding the model silence
+        self.source.on_detached()
+        self._attached.clear()
+        self._next_tick = None
+        self._ready.clear()
+        self.buffering = False
+        self.buffer.reset()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_source(), name="conditioned_audio_reader")
+        while True:
+            if self._reader.done() and not self._ready:
+                raise StopAsyncIteration
+            await self._attached.wait()
+            if self._ready:
+                self.stats.passed += 1
+                return self._frame(self._ready.popleft())
+            if self.buffering:
+                return await self._play_tick()
+            self._arrived.clear()
+            await self._arrived.wait()
+
+    async def _play_tick(self) -> rtc.AudioFrame:
+        loop = asyncio.get_running_loop()
+        if self._next_tick is None:
+            self._next_tick = loop.time()
+        self._next_tick += self.buffer.frame_s
+        await asyncio.sleep(max(self._next_tick - loop.time(), 0.0))
+        pcm, _ = self.buffer.pop()
+        return self._frame(pcm)
+
+    def _frame(self, pcm: np.ndarray) -> rtc.AudioFrame:
+        started = time.thread_time()
+        out = self.resampler.process(pcm)
+        self.stats.cpu_seconds += time.thread_time() - started
+        return rtc.AudioFrame(data=out.tobytes(), sample_rate=self.out_rate, num_channels=1, samples_per_channel=len(out))
+
+    def _push(self, data: memoryview, arrival: float) -> None:
+        started = time.thread_time()
+        pcm = np.frombuffer(data, dtype=np.int16)
+        jitter = self.buffer.measure(len(pcm), arrival)
+        if not self.buffering and jitter > self.buffer_above_ms:
+            self.buffering = True
+            self.stats.buffered_runs += 1
+            logger.info(f"caller audio jitter {jitter:.0f}ms, de-jittering it")
+        elif self.buffering and jitter < self.buffer_above_ms / 2:
+            # hand what's buffered on first, then frames as they arrive again
+            self.buffering = False
+            self._next_tick = None
+            self._ready.append(self.buffer.drain())
+            logger.info(f"caller audio jitter back to {jitter:.0f}ms, jitter buffer out")
+        if self.buffering:
+            self.buffer.store(pcm)
+        else:
+            self._ready.append(pcm)
+        self.stats.cpu_seconds += time.thread_time() - started
+
+    async def _read_source(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            async for frame in self.source:
+                if not self._attached.is_set():
+                    continue
+                if frame.sample_rate != self.in_rate:
+                    logger.warning(f"expected {self.in_rate}Hz input, got {frame.sample_rate}Hz")
+                # frame.data is a memoryview over the frame's own buffer: no copy until the jitter buffer
+                self._push(frame.data, loop.time())
+                self._arrived.set()
+        finally:
+            self._arrived.set()
+
+    async def aclose(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+def condition_session_audio(
+    session,
+    *,
+    out_rate: int,
+    max_delay_ms: int = 120,
+    buffer_above_ms: float = 15.0,
+) -> ConditionedAudioInput:
+    """Put the conditioning stage in front of a started session's room audio input
+
+    The session must be started with `RoomInputOptions(audio_sample_rate=8000)` so the
+    stage receives the caller's telephony-rate audio.
+    """
+    conditioned = ConditionedAudioInput(
+        session.input.audio,
+        in_rate=TELEPHONY_SAMPLE_RATE,
+        out_rate=out_rate,
+        max_delay_ms=max_delay_ms,
+        buffer_above_ms=buffer_above_ms,
+    )
+    session.input.audio = conditioned
+    if not session.input.audio_enabled:
+        conditioned.on_detached()  # started deaf (until AMD hears a person): no playout clock either
+    return conditioned
+
+
+def log_stats(stats: JitterStats, label: str = "caller audio") -> None:
+    logger.info(
+        f"{label}: {stats.received} frames in, {stats.passed} passed through, "
+        f"{stats.played} played from the jitter buffer (in {stats.buffered_runs}x), "
+        f"{stats.concealed} underruns ({stats.underrun_rate:.1%}), {stats.late} late, "
+        f"{stats.dropped} dropped, jitter {stats.jitter_ms:.1f}ms, "
+        f"cpu {stats.cpu_seconds * 1000:.1f}ms"
+    )
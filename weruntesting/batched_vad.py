@@ -0,0 +1,253 @@
+"""
+Worker-level batched Silero VAD
+
+`silero.VAD.load()` gives every call its own ONNX inference: one tiny run per
+32ms window per call, each paying the full per-run overhead. With many calls
+in one worker that overhead dominates the CPU. Here every call's VAD stream
+hands its window to one shared VADBatcher instead:
+
+    call 1 window --\
+    call 2 window ---+--> one (N, 576) tensor -> one ONNX run -> N probabilities
+    call N window --/
+
+- the batcher thread runs as soon as every active stream has a window waiting,
+  or `max_wait` after the first one arrived, whichever comes first
+- each stream keeps its own RNN state and context, gathered into the batch and
+  scattered back after the run
+- the rest of the silero plugin (speech segmentation, padding, events) is used
+  unchanged, only the model call is swapped out
+
+Jobs only share the batcher when they run in the same process. Job processes
+are the default, where each call's batch is its own; `INTERVIEW_JOB_THREADS=1`
+runs the interview agent's jobs as threads of one process, which share it.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import cache
+
+import numpy as np
+from livekit.plugins import silero
+from livekit.plugins.silero import onnx_model
+from livekit.plugins.silero.vad import VADStream, _VADOptions
+
+STATE_SIZE = 128
+
+
+@dataclass
+class BatchStats:
+    runs: int = 0
+    windows: int = 0
+    inference_seconds: float = 0.0
+
+    @property
+    def mean_batch(self) -> float:
+        return self.windows / max(self.runs, 1)
+
+
+class VADBatcher:
+    """Runs the VAD windows of all active streams as one batched inference"""
+
+    def __init__(self, session, *, sample_rate: int = 16000, max_wait: float = 0.008, initial_slots: int = 16):
+        if sample_rate not in onnx_model.SUPPORTED_SAMPLE_RATES:
+            raise ValueError("Silero VAD only supports 8KHz and 16KHz sample rates")
+        self._session = session
+        self.sample_rate = sample_rate
+        self.window_size_samples = 256 if sample_rate == 8000 else 512
+        self.context_size = 32 if sample_rate == 8000 else 64
+        self.max_wait = max_wait
+        self.stats = BatchStats()
+        self._sr = np.array(sample_rate, dtype=np.int64)
+
+        # per-slot model state, indexed by the stream's slot number
+        self._states = np.zeros((2, initial_slots, STATE_SIZE), dtype=np.float32)
+        self._contexts = np.zeros((initial_slots, self.context_size), dtype=np.float32)
+        self._free = list(range(initial_slots - 1, -1, -1))
+        self._active: set[int] = set()
+
+        # each window waits on a future of its own, so a slot handed to a new stream
+        # can't be woken by a batch that was run for the stream before it
+        self._pending: dict[int, tuple[np.ndarray, Future]] = {}
+        self._first_pending = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="vad_batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._active)
+
+    def register(self) -> int:
+        with self._cond:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._states[:, slot] = 0
+            self._contexts[slot] = 0
+            self._active.add(slot)
+            return slot
+
+    def unregister(self, slot: int) -> None:
+        with self._cond:
+            if slot in self._active:
+                self._active.discard(slot)
+                if (pending := self._pending.pop(slot, None)) is not None:
+                    # don't leave the stream's executor thread blocked forever
+                    pending[1].set_result(0.0)
+                self._free.append(slot)
+                # the batch may have been waiting on this stream
+                self._cond.notify()
+
+    def infer(self, slot: int, window: np.ndarray) -> float:
+        """Speech probability for one window; blocks until the batch containing it has run"""
+        result: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("VAD batcher is closed")
+            alone = len(self._active) == 1 and not self._pending
+            if alone:
+                batch = self._gather({slot: (window, result)})
+            else:
+                if not self._pending:
+                    self._first_pending = time.monotonic()
+                self._pending[slot] = (window, result)
+                self._cond.notify()
+        if alone:
+            # nothing to batch with, skip the hand-off to the batcher thread
+            self._infer_batch(*batch)
+        return float(result.result())
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+            self._cond.notify()
+        for _, result in pending.values():
+            result.set_exception(RuntimeError("VAD batcher is closed"))
+        self._thread.join()
+
+    def _grow(self) -> None:
+        old = len(self._contexts)
+        self._states = np.concatenate((self._states, np.zeros_like(self._states)), axis=1)
+        self._contexts = np.concatenate((self._contexts, np.zeros_like(self._contexts)))
+        self._free += range(2 * old - 1, old - 1, -1)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._closed:
+                if self._pending:
+                    remaining = self._first_pending + self.max_wait - time.monotonic()
+                    if len(self._pending) >= len(self._active) or remaining <= 0:
+                        batch, self._pending = self._pending, {}
+                        return self._gather(batch)
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _gather(self, batch: dict[int, tuple[np.ndarray, Future]]):
+        # called with the lock held, a register() may grow the state arrays
+        slots = np.fromiter(batch, dtype=np.int64, count=len(batch))
+        x = np.empty((len(slots), self.context_size + self.window_size_samples), dtype=np.float32)
+        x[:, : self.context_size] = self._contexts[slots]
+        x[:, self.context_size :] = np.stack([window for window, _ in batch.values()])
+        return slots, x, self._states[:, slots], [result for _, result in batch.values()]
+
+    def _infer_batch(self, slots: np.ndarray, x: np.ndarray, states: np.ndarray, results: list[Future]) -> None:
+        started = time.perf_counter()
+        out, states = self._session.run(None, {"input": x, "state": states, "sr": self._sr})
+        elapsed = time.perf_counter() - started
+
+        with self._cond:
+            # a stream that closed mid-run may have given its slot to a new one already
+            live = np.fromiter((slot in self._active for slot in slots), dtype=bool, count=len(slots))
+            self._states[:, slots[live]] = states[:, live]
+            self._contexts[slots[live]] = x[live, -self.context_size :]
+            self.stats.runs += 1
+            self.stats.windows += len(slots)
+            self.stats.inference_seconds += elapsed
+        for result, probability in zip(results, out[:, 0]):
+            result.set_result(float(probability))
+
+    def _run(self) -> None:
+        while (batch := self._take_batch()) is not None:
+            self._infer_batch(*batch)
+
+
+class BatchedModel:
+    """Stands in for silero's per-stream `OnnxModel`, backed by the shared batcher"""
+
+    def __init__(self, batcher: VADBatcher):
+        self._batcher = batcher
+        self._slot: int | None = batcher.register()
+
+    @property
+    def sample_rate(self) -> int:
+        return self._batcher.sample_rate
+
+    @property
+    def window_size_samples(self) -> int:
+        return self._batcher.window_size_samples
+
+    @property
+    def context_size(self) -> int:
+        return self._batcher.context_size
+
+    def __call__(self, x: np.ndarray) -> float:
+        return self._batcher.infer(self._slot, x)
+
+    def close(self) -> None:
+        if self._slot is not None:
+            self._batcher.unregister(self._slot)
+            self._slot = None
+
+
+@cache
+def shared_batcher(sample_rate: int = 16000, max_wait: float = 0.008) -> VADBatcher:
+    """The process-wide batcher; call it from prewarm so the model is loaded before calls arrive"""
+    return VADBatcher(onnx_model.new_inference_session(True), sample_rate=sample_rate, max_wait=max_wait)
+
+
+class BatchedVAD(silero.VAD):
+    """`silero.VAD` whose streams share one batched inference
+
+    Build one per call (the session listens to the VAD's metrics events), they
+    all feed the same process-wide batcher.
+    """
+
+    @classmethod
+    def load(
+        cls,
+        *,
+        min_speech_duration: float = 0.05,
+        min_silence_duration: float = 0.55,
+        prefix_padding_duration: float = 0.5,
+        max_buffered_speech: float = 60.0,
+        activation_threshold: float = 0.5,
+        batcher: VADBatcher | None = None,
+    ) -> BatchedVAD:
+        batcher = batcher or shared_batcher()
+        opts = _VADOptions(
+            min_speech_duration=min_speech_duration,
+            min_silence_duration=min_silence_duration,
+            prefix_padding_duration=prefix_padding_duration,
+            max_buffered_speech=max_buffered_speech,
+            activation_threshold=activation_threshold,
+            sample_rate=batcher.sample_rate,
+        )
+        return cls(batcher=batcher, opts=opts)
+
+    def __init__(self, *, batcher: VADBatcher, opts: _VADOptions):
+        super().__init__(session=batcher._session, opts=opts)
+        self.batcher = batcher
+
+    def stream(self) -> VADStream:
+        model = BatchedModel(self.batcher)
+        stream = VADStream(self, self._opts, model)
+        stream._task.add_done_callback(lambda _: model.close())
+        self._streams.add(stream)
+        return stream
@@ -0,0 +1,84 @@
+"""
+Answer cache lookups as a job's cache grows
+
+Fills one job's JobAnswers with `--sizes` cached questions (random unit
+vectors of the embedding's dimension; a learned embedding spreads questions
+out about as much) and times lookups of near duplicates of cached questions,
+with the index searched exactly and through its IVF partition. Reported per
+size: lookup p50/p95, recall of the IVF search against the exact one, store
+rate and the index's memory. The lookup happens between the end of the
+candidate's turn and the model being asked, so it has to stay in the
+low milliseconds at the largest size.
+
+Usage:
+    python bench_answer_cache.py --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from answer_cache import JobAnswers
+from call_harness import percentile
+
+
+def unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(size, vectors):
+    """A job with `size` answers, stored the way calls store them (IVF builds in the background included)"""
+    job = JobAnswers("bench", "fp", threshold=0.85, max_entries=size)
+    started = time.perf_counter()
+    for i, vector in enumerate(vectors[:size]):
+        job.store(f"question {i}", vector, f"answer {i}", None, now=0.0)
+    return job, time.perf_counter() - started
+
+
+def time_lookups(job, queries):
+    samples, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        entry = job.lookup(query, now=1.0)
+        samples.append(time.perf_counter() - started)
+        found.append(entry.question if entry else None)
+    return samples, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark answer cache lookups by cache size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = unit(rng.standard_normal((max(args.sizes), args.dim)).astype(np.float32))
+
+    print("\n📊 ANSWER CACHE LOOKUPS")
+    print("=" * 60)
+    print(f"{'cached':>8} {'index':>6} {'p50':>9} {'p95':>9} {'recall':>7} {'stores/s':>10} {'index MB':>9}")
+    for size in args.sizes:
+        job, fill_seconds = fill(size, vectors)
+        index = job._index
+        index.build()  # settle whatever was still building
+        picks = rng.integers(0, size, args.lookups)
+        # the same question, worded a little differently: cosine ~0.95 to the cached one
+        queries = unit(vectors[picks] + 0.3 * unit(rng.standard_normal((args.lookups, args.dim)).astype(np.float32)))
+        megabytes = (index._vectors.nbytes + index._ivf.vectors.nbytes) / 2**20
+        nprobe, exact_found = index.nprobe, None
+        # probing every list is the exact search
+        for name, probes in (("exact", 10**9), ("ivf", nprobe)):
+            index.nprobe = probes
+            samples, found = time_lookups(job, queries)
+            exact_found = exact_found or found
+            recall = sum(a == b for a, b in zip(found, exact_found)) / len(found)
+            print(
+                f"{size:>8} {name:>6} {percentile(samples, 0.5) * 1000:>7.2f}ms {percentile(samples, 0.95) * 1000:>7.2f}ms "
+                f"{recall:>7.1%} {size / fill_seconds:>10.0f} {megabytes:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+CPU benchmark: per-session Silero VAD vs the worker-level batched VAD
+
+Each simulated call runs in its own thread (as the silero plugin does) and
+feeds 32ms windows of synthetic audio to its VAD model for `--seconds` of
+audio. The per-session setup gives every call its own `OnnxModel`; the batched
+setup routes every call through one VADBatcher. CPU time for the whole process
+is divided by the number of calls and the audio duration.
+
+Usage:
+    python bench_batched_vad.py --streams 1 10 50 --seconds 10
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+from livekit.plugins.silero import onnx_model
+
+from batched_vad import BatchedModel, VADBatcher
+
+SAMPLE_RATE = 16000
+WINDOW = 512
+
+
+def synth_windows(rng, seconds):
+    """Alternating bursts of voiced sound and background noise, as float32 windows"""
+    n = int(seconds * SAMPLE_RATE / WINDOW)
+    t = np.arange(n * WINDOW) / SAMPLE_RATE
+    voiced = (np.sin(2 * np.pi * 0.5 * t) > 0) * np.sin(2 * np.pi * 180 * t) * 0.3
+    audio = (voiced + rng.normal(0, 0.01, len(t))).astype(np.float32)
+    return audio.reshape(n, WINDOW)
+
+
+def run_streams(models, windows):
+    def feed(model):
+        for window in windows:
+            model(window)
+
+    threads = [threading.Thread(target=feed, args=(model,)) for model in models]
+    cpu, wall = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.process_time() - cpu, time.perf_counter() - wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session and batched VAD CPU cost")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio per stream")
+    args = parser.parse_args()
+
+    session = onnx_model.new_inference_session(True)
+    windows = synth_windows(np.random.default_rng(0), args.seconds)
+
+    print("\n📊 VAD CPU PER CALL")
+    print("=" * 60)
+    print(f"{'streams':>8} {'per-session':>14} {'batched':>14} {'mean batch':>11} {'saving':>8}")
+    for n in args.streams:
+        per_session = [onnx_model.OnnxModel(onnx_session=session, sample_rate=SAMPLE_RATE) for _ in range(n)]
+        single_cpu, _ = run_streams(per_session, windows)
+
+        batcher = VADBatcher(session, sample_rate=SAMPLE_RATE)
+        batched = [BatchedModel(batcher) for _ in range(n)]
+        batched_cpu, _ = run_streams(batched, windows)
+        for model in batched:
+            model.close()
+        batcher.close()
+
+        # CPU seconds per second of call audio, i.e. share of one core per call
+        single = single_cpu / n / args.seconds
+        shared = batched_cpu / n / args.seconds
+        print(
+            f"{n:>8} {single:>13.2%} {shared:>13.2%} {batcher.stats.mean_batch:>11.1f} "
+            f"{1 - shared / single:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Memory per active call, as a worker takes on more calls
+
+Builds `--calls` concurrent calls' per-call state the way the entrypoints
+do (the dispatch metadata or the job and candidate records decoded from
+JSON, the agent with its history window, endpointing and the call's
+language) for each agent, then has every call talk for `--minutes`,
+appending each item to the session's history and the agent's chat history
+the way the session does. Reported per agent and size, with the history
+window on (CALL_HISTORY_ITEMS) and off: the bytes tracemalloc counts per
+call, and the chat items the agent and the session each hold at the end. What a call shares with the rest of the worker (models, caches,
+the shared stores) isn't counted, and nor are the audio buffers, which
+LiveKit sizes per call regardless.
+
+A window keeps a call's memory flat however long the call goes on; without
+one it grows with every turn. `CALL_BUDGET` is the windowed call's budget,
+which test_call_state.py checks.
+
+Usage:
+    python bench_call_memory.py
+    python bench_call_memory.py --calls 10 100 500 --minutes 60
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from livekit.agents import llm
+
+from call_state import CandidateContext, DialInfo, HistoryWindow, JobContext, history_items
+from endpointing import Endpointing
+from languages import CallLanguage
+from call_lifecycle import CallLifecycle
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+import interview_agent  # noqa: E402
+
+# bytes a call may hold after half an hour with the default window
+CALL_BUDGET = 96 * 1024
+
+# a turn each way about every 15 seconds
+ITEMS_PER_MINUTE = 8
+
+JOB = {
+    "job_id": "job-0042",
+    "job_title": "Python Developer",
+    "company_name": "Tech Company",
+    "requirements": ["Python", "FastAPI", "MongoDB", "Docker", "AWS"],
+    "experience_level": "Mid-level",
+    "salary": "18-24 LPA",
+}
+
+LINES = {
+    "agent": "Thanks, that's helpful. Could you tell me about a project where you designed an API from scratch?",
+    "user": "Sure, at my last company I built the billing service's REST API with FastAPI, and we used MongoDB for storage.",
+}
+
+
+def candidate(i):
+    return {"candidate_name": f"Candidate {i}", "experience_years": 3 + i % 5, "relevant_skills": ["Python", "API Development"]}
+
+
+def dial(i):
+    return {"phone_number": f"+1415555{i % 10000:04d}", "transfer_to": "+14155550100", "campaign": "spring-recall", "attempt": 1}
+
+
+class Session:
+    """The part of AgentSession a call's history lives in"""
+
+    def __init__(self):
+        self.history = llm.ChatContext.empty()
+
+    def on(self, event, handler):
+        pass
+
+
+def new_call(kind, i, window):
+    """One call's state; `json.loads` gives it its own copy of every record, as the job's metadata does"""
+    if kind == "interview":
+        job = JobContext.from_record(json.loads(json.dumps(JOB)))
+        candidate_context = CandidateContext.from_record(json.loads(json.dumps(candidate(i))))
+        language = CallLanguage("en")
+        call = interview_agent.InterviewAgent(job, candidate_context, language=language)
+        endpointing = Endpointing(language=lambda: language.code)
+    else:
+        dial_info = DialInfo.from_record(json.loads(json.dumps(dial(i))))
+        call = agent.OutboundCaller(
+            name="Jayden", appointment_time="next Tuesday at 3pm", dial_info=dial_info, lifecycle=CallLifecycle()
+        )
+        endpointing = Endpointing(language=lambda: "en")
+    call._chat_ctx.add_message(role="system", content=call.instructions)
+    call.history = HistoryWindow(call, history_items() if window else 0)
+    session = Session()
+    call.history.attach_session(session)
+    return call, endpointing, session
+
+
+async def talk(call, session, items):
+    """The session's side: each turn added to its history and the agent's chat history, trimmed as it goes"""
+    for n in range(items):
+        role = "assistant" if n % 2 == 0 else "user"
+        item = session.history.add_message(role=role, content=f"{LINES['agent' if role == 'assistant' else 'user']} ({n})")
+        call._chat_ctx.insert(item)
+        if call.history.over():
+            await call.history.trim()
+
+
+async def measure(kind, calls, minutes, window):
+    """Bytes per call, and the chat items its agent and session hold, with `calls` of them active at once"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    active = [new_call(kind, i, window) for i in range(calls)]
+    for call, _, session in active:
+        await talk(call, session, int(minutes * ITEMS_PER_MINUTE))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    call, _, session = active[0]
+    return used / calls, len(call.chat_ctx.items), len(session.history.items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory per active call")
+    parser.add_argument("--calls", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--minutes", type=float, default=30.0, help="how long every call has been going")
+    args = parser.parse_args()
+
+    print("\n📊 MEMORY PER CALL")
+    print("=" * 60)
+    print(f"{args.minutes:.0f}-minute calls, window of {history_items()} items, budget {CALL_BUDGET / 1024:.0f} KiB")
+    print(f"{'agent':>10} {'calls':>6} {'window':>7} {'per call':>10} {'items':>6} {'session':>8} {'wall':>6}")
+    for kind in ("interview", "outbound"):
+        for calls in args.calls:
+            for window in (True, False):
+                started = time.perf_counter()
+                per_call, items, session_items = asyncio.run(measure(kind, calls, args.minutes, window))
+                print(
+                    f"{kind:>10} {calls:>6} {'on' if window else 'off':>7} {per_call / 1024:>7.1f}KiB "
+                    f"{items:>6} {session_items:>8} {time.perf_counter() - started:>5.1f}s"
+                )
+
+
+if __name__ == "__main__":
+    main()
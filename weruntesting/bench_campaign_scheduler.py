@@ -0,0 +1,136 @@
+"""
+Throughput harness for the campaign scheduler, against the fake LiveKit API
+
+1. Queues N contacts across timezones and reports insert rate, how many
+   contacts are held in memory and the process's peak RSS.
+2. Dispatches as fast as the fake workers allow (short simulated calls, all
+   windows open) and reports scheduling throughput in dispatches/second.
+3. Compares rate-matched dispatch with firing every dispatch at once (the
+   current `lk dispatch create` loop) on a small fake worker pool: how many
+   jobs had to wait for a worker, and for how long.
+
+Usage:
+    python bench_campaign_scheduler.py --contacts 1000000 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import tempfile
+import time
+
+from livekit import api
+
+from campaign_scheduler import CallWindow, CampaignScheduler, Contact, WorkerCapacity
+from fake_livekit import FakeLiveKitAPI
+
+TIMEZONES = ["America/New_York", "America/Chicago", "America/Los_Angeles", "Europe/London", "Asia/Kolkata", "Australia/Sydney"]
+ALWAYS_OPEN = CallWindow(start_hour=0, end_hour=24, weekdays=frozenset(range(7)))
+
+
+def contacts(n):
+    for i in range(n):
+        # valid 415 numbers (exchange 200-999), up to 8M distinct contacts
+        yield Contact(f"+1415{2_000_000 + i:07d}", TIMEZONES[i % len(TIMEZONES)], priority=i % 5)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def fill_and_drain(path, n, seconds):
+    scheduler = None
+    lk_api = FakeLiveKitAPI(
+        workers=50,
+        slots_per_worker=20,
+        call_seconds=(0.0, 0.002),
+        on_call_finished=lambda metadata, outcome: scheduler.complete(metadata["contact_id"], outcome),
+    )
+    scheduler = CampaignScheduler(
+        path, lk_api, capacity=WorkerCapacity(lk_api.capacity), window=ALWAYS_OPEN, max_rate=1e9,
+        results=f"{path}-results",
+    )
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    scheduler.add_contacts(contacts(n))
+    insert_seconds = time.perf_counter() - started
+    print(f"queued:          {n:,} contacts in {insert_seconds:.1f}s ({n / insert_seconds:,.0f}/s)")
+    print(f"in memory:       {scheduler.in_memory:,} contacts (rest on disk), peak RSS +{peak_rss_mb() - rss_before:.0f}MB")
+
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        if not await scheduler.step():
+            await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    await lk_api.aclose()
+    print(
+        f"dispatched:      {scheduler.stats.dispatched:,} in {elapsed:.1f}s "
+        f"({scheduler.stats.dispatched / elapsed:,.0f}/s, {scheduler.stats.refills} refills, "
+        f"{scheduler.in_memory:,} in memory)"
+    )
+    scheduler.close()
+
+
+async def rate_matching(path, n, matched):
+    scheduler = None
+    lk_api = FakeLiveKitAPI(
+        workers=2,
+        slots_per_worker=5,
+        call_seconds=(0.05, 0.15),
+        on_call_finished=lambda metadata, outcome: scheduler and scheduler.complete(metadata["contact_id"], outcome),
+    )
+    started = time.perf_counter()
+    if matched:
+        scheduler = CampaignScheduler(
+            path, lk_api, capacity=WorkerCapacity(lk_api.capacity, lk_api, refresh=0.0), window=ALWAYS_OPEN, max_rate=1e9,
+            results=f"{path}-results",
+        )
+        scheduler.add_contacts(contacts(n))
+        task = asyncio.create_task(scheduler.run(tick=0.005))
+        while scheduler.stats.answered < n:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        scheduler.close()
+    else:
+        for i, contact in enumerate(contacts(n)):
+            await lk_api.agent_dispatch.create_dispatch(
+                api.CreateAgentDispatchRequest(
+                    agent_name="outbound-caller", room=f"call-{i}", metadata=json.dumps({"phone_number": contact.phone})
+                )
+            )
+        while sum(lk_api.stats.finished.values()) < n:
+            await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await lk_api.aclose()
+    return lk_api.stats, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Campaign scheduler throughput and rate matching")
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--matching-calls", type=int, default=100)
+    args = parser.parse_args()
+    logging.getLogger("campaign-scheduler").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n📊 CAMPAIGN SCHEDULER THROUGHPUT")
+        print("=" * 60)
+        asyncio.run(fill_and_drain(os.path.join(tmp, "throughput.db"), args.contacts, args.seconds))
+
+        print("\n📊 RATE MATCHING (10 worker slots)")
+        print("=" * 60)
+        print(f"{'dispatch':>12} {'waited for worker':>18} {'longest wait':>13} {'peak calls':>11} {'total':>7}")
+        for matched in (False, True):
+            stats, elapsed = asyncio.run(rate_matching(os.path.join(tmp, f"matching-{matched}.db"), args.matching_calls, matched))
+            print(
+                f"{'scheduler' if matched else 'fire-all':>12} {stats.queued:>18} "
+                f"{stats.max_queue_seconds * 1000:>11.0f}ms {stats.peak_calls:>11} {elapsed:>6.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
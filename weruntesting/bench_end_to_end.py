@@ -0,0 +1,152 @@
+"""
+End-to-end latency regression run, against the local LiveKit/SIP stand-in
+
+Runs both agents' real entrypoints through call_harness.py, with no
+credentials or network:
+
+- outbound:  campaign-style dispatches to agent.py's outbound caller; each
+             callee answers after a scripted ring, says "Hello?", AMD hears a
+             person, and the caller speaks a few turns before the agent hangs up
+- inbound:   callers already on the line for interview_agent.py, speaking a
+             few turns and then hanging up
+
+Calls run concurrently, as they would on one worker. The model stand-ins
+answer after `--reply-latency`, so the figures measure what the agents' own
+code adds on top: dialling and retries, AMD, audio conditioning, endpointing,
+teardown. Each scenario's p95 is checked against its budgets, and the run
+exits non-zero if any budget is broken. With `--virtual` the calls run in
+virtual time (virtual_time.py): much faster, but the figures then leave out
+the CPU time the agents spend, so the real-time run is the one that gates.
+
+Usage:
+    python bench_end_to_end.py --calls 8
+    python bench_end_to_end.py --budget outbound.turn=1.2 --budget inbound.answer_to_greeting=0.8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+from livekit import api
+
+import virtual_time
+from call_harness import LocalWorker, SessionScript, check_budgets, latencies, local_environment, percentile, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+import interview_agent  # noqa: E402
+
+# p95 seconds; answer_to_greeting includes AMD for outbound calls (about 1.5s for a short "Hello?")
+BUDGETS = {
+    "outbound": {"dial": 1.0, "answer_to_greeting": 2.5, "turn": 1.3, "teardown": 0.5},
+    "inbound": {"answer_to_greeting": 1.0, "turn": 1.3, "teardown": 0.5},
+}
+
+
+def caller_audio(turns, seed, hello=True):
+    parts = [("silence", 0.2), ("speech", 0.5, 1), ("silence", 1.2)] if hello else [("silence", 1.0)]
+    for _ in range(turns):
+        parts += [("speech", 0.8, 3), ("silence", 2.0)]
+    return CallerAudio.script(*parts, seed=seed)
+
+
+async def outbound(calls, turns, script, api_latency, ring):
+    # the agent hangs up in reply to the caller's last turn
+    worker = LocalWorker(agent.entrypoint, script=replace(script, tools={turns: "end_call"}))
+    done = asyncio.Event()
+    finished = []
+
+    def on_finished(metadata, outcome):
+        finished.append(outcome)
+        if len(finished) == calls:
+            done.set()
+
+    server = FakeLiveKitAPI(
+        workers=1,
+        slots_per_worker=calls,
+        sip_script=lambda req: SipCall(setup=0.05, ring=ring, audio=caller_audio(turns, seed=int(req.room_name.split("-")[1]))),
+        job_runner=worker,
+        on_call_finished=on_finished,
+        api_latency=api_latency,
+    )
+    for i in range(calls):
+        await server.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(
+                agent_name="outbound-caller",
+                room=f"outbound-{i}",
+                metadata=json.dumps({"phone_number": f"+1415555{i:04d}", "transfer_to": "+14155550100"}),
+            )
+        )
+    await done.wait()
+    return worker.reports
+
+
+async def inbound(calls, turns, script, api_latency):
+    worker = LocalWorker(interview_agent.entrypoint, prewarm=interview_agent.prewarm, script=script)
+    server = FakeLiveKitAPI(api_latency=api_latency)
+    runs = []
+    for i in range(calls):
+        audio = caller_audio(turns, seed=i, hello=False)
+        server.inbound_call(f"inbound-{i}", SipCall(audio=audio, hangup_after=audio.duration))
+        runs.append(run_call(interview_agent.entrypoint, server, room_name=f"inbound-{i}", script=script, proc=worker.proc))
+    return await asyncio.gather(*runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end call latency against the local LiveKit/SIP stand-in")
+    parser.add_argument("--calls", type=int, default=8, help="concurrent calls per scenario")
+    parser.add_argument("--turns", type=int, default=2, help="caller turns per call")
+    parser.add_argument("--reply-latency", type=float, default=0.5, help="model time to first audio, seconds")
+    parser.add_argument("--ring", type=float, default=0.5, help="outbound ring time, seconds")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="LiveKit API round trip, seconds")
+    parser.add_argument("--budget", action="append", default=[], metavar="SCENARIO.METRIC=SECONDS")
+    parser.add_argument("--virtual", action="store_true", help="run in virtual time")
+    args = parser.parse_args()
+
+    budgets = {scenario: dict(limits) for scenario, limits in BUDGETS.items()}
+    for override in args.budget:
+        name, seconds = override.split("=")
+        scenario, metric = name.split(".")
+        budgets[scenario][metric] = float(seconds)
+
+    script = SessionScript(reply_latency=args.reply_latency)
+    run = virtual_time.run if args.virtual else asyncio.run
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, agent.entrypoint, interview_agent.entrypoint):
+        results = {
+            "outbound": run(outbound(args.calls, args.turns, script, args.api_latency, args.ring)),
+            "inbound": run(inbound(args.calls, args.turns, script, args.api_latency)),
+        }
+
+    print(f"\n📊 END-TO-END CALL LATENCY (local stand-in{', virtual time' if args.virtual else ''})")
+    print("=" * 60)
+    print(f"{args.calls} concurrent calls per scenario, {args.turns} caller turns, model reply {args.reply_latency:.2f}s")
+    print(f"{'scenario':>10} {'metric':>20} {'n':>4} {'p50':>8} {'p95':>8} {'budget':>8}")
+    failures = []
+    for scenario, reports in results.items():
+        for metric, samples in latencies(reports).items():
+            if not samples:
+                continue
+            budget = budgets[scenario].get(metric)
+            print(
+                f"{scenario:>10} {metric:>20} {len(samples):>4} {percentile(samples, 0.5):>7.3f}s "
+                f"{percentile(samples, 0.95):>7.3f}s {f'{budget:.3f}s' if budget else '-':>8}"
+            )
+        failures += [f"{scenario} {failure}" for failure in check_budgets(reports, budgets[scenario])]
+
+    print(f"\n({time.perf_counter() - started:.1f}s)")
+    if failures:
+        print("\n❌ Budgets broken:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ All budgets met")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Endpointing: how soon the agents answer, against how often they cut callers off
+
+Writes a corpus of calls (call_replay.py's format) whose callers speak at
+their own pace, from brisk to slow, and often stop to think in the middle of
+a sentence for longer than a telephony VAD's silence, then replays it through
+both agents (the interviewer, and agent.py in prefetch mode) under each
+endpointing setup:
+
+- fixed: the VAD's silence alone ends a turn, as short as a phone call wants
+  (0.5s) and as long as it takes not to cut anyone off (0.8s), and LiveKit's
+  defaults (0.55s of VAD silence, then 0.5s)
+- adaptive: endpointing.py's delays fitted to each caller, without a turn
+  detector and with one
+
+The turn detector is scripted, since the harness has no model: it knows
+whether what the caller has said so far is one of their whole lines, and is
+wrong `--detector-errors` of the time. Reported per setup: response delay
+(the caller's last word to the agent's turn ending, p50/p95), false cut-offs
+(caller turns the agent ended early, so it heard more turns than the caller
+took), the cut-offs the agents suspected themselves, and interruptions.
+
+Usage:
+    python bench_endpointing.py --calls 40
+    python bench_endpointing.py --calls 40 --detector-errors 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from unittest import mock
+
+import endpointing
+from bench_replay import AGENT_LINES, CALLER_LINES, GREETINGS
+from call_harness import percentile
+from call_replay import REPLAY_SCRIPT, CallerTurn, Recording, load_recording, recordings, replay_file, save_recording
+from fake_livekit import CallerAudio
+
+SETUPS = {
+    "fixed 0.5s": {"ENDPOINTING_VAD_SILENCE": "0.5", "ENDPOINTING_VAD_DELAY": "0", "ENDPOINTING_ADAPTIVE": "0"},
+    "fixed 0.8s": {"ENDPOINTING_VAD_SILENCE": "0.8", "ENDPOINTING_VAD_DELAY": "0", "ENDPOINTING_ADAPTIVE": "0"},
+    "livekit defaults": {"ENDPOINTING_VAD_SILENCE": "0.55", "ENDPOINTING_VAD_DELAY": "0.5", "ENDPOINTING_ADAPTIVE": "0"},
+    "adaptive": {},
+}
+
+
+class ScriptedTurnDetector:
+    """Stands in for the turn detector: a caller is done when they've said one of their lines in full"""
+
+    def __init__(self, lines, errors=0.0, latency=0.03, seed=0):
+        self.lines = {line.lower() for line in lines}
+        self.errors = errors
+        self.latency = latency
+        self.rng = random.Random(seed)
+
+    def supports_language(self, language):
+        return True
+
+    def unlikely_threshold(self, language):
+        return 0.5
+
+    async def predict_end_of_turn(self, chat_ctx):
+        await asyncio.sleep(self.latency)  # inference, on the worker's shared model
+        said = chat_ctx.items[-1].text_content.lower()
+        done = said in self.lines
+        if self.rng.random() < self.errors:
+            done = not done
+        return 0.9 if done else 0.1
+
+
+def paced_recording(name, seed, agent="interview", turns=4, pause=0.5) -> Recording:
+    """A caller with their own pace, who pauses mid-sentence on `pause` of their longer lines"""
+    rng = random.Random(seed)
+    script = REPLAY_SCRIPT
+    word_seconds = rng.uniform(0.25, 0.6)
+    parts, caller = [], []
+    t = 0.0
+
+    def add(kind, seconds, words=None):
+        nonlocal t
+        parts.append((kind, seconds, words) if words else (kind, seconds))
+        t += seconds
+
+    if agent == "outbound":
+        add("silence", 0.2)
+        add("speech", 0.5, 1)
+        caller.append(CallerTurn(0.2, 0.7, "Hello?"))
+        agent_end = 2.0 + len(GREETINGS[agent]) / script.chars_per_second
+    else:
+        agent_end = 0.7 + len(GREETINGS[agent]) / script.chars_per_second
+    replies, transcript = [GREETINGS[agent]], [("agent", GREETINGS[agent])]
+    for _ in range(turns):
+        add("silence", max(agent_end - t, 0.0) + rng.uniform(0.4, 1.0))
+        start = t
+        line = rng.choice(CALLER_LINES[agent])
+        words = len(line.split())
+        if words > 4 and rng.random() < pause:
+            # slower speakers think for longer
+            half = words // 2
+            add("speech", half * word_seconds, half)
+            add("silence", rng.uniform(0.4, 0.8) * word_seconds / 0.3)
+            add("speech", (words - half) * word_seconds, words - half)
+        else:
+            add("speech", words * word_seconds, words)
+        caller.append(CallerTurn(round(start, 3), round(t, 3), line))
+        transcript.append(("caller", line))
+        reply = rng.choice(AGENT_LINES)
+        replies.append(reply)
+        transcript.append(("agent", reply))
+        # whichever setup is replayed, the agent has answered by now
+        agent_end = t + 1.5 + script.reply_latency + len(reply) / script.chars_per_second
+    add("silence", max(agent_end - t, 0.0) + 1.0)
+    return Recording(
+        name=name,
+        audio=CallerAudio.script(*parts, seed=seed),
+        agent=agent,
+        inbound=agent == "interview",
+        metadata={"phone_number": f"+1415555{seed % 10000:04d}", "prefetch": True} if agent == "outbound" else {},
+        ring=0.5 if agent == "outbound" else 0.0,
+        hangup_after=t,
+        caller=caller,
+        transcript=transcript,
+        replies=replies,
+    )
+
+
+def write_corpus(directory, calls, seed=0, turns=4, pause=0.5):
+    for i in range(calls):
+        agent = "interview" if i % 2 == 0 else "outbound"
+        save_recording(directory, paced_recording(f"{agent}-{i:04d}", seed + i, agent=agent, turns=turns, pause=pause))
+
+
+def replay_setup(paths, environment, detector=None):
+    """Every recording, in-process so the scripted detector can stand in for the model"""
+    delays, cutoffs, interruptions = [], 0, 0
+    suspected = endpointing.ENDPOINTING_METRICS.cutoffs
+    with mock.patch.dict(os.environ, environment), mock.patch.object(endpointing, "turn_model", lambda model_type: detector):
+        for path in paths:
+            recording, result = load_recording(path), replay_file(path)
+            if result.error:
+                raise RuntimeError(f"{recording.name}: {result.error}")
+            # an outbound caller's "Hello?" is heard by answering machine detection, not taken as a turn
+            heard = sum(speaker == "caller" for speaker, _ in result.transcript) + (recording.agent == "outbound")
+            cutoffs += max(heard - len(recording.caller), 0)
+            interruptions += result.interruptions
+            delays += [turn - REPLAY_SCRIPT.reply_latency for turn in result.turns]
+    return delays, cutoffs, endpointing.ENDPOINTING_METRICS.cutoffs - suspected, interruptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark endpointing: response delay against false cut-offs")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=4, help="caller turns per call")
+    parser.add_argument("--pause", type=float, default=0.5, help="chance a longer line has a mid-sentence pause")
+    parser.add_argument("--detector-errors", type=float, default=0.05, help="how often the scripted turn detector is wrong")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    lines = [line for agent_lines in CALLER_LINES.values() for line in agent_lines]
+    setups = [(name, environment, None) for name, environment in SETUPS.items()]
+    setups.append(("adaptive + detector", {}, ScriptedTurnDetector(lines, args.detector_errors, seed=args.seed)))
+
+    with tempfile.TemporaryDirectory() as corpus:
+        write_corpus(corpus, args.calls, seed=args.seed, turns=args.turns, pause=args.pause)
+        paths = recordings(corpus)
+        turns = sum(len(load_recording(path).caller) for path in paths)
+        print("\n📊 ENDPOINTING")
+        print("=" * 60)
+        print(f"{len(paths)} calls, {turns} caller turns, mid-sentence pauses on {args.pause:.0%} of longer lines")
+        print(f"{'setup':>20} {'p50':>8} {'p95':>8} {'cut-offs':>9} {'suspected':>10} {'interrupts':>11} {'wall':>6}")
+        for name, environment, detector in setups:
+            started = time.perf_counter()
+            delays, cutoffs, suspected, interruptions = replay_setup(paths, environment, detector)
+            print(
+                f"{name:>20} {percentile(delays, 0.5):>7.2f}s {percentile(delays, 0.95):>7.2f}s "
+                f"{cutoffs:>9} {suspected:>10} {interruptions:>11} {time.perf_counter() - started:>5.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
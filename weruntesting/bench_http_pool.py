@@ -0,0 +1,169 @@
+"""
+First-turn latency benchmark for the shared HTTP client pool
+
+Starts a local HTTPS stand-in for the OpenAI API (self-signed certificate,
+simulated network round trip) and times a first turn - one STT, one LLM and
+one TTS request - two ways:
+
+- cold: a fresh httpx client per plugin, which is what the plugins do by default
+- pooled: the shared HTTPClientPool, preconnected while the call is being set up
+
+Usage:
+    python bench_http_pool.py --rtt-ms 40 --calls 20
+"""
+import argparse
+import asyncio
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from http_pool import HTTPClientPool
+
+FIRST_TURN = ["/v1/audio/transcriptions", "/v1/chat/completions", "/v1/audio/speech"]
+
+
+def make_certificate(directory):
+    """Self-signed certificate for 127.0.0.1 via the openssl CLI"""
+    cert, key = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-keyout", str(key), "-out", str(cert), "-subj", "/CN=127.0.0.1",
+            "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+class FakeOpenAIServer:
+    """Minimal HTTPS/1.1 keep-alive server behind a proxy that adds network latency
+
+    The proxy delays every chunk by half a round trip in each direction, so the
+    TCP and TLS handshakes cost real round trips just like they do to the API.
+    """
+
+    def __init__(self, cert, key, rtt):
+        self.rtt = rtt
+        self.connections = 0
+        self.requests = 0
+        self._ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self._ssl.load_cert_chain(cert, key)
+        self._servers = []
+
+    async def start(self):
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self._ssl)
+        self._server_port = server.sockets[0].getsockname()[1]
+        proxy = await asyncio.start_server(self._proxy, "127.0.0.1", 0)
+        self._servers = [server, proxy]
+        return proxy.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _proxy(self, client_reader, client_writer):
+        await asyncio.sleep(self.rtt)  # TCP handshake
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self._server_port)
+
+        async def pipe(reader, writer):
+            try:
+                while data := await reader.read(65536):
+                    await asyncio.sleep(self.rtt / 2)
+                    writer.write(data)
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        await asyncio.gather(pipe(client_reader, server_writer), pipe(server_reader, client_writer))
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                body = b'{"ok": true}'
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def first_turn(clients, base_url):
+    start = time.perf_counter()
+    for client, path in zip(clients, FIRST_TURN):
+        response = await client.post(base_url + path, json={"model": "stand-in"})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_benchmark(calls, rtt):
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(tmp)
+        verify = ssl.create_default_context(cafile=str(cert))
+        server = FakeOpenAIServer(cert, key, rtt)
+        port = await server.start()
+        base_url = f"https://127.0.0.1:{port}"
+
+        cold, pooled = [], []
+        for _ in range(calls):
+            # one client per plugin, created when the job starts
+            clients = [httpx.AsyncClient(verify=verify) for _ in FIRST_TURN]
+            cold.append(await first_turn(clients, base_url))
+            await asyncio.gather(*(client.aclose() for client in clients))
+
+        pool = HTTPClientPool(verify=verify)
+        for _ in range(calls):
+            # preconnect overlaps with room connection and ringing in the agent
+            await pool.preconnect([base_url + "/v1"])
+            shared = pool.client(base_url)
+            pooled.append(await first_turn([shared] * len(FIRST_TURN), base_url))
+        await pool.aclose()
+        await server.stop()
+        return cold, pooled, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark first-turn latency with the shared HTTP pool")
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated network round trip")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    cold, pooled, server = asyncio.run(run_benchmark(args.calls, args.rtt_ms / 1000))
+
+    print("\n📊 FIRST TURN HTTP LATENCY (STT + LLM + TTS requests)")
+    print("=" * 60)
+    print(f"Simulated RTT: {args.rtt_ms:.0f}ms, calls: {args.calls}")
+    print(f"Cold clients:  mean {statistics.mean(cold) * 1000:.1f}ms")
+    print(f"Shared pool:   mean {statistics.mean(pooled) * 1000:.1f}ms")
+    print(f"⚡ Saved per first turn: {(statistics.mean(cold) - statistics.mean(pooled)) * 1000:.1f}ms")
+    print(f"Server connections opened: {server.connections} for {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Ring-to-greeting for inbound calls, with and without hot standby
+
+Ring-to-greeting is made of: waiting for a job executor (none if one is idle,
+otherwise its start-up and prewarm), the entrypoint up to session start
+(connect, build plugins), and the greeting's first audio (LLM + TTS when
+generated, next to nothing when replayed from the pre-synthesized cache).
+
+Executor warm-up is measured here, in a fresh interpreter (imports, VAD
+model) as a process executor pays it; connect and generated
+greeting times come from the command line (defaults are typical LiveKit
+Cloud / OpenAI first-byte figures). A day of inbound traffic with a burst in
+the middle is then replayed through the worker's executor pool in virtual
+time for:
+
+- no standby:  no idle executors, generated greeting (the current setup)
+- fixed:       INBOUND_STANDBY_MAX idle executors at all times
+- sized:       idle executors sized by StandbySizer from recent arrivals
+
+and the bench reports p50/p95/max ring-to-greeting and the average number of
+idle executors held.
+
+Usage:
+    python bench_inbound_standby.py --max-idle 4 --connect 0.35 --generated-greeting 1.4
+"""
+import argparse
+import heapq
+import random
+import subprocess
+import sys
+import time
+
+from inbound_standby import StandbySizer
+
+WARMUP_SCRIPT = """
+import time
+started = time.perf_counter()
+from livekit.plugins import openai, noise_cancellation
+from batched_vad import shared_batcher
+shared_batcher()
+print(time.perf_counter() - started)
+"""
+
+# (seconds, calls per second): quiet morning, a burst after an email blast, steady afternoon
+PROFILE = [(3 * 3600, 0.01), (1800, 0.4), (4 * 3600, 0.05), (1800, 0.002)]
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def measure_warmup(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", WARMUP_SCRIPT], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return sorted(samples)[len(samples) // 2]
+
+
+def arrivals(seed):
+    rng = random.Random(seed)
+    now = 0.0
+    for duration, rate in PROFILE:
+        end = now + duration
+        while True:
+            now += rng.expovariate(rate)
+            if now >= end:
+                now = end
+                break
+            yield now
+
+
+def simulate(mode, warmup, connect, greeting, max_idle, seed):
+    clock = VirtualClock()
+    sizer = StandbySizer(max_idle=max_idle, warmup=warmup, clock=clock)
+    idle = 0
+    spawning: list[float] = []  # ready times of executors not yet claimed by a call
+    idle_area, last = 0.0, 0.0
+    latencies = []
+
+    def target():
+        return {"none": 0, "fixed": max_idle, "sized": sizer.target()}[mode]
+
+    for at in arrivals(seed):
+        while spawning and spawning[0] <= at:
+            ready = heapq.heappop(spawning)
+            idle_area += idle * (ready - last)
+            idle, last = idle + 1, ready
+        idle_area += idle * (at - last)
+        last = clock.now = at
+        sizer.record_arrival()
+
+        if idle:
+            idle -= 1
+            wait = 0.0
+        elif spawning:
+            wait = heapq.heappop(spawning) - at
+        else:
+            wait = warmup
+        speak = 0.05 if mode != "none" else greeting
+        latencies.append(wait + connect + speak)
+
+        while idle + len(spawning) < target():
+            heapq.heappush(spawning, at + warmup)
+    return sorted(latencies), idle_area / max(last, 1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inbound ring-to-greeting with and without hot standby")
+    parser.add_argument("--max-idle", type=int, default=4)
+    parser.add_argument("--connect", type=float, default=0.35, help="entrypoint start to session start, seconds")
+    parser.add_argument("--generated-greeting", type=float, default=1.4, help="LLM + TTS time to first audio, seconds")
+    parser.add_argument("--warmup-runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    warmup = measure_warmup(args.warmup_runs)
+    print("\n📊 INBOUND RING TO GREETING")
+    print("=" * 60)
+    print(f"executor warm-up (measured, median of {args.warmup_runs}): {warmup:.2f}s")
+    print(f"{'standby':>10} {'calls':>6} {'p50':>7} {'p95':>7} {'max':>7} {'idle held':>10}")
+    for mode in ("none", "fixed", "sized"):
+        latencies, idle = simulate(mode, warmup, args.connect, args.generated_greeting, args.max_idle, args.seed)
+        print(
+            f"{mode:>10} {len(latencies):>6} {latencies[len(latencies) // 2]:>6.2f}s "
+            f"{latencies[int(len(latencies) * 0.95)]:>6.2f}s {latencies[-1]:>6.2f}s {idle:>10.2f}"
+        )
+    print(f"\n({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
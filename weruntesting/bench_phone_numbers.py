@@ -0,0 +1,102 @@
+"""
+Benchmark for phone number normalization and the DNC / dedupe number set
+
+Generates N US and UK numbers in mixed human formats and reports:
+
+- normalization throughput for unique numbers (every call misses the memo)
+  and for a retry-like workload (the same numbers over and over)
+- building a NumberSet from N numbers: time and bytes per number, next to a
+  plain Python set of E.164 strings
+- membership checks, one at a time (as before each dial) and vectorized
+
+Usage:
+    python bench_phone_numbers.py --numbers 10000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from phone_numbers import NumberSet, _normalize, normalize, number_key
+
+FORMATS = (
+    lambda a, e, n: f"({a}) {e}-{n}",
+    lambda a, e, n: f"+1 {a} {e} {n}",
+    lambda a, e, n: f"1-{a}-{e}-{n}",
+    lambda a, e, n: f"'{a}{e}{n}'",
+    lambda a, e, n: f"+44 20 {e}{n[0]} {n[1:]}",
+)
+
+
+def raw_numbers(n):
+    for i in range(n):
+        area = 201 + (i // 8_000_000) % 700
+        exchange = 200 + (i // 10_000) % 800
+        yield FORMATS[i % len(FORMATS)](area, exchange, f"{i % 10_000:04d}")
+
+
+def rate(count, seconds):
+    return f"{count / seconds / 1e6:.2f}M/s ({seconds / count * 1e6:.2f}µs each)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phone number normalization and membership at scale")
+    parser.add_argument("--numbers", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    print("\n📊 PHONE NUMBERS")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    keys = np.fromiter((number_key(normalize(raw)) for raw in raw_numbers(args.numbers)), dtype=np.int64, count=args.numbers)
+    elapsed = time.perf_counter() - started
+    print(f"normalize, unique:     {rate(args.numbers, elapsed)}")
+
+    hot = list(raw_numbers(50_000))
+    workload = [hot[rng.randrange(len(hot))] for _ in range(args.lookups)]
+    _normalize.cache_clear()
+    started = time.perf_counter()
+    for raw in workload:
+        normalize(raw)
+    elapsed = time.perf_counter() - started
+    info = _normalize.cache_info()
+    print(f"normalize, repeats:    {rate(len(workload), elapsed)}, memo hit rate {info.hits / (info.hits + info.misses):.0%}")
+
+    started = time.perf_counter()
+    numbers = NumberSet(keys)
+    elapsed = time.perf_counter() - started
+    print(
+        f"NumberSet build:       {elapsed:.2f}s for {len(numbers):,} distinct numbers, "
+        f"{numbers.nbytes / len(numbers):.1f} bytes/number ({numbers.nbytes / 2**20:.0f}MB)"
+    )
+
+    sample = min(args.numbers, 1_000_000)
+    tracemalloc.start()
+    plain = {f"+{key}" for key in keys[:sample].tolist()}
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  python set of str:   {size / len(plain):.1f} bytes/number (~{size / len(plain) * len(numbers) / 2**20:.0f}MB at this size)")
+    del plain
+
+    present = [f"+{key}" for key in keys[rng.sample(range(len(keys)), args.lookups // 2)].tolist()]
+    absent = [f"+1999{rng.randrange(10**7):07d}" for _ in range(args.lookups // 2)]
+    queries = present + absent
+    rng.shuffle(queries)
+    started = time.perf_counter()
+    hits = sum(number in numbers for number in queries)
+    elapsed = time.perf_counter() - started
+    print(f"membership, single:    {rate(len(queries), elapsed)}, {hits:,} hits")
+
+    query_keys = np.array([number_key(number) for number in queries] * (args.numbers // len(queries) or 1), dtype=np.int64)
+    started = time.perf_counter()
+    found = numbers.contains_keys(query_keys)
+    elapsed = time.perf_counter() - started
+    print(f"membership, vectorized: {rate(len(query_keys), elapsed)}, {int(found.sum()):,} hits")
+
+
+if __name__ == "__main__":
+    main()
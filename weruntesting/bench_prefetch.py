@@ -0,0 +1,130 @@
+"""
+Prefetched replies over a replayed corpus of confirmation calls
+
+Builds dental-confirmation calls to agent.py whose patients take the usual
+branches (confirm, reschedule, ask for a person, say goodbye) in their own
+words, with the odd question thrown in, and replays each one twice in
+virtual time (see call_replay.py): once with the model answering every turn,
+once with `"prefetch": true` in the dial info. Reported: the hit rate, per
+branch, the latency saved per turn as measured (turn latency with and without
+prefetch) and as the prefetcher estimated it, and how much synthesis went
+unplayed.
+
+Usage:
+    python bench_prefetch.py --calls 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import virtual_time
+from call_harness import local_environment, percentile
+from call_replay import CallerTurn, Recording, replay
+from fake_livekit import CallerAudio
+from prefetch import PREFETCH_METRICS, classify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+
+LINES = {
+    "confirm": ["Yes that works for me", "Yeah I'll be there", "Sounds good", "Yes", "That's fine see you then"],
+    "reschedule": ["Can we move it to another day", "I can't make it that day", "Could I reschedule for later in the week"],
+    "transfer": ["Can I speak to someone at the front desk", "I'd like to talk to a real person please"],
+    "end": ["No thanks that's all", "Nope that's it bye", "No thank you goodbye"],
+    "other": ["Sorry what time was that again", "Which office is that at", "Is Dr Patel still my dentist"],
+}
+# how a call goes, as the intents of the patient's turns, with how often
+PATHS = [
+    (("confirm", "end"), 0.45),
+    (("reschedule", "other", "end"), 0.2),
+    (("transfer", "other"), 0.1),
+    (("other", "confirm", "end"), 0.15),
+    (("confirm", "other", "end"), 0.1),
+]
+WORD_SECONDS = 0.3
+DIAL_INFO = {"phone_number": "+14155550134", "transfer_to": "+14155550100"}
+
+
+def confirmation_call(name, seed) -> Recording:
+    rng = random.Random(seed)
+    path = rng.choices([p for p, _ in PATHS], weights=[w for _, w in PATHS])[0]
+    parts, caller = [("silence", 0.2), ("speech", 0.5, 1)], [CallerTurn(0.2, 0.7, "Hello?")]
+    t = 0.7
+    for intent in path:
+        line = rng.choice(LINES[intent])
+        words = len(line.split())
+        # room for the greeting or the agent's last reply to finish
+        start = t + rng.uniform(9.0, 10.0)
+        parts += [("silence", start - t), ("speech", words * WORD_SECONDS, words)]
+        t = start + words * WORD_SECONDS
+        caller.append(CallerTurn(round(start, 3), round(t, 3), line))
+    parts.append(("silence", 9.0))
+    audio = CallerAudio.script(*parts, seed=seed)
+    return Recording(name=name, audio=audio, metadata=dict(DIAL_INFO), hangup_after=audio.duration, caller=caller)
+
+
+async def replay_all(recordings, prefetch, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(recording):
+        if prefetch:
+            recording = Recording(**{**recording.__dict__, "metadata": {**recording.metadata, "prefetch": True}})
+        async with slots:
+            return await replay(recording)
+
+    return await asyncio.gather(*(one(r) for r in recordings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay confirmation calls with and without prefetched replies")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    calls = [confirmation_call(f"confirm-{i:04d}", args.seed + i) for i in range(args.calls)]
+    wall = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, agent.entrypoint):
+        baseline = virtual_time.run(replay_all(calls, False, args.concurrency))
+        prefetched = virtual_time.run(replay_all(calls, True, args.concurrency))
+    wall = time.perf_counter() - wall
+
+    errors = [f"{r.name}: {r.error}" for r in baseline + prefetched if r.error]
+    saved = [
+        before - after
+        for model, fast in zip(baseline, prefetched)
+        if len(model.turns) == len(fast.turns)
+        for before, after in zip(model.turns, fast.turns)
+    ]
+    expected = Counter(classify(turn.text)[0].value for call in calls for turn in call.caller[1:])
+    stats = PREFETCH_METRICS
+
+    print("\n📊 RESPONSE PREFETCH")
+    print("=" * 60)
+    print(f"{len(calls)} calls, {stats.turns} patient turns, replayed twice in {wall:.1f}s")
+    print(f"{'hit rate':>24} {stats.hit_rate:.0%} ({stats.hits} of {stats.turns} turns)")
+    for intent, n in expected.most_common():
+        print(f"{intent:>24} {stats.by_intent.get(intent, 0):>4} hits of {n} turns")
+    print(f"{'saved per turn':>24} {sum(saved) / len(saved) * 1000:.0f}ms measured, {stats.saved_per_turn * 1000:.0f}ms estimated")
+    hits = [s for s in saved if s > 0.01]
+    if hits:
+        print(f"{'saved per hit':>24} p50 {percentile(hits, 0.5) * 1000:.0f}ms  p95 {percentile(hits, 0.95) * 1000:.0f}ms")
+    model_turns = [turn for r in baseline for turn in r.turns]
+    fast_turns = [turn for r in prefetched for turn in r.turns]
+    print(f"{'turn latency p50':>24} {percentile(model_turns, 0.5):.3f}s -> {percentile(fast_turns, 0.5):.3f}s")
+    print(f"{'turn latency p95':>24} {percentile(model_turns, 0.95):.3f}s -> {percentile(fast_turns, 0.95):.3f}s")
+    print(f"{'syntheses':>24} {stats.syntheses}, {stats.wasted} never played")
+    if errors:
+        print("\n❌ Errors:")
+        for error in errors[:20]:
+            print(f"   {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Replay corpus benchmark: how fast a corpus replays, and what a change does to it
+
+Writes a synthetic corpus of recorded calls (call_replay.py's WAV + JSON
+format) to a temporary directory: dental-confirmation calls to agent.py and
+inbound interviews to interview_agent.py, with callers who sometimes pause
+mid-sentence or talk over the agent. The corpus is replayed once with the
+default session script to take reference transcripts, then again with the
+script given on the command line, and the second run is reported against
+the first: turn latency, interruptions, and calls whose transcript changed.
+With no overrides the two runs must match exactly.
+
+Usage:
+    python bench_replay.py --calls 200
+    python bench_replay.py --calls 100 --endpointing 0.3   # shorter silence: faster replies, split turns?
+
+`--endpointing` is the stand-in model's, so it only moves agent.py's default
+realtime calls; the others end turns on endpointing.py's ENDPOINTING_*
+settings (see bench_endpointing.py).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from dataclasses import replace
+
+from call_harness import SessionScript
+from call_replay import REPLAY_SCRIPT, CallerTurn, Recording, recordings, replay_corpus, save_recording, summarize, update_references
+from fake_livekit import CallerAudio
+
+GREETINGS = {
+    "outbound": "Hi, this is Bright Smile Dental calling to confirm your appointment on Tuesday at ten. Does that still work for you?",
+    "interview": "Hello Test Candidate, and welcome to your interview. I'm an AI interviewer. Are you ready to begin?",
+}
+CALLER_LINES = {
+    "outbound": [
+        "Yes that works for me",
+        "Can we move it to Thursday afternoon instead",
+        "Sorry what time was that again",
+        "Okay great thank you",
+        "I need to check my calendar first",
+    ],
+    "interview": [
+        "Yes I'm ready",
+        "I have about five years of Python experience mostly building APIs",
+        "We moved our services to Kubernetes last year and I led that migration",
+        "What does the team's on call rotation look like",
+        "I think that covers it thank you",
+    ],
+}
+AGENT_LINES = [
+    "Great, thank you.",
+    "Sure, let me check what we have open on Thursday.",
+    "Of course. It's Tuesday at ten in the morning.",
+    "That sounds good. Can you tell me a bit more about that?",
+    "Thanks, that's really helpful to know.",
+]
+WORD_SECONDS = 0.3
+
+
+def synthetic_recording(name, seed, agent="outbound", turns=3, barge_in=0.15, pause=0.2) -> Recording:
+    """A call shaped like the session script would run it; `barge_in` and `pause` are per-turn chances"""
+    rng = random.Random(seed)
+    script = REPLAY_SCRIPT
+    parts, caller = [], []
+    t = 0.0
+
+    def add(kind, seconds, words=None):
+        nonlocal t
+        parts.append((kind, seconds, words) if words else (kind, seconds))
+        t += seconds
+
+    if agent == "outbound":
+        # "Hello?" for AMD, which hears a person and lets the agent greet about 2s in
+        add("silence", 0.2)
+        add("speech", 0.5, 1)
+        caller.append(CallerTurn(0.2, 0.7, "Hello?"))
+        agent_start = 2.0
+    else:
+        agent_start = 0.7
+    greeting = GREETINGS[agent]
+    replies, transcript = [greeting], [("agent", greeting)]
+    agent_end = agent_start + len(greeting) / script.chars_per_second
+    for turn in range(turns):
+        if rng.random() < barge_in:
+            start = agent_start + rng.uniform(0.8, 1.5)
+        else:
+            start = max(agent_end + rng.uniform(0.3, 1.2), t + 0.3)
+        add("silence", start - t)
+        line = rng.choice(CALLER_LINES[agent])
+        words = line.split()
+        if len(words) > 4 and rng.random() < pause:
+            # a thinking pause mid-sentence, shorter than the default endpointing
+            half = len(words) // 2
+            add("speech", half * WORD_SECONDS, half)
+            add("silence", rng.uniform(0.3, 0.45))
+            add("speech", (len(words) - half) * WORD_SECONDS, len(words) - half)
+        else:
+            add("speech", len(words) * WORD_SECONDS, len(words))
+        caller.append(CallerTurn(round(start, 3), round(t, 3), line))
+        transcript.append(("caller", line))
+        reply = rng.choice(AGENT_LINES)
+        replies.append(reply)
+        transcript.append(("agent", reply))
+        agent_start = t + script.endpointing + script.reply_latency
+        agent_end = agent_start + len(reply) / script.chars_per_second
+    add("silence", max(agent_end - t, 0.0) + 1.0)
+    return Recording(
+        name=name,
+        audio=CallerAudio.script(*parts, seed=seed),
+        agent=agent,
+        inbound=agent == "interview",
+        metadata={"phone_number": f"+1415555{seed % 10000:04d}", "transfer_to": "+14155550100"} if agent == "outbound" else {},
+        ring=rng.uniform(0.5, 3.0) if agent == "outbound" else 0.0,
+        hangup_after=t,
+        caller=caller,
+        transcript=transcript,
+        replies=replies,
+        tools={turns: "end_call"} if agent == "outbound" else {},
+    )
+
+
+def write_corpus(directory, calls, seed=0, turns=3):
+    for i in range(calls):
+        agent = "outbound" if i % 2 == 0 else "interview"
+        save_recording(directory, synthetic_recording(f"{agent}-{i:04d}", seed + i, agent=agent, turns=turns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a synthetic call corpus, before and after a session change")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=3, help="caller turns per call")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--endpointing", type=float, default=None, help="caller silence that ends a turn, seconds")
+    parser.add_argument("--interrupt-after", type=float, default=None, help="caller speech that cuts the agent off, seconds")
+    parser.add_argument("--reply-latency", type=float, default=None, help="model time to first audio, seconds")
+    args = parser.parse_args()
+
+    overrides = {
+        name: value
+        for name, value in (
+            ("endpointing", args.endpointing),
+            ("interrupt_after", args.interrupt_after),
+            ("reply_latency", args.reply_latency),
+        )
+        if value is not None
+    }
+    candidate: SessionScript = replace(REPLAY_SCRIPT, **overrides)
+
+    with tempfile.TemporaryDirectory() as corpus:
+        write_corpus(corpus, args.calls, turns=args.turns)
+        paths = recordings(corpus)
+        started = time.perf_counter()
+        update_references(paths, replay_corpus(paths, processes=args.processes))
+        reference_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        results = replay_corpus(paths, processes=args.processes, base=candidate)
+        elapsed = time.perf_counter() - started
+
+    summary = summarize(results)
+    call_seconds = sum(r.call_seconds for r in results)
+    processes = args.processes or os.cpu_count() or 1
+    print("\n📊 REPLAY CORPUS")
+    print("=" * 60)
+    print(f"{summary['calls']} calls ({call_seconds / 60:.1f} call minutes), {summary['turns']} caller turns, {processes} processes")
+    print(f"{'reference run':>22} {reference_seconds:>8.1f}s")
+    print(f"{'candidate run':>22} {elapsed:>8.1f}s  ({summary['calls'] / elapsed:.1f} calls/s, {call_seconds / elapsed:.0f}x real time)")
+    print(f"{'script changes':>22} {overrides or 'none'}")
+    if summary["turns"]:
+        print(f"{'turn latency':>22} p50 {summary['turn_p50']:.3f}s  p95 {summary['turn_p95']:.3f}s")
+    print(f"{'interruptions':>22} {summary['interruptions']}")
+    print(f"{'transcript diffs':>22} {summary['calls_with_diffs']} of {summary['calls']} calls")
+    print(f"{'errors':>22} {summary['errors']}")
+    if not overrides and summary["calls_with_diffs"]:
+        print("\n❌ The same script replayed differently; replays aren't deterministic")
+
+
+if __name__ == "__main__":
+    main()
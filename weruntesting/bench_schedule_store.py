@@ -0,0 +1,126 @@
+"""
+Benchmark for the appointment schedule store at clinic-network scale
+
+Fills a fresh SQLite schedule with N appointments spread over providers and
+working days (about 70% of slots booked), then measures:
+
+- opening the store (loading the index from SQLite)
+- next-free-slot lookups from random times, against the index
+- the same answer from an indexed SQL query per slot, for comparison
+- reschedules (SQLite transaction with the slot and version checks)
+
+Usage:
+    python bench_schedule_store.py --appointments 100000 --providers 40
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from schedule_store import MAX_APPOINTMENT_MINUTES, ScheduleStore, SlotTaken, to_minutes
+
+START = datetime(2025, 1, 6)  # a Monday
+
+
+def working_slots(days):
+    day = START
+    while days:
+        if day.weekday() < 5:
+            for half_hour in range(16):
+                yield day + timedelta(hours=9, minutes=30 * half_hour)
+            days -= 1
+        day += timedelta(days=1)
+
+
+def fill(store, appointments, providers, rng):
+    per_provider = -(-appointments // providers)
+    days = -(-per_provider // 11)  # ~11 of 16 slots booked per day
+    rows = []
+    for p in range(providers):
+        slots = [slot for slot in working_slots(days) if rng.random() < 0.7][:per_provider]
+        rows.extend((f"provider-{p}", f"+1555{len(rows):07d}", slot, 30) for slot in slots)
+    store.add_many(rows[:appointments])
+    return days
+
+
+def sql_next_free(store, provider, after, count):
+    """The same search with an indexed SQL query per candidate slot, no in-memory index"""
+    found, start = [], store.hours.next_opening(to_minutes(after), 30)
+    while len(found) < count:
+        taken = store._db.execute(
+            "SELECT 1 FROM appointments WHERE provider = ? AND start > ? AND start < ? AND start + minutes > ? LIMIT 1",
+            (provider, start - MAX_APPOINTMENT_MINUTES, start + 30, start),
+        ).fetchone()
+        if not taken:
+            found.append(start)
+        start = store.hours.next_opening(start + 30, 30)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule store lookups and reschedules at scale")
+    parser.add_argument("--appointments", type=int, default=100_000)
+    parser.add_argument("--providers", type=int, default=40)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--reschedules", type=int, default=2_000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "schedule.db")
+        days = fill(ScheduleStore(path), args.appointments, args.providers, rng)
+
+        started = time.perf_counter()
+        store = ScheduleStore(path)
+        load_seconds = time.perf_counter() - started
+
+        span = timedelta(days=days * 7 / 5)
+        queries = [
+            (f"provider-{rng.randrange(args.providers)}", START + span * rng.random())
+            for _ in range(args.lookups)
+        ]
+        lookup_times = []
+        for provider, after in queries:
+            started = time.perf_counter()
+            store.next_free_slots(provider, after, count=3)
+            lookup_times.append(time.perf_counter() - started)
+
+        sql_times = []
+        for provider, after in queries[: args.lookups // 20]:
+            started = time.perf_counter()
+            sql_next_free(store, provider, after, 3)
+            sql_times.append(time.perf_counter() - started)
+
+        ids = rng.sample(sorted(store.appointments), args.reschedules)
+        taken = 0
+        started = time.perf_counter()
+        for appointment_id in ids:
+            appointment = store.appointments[appointment_id]
+            slot = store.next_free_slots(appointment.provider, appointment.start + timedelta(days=1), count=1)[0]
+            try:
+                store.reschedule(appointment, slot)
+            except SlotTaken:
+                taken += 1
+        reschedule_seconds = time.perf_counter() - started
+
+    lookup_times.sort()
+    print("\n📊 SCHEDULE STORE")
+    print("=" * 60)
+    print(f"appointments:        {len(store.appointments):,} across {args.providers} providers")
+    print(f"index load:          {load_seconds * 1000:.0f}ms")
+    print(
+        f"next 3 free slots:   median {statistics.median(lookup_times) * 1e6:.1f}µs, "
+        f"p99 {lookup_times[int(len(lookup_times) * 0.99)] * 1e6:.1f}µs"
+    )
+    print(f"  SQL per slot:      median {statistics.median(sql_times) * 1e6:.1f}µs")
+    print(
+        f"reschedule:          {reschedule_seconds / args.reschedules * 1000:.2f}ms each "
+        f"({args.reschedules / reschedule_seconds:.0f}/s, {taken} lost races)"
+    )
+
+
+if __name__ == "__main__":
+    main()
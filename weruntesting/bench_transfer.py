@@ -0,0 +1,147 @@
+"""
+Transfer time-to-human benchmark
+
+Compares cold and warm transfers against an in-process SIP stand-in with
+randomised ring times and agent speech lengths. Times are scaled down so the
+whole run takes a few seconds, and reported back in real-call seconds.
+
+Usage:
+    python bench_transfer.py --calls 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+
+from warm_transfer import CallTransfer
+
+TIME_SCALE = 0.01  # 1 simulated second takes 10ms
+
+
+class FakeSpeech:
+    """Stands in for a SpeechHandle: awaitable, finishes after the speech plays out"""
+
+    def __init__(self, seconds, log, text):
+        self.interrupted = False
+        self._task = asyncio.ensure_future(asyncio.sleep(seconds * TIME_SCALE))
+        log.append(text)
+
+    def done(self):
+        return self._task.done()
+
+    def interrupt(self):
+        self.interrupted = True
+        self._task.cancel()
+        return self
+
+    def __await__(self):
+        try:
+            yield from asyncio.shield(self._task).__await__()
+        except asyncio.CancelledError:
+            if not self.interrupted:
+                raise
+        return self
+
+
+class FakeSession:
+    def __init__(self, speech_seconds):
+        self.speech_seconds = speech_seconds
+        self.spoken = []
+        self.speeches = []
+
+    def generate_reply(self, *, instructions):
+        speech = FakeSpeech(self.speech_seconds, self.spoken, instructions)
+        self.speeches.append(speech)
+        return speech
+
+    def say(self, text, *, audio=None, allow_interruptions=True, add_to_chat_ctx=True):
+        # hold prompts loop until interrupted
+        speech = FakeSpeech(3600, self.spoken, text)
+        self.speeches.append(speech)
+        return speech
+
+
+class FakeSIP:
+    """SIP stand-in: dialling rings for `ring_seconds`, a REFER adds signalling on top"""
+
+    def __init__(self, ring_seconds, refer_overhead=0.8, answers=True):
+        self.ring_seconds = ring_seconds
+        self.refer_overhead = refer_overhead
+        self.answers = answers
+        self.dialled = []
+        self.transferred = []
+
+    async def create_sip_participant(self, request):
+        self.dialled.append(request.sip_call_to)
+        if not self.answers:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.ring_seconds * TIME_SCALE)
+
+    async def transfer_sip_participant(self, request):
+        self.transferred.append(request.transfer_to)
+        await asyncio.sleep((self.ring_seconds + self.refer_overhead) * TIME_SCALE)
+
+
+class FakeRoom:
+    def __init__(self):
+        self.removed = []
+
+    async def remove_participant(self, request):
+        self.removed.append(request.identity)
+
+
+class FakeLiveKitAPI:
+    def __init__(self, sip):
+        self.sip = sip
+        self.room = FakeRoom()
+
+
+def make_transfer(sip, **kwargs):
+    return CallTransfer(
+        lk_api=FakeLiveKitAPI(sip),
+        room_name="call-room",
+        trunk_id="ST_fake",
+        participant_identity="+15550100",
+        hold_frames=("hold-frame",),
+        **kwargs,
+    )
+
+
+async def run_benchmark(calls, seed=11):
+    rng = random.Random(seed)
+    times = {"cold": [], "warm": []}
+    for _ in range(calls):
+        ring = rng.uniform(3.0, 15.0)
+        speech = rng.uniform(2.0, 6.0)
+        for mode in ("cold", "warm"):
+            transfer = make_transfer(FakeSIP(ring))
+            session = FakeSession(speech)
+            if mode == "cold":
+                result = await transfer.cold(session, "+15550199")
+            else:
+                result = await transfer.warm(session, "+15550199", "summary")
+            assert result.connected, result
+            times[mode].append(result.time_to_human / TIME_SCALE)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold vs warm transfer time-to-human")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    times = asyncio.run(run_benchmark(args.calls))
+
+    print("\n📊 TIME TO HUMAN (simulated seconds)")
+    print("=" * 60)
+    print(f"{'mode':<8}{'mean':>10}{'p50':>10}{'p95':>10}")
+    for mode, samples in times.items():
+        samples = sorted(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{mode:<8}{statistics.mean(samples):>10.2f}{statistics.median(samples):>10.2f}{p95:>10.2f}")
+    saved = statistics.mean(times["cold"]) - statistics.mean(times["warm"])
+    print(f"\n⚡ Warm transfer saves {saved:.2f}s per transfer on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Provisioning time for many numbers, one REST call at a time against the thread pool
+
+Provisions `--numbers` numbers over `--trunks` trunks on fake_twilio.py's
+server, each request taking `--latency` (about a round trip to Twilio's
+API), with one worker and with each of `--workers`; then re-runs from the
+cached state, which should make no requests at all.
+
+Usage:
+    python bench_twilio_provision.py
+    python bench_twilio_provision.py --numbers 500 --workers 4 8 16 --latency 0.15
+"""
+import argparse
+
+from fake_twilio import FakeTwilioAPI
+from twilio_provision import Provisioner, TrunkPlan, twilio_client
+
+ACCOUNT = "AC" + "0" * 32
+
+
+def run(numbers, trunks, workers, latency):
+    """Seconds to provision from scratch, requests made, and requests on a re-run"""
+    owned = [f"+1415{i:07d}" for i in range(numbers)]
+    plan = [TrunkPlan(f"trunk-{t}", tuple(owned[t::trunks])) for t in range(trunks)]
+    with FakeTwilioAPI(numbers=owned, latency=latency) as twilio:
+        state = {}
+
+        def provisioner():
+            return Provisioner(lambda: twilio_client(ACCOUNT, "token", twilio.url), state, sip_host="bench.sip.livekit.cloud", workers=workers)
+
+        report = provisioner().apply(plan)
+        made = len(twilio.requests)
+        provisioner().apply(plan)
+        return report.seconds, made, len(twilio.requests) - made, twilio.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Twilio provisioning")
+    parser.add_argument("--numbers", type=int, default=200)
+    parser.add_argument("--trunks", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per request")
+    args = parser.parse_args()
+
+    print("\n📊 TWILIO PROVISIONING")
+    print("=" * 60)
+    print(f"{args.numbers} numbers on {args.trunks} trunks, {args.latency * 1000:.0f}ms a request")
+    print(f"{'workers':>8} {'seconds':>8} {'requests':>9} {'re-run':>7} {'peak':>5}")
+    for workers in [1, *args.workers]:
+        seconds, made, rerun, peak = run(args.numbers, args.trunks, workers, args.latency)
+        print(f"{workers:>8} {seconds:>7.1f}s {made:>9} {rerun:>7} {peak:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Scenario sweep in virtual time: thousands of calls through both agents per run
+
+Every scenario runs the agents' real entrypoints against the local stand-in
+(call_harness.py) on a VirtualTimeLoop, so ring timeouts, the interviewer's
+connect wait and status polling, endpointing and caller pauses cost no wall
+time; what's left is the CPU the agents spend per audio frame. The mix:
+
+- answered:   outbound call, a person says "Hello?" and talks for a few turns
+- voicemail:  outbound call, an answering machine greeting and beep
+- busy:       outbound call, 486 after a short ring
+- no-answer:  outbound call, rings for 45s and the carrier gives up (480)
+- interview:  inbound caller for interview_agent.py, a few turns, then hangs up
+- interview-outbound: interview_agent.py dials, polls until answered, waits 3s to greet
+
+Ring times, turn counts and the audio vary per scenario. Latency budgets from
+bench_end_to_end.py are checked over the answered calls, and the run exits
+non-zero if one is broken or any scenario ends in an error.
+
+Usage:
+    python bench_virtual_time.py --scenarios 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import virtual_time
+from bench_end_to_end import BUDGETS, caller_audio
+from call_harness import LocalWorker, SessionScript, check_budgets, latencies, local_environment, percentile, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+import interview_agent  # noqa: E402
+
+KINDS = ["answered", "voicemail", "busy", "no-answer", "interview", "interview-outbound"]
+MACHINE = CallerAudio.script(("silence", 0.2), ("speech", 4.0, 10), ("beep", 0.5))
+DIAL_INFO = {"phone_number": "+14155550134", "transfer_to": "+14155550100"}
+
+
+async def scenario(kind, i, rng, interviewer: LocalWorker):
+    turns = rng.randint(1, 4)
+    ring = rng.uniform(0.5, 8.0)
+    if kind == "interview":
+        audio = caller_audio(turns, seed=i, hello=False)
+        server = FakeLiveKitAPI()
+        server.inbound_call(f"s-{i}", SipCall(audio=audio, hangup_after=audio.duration))
+        return await run_call(interview_agent.entrypoint, server, room_name=f"s-{i}", proc=interviewer.proc, timeout=600)
+    if kind == "interview-outbound":
+        audio = caller_audio(turns, seed=i, hello=False)
+        server = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=ring, audio=audio, hangup_after=audio.duration))
+        return await run_call(interview_agent.entrypoint, server, metadata=DIAL_INFO["phone_number"], proc=interviewer.proc, timeout=600)
+    calls = {
+        "answered": SipCall(setup=0.05, ring=ring, audio=caller_audio(turns, seed=i)),
+        "voicemail": SipCall(ring=ring, audio=MACHINE),
+        "busy": SipCall(status=486, ring=rng.uniform(0.2, 2.0)),
+        "no-answer": SipCall(status=480, ring=45.0),
+    }
+    server = FakeLiveKitAPI(sip_script=lambda req: calls[kind])
+    script = SessionScript(tools={turns: "end_call"})
+    return await run_call(agent.entrypoint, server, metadata=json.dumps(DIAL_INFO), script=script, timeout=600)
+
+
+async def sweep(count, concurrency, seed):
+    rng = random.Random(seed)
+    interviewer = LocalWorker(interview_agent.entrypoint, prewarm=interview_agent.prewarm)
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    call_seconds = 0.0
+
+    async def one(i):
+        nonlocal call_seconds
+        kind = KINDS[i % len(KINDS)]
+        async with slots:
+            started = loop.time()
+            report = await scenario(kind, i, random.Random(rng.random()), interviewer)
+            call_seconds += loop.time() - started
+            return kind, report
+
+    results = await asyncio.gather(*(one(i) for i in range(count)))
+    return results, call_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep call scenarios through both agents in virtual time")
+    parser.add_argument("--scenarios", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=50, help="calls in flight at once, as on one worker")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    wall = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, agent.entrypoint, interview_agent.entrypoint):
+        results, call_seconds = virtual_time.run(sweep(args.scenarios, args.concurrency, args.seed))
+    wall = time.perf_counter() - wall
+
+    by_kind: dict[str, list] = {}
+    for kind, report in results:
+        by_kind.setdefault(kind, []).append(report)
+    print("\n📊 VIRTUAL-TIME SCENARIO SWEEP")
+    print("=" * 60)
+    print(f"{len(results)} scenarios, {args.concurrency} at a time: {call_seconds / 60:.1f} minutes of calls in {wall:.1f}s")
+    print(f"{len(results) / wall:.0f} scenarios/s, {call_seconds / wall:.0f} call-seconds per second")
+    print(f"{'scenario':>20} {'n':>5} {'turns':>6} {'turn p95':>9}  outcomes")
+    failures = []
+    for kind in KINDS:
+        reports = by_kind.get(kind, [])
+        turns = latencies(reports)["turn"]
+        p95 = percentile(turns, 0.95)
+        outcomes = ", ".join(f"{outcome} {n}" for outcome, n in Counter(r.outcome for r in reports).most_common())
+        print(f"{kind:>20} {len(reports):>5} {len(turns):>6} {f'{p95:.3f}s' if p95 else '-':>9}  {outcomes}")
+        failures += [f"{kind} {r.room}: {r.error}" for r in reports if r.error]
+    # ring times vary here, so dialling isn't budgeted
+    outbound = {metric: budget for metric, budget in BUDGETS["outbound"].items() if metric != "dial"}
+    failures += [f"answered {f}" for f in check_budgets(by_kind.get("answered", []), outbound)]
+    failures += [f"interview {f}" for f in check_budgets(by_kind.get("interview", []), BUDGETS["inbound"])]
+
+    if failures:
+        print("\n❌ Failures:")
+        for failure in sorted(set(failures))[:20]:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ All scenarios ran and budgets were met")
+
+
+if __name__ == "__main__":
+    main()
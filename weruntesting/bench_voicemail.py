@@ -0,0 +1,178 @@
+"""
+Answering machine detection benchmark
+
+Runs the early-media classifier over a labelled local audio set and reports
+accuracy, machine precision/recall, decision latency and CPU cost.
+
+Dataset layout (16-bit mono WAV files):
+    <dataset>/labels.json   {"call_001.wav": "human", "call_002.wav": "machine", ...}
+or
+    <dataset>/human/*.wav and <dataset>/machine/*.wav
+
+Usage:
+    python bench_voicemail.py --dataset ./amd_corpus
+    python bench_voicemail.py              # generates a synthetic labelled set
+"""
+import argparse
+import json
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from voicemail_detector import AnsweredBy, classify_pcm
+
+SAMPLE_RATE = 16000
+
+
+def load_dataset(dataset_dir):
+    """Return a list of (path, label) pairs from labels.json or human/machine folders"""
+    dataset_dir = Path(dataset_dir)
+    labels_file = dataset_dir / "labels.json"
+    if labels_file.exists():
+        labels = json.loads(labels_file.read_text())
+        return [(dataset_dir / name, label) for name, label in sorted(labels.items())]
+
+    items = []
+    for label in ("human", "machine"):
+        for path in sorted((dataset_dir / label).glob("*.wav")):
+            items.append((path, label))
+    return items
+
+
+def read_wav(path):
+    with wave.open(str(path), "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM")
+        rate = wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    return pcm, rate
+
+
+def write_wav(path, pcm, rate=SAMPLE_RATE):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.astype(np.int16).tobytes())
+
+
+def _speech(rng, seconds, words):
+    """Syllabic bursts of band-limited noise, which is all an energy VAD sees of speech"""
+    n = int(seconds * SAMPLE_RATE)
+    noise = rng.standard_normal(n)
+    voiced = np.convolve(noise, np.ones(8) / 8, mode="same")
+    envelope = np.zeros(n)
+    gaps = rng.uniform(0.05, 0.2, size=words - 1) * SAMPLE_RATE
+    word_len = (n - gaps.sum()) / words
+    start = 0.0
+    for i in range(words):
+        lo, hi = int(start), int(start + word_len)
+        envelope[lo:hi] = np.hanning(hi - lo) ** 0.5
+        start += word_len + (gaps[i] if i < len(gaps) else 0)
+    return voiced * envelope * 0.3
+
+
+def _silence(rng, seconds):
+    return rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001
+
+
+def _beep(seconds, freq=1000.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return np.sin(2 * np.pi * freq * t) * 0.3
+
+
+def synth_call(rng, label):
+    """One synthetic answered call, shaped like a human "Hello?" or a voicemail greeting"""
+    if label == "human":
+        parts = [
+            _silence(rng, rng.uniform(0.2, 0.8)),
+            _speech(rng, rng.uniform(0.4, 1.0), words=int(rng.integers(1, 3))),
+            _silence(rng, rng.uniform(1.5, 2.5)),
+            _speech(rng, rng.uniform(0.3, 0.6), words=1),
+            _silence(rng, 1.0),
+        ]
+    else:
+        parts = [
+            _silence(rng, rng.uniform(0.1, 0.5)),
+            _speech(rng, rng.uniform(2.5, 6.0), words=int(rng.integers(6, 14))),
+            _silence(rng, 0.3),
+            _beep(0.5),
+            _silence(rng, 1.0),
+        ]
+    return (np.concatenate(parts) * 32767).clip(-32768, 32767).astype(np.int16)
+
+
+def generate_synthetic_dataset(dataset_dir, calls=200, seed=7):
+    """Write a labelled synthetic set so the benchmark runs without a recorded corpus"""
+    rng = np.random.default_rng(seed)
+    dataset_dir = Path(dataset_dir)
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    labels = {}
+    for i in range(calls):
+        label = "human" if i % 2 == 0 else "machine"
+        name = f"call_{i:04d}.wav"
+        write_wav(dataset_dir / name, synth_call(rng, label))
+        labels[name] = label
+    (dataset_dir / "labels.json").write_text(json.dumps(labels, indent=2))
+    return dataset_dir
+
+
+def run_benchmark(items):
+    confusion = {(truth, pred): 0 for truth in ("human", "machine") for pred in AnsweredBy}
+    decision_times = []
+    cpu_seconds = 0.0
+    audio_seconds = 0.0
+
+    for path, truth in items:
+        pcm, rate = read_wav(path)
+        start = time.process_time()
+        result = classify_pcm(pcm, rate)
+        cpu_seconds += time.process_time() - start
+        audio_seconds += result.decision_time
+        decision_times.append(result.decision_time)
+        confusion[(truth, result.answered_by)] += 1
+
+    total = len(items)
+    correct = confusion[("human", AnsweredBy.HUMAN)] + confusion[("machine", AnsweredBy.MACHINE)]
+    predicted_machine = confusion[("human", AnsweredBy.MACHINE)] + confusion[("machine", AnsweredBy.MACHINE)]
+    actual_machine = sum(confusion[("machine", pred)] for pred in AnsweredBy)
+
+    print("\n📊 ANSWERING MACHINE DETECTION RESULTS")
+    print("=" * 60)
+    print(f"Calls: {total}")
+    print(f"{'truth \\ predicted':<20}" + "".join(f"{pred.value:>10}" for pred in AnsweredBy))
+    for truth in ("human", "machine"):
+        print(f"{truth:<20}" + "".join(f"{confusion[(truth, pred)]:>10}" for pred in AnsweredBy))
+    print(f"\nAccuracy: {correct / max(total, 1):.1%}")
+    print(f"Machine precision: {confusion[('machine', AnsweredBy.MACHINE)] / max(predicted_machine, 1):.1%}")
+    print(f"Machine recall: {confusion[('machine', AnsweredBy.MACHINE)] / max(actual_machine, 1):.1%}")
+    print(f"Humans hung up on: {confusion[('human', AnsweredBy.MACHINE)]}")
+    print(f"Decision time: mean {np.mean(decision_times):.2f}s, p95 {np.percentile(decision_times, 95):.2f}s")
+    print(f"CPU: {cpu_seconds / max(audio_seconds, 1e-9) * 100:.3f}% of one core per stream")
+    return confusion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark answering machine detection")
+    parser.add_argument("--dataset", help="directory with labelled WAV files")
+    parser.add_argument("--calls", type=int, default=200, help="synthetic calls to generate")
+    args = parser.parse_args()
+
+    if args.dataset:
+        items = load_dataset(args.dataset)
+        print(f"📁 Loaded {len(items)} labelled calls from {args.dataset}")
+        run_benchmark(items)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_synthetic_dataset(tmp, calls=args.calls)
+        items = load_dataset(tmp)
+        print(f"🧪 Generated {len(items)} synthetic labelled calls")
+        run_benchmark(items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Per-call cost and usage accounting
+
+Each call gets a CallUsage that listens to its session's `metrics_collected`
+events and adds up what the providers bill for: LLM and realtime tokens
+(text, audio and cached input kept apart, they're priced differently), STT
+audio seconds, TTS characters, and the length of the call. Events
+arrive once per model request or speech segment, never per audio frame, and
+each one only adds into the call's fixed set of counters; VAD metrics, which
+are frequent, are dropped on the first check.
+
+When the call ends, CostLedger prices it and writes its row to SQLite; a job
+process runs one call, so there is nothing to batch, and the agents call it
+from a thread at teardown, off the call's event loop. Campaign figures (calls,
+completed calls, cost per completed call) aren't a live metric: they're a
+query when they're read (CostLedger.campaign()), over every process's calls,
+from an index that covers them. Each call also logs its campaign's cost per
+completed call as it's written.
+
+    usage = CallUsage(call_id=ctx.room.name, campaign="spring-recall")
+    session.on("metrics_collected", usage.on_metrics)
+    ...
+    await asyncio.to_thread(lambda: shared_ledger().finish(usage, PIPELINE_PRICING))
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import astuple, dataclass, fields, replace
+from functools import cache
+
+from livekit.agents import metrics
+
+import clock
+
+logger = logging.getLogger("call-costs")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_costs (
+    call_id TEXT PRIMARY KEY,
+    campaign TEXT NOT NULL,
+    started REAL NOT NULL,
+    completed INTEGER NOT NULL,
+    call_seconds REAL NOT NULL,
+    text_input_tokens INTEGER NOT NULL,
+    cached_input_tokens INTEGER NOT NULL,
+    text_output_tokens INTEGER NOT NULL,
+    audio_input_tokens INTEGER NOT NULL,
+    audio_output_tokens INTEGER NOT NULL,
+    stt_seconds REAL NOT NULL,
+    tts_characters INTEGER NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_costs_campaign_cost ON call_costs (campaign, completed, cost);
+"""
+
+
+@dataclass(frozen=True)
+class Pricing:
+    """USD per unit: per million tokens, per minute of audio or call, per million characters"""
+
+    text_input: float = 0.0
+    cached_input: float = 0.0
+    text_output: float = 0.0
+    audio_input: float = 0.0
+    audio_output: float = 0.0
+    stt_minute: float = 0.0
+    tts_characters: float = 0.0
+    call_minute: float = 0.0  # telephony, per minute of the call
+
+
+# gpt-4o-realtime-preview-2024-12-17, as agent.py uses it
+REALTIME_PRICING = Pricing(text_input=5.0, cached_input=2.5, text_output=20.0, audio_input=40.0, audio_output=80.0)
+# whisper-1 + gpt-4o-mini + tts-1, as interview_agent.py uses them
+PIPELINE_PRICING = Pricing(text_input=0.15, cached_input=0.075, text_output=0.6, stt_minute=0.006, tts_characters=15.0)
+# agent.py with prefetched replies: the realtime model, plus gpt-4o-mini-transcribe for partial
+# transcripts and tts-1 for the prefetched lines
+PREFETCH_PRICING = replace(REALTIME_PRICING, stt_minute=0.003, tts_characters=15.0)
+
+
+@dataclass(slots=True)
+class CallUsage:
+    call_id: str
+    campaign: str = "default"
+    started: float = 0.0
+    completed: bool = False
+    call_seconds: float = 0.0
+    text_input_tokens: int = 0  # uncached
+    cached_input_tokens: int = 0
+    text_output_tokens: int = 0
+    audio_input_tokens: int = 0
+    audio_output_tokens: int = 0
+    stt_seconds: float = 0.0
+    tts_characters: int = 0
+
+    def __post_init__(self):
+        self.started = self.started or clock.time()
+
+    def on_metrics(self, ev) -> None:
+        """`metrics_collected` handler"""
+        m = ev.metrics
+        if isinstance(m, (metrics.VADMetrics, metrics.EOUMetrics)):
+            return
+        if isinstance(m, metrics.RealtimeModelMetrics):
+            details = m.input_token_details
+            # cached tokens are also counted in the text and audio totals, bill them once
+            cached = details.cached_tokens_details
+            cached_text = cached.text_tokens if cached else details.cached_tokens
+            cached_audio = cached.audio_tokens if cached else 0
+            self.cached_input_tokens += details.cached_tokens
+            self.text_input_tokens += max(details.text_tokens - cached_text, 0)
+            self.audio_input_tokens += max(details.audio_tokens - cached_audio, 0)
+            self.text_output_tokens += m.output_token_details.text_tokens
+            self.audio_output_tokens += m.output_token_details.audio_tokens
+        elif isinstance(m, metrics.LLMMetrics):
+            self.cached_input_tokens += m.prompt_cached_tokens
+            self.text_input_tokens += m.prompt_tokens - m.prompt_cached_tokens
+            self.text_output_tokens += m.completion_tokens
+        elif isinstance(m, metrics.STTMetrics):
+            self.stt_seconds += m.audio_duration
+        elif isinstance(m, metrics.TTSMetrics):
+            self.tts_characters += m.characters_count
+
+    def finish(self, completed: bool | None = None) -> None:
+        if completed is not None:
+            self.completed = completed
+        self.call_seconds = clock.time() - self.started
+
+    def cost(self, pricing: Pricing) -> float:
+        return (
+            self.text_input_tokens * pricing.text_input
+            + self.cached_input_tokens * pricing.cached_input
+            + self.text_output_tokens * pricing.text_output
+            + self.audio_input_tokens * pricing.audio_input
+            + self.audio_output_tokens * pricing.audio_output
+            + self.tts_characters * pricing.tts_characters
+        ) / 1e6 + self.stt_seconds / 60 * pricing.stt_minute + self.call_seconds / 60 * pricing.call_minute
+
+
+_COLUMNS = [f.name for f in fields(CallUsage)] + ["cost"]
+
+
+@dataclass
+class CampaignTotals:
+    calls: int = 0
+    completed: int = 0
+    cost: float = 0.0
+
+    @property
+    def cost_per_completed_call(self) -> float | None:
+        return self.cost / self.completed if self.completed else None
+
+
+class CostLedger:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def finish(self, usage: CallUsage, pricing: Pricing) -> float:
+        """Price a call that has ended and write it; returns its cost"""
+        if not usage.call_seconds:
+            usage.finish()
+        cost = usage.cost(pricing)
+        with self._lock:
+            try:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO call_costs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    (*astuple(usage), cost),
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"couldn't write the cost of call {usage.call_id}: {e}")
+                return cost
+        per_call = self.cost_per_completed_call(usage.campaign)
+        logger.info(
+            f"call {usage.call_id} cost ${cost:.4f}; campaign {usage.campaign}: "
+            + (f"${per_call:.4f} per completed call" if per_call is not None else "no completed calls yet")
+        )
+        return cost
+
+    def campaign(self, campaign: str) -> CampaignTotals:
+        """The campaign's totals so far, over the calls of every worker process"""
+        with self._lock:
+            calls, completed, cost = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(completed), 0), COALESCE(SUM(cost), 0.0) FROM call_costs WHERE campaign = ?",
+                (campaign,),
+            ).fetchone()
+        return CampaignTotals(calls, completed, cost)
+
+    def cost_per_completed_call(self, campaign: str) -> float | None:
+        return self.campaign(campaign).cost_per_completed_call
+
+
+@cache
+def shared_ledger() -> CostLedger:
+    """The process's ledger, writing to COST_DB_PATH (default call_costs.db)"""
+    return CostLedger(os.getenv("COST_DB_PATH", "call_costs.db"))
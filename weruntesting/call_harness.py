@@ -0,0 +1,784 @@
+"""
+Run the agents' entrypoints end to end, in-process, against the LiveKit stand-in
+
+The entrypoint under test is the real one (agent.py's or interview_agent.py's):
+phone number screening, dialling with retries over the trunk pool, answering
+machine detection, audio conditioning, tools, teardown and the cost ledger
+all run as they would in production. Only the network edges are replaced:
+
+- FakeLiveKitAPI serves the room, SIP and dispatch APIs
+- FakeRoom and FakeJobContext stand in for the room connection and the job
+- ScriptedSession stands in for AgentSession, i.e. for the models: it hears
+  the caller through the session's audio input (after conditioning), ends a
+  caller's turn after `endpointing` seconds of silence, and answers after
+  `reply_latency`, reporting metrics the way the real plugins do. A session
+  built with an STT does its own turn detection, as AgentSession does: it
+  reports partial transcripts while the caller speaks, and hands each turn
+  to the agent's on_user_turn_completed() first, which may answer it itself.
+  Given a turn detector with a `vad_silence` (endpointing.py's), it stops
+  listening for silence after that long instead, and leaves it to the
+  detector's predict_end_of_turn() to end the turn, or to the caller to
+  carry on with it
+
+No credentials or network access are needed; run_call reports the call's
+dial, answer-to-greeting, turn and teardown times, and check_budgets turns a
+set of reports into pass/fail against latency budgets, as bench_end_to_end.py
+does for regression runs.
+
+    async def main():
+        server = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=0.5, audio=HUMAN))
+        with local_environment(tmpdir, agent.entrypoint):
+            report = await run_call(agent.entrypoint, server, metadata=json.dumps({...}))
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import inspect
+import logging
+import os
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from livekit import api, rtc
+from livekit.agents import (
+    AgentStateChangedEvent,
+    CloseEvent,
+    ConversationItemAddedEvent,
+    MetricsCollectedEvent,
+    UserInputTranscribedEvent,
+    UserStateChangedEvent,
+    llm,
+    metrics,
+)
+from livekit.agents.job import _JobContextVar
+from livekit.agents.llm import StopResponse
+from livekit.agents.voice import io
+from livekit.agents.voice.events import CloseReason
+
+import answer_cache
+import call_costs
+import clock
+import phone_numbers
+import schedule_store
+import sip_retry
+from fake_livekit import CallerAudioStream, FakeLiveKitAPI, FakeParticipant, FakeRoom, fake_audio_streams
+
+logger = logging.getLogger("call-harness")
+
+# the call run_call is driving in this task, for the sessions its entrypoint builds
+_current_call: contextvars.ContextVar[CallReport] = contextvars.ContextVar("current_call")
+# while the agent handles a caller's turn: when it ended, so whatever it says first counts as the reply
+_turn_end: contextvars.ContextVar[float | None] = contextvars.ContextVar("turn_end", default=None)
+
+
+@dataclass
+class SessionScript:
+    """How the stand-in models behave"""
+
+    start_latency: float = 0.05  # session.start() until audio flows (model connection, RoomIO)
+    reply_latency: float = 0.5  # end of the caller's turn, or a reply request, to the agent's first audio
+    reply_chars: int = 120  # length of each generated reply
+    chars_per_second: float = 15.0  # agent speaking rate
+    playout_speed: float = 10.0  # agent speech plays this many times faster than real time, to keep runs short
+    endpointing: float = 0.5  # caller silence that ends their turn
+    speech_dbfs: float = -40.0  # caller audio louder than this is speech
+    tools: dict[int, str] = field(default_factory=dict)  # caller turn -> tool the model calls in reply
+    replies: list[str] = field(default_factory=list)  # what the model says, in order, before falling back to placeholders
+    interrupt_after: float | None = None  # caller speech over the agent this long cuts it off (AgentSession: 0.5); None never
+    # STT: the caller's words between two offsets into their audio, and whether it's the final transcript of a turn
+    transcribe: Callable[[float, float, bool], str] | None = None
+    partial_every: float = 0.3  # with an STT, a partial transcript this often while the caller speaks
+    tts_latency: float = 0.25  # the TTS plugin's time to synthesize a line
+
+
+@dataclass
+class CallReport:
+    room: str
+    script: SessionScript = field(default_factory=SessionScript)
+    outcome: str = ""  # why the job shut down
+    error: str | None = None  # the entrypoint raised
+    dial: float | None = None  # INVITE to answer, seconds
+    answer_to_greeting: float | None = None  # answer (inbound: the call reaching the agent) to first agent audio
+    turns: list[float] = field(default_factory=list)  # end of each caller turn, as the models hear it, to the reply audio
+    teardown: float | None = None  # shutdown callbacks, seconds
+    spoken: list[str] = field(default_factory=list)
+    heard: float = 0.0  # seconds of caller audio the models were sent
+    interruptions: int = 0  # agent speech the caller talked over and cut off
+    transcript: list[tuple[str, str]] = field(default_factory=list)  # ("caller" | "agent", text), as the call went
+    tool_calls: list[str] = field(default_factory=list)
+    sessions: list[ScriptedSession] = field(default_factory=list)
+
+
+
+class FakeJobProcess:
+    def __init__(self):
+        self.userdata: dict = {}
+
+
+class FakeJobContext:
+    """The parts of `JobContext` the entrypoints use"""
+
+    def __init__(self, server: FakeLiveKitAPI, room: FakeRoom, metadata: str, proc: FakeJobProcess):
+        self.api = server
+        self.room = room
+        self.proc = proc
+        self.job = SimpleNamespace(
+            id=f"AJ_{room.name}",
+            metadata=metadata,
+            room=api.Room(
+                name=room.name,
+                creation_time=int(room.creation_time),
+                creation_time_ms=int(room.creation_time * 1000),
+            ),
+        )
+        self.shutdown_reason: str | None = None
+        self._shutdown_callbacks: list = []
+        self._shutdown = asyncio.Event()
+        room.on("disconnected", lambda reason: self.shutdown(reason))
+
+    async def connect(self) -> None:
+        await self.api._rtt()
+        self.room.connected = True
+
+    def add_shutdown_callback(self, callback) -> None:
+        self._shutdown_callbacks.append(callback)
+
+    def shutdown(self, reason: str = "") -> None:
+        if not self._shutdown.is_set():
+            self.shutdown_reason = reason
+            self._shutdown.set()
+
+    async def wait_for_participant(self, *, identity: str | None = None, **kwargs) -> FakeParticipant:
+        return await wait_for_participant(self.room, identity)
+
+    async def _run_shutdown_callbacks(self) -> None:
+        for callback in self._shutdown_callbacks:
+            try:
+                result = callback(self.shutdown_reason) if inspect.signature(callback).parameters else callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("shutdown callback failed")
+
+
+async def wait_for_participant(room: FakeRoom, identity: str | None = None) -> FakeParticipant:
+    for participant in room.remote_participants.values():
+        if identity is None or participant.identity == identity:
+            return participant
+    joined = asyncio.get_running_loop().create_future()
+
+    def on_connected(participant: FakeParticipant) -> None:
+        if (identity is None or participant.identity == identity) and not joined.done():
+            joined.set_result(participant)
+
+    room.on("participant_connected", on_connected)
+    try:
+        return await joined
+    finally:
+        room.off("participant_connected", on_connected)
+
+
+class _RoomAudioInput(io.AudioInput):
+    """The linked participant's audio, as RoomIO would feed the session"""
+
+    def __init__(self, room: FakeRoom, sample_rate: int):
+        self.room = room
+        self.sample_rate = sample_rate
+        self.participant: FakeParticipant | None = None
+        self._stream: CallerAudioStream | None = None
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        if self._stream is None:
+            self.participant = await wait_for_participant(self.room)
+            self._stream = CallerAudioStream(self.participant, self.sample_rate)
+        return (await self._stream.__anext__()).frame
+
+
+class _SessionInput:
+    def __init__(self, session: ScriptedSession):
+        self._session = session
+        self._audio: io.AudioInput | None = None
+        self.audio_enabled = True
+
+    @property
+    def audio(self) -> io.AudioInput | None:
+        return self._audio
+
+    @audio.setter
+    def audio(self, audio: io.AudioInput | None) -> None:
+        # like AgentSession, whatever is set here is what the models hear from now on
+        self._audio = audio
+        self._session._listen(audio)
+
+    def set_audio_enabled(self, enabled: bool) -> None:
+        # like AgentInput, the stream already set is detached (or attached again) right away
+        if enabled == self.audio_enabled:
+            return
+        self.audio_enabled = enabled
+        if self._audio is None:
+            return
+        if enabled:
+            self._audio.on_attached()
+        else:
+            self._audio.on_detached()
+
+
+class _SessionOutput:
+    def __init__(self):
+        self.audio_enabled = True
+
+    def set_audio_enabled(self, enabled: bool) -> None:
+        self.audio_enabled = enabled
+
+
+class ScriptedSpeech:
+    """The parts of `SpeechHandle` the agents use"""
+
+    def __init__(self, text: str, allow_interruptions: bool = True, chars: int | None = None, add_to_chat_ctx: bool = True):
+        self.text = text
+        self.allow_interruptions = allow_interruptions
+        self.add_to_chat_ctx = add_to_chat_ctx
+        self.chars = len(text) if chars is None else chars  # how long it takes to say
+        self.interrupted = False
+        self._task: asyncio.Task | None = None
+        self._done = asyncio.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def interrupt(self) -> ScriptedSpeech:
+        if self.allow_interruptions and not self.done():
+            self.interrupted = True
+            if self._task is not None:
+                self._task.cancel()
+        return self
+
+    async def wait_for_playout(self) -> None:
+        await self._done.wait()
+
+    def __await__(self):
+        return self.wait_for_playout().__await__()
+
+
+class ScriptedTTS:
+    """Stands in for the session's TTS plugin: silence as long as the text takes to say"""
+
+    sample_rate = 24000
+    num_channels = 1
+
+    def __init__(self, session: ScriptedSession):
+        self._session = session
+
+    def synthesize(self, text: str) -> _ScriptedSynthesis:
+        return _ScriptedSynthesis(self._session, text)
+
+
+class _ScriptedSynthesis:
+    def __init__(self, session: ScriptedSession, text: str):
+        self._session = session
+        self._text = text
+
+    async def __aenter__(self) -> _ScriptedSynthesis:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        script = self._session.script
+        await asyncio.sleep(script.tts_latency)
+        samples = ScriptedTTS.sample_rate // 50
+        seconds = len(self._text) / script.chars_per_second
+        for _ in range(max(int(seconds * 50), 1)):
+            frame = rtc.AudioFrame(data=bytes(samples * 2), sample_rate=ScriptedTTS.sample_rate, num_channels=1, samples_per_channel=samples)
+            yield SimpleNamespace(frame=frame)
+        self._session._emit_metrics(
+            metrics.TTSMetrics(
+                label="scripted.TTS", request_id="tts_prefetch", timestamp=clock.time(), ttfb=script.tts_latency,
+                duration=script.tts_latency, audio_duration=seconds, cancelled=False,
+                characters_count=len(self._text), streamed=False,
+            )
+        )
+
+
+class ScriptedSession(rtc.EventEmitter):
+    """Stands in for `AgentSession` (and the models behind it) during run_call"""
+
+    def __init__(self, **plugins):
+        super().__init__()
+        self.call = _current_call.get()
+        self.call.sessions.append(self)
+        # room events arrive from the server's tasks, which don't carry the job's context
+        self._job = _JobContextVar.get()
+        self.script = self.call.script
+        # STT + LLM + TTS, or one realtime model; they report different metrics. With an STT the session
+        # detects turns itself, with only a realtime model the model does
+        self.stt = plugins.get("stt")
+        self.realtime = isinstance(plugins.get("llm"), llm.RealtimeModel)
+        self.tts = ScriptedTTS(self) if plugins.get("tts") is not None else None
+        detector = plugins.get("turn_detection")
+        self.turn_detector = detector if hasattr(detector, "vad_silence") else None
+        self.input = _SessionInput(self)
+        self.output = _SessionOutput()
+        self.agent = None
+        self.agent_state = "initializing"
+        self.user_state = "listening"
+        self.user_turns = 0
+        self.history = llm.ChatContext.empty()  # every item of the call, as AgentSession keeps it
+        self._replies = iter(self.script.replies)
+        self.first_speech_at: float | None = None
+        self.closed = False
+        self._room: FakeRoom | None = None
+        self._current: ScriptedSpeech | None = None
+        self._playout = asyncio.Lock()
+        self._listener: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def current_speech(self) -> ScriptedSpeech | None:
+        return self._current
+
+    @property
+    def linked_participant(self) -> FakeParticipant | None:
+        source = self.input.audio
+        while source is not None and not isinstance(source, _RoomAudioInput):
+            source = getattr(source, "source", None)
+        return source.participant if source is not None else None
+
+    async def start(self, *, agent, room: FakeRoom, room_input_options=None, **kwargs) -> None:
+        await asyncio.sleep(self.script.start_latency)
+        self.agent = agent
+        self._room = room
+        sample_rate = room_input_options.audio_sample_rate if room_input_options is not None else 24000
+        self.input.audio = _RoomAudioInput(room, sample_rate)
+        room.on("participant_disconnected", self._on_participant_disconnected)
+        self._set_state("listening")
+
+    def generate_reply(self, *, instructions: str | None = None, user_input: str | None = None, **kwargs) -> ScriptedSpeech:
+        return self._speak(self._reply(instructions or user_input or "[reply]"), generated=True)
+
+    def say(self, text: str, *, audio=None, allow_interruptions: bool = True, add_to_chat_ctx: bool = True, **kwargs) -> ScriptedSpeech:
+        speech = ScriptedSpeech(text, allow_interruptions, add_to_chat_ctx=add_to_chat_ctx)
+        return self._speak(speech, audio=audio, turn_end=_turn_end.get())
+
+    def clear_user_turn(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        await self._close(CloseReason.USER_INITIATED)
+
+    def _reply(self, placeholder: str) -> ScriptedSpeech:
+        text = next(self._replies, None)
+        return ScriptedSpeech(placeholder, chars=self.script.reply_chars) if text is None else ScriptedSpeech(text)
+
+    def _speak(self, speech: ScriptedSpeech, *, generated: bool = False, audio=None, turn_end: float | None = None):
+        if self.closed:
+            speech._done.set()
+            return speech
+        speech._task = self._track(asyncio.create_task(self._play(speech, generated, audio, turn_end)))
+        return speech
+
+    async def _play(self, speech: ScriptedSpeech, generated: bool, audio, turn_end: float | None) -> None:
+        loop = asyncio.get_running_loop()
+        script = self.script
+        try:
+            async with self._playout:
+                self._current = speech
+                if generated:
+                    self._set_state("thinking")
+                    await asyncio.sleep(script.reply_latency)
+                elif audio is None and self.tts is not None:
+                    await asyncio.sleep(script.tts_latency)  # say() without audio goes through the TTS
+                self._set_state("speaking")
+                started = loop.time()
+                self.first_speech_at = self.first_speech_at or started
+                if turn_end is not None:
+                    self.call.turns.append(started - turn_end)
+                self.call.spoken.append(speech.text)
+                if generated:
+                    self._report_reply(speech.chars)
+                if audio is not None:
+                    async for frame in audio:
+                        await asyncio.sleep(frame.samples_per_channel / frame.sample_rate / script.playout_speed)
+                else:
+                    await asyncio.sleep(speech.chars / script.chars_per_second / script.playout_speed)
+                self.call.transcript.append(("agent", speech.text))
+                self._item_added("assistant", speech.text, add=speech.add_to_chat_ctx)
+        except asyncio.CancelledError:
+            speech.interrupted = True
+            if speech is self._current and self.agent_state == "speaking":
+                # what got said before the cut, as the session's transcript keeps it
+                said = (loop.time() - started) * script.chars_per_second * script.playout_speed
+                text = speech.text[: int(said * len(speech.text) / max(speech.chars, 1))]
+                self.call.transcript.append(("agent", text))
+                self._item_added("assistant", text, add=speech.add_to_chat_ctx, interrupted=True)
+        finally:
+            if self._current is speech:
+                self._current = None
+                if not self.closed:
+                    self._set_state("listening")
+            speech._done.set()
+
+    def _listen(self, audio: io.AudioInput | None) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        self._listener = None if audio is None else self._track(asyncio.create_task(self._hear(audio)))
+
+    async def _hear(self, audio: io.AudioInput) -> None:
+        """Energy endpointing over what the session's audio input delivers"""
+        loop = asyncio.get_running_loop()
+        script = self.script
+        threshold = 32768 * 10 ** (script.speech_dbfs / 20)
+        detector = self.turn_detector
+        silence = script.endpointing if detector is None else detector.vad_silence
+        speech_started = last_speech = last_partial = None
+        speaking = False
+        deciding: asyncio.Task | None = None  # the detector, on the turn so far
+        async for frame in audio:
+            if deciding is not None and deciding.done():
+                deciding = speech_started = None
+            if not self.input.audio_enabled:
+                speech_started = None
+                continue
+            self.call.heard += frame.samples_per_channel / frame.sample_rate
+            pcm = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32)
+            now = loop.time()
+            if pcm.size and np.sqrt(np.mean(pcm * pcm)) > threshold:
+                if not speaking:
+                    speaking = True
+                    self._set_user_state("speaking")
+                if deciding is not None:
+                    # they carried on: the same turn
+                    deciding.cancel()
+                    deciding = None
+                if speech_started is None:
+                    speech_started = last_partial = now
+                last_speech = now
+                self._maybe_interrupt(now - speech_started)
+                if self.stt is not None and now - last_partial >= script.partial_every:
+                    last_partial = now
+                    partial = self._transcribe(speech_started, now, final=False)
+                    if partial:
+                        self.emit("user_input_transcribed", UserInputTranscribedEvent(transcript=partial, is_final=False))
+            elif speaking and now - last_speech >= silence:
+                speaking = False
+                self._set_user_state("listening")
+                if speech_started is None:
+                    continue
+                if detector is None:
+                    self._end_user_turn(last_speech - speech_started, last_speech)
+                    speech_started = None
+                else:
+                    deciding = self._track(asyncio.create_task(self._end_of_turn(detector, speech_started, last_speech)))
+
+    async def _end_of_turn(self, detector, started: float, ended: float) -> None:
+        """The turn detector's verdict on the turn so far, and the turn's end unless the caller carries on"""
+        chat_ctx = self.agent.chat_ctx.copy()
+        chat_ctx.add_message(role="user", content=self._transcribe(started, ended, final=False) or "")
+        await detector.predict_end_of_turn(chat_ctx)
+        self._end_user_turn(ended - started, ended)
+
+    def _maybe_interrupt(self, talked_over: float) -> None:
+        speech = self._current
+        after = self.script.interrupt_after
+        if (
+            after is not None and talked_over >= after and speech is not None
+            and self.agent_state == "speaking" and speech.allow_interruptions and not speech.interrupted
+        ):
+            self.call.interruptions += 1
+            speech.interrupt()
+
+    def _transcribe(self, started: float, ended: float, *, final: bool) -> str | None:
+        """What the STT hears between two loop times, or None without a transcriber"""
+        participant = self.linked_participant
+        if self.script.transcribe is None or participant is None or participant.answered_at is None:
+            return None
+        return self.script.transcribe(started - participant.answered_at, ended - participant.answered_at, final)
+
+    def _end_user_turn(self, seconds: float, ended: float) -> None:
+        self.user_turns += 1
+        turn = self.user_turns
+        text = self._transcribe(ended - seconds, ended, final=True)
+        if text is None:
+            text = f"[caller turn {turn}]"
+        self.call.transcript.append(("caller", text))
+        self._item_added("user", text)
+        if self.stt is None:
+            self._answer(turn, ended)
+            return
+        self._emit_metrics(
+            metrics.STTMetrics(
+                label="scripted.STT", request_id=f"stt_{turn}", timestamp=clock.time(),
+                duration=0.0, audio_duration=seconds, streamed=False,
+            )
+        )
+        self.emit("user_input_transcribed", UserInputTranscribedEvent(transcript=text, is_final=True))
+        self._track(asyncio.create_task(self._complete_user_turn(turn, text, ended)))
+
+    async def _complete_user_turn(self, turn: int, text: str, ended: float) -> None:
+        """Local turn detection: the agent sees the turn first, and raises StopResponse if it answered"""
+        token = _turn_end.set(ended)
+        try:
+            await self.agent.on_user_turn_completed(self.agent.chat_ctx.copy(), new_message=llm.ChatMessage(role="user", content=[text]))
+        except StopResponse:
+            return
+        except Exception:
+            logger.exception("on_user_turn_completed failed")
+            return
+        finally:
+            _turn_end.reset(token)
+        self._answer(turn, ended)
+
+    def _answer(self, turn: int, ended: float) -> None:
+        reply = self._speak(self._reply(f"[reply to caller turn {turn}]"), generated=True, turn_end=ended)
+        tool = self.script.tools.get(turn)
+        if tool is not None:
+            self._track(asyncio.create_task(self._call_tool(tool, reply)))
+
+    async def _call_tool(self, name: str, reply: ScriptedSpeech) -> None:
+        await reply.wait_for_playout()
+        self.call.tool_calls.append(name)
+        try:
+            result = await getattr(self.agent, name)(SimpleNamespace(session=self, speech_handle=reply))
+        except Exception as e:
+            logger.warning(f"tool {name} failed: {e}")
+            return
+        if isinstance(result, str):
+            self.generate_reply(instructions=result)
+
+    def _report_reply(self, chars: int) -> None:
+        script = self.script
+        now = clock.time()
+        out_tokens = chars // 4
+        if not self.realtime:
+            self._emit_metrics(
+                metrics.LLMMetrics(
+                    label="scripted.LLM", request_id="llm", timestamp=now, duration=script.reply_latency,
+                    ttft=script.reply_latency, cancelled=False, completion_tokens=out_tokens, prompt_tokens=800,
+                    prompt_cached_tokens=0, total_tokens=800 + out_tokens, tokens_per_second=50.0,
+                )
+            )
+            self._emit_metrics(
+                metrics.TTSMetrics(
+                    label="scripted.TTS", request_id="tts", timestamp=now, ttfb=0.0, duration=0.0,
+                    audio_duration=chars / script.chars_per_second, cancelled=False,
+                    characters_count=chars, streamed=True,
+                )
+            )
+            return
+        # realtime audio runs at about 10 tokens a second each way
+        details = metrics.RealtimeModelMetrics
+        audio_out = int(chars / script.chars_per_second * 10)
+        self._emit_metrics(
+            metrics.RealtimeModelMetrics(
+                label="scripted.realtime", request_id="rt", timestamp=now, duration=script.reply_latency,
+                ttft=script.reply_latency, cancelled=False, input_tokens=900, output_tokens=out_tokens + audio_out,
+                total_tokens=900 + out_tokens + audio_out, tokens_per_second=40.0,
+                input_token_details=details.InputTokenDetails(
+                    audio_tokens=100, text_tokens=800, image_tokens=0, cached_tokens=0, cached_tokens_details=None
+                ),
+                output_token_details=details.OutputTokenDetails(text_tokens=out_tokens, audio_tokens=audio_out, image_tokens=0),
+            )
+        )
+
+    def _item_added(self, role: str, text: str, *, add: bool = True, interrupted: bool = False) -> None:
+        if add and not self.closed:
+            item = llm.ChatMessage(role=role, content=[text], interrupted=interrupted)
+            self.history.insert(item)
+            self.emit("conversation_item_added", ConversationItemAddedEvent(item=item))
+
+    def _emit_metrics(self, m) -> None:
+        self.emit("metrics_collected", MetricsCollectedEvent(metrics=m))
+
+    def _set_user_state(self, state: str) -> None:
+        old, self.user_state = self.user_state, state
+        self.emit("user_state_changed", UserStateChangedEvent(old_state=old, new_state=state))
+
+    def _set_state(self, state: str) -> None:
+        if state != self.agent_state:
+            old, self.agent_state = self.agent_state, state
+            self.emit("agent_state_changed", AgentStateChangedEvent(old_state=old, new_state=state))
+
+    def _on_participant_disconnected(self, participant: FakeParticipant) -> None:
+        if participant is self.linked_participant and not self.closed:
+            self._track(asyncio.create_task(self._close(CloseReason.PARTICIPANT_DISCONNECTED)))
+
+    async def _close(self, reason: CloseReason) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        current = asyncio.current_task()
+        tasks = [task for task in self._tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.emit("close", CloseEvent(error=None, reason=reason))
+        if reason == CloseReason.PARTICIPANT_DISCONNECTED:
+            # the caller is gone and the room has emptied, the worker ends the job
+            self._job.shutdown("participant disconnected")
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+
+async def run_call(
+    entrypoint,
+    server: FakeLiveKitAPI,
+    *,
+    metadata: str = "",
+    room_name: str | None = None,
+    script: SessionScript | None = None,
+    proc: FakeJobProcess | None = None,
+    timeout: float = 60.0,
+) -> CallReport:
+    """Run one job through `entrypoint` until it shuts down, as a worker would
+
+    Needs local_environment() around it, for the entrypoint's module. The job
+    ends when it calls `ctx.shutdown()`, its room is deleted, the caller
+    leaves, or after `timeout` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    room_name = room_name or f"call-{os.getpid()}-{id(object()):x}"
+    room = server.create_room(room_name, metadata)
+    ctx = FakeJobContext(server, room, metadata, proc or FakeJobProcess())
+    report = CallReport(room=room_name, script=script or SessionScript())
+
+    async def job() -> None:
+        _current_call.set(report)
+        _JobContextVar.set(ctx)
+        try:
+            await entrypoint(ctx)
+        except Exception as e:
+            logger.exception("entrypoint failed")
+            report.error = f"{type(e).__name__}: {e}"
+            ctx.shutdown("entrypoint failed")
+        # the job outlives its entrypoint until it's shut down
+        await ctx._shutdown.wait()
+        started = loop.time()
+        await ctx._run_shutdown_callbacks()
+        report.teardown = loop.time() - started
+
+    # tasks copy the context they're created in, so everything the job starts sees its own call
+    task = asyncio.create_task(job())
+    try:
+        await asyncio.wait_for(asyncio.shield(ctx._shutdown.wait()), timeout)
+    except TimeoutError:
+        ctx.shutdown("timeout")
+    await task
+    report.outcome = ctx.shutdown_reason
+
+    for session in report.sessions:
+        participant = session.linked_participant
+        if participant is not None and participant.answered_at is not None:
+            if participant.invited_at is not None:
+                report.dial = participant.answered_at - participant.invited_at
+            if session.first_speech_at is not None:
+                report.answer_to_greeting = session.first_speech_at - participant.answered_at
+    return report
+
+
+class LocalWorker:
+    """`FakeLiveKitAPI(job_runner=...)`: each dispatch runs the entrypoint in this process
+
+    Like a worker, prewarm runs once, and its userdata is shared by every job.
+    """
+
+    def __init__(self, entrypoint, *, prewarm=None, script: SessionScript | None = None, timeout: float = 60.0):
+        self.entrypoint = entrypoint
+        self.script = script
+        self.timeout = timeout
+        self.proc = FakeJobProcess()
+        if prewarm is not None:
+            prewarm(self.proc)
+        self.reports: list[CallReport] = []
+
+    async def __call__(self, server: FakeLiveKitAPI, room: str, metadata: str) -> str:
+        report = await run_call(
+            self.entrypoint, server, metadata=metadata, room_name=room, script=self.script, proc=self.proc, timeout=self.timeout
+        )
+        self.reports.append(report)
+        return report.outcome
+
+
+@contextlib.contextmanager
+def local_environment(directory: str, *entrypoints, trunks: str = "ST_local"):
+    """Point the agents' process-wide state at `directory` and their network edges at the stand-ins
+
+    SQLite stores (trunk health and pool, schedule, call costs, answers) live in
+    `directory`; OpenAI clients get a placeholder key and a local address that
+    refuses connections, so pre-connects fail fast instead of reaching out;
+    AgentSession is replaced by ScriptedSession in each entrypoint's module.
+    """
+    cached = (
+        sip_retry.shared_engine,
+        schedule_store.shared_store,
+        call_costs.shared_ledger,
+        phone_numbers.shared_dnc,
+        answer_cache.shared_answer_cache,
+    )
+    environment = {
+        "OPENAI_API_KEY": "local",
+        "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",
+        "SIP_OUTBOUND_TRUNK_IDS": trunks,
+        "TRUNK_HEALTH_DB": os.path.join(directory, "trunk_health.db"),
+        "TRUNK_POOL_DB": os.path.join(directory, "trunk_pool.db"),
+        "SCHEDULE_DB_PATH": os.path.join(directory, "schedule.db"),
+        "COST_DB_PATH": os.path.join(directory, "call_costs.db"),
+        "ANSWER_CACHE_DB": os.path.join(directory, "answer_cache.db"),
+        "CAMPAIGN_RESULTS_DB": os.path.join(directory, "campaign_results.db"),
+        "DNC_LIST_PATH": "",
+    }
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(os.environ, environment))
+        stack.enter_context(fake_audio_streams())
+        for entrypoint in entrypoints:
+            stack.enter_context(mock.patch.dict(entrypoint.__globals__, AgentSession=ScriptedSession))
+        for shared in cached:
+            shared.cache_clear()
+        try:
+            yield
+        finally:
+            for shared in cached:
+                shared.cache_clear()
+
+
+def percentile(samples: list[float], q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def latencies(reports: list[CallReport]) -> dict[str, list[float]]:
+    """Samples per budgeted metric: dial, answer_to_greeting, turn and teardown (seconds)"""
+    return {
+        "dial": [r.dial for r in reports if r.dial is not None],
+        "answer_to_greeting": [r.answer_to_greeting for r in reports if r.answer_to_greeting is not None],
+        "turn": [turn for r in reports for turn in r.turns],
+        "teardown": [r.teardown for r in reports if r.teardown is not None],
+    }
+
+
+def check_budgets(reports: list[CallReport], budgets: dict[str, float], quantile: float = 0.95) -> list[str]:
+    """Each budget the reports break, as a message; budgets are seconds at `quantile`"""
+    samples = latencies(reports)
+    failures = [f"{r.room}: {r.error}" for r in reports if r.error]
+    for name, budget in budgets.items():
+        if name not in samples:
+            raise ValueError(f"unknown budget {name!r}, expected one of {', '.join(samples)}")
+        value = percentile(samples[name], quantile)
+        if value is None:
+            failures.append(f"{name}: no samples")
+        elif value > budget:
+            failures.append(f"{name}: p{quantile * 100:.0f} {value:.3f}s over the {budget:.3f}s budget")
+    return failures
@@ -0,0 +1,197 @@
+"""
+Call lifecycle manager
+
+Owns everything a call holds on to (session, plugin clients, background tasks,
+the room) and tears it down in a fixed order with a time budget per step, so a
+job process gives its worker slot back as soon as the call is over:
+
+1. STOP_AUDIO   - cancel pending tasks, stop feeding/playing audio
+2. CLOSE_MODELS - close the AgentSession and model/plugin connections
+3. FLUSH        - flush recorders, metrics and cost tracking
+4. DELETE_ROOM  - delete the room so the SIP leg and participants go away
+
+Teardown is idempotent: hangups, SIP failures and job shutdown can all call it,
+and every caller awaits the same run.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable
+
+from livekit import api
+
+import clock
+
+logger = logging.getLogger("call-lifecycle")
+
+TeardownCallback = Callable[[], Awaitable[Any] | Any]
+
+
+class TeardownStage(IntEnum):
+    STOP_AUDIO = 0
+    CLOSE_MODELS = 1
+    FLUSH = 2
+    DELETE_ROOM = 3
+
+
+@dataclass
+class TeardownStep:
+    stage: TeardownStage
+    name: str
+    callback: TeardownCallback
+    timeout: float | None = None
+
+
+@dataclass
+class StepResult:
+    stage: TeardownStage
+    name: str
+    duration: float
+    error: str | None = None
+    timed_out: bool = False
+
+
+@dataclass
+class TeardownReport:
+    reason: str
+    slot_release_latency: float  # seconds from teardown() to the last step finishing
+    steps: list[StepResult] = field(default_factory=list)
+
+    @property
+    def clean(self) -> bool:
+        return all(step.error is None and not step.timed_out for step in self.steps)
+
+
+class CallLifecycle:
+    """Ordered, time-bounded teardown for everything one call holds"""
+
+    def __init__(self, *, step_timeout: float = 3.0, total_timeout: float = 10.0):
+        self.step_timeout = step_timeout
+        self.total_timeout = total_timeout
+        self.report: TeardownReport | None = None
+
+        self._steps: list[TeardownStep] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._teardown_task: asyncio.Task | None = None
+
+    @property
+    def closing(self) -> bool:
+        return self._teardown_task is not None
+
+    def on_teardown(
+        self,
+        stage: TeardownStage,
+        name: str,
+        callback: TeardownCallback,
+        *,
+        timeout: float | None = None,
+    ) -> None:
+        """Register a callback (sync or async) to run during the given stage"""
+        self._steps.append(TeardownStep(stage, name, callback, timeout))
+
+    def track_task(self, task: asyncio.Task) -> asyncio.Task:
+        """Cancel this task during STOP_AUDIO if it is still running"""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def attach_session(self, session) -> None:
+        """Stop audio in and out of an AgentSession, then close it"""
+
+        def stop_audio():
+            session.input.set_audio_enabled(False)
+            session.output.set_audio_enabled(False)
+
+        self.on_teardown(TeardownStage.STOP_AUDIO, "session audio", stop_audio)
+        self.on_teardown(TeardownStage.CLOSE_MODELS, "agent session", session.aclose)
+
+    def attach_plugins(self, *plugins) -> None:
+        """Close STT/LLM/TTS/VAD instances built for this call"""
+        for plugin in plugins:
+            if plugin is not None and hasattr(plugin, "aclose"):
+                self.on_teardown(TeardownStage.CLOSE_MODELS, type(plugin).__name__, plugin.aclose)
+
+    def attach_room(self, room_api, room_name: str) -> None:
+        """Delete the room last, which hangs up the SIP leg"""
+
+        async def delete_room():
+            await room_api.room.delete_room(api.DeleteRoomRequest(room=room_name))
+
+        self.on_teardown(TeardownStage.DELETE_ROOM, "delete room", delete_room)
+
+    def keep_room(self) -> None:
+        """Leave the room up at teardown, e.g. after bridging the caller with a human"""
+        self._steps = [step for step in self._steps if step.stage != TeardownStage.DELETE_ROOM]
+
+    def hold(self, *names: str) -> list[TeardownCallback]:
+        """Take the named steps out of the teardown and return their callbacks, for the caller to run later"""
+        held = [step.callback for step in self._steps if step.name in names]
+        self._steps = [step for step in self._steps if step.name not in names]
+        return held
+
+    def start_teardown(self, reason: str = "hangup") -> asyncio.Task:
+        """Begin teardown without waiting for it
+
+        Function tools run inside the session's speech tasks, and closing the
+        session waits for those tasks, so tools must not await the teardown.
+        """
+        if self._teardown_task is None:
+            self._teardown_task = asyncio.create_task(self._run(reason), name="call_teardown")
+        return self._teardown_task
+
+    async def teardown(self, reason: str = "hangup") -> TeardownReport:
+        """Run the teardown once; concurrent and repeated callers share the result"""
+        # shield so a cancelled caller doesn't abort the teardown half way
+        return await asyncio.shield(self.start_teardown(reason))
+
+    async def _run(self, reason: str) -> TeardownReport:
+        started = clock.monotonic()
+        deadline = started + self.total_timeout
+        report = TeardownReport(reason=reason, slot_release_latency=0.0)
+        logger.info(f"tearing down call: {reason}")
+
+        current = asyncio.current_task()
+        pending = [task for task in self._tasks if task is not current and not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=self.step_timeout)
+
+        for stage in TeardownStage:
+            steps = [step for step in self._steps if step.stage == stage]
+            if not steps:
+                continue
+            # steps within one stage are independent, so they run side by side
+            results = await asyncio.gather(
+                *(self._run_step(step, deadline) for step in steps)
+            )
+            report.steps.extend(results)
+
+        report.slot_release_latency = clock.monotonic() - started
+        self.report = report
+        for step in report.steps:
+            if step.timed_out:
+                logger.warning(f"teardown step '{step.name}' timed out after {step.duration:.2f}s")
+            elif step.error:
+                logger.warning(f"teardown step '{step.name}' failed: {step.error}")
+        logger.info(f"call teardown finished in {report.slot_release_latency * 1000:.1f}ms")
+        return report
+
+    async def _run_step(self, step: TeardownStep, deadline: float) -> StepResult:
+        timeout = min(step.timeout or self.step_timeout, max(deadline - clock.monotonic(), 0.0))
+        started = clock.monotonic()
+        result = StepResult(step.stage, step.name, 0.0)
+        try:
+            outcome = step.callback()
+            if inspect.isawaitable(outcome):
+                await asyncio.wait_for(outcome, timeout=timeout)
+        except asyncio.TimeoutError:
+            result.timed_out = True
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+        result.duration = clock.monotonic() - started
+        return result
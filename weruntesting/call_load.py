@@ -0,0 +1,192 @@
+"""
+Per-call load: event loop lag, noise cancellation bypass and caller audio frames
+
+BVCTelephony runs inside the LiveKit SDK's native audio stream, and the rest
+of a call's input audio work (audio_conditioning) is a few microseconds of
+numpy per frame, so all of it runs inline on the call's event loop: handing
+each 10-20ms frame to a thread pool would cost more than the work itself.
+
+- LoopLagMonitor: samples how late the call's event loop wakes up. A job runs
+  on its own loop (one call per job process, or per job thread), so its lag
+  is that call's "behind real time" signal; when it stays above
+  `saturation_lag` the call can't keep up, whatever the cause (its own CPU,
+  or other processes on the machine).
+- NoiseCancellationGuard: while the call is behind, turns BVC off for it (the
+  room audio stream is re-created without it) and turns it back on once the
+  call has kept up for a while.
+
+Per call, CallLoad keeps the peak loop lag and how often NC was bypassed;
+log_load() reports them at teardown with the late, dropped and concealed
+caller frames from the call's jitter stats (audio_conditioning.JitterStats).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from livekit.agents import __version__ as agents_version
+
+logger = logging.getLogger("call-load")
+
+# _restart_room_stream uses RoomIO internals as they are in these releases
+ROOM_IO_VERSIONS = ("1.1.",)
+
+
+@dataclass
+class CallLoad:
+    call_id: str
+    peak_lag: float = 0.0
+    nc_bypasses: int = 0
+    nc_bypassed: bool = False
+
+
+class LoopLagMonitor:
+    """Smoothed lateness of the running event loop's timers, sampled every `interval`"""
+
+    def __init__(self, *, interval: float = 0.02, saturation_lag: float = 0.010, smoothing: float = 0.05):
+        self.interval = interval
+        self.saturation_lag = saturation_lag
+        self.smoothing = smoothing
+        self.lag = 0.0  # smoothed delay between a timer's due time and the loop running it
+        self.calls: dict[str, CallLoad] = {}
+        self._task: asyncio.Task | None = None
+        self._last_nc_change = float("-inf")
+
+    @property
+    def saturated(self) -> bool:
+        return self.lag > self.saturation_lag
+
+    def claim_nc_change(self, now: float, spacing: float) -> bool:
+        """Let one call at a time switch NC when several share a loop, so load is shed gradually"""
+        if now - self._last_nc_change < spacing:
+            return False
+        self._last_nc_change = now
+        return True
+
+    def register(self, call_id: str) -> CallLoad:
+        load = self.calls[call_id] = CallLoad(call_id)
+        return load
+
+    def unregister(self, call_id: str) -> CallLoad | None:
+        return self.calls.pop(call_id, None)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample(), name="loop_lag_monitor")
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            late = max(loop.time() - due, 0.0)
+            self.lag += (late - self.lag) * self.smoothing
+            for load in self.calls.values():
+                load.peak_lag = max(load.peak_lag, self.lag)
+
+
+def _room_io_supported(room_input) -> bool:
+    return agents_version.startswith(ROOM_IO_VERSIONS) and all(
+        hasattr(room_input, name)
+        for name in ("_noise_cancellation", "_publication", "_room", "_participant_identity", "_close_stream", "_on_track_available")
+    )
+
+
+def _restart_room_stream(room_input, noise_cancellation) -> bool:
+    """Re-create RoomIO's audio stream for the current track with different NC options
+
+    RoomIO has no public way to change noise cancellation mid-call, so this uses
+    its participant input stream's internals, only on the releases in
+    ROOM_IO_VERSIONS; on any other it changes nothing.
+    """
+    if not _room_io_supported(room_input):
+        return False
+    room_input._noise_cancellation = noise_cancellation
+    publication = room_input._publication
+    if publication is None or publication.track is None:
+        return False  # picked up when the track is (re)subscribed
+    participant = room_input._room.remote_participants.get(room_input._participant_identity)
+    if participant is None:
+        return False
+    room_input._close_stream()
+    return room_input._on_track_available(publication.track, publication, participant)
+
+
+class NoiseCancellationGuard:
+    """Bypasses noise cancellation for one call while its event loop is behind"""
+
+    def __init__(
+        self,
+        room_input,
+        noise_cancellation,
+        monitor: LoopLagMonitor,
+        load: CallLoad,
+        *,
+        check_interval: float = 1.0,
+        recover_after: float = 10.0,
+        restart=_restart_room_stream,
+    ):
+        self.room_input = room_input
+        self.noise_cancellation = noise_cancellation
+        self.monitor = monitor
+        self.load = load
+        self.check_interval = check_interval
+        self.recover_after = recover_after
+        self._restart = restart
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._restart is _restart_room_stream and not _room_io_supported(self.room_input):
+            logger.warning(f"can't switch noise cancellation on this input (livekit-agents {agents_version}), leaving it on")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(), name="nc_guard")
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        calm_since = None
+        while True:
+            await asyncio.sleep(self.check_interval)
+            now = asyncio.get_running_loop().time()
+            if self.monitor.saturated:
+                calm_since = None
+                if not self.load.nc_bypassed and self.monitor.claim_nc_change(now, self.check_interval):
+                    self._set_bypassed(True)
+            elif self.load.nc_bypassed:
+                calm_since = calm_since or now
+                # wait for the call to stay healthy, so NC doesn't flap on and off
+                if now - calm_since >= self.recover_after and self.monitor.claim_nc_change(now, self.check_interval):
+                    self._set_bypassed(False)
+                    calm_since = None
+
+    def _set_bypassed(self, bypassed: bool) -> None:
+        self._restart(self.room_input, None if bypassed else self.noise_cancellation)
+        self.load.nc_bypassed = bypassed
+        if bypassed:
+            self.load.nc_bypasses += 1
+            logger.warning(f"call behind real time (lag {self.monitor.lag * 1000:.1f}ms), noise cancellation off for {self.load.call_id}")
+        else:
+            logger.info(f"call caught up, noise cancellation back on for {self.load.call_id}")
+
+
+def log_load(load: CallLoad, audio=None) -> None:
+    """The call's load, with the caller frames that came late, were dropped or were concealed (`audio`: JitterStats)"""
+    frames = ""
+    if audio is not None:
+        frames = f", caller frames {audio.late} late, {audio.dropped} dropped, {audio.concealed} concealed of {audio.received}"
+    logger.info(
+        f"{load.call_id}: peak event loop lag {load.peak_lag * 1000:.1f}ms, "
+        f"noise cancellation bypassed {load.nc_bypasses}x{frames}"
+    )
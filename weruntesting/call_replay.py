@@ -0,0 +1,305 @@
+"""
+Replay recorded calls through the agents, faster than real time
+
+A recording is the caller's side of a call plus what was said, as two files
+with the same name:
+
+- `<name>.wav`: the caller's audio from the moment they answered (16-bit mono)
+- `<name>.json`:
+
+      {
+        "agent": "outbound",              # agent.py; "interview" for interview_agent.py
+        "inbound": false,                 # the caller dialled in (interview_agent.py only)
+        "metadata": {"phone_number": "+14155550134"},
+        "ring": 0.5,                      # seconds ringing before they answered
+        "hangup_after": 21.0,             # they hung up this long after answering
+        "caller": [{"start": 0.2, "end": 0.7, "text": "Hello?"}, ...],
+        "transcript": [["agent", "Hi, this is ..."], ["caller", "Yes, that works"], ...],
+        "replies": ["Hi, this is ...", ...],  # optional, the agent's lines in "transcript"
+        "tools": {"3": "end_call"},       # optional, caller turn -> tool the model called
+        "script": {"reply_latency": 0.4}  # optional, SessionScript overrides
+      }
+
+replay() runs the agent's real entrypoint against the LiveKit stand-in (see
+call_harness.py) with the caller playing the WAV, on a VirtualTimeLoop, so a
+minute of call takes well under a second. The stand-in model answers with
+the recorded replies after a fixed model latency, and its STT hears the words of
+whichever recorded caller turns a detected turn overlaps. What changes from
+run to run is therefore only what the agents' own code decides: when the
+caller's turn ends (VAD, noise cancellation, audio conditioning), when the
+agent is cut off, and how long replies take. Each ReplayResult has the turn
+latencies, interruption count and a diff of the transcript against the
+recorded one.
+
+replay_corpus() replays every recording in a directory across a process
+pool; `python call_replay.py <dir> --update` stores this run's transcripts as
+the new references once a change has been reviewed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import difflib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import virtual_time
+from bench_voicemail import write_wav
+from call_harness import LocalWorker, SessionScript, local_environment, percentile, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+
+logger = logging.getLogger("call-replay")
+
+# the script a replay runs with, unless the recording overrides it: speech plays at its real pace
+REPLAY_SCRIPT = SessionScript(playout_speed=1.0, interrupt_after=0.5)
+
+
+@dataclass
+class CallerTurn:
+    start: float  # seconds into the caller's audio
+    end: float
+    text: str
+
+
+@dataclass
+class Recording:
+    name: str
+    audio: CallerAudio
+    agent: str = "outbound"
+    inbound: bool = False
+    metadata: dict = field(default_factory=dict)
+    ring: float = 0.5
+    hangup_after: float | None = None
+    caller: list[CallerTurn] = field(default_factory=list)
+    transcript: list[tuple[str, str]] = field(default_factory=list)
+    replies: list[str] | None = None
+    tools: dict[int, str] = field(default_factory=dict)
+    script: dict = field(default_factory=dict)
+
+    def transcribe(self, start: float, end: float, final: bool = True) -> str:
+        """What STT makes of the caller audio between two offsets: every recorded turn it overlaps
+
+        A partial transcript (`final=False`) has only the words of a turn
+        spoken by `end`, in proportion to how far into the turn it is (a
+        word counts once it's half said).
+        """
+        heard = []
+        for turn in self.caller:
+            if turn.start < end and turn.end > start:
+                words = turn.text.split()
+                if not final and end < turn.end:
+                    words = words[: round(len(words) * (end - turn.start) / (turn.end - turn.start))]
+                heard += words
+        return " ".join(heard)
+
+    def session_script(self, base: SessionScript = REPLAY_SCRIPT) -> SessionScript:
+        replies = self.replies if self.replies is not None else [text for speaker, text in self.transcript if speaker == "agent"]
+        return replace(base, **self.script, tools=self.tools, replies=replies, transcribe=self.transcribe)
+
+
+@dataclass
+class ReplayResult:
+    name: str
+    outcome: str = ""
+    error: str | None = None
+    answer_to_greeting: float | None = None
+    turns: list[float] = field(default_factory=list)
+    interruptions: int = 0
+    transcript: list[tuple[str, str]] = field(default_factory=list)
+    diff: list[str] = field(default_factory=list)  # unified diff against the recording's transcript, empty if it matches
+    call_seconds: float = 0.0  # virtual
+    wall_seconds: float = 0.0
+
+
+def load_recording(path) -> Recording:
+    """Read `<name>.json` and `<name>.wav`; `path` may name either, or neither suffix"""
+    path = Path(path).with_suffix("")
+    info = json.loads(path.with_suffix(".json").read_text())
+    return Recording(
+        name=path.name,
+        audio=CallerAudio.from_wav(path.with_suffix(".wav")),
+        agent=info.get("agent", "outbound"),
+        inbound=info.get("inbound", False),
+        metadata=info.get("metadata", {}),
+        ring=info.get("ring", 0.5),
+        hangup_after=info.get("hangup_after"),
+        caller=[CallerTurn(**turn) for turn in info.get("caller", [])],
+        transcript=[(speaker, text) for speaker, text in info.get("transcript", [])],
+        replies=info.get("replies"),
+        tools={int(turn): tool for turn, tool in info.get("tools", {}).items()},
+        script=info.get("script", {}),
+    )
+
+
+def save_recording(directory, recording: Recording) -> Path:
+    path = Path(directory) / recording.name
+    write_wav(path.with_suffix(".wav"), recording.audio.pcm, recording.audio.sample_rate)
+    info = {
+        "agent": recording.agent,
+        "inbound": recording.inbound,
+        "metadata": recording.metadata,
+        "ring": recording.ring,
+        "hangup_after": recording.hangup_after,
+        "caller": [turn.__dict__ for turn in recording.caller],
+        "transcript": [list(line) for line in recording.transcript],
+        "tools": {str(turn): tool for turn, tool in recording.tools.items()},
+        "script": recording.script,
+    }
+    if recording.replies is not None:
+        info["replies"] = recording.replies
+    path.with_suffix(".json").write_text(json.dumps(info, indent=2))
+    return path
+
+
+def transcript_diff(expected: list[tuple[str, str]], actual: list[tuple[str, str]]) -> list[str]:
+    lines = lambda transcript: [f"{speaker}: {text}" for speaker, text in transcript]  # noqa: E731
+    return list(difflib.unified_diff(lines(expected), lines(actual), "recorded", "replayed", lineterm="", n=1))
+
+
+def _agents():
+    """The agents' modules, imported on first use (agent.py lives one directory up)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.append(root)
+    import agent
+    import interview_agent
+
+    return {"outbound": (agent.entrypoint, None), "interview": (interview_agent.entrypoint, interview_agent.prewarm)}
+
+
+async def replay(recording: Recording, *, base: SessionScript = REPLAY_SCRIPT) -> ReplayResult:
+    """Replay one recording; needs local_environment() for the recording's agent around it"""
+    loop = asyncio.get_running_loop()
+    entrypoint, prewarm = _agents()[recording.agent]
+    # prewarmed per replay: what prewarm builds (HTTP clients) belongs to the event loop it ran on
+    worker = LocalWorker(entrypoint, prewarm=prewarm)
+    hangup_after = recording.hangup_after if recording.hangup_after is not None else recording.audio.duration
+    call = SipCall(ring=recording.ring, audio=recording.audio, hangup_after=hangup_after)
+    server = FakeLiveKitAPI(sip_script=lambda req: call)
+    room_name = f"replay-{recording.name}"
+    if recording.inbound:
+        server.inbound_call(room_name, call)
+    started, wall = loop.time(), time.perf_counter()
+    report = await run_call(
+        entrypoint,
+        server,
+        metadata=json.dumps(recording.metadata) if recording.metadata else "",
+        room_name=room_name,
+        script=recording.session_script(base),
+        proc=worker.proc,
+        timeout=recording.ring + hangup_after + 30.0,
+    )
+    return ReplayResult(
+        name=recording.name,
+        outcome=report.outcome,
+        error=report.error,
+        answer_to_greeting=report.answer_to_greeting,
+        turns=report.turns,
+        interruptions=report.interruptions,
+        transcript=report.transcript,
+        diff=transcript_diff(recording.transcript, report.transcript),
+        call_seconds=loop.time() - started,
+        wall_seconds=time.perf_counter() - wall,
+    )
+
+
+def replay_file(path, base: SessionScript = REPLAY_SCRIPT) -> ReplayResult:
+    """Replay one recording in its own local environment, in virtual time"""
+    recording = load_recording(path)
+    entrypoint, _ = _agents()[recording.agent]
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, entrypoint):
+        try:
+            return virtual_time.run(replay(recording, base=base))
+        except Exception as e:
+            logger.exception(f"replay of {recording.name} failed")
+            return ReplayResult(name=recording.name, error=f"{type(e).__name__}: {e}")
+
+
+def recordings(directory) -> list[Path]:
+    return sorted(path.with_suffix("") for path in Path(directory).glob("*.json") if path.with_suffix(".wav").exists())
+
+
+def replay_corpus(paths, *, processes: int | None = None, base: SessionScript = REPLAY_SCRIPT) -> list[ReplayResult]:
+    """Replay many recordings over a pool of processes; results come back in the order of `paths`"""
+    paths = list(paths)
+    if processes == 1 or len(paths) <= 1:
+        return [replay_file(path, base) for path in paths]
+    processes = processes or os.cpu_count() or 1
+    # spawned rather than forked: the parent may already hold the SDK's native threads
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        chunksize = max(1, len(paths) // (processes * 4))
+        return list(pool.map(replay_file, paths, [base] * len(paths), chunksize=chunksize))
+
+
+def summarize(results: list[ReplayResult]) -> dict:
+    turns = [turn for r in results for turn in r.turns]
+    greetings = [r.answer_to_greeting for r in results if r.answer_to_greeting is not None]
+    wall = sum(r.wall_seconds for r in results)
+    return {
+        "calls": len(results),
+        "errors": sum(r.error is not None for r in results),
+        "turns": len(turns),
+        "turn_p50": percentile(turns, 0.5),
+        "turn_p95": percentile(turns, 0.95),
+        "greeting_p95": percentile(greetings, 0.95),
+        "interruptions": sum(r.interruptions for r in results),
+        "calls_with_diffs": sum(bool(r.diff) for r in results),
+        "speedup": sum(r.call_seconds for r in results) / wall if wall else None,
+    }
+
+
+def update_references(paths, results: list[ReplayResult]) -> None:
+    """Make each replay's transcript its recording's reference"""
+    for path, result in zip(paths, results):
+        if result.error is None:
+            recording = load_recording(path)
+            recording.transcript = result.transcript
+            save_recording(Path(path).parent, recording)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a directory of recorded calls through the agents")
+    parser.add_argument("corpus", help="directory of <name>.wav + <name>.json recordings")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--diffs", action="store_true", help="print each transcript diff")
+    parser.add_argument("--update", action="store_true", help="store this run's transcripts as the references")
+    args = parser.parse_args()
+
+    paths = recordings(args.corpus)
+    started = time.perf_counter()
+    results = replay_corpus(paths, processes=args.processes)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+
+    print(f"\n📊 REPLAY: {args.corpus}")
+    print("=" * 60)
+    print(f"{summary['calls']} calls, {summary['turns']} caller turns, {summary['errors']} errors in {elapsed:.1f}s")
+    if summary["turns"]:
+        print(f"turn latency        p50 {summary['turn_p50']:.3f}s  p95 {summary['turn_p95']:.3f}s")
+    if summary["greeting_p95"] is not None:
+        print(f"answer to greeting  p95 {summary['greeting_p95']:.3f}s")
+    print(f"interruptions       {summary['interruptions']}")
+    print(f"transcript diffs    {summary['calls_with_diffs']} of {summary['calls']} calls")
+    if summary["speedup"]:
+        print(f"speed               {summary['speedup']:.0f}x real time per process")
+    for result in results:
+        if result.error:
+            print(f"❌ {result.name}: {result.error}")
+        elif args.diffs and result.diff:
+            print(f"\n{result.name}:")
+            print("\n".join(result.diff))
+    if args.update:
+        update_references(paths, results)
+        print(f"\n✅ Updated {sum(r.error is None for r in results)} reference transcripts")
+
+
+if __name__ == "__main__":
+    main()
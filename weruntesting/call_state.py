@@ -0,0 +1,156 @@
+"""
+Compact per-call state, for workers holding hundreds of calls
+
+What a call is about arrives as JSON records: the dial info in the job's
+metadata (agent.py), the job and candidate from the database
+(interview_agent.py). Kept as they're decoded, every call holds its own
+dicts and its own copies of strings most calls share, such as the company,
+the job title, the skills and the transfer number. Kept in these instead:
+
+- DialInfo, JobContext and CandidateContext are frozen, slotted dataclasses,
+  with lists as tuples and any fields the code doesn't read in `extra`
+- their strings are interned, so a node's calls share one copy of each
+
+A call's chat history grows for as long as the call lasts, in the agent and
+again in its session. HistoryWindow keeps both to the last
+CALL_HISTORY_ITEMS items (default 60, about a 15-minute interview), with the
+agent's instructions kept in front. For the realtime
+model, whose conversation lives on the server, the trimmed items are deleted
+there too. The stats a worker keeps over all its calls hold their last
+`SAMPLES` latency samples in a ring().
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Any
+
+logger = logging.getLogger("call-state")
+
+# latency samples each of a worker's stats keeps, newest last
+SAMPLES = 1000
+
+
+def ring(maxlen: int = SAMPLES) -> deque:
+    """A bounded list: the oldest item goes when a new one doesn't fit"""
+    return deque(maxlen=maxlen)
+
+
+def intern_value(value: Any) -> Any:
+    """`value` with its strings interned, lists and dicts as tuples"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return tuple((sys.intern(str(key)), intern_value(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(intern_value(item) for item in value)
+    return value
+
+
+class _Record:
+    """from_record() and to_dict() for the slotted dataclasses below"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_record(cls, record: dict | None):
+        names = {f.name for f in fields(cls)} - {"extra"}
+        record = record or {}
+        known = {name: intern_value(value) for name, value in record.items() if name in names and value is not None}
+        extra = intern_value({name: value for name, value in record.items() if name not in names})
+        return cls(**known, extra=extra)
+
+    def to_dict(self) -> dict:
+        record = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "extra"}
+        record = {name: list(value) if isinstance(value, tuple) else value for name, value in record.items()}
+        return {**record, **dict(self.extra)}
+
+
+@dataclass(frozen=True, slots=True)
+class DialInfo(_Record):
+    """An outbound call's dispatch metadata (agent.py)"""
+
+    phone_number: str = ""
+    transfer_to: str | None = None
+    transfer_mode: str = "warm"
+    region: str | None = None  # SIP_REGION if unset
+    attempt: int = 1
+    campaign: str = "default"
+    prefetch: bool | None = None  # PREFETCH_RESPONSES if unset
+    detect_voicemail: bool = True
+    extra: tuple[tuple[str, Any], ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class JobContext(_Record):
+    job_title: str = "Software Developer"
+    company_name: str = "Our Company"
+    requirements: tuple[str, ...] = ()
+    experience_level: str = "Mid-level"
+    extra: tuple[tuple[str, Any], ...] = ()  # job_id, salary, ...
+
+
+@dataclass(frozen=True, slots=True)
+class CandidateContext(_Record):
+    candidate_name: str = "Candidate"
+    experience_years: int | str = "Unknown"
+    relevant_skills: tuple[str, ...] = ()
+    extra: tuple[tuple[str, Any], ...] = ()
+
+
+def history_items() -> int:
+    """CALL_HISTORY_ITEMS: chat items an agent keeps (default 60), 0 for all of them"""
+    return int(os.getenv("CALL_HISTORY_ITEMS", "60"))
+
+
+class HistoryWindow:
+    """Keeps an agent's chat history, and its session's, to the last `max_items` items
+
+    attach_session() trims them as the session adds items; the instructions
+    stay, and a window never starts inside a tool call. The session keeps a
+    history of its own (`session.history`, added to with every item), which
+    nothing in the agents reads, so it's cut to the same window in place.
+    """
+
+    __slots__ = ("agent", "max_items", "trimmed", "_session", "_task")
+
+    def __init__(self, agent, max_items: int | None = None):
+        self.agent = agent
+        self.max_items = history_items() if max_items is None else max_items
+        self.trimmed = 0
+        self._session = None
+        self._task = None
+
+    def attach_session(self, session) -> None:
+        if self.max_items:
+            self._session = session
+            session.on("conversation_item_added", self._on_item)
+
+    def over(self) -> bool:
+        # the instructions aren't counted
+        if not self.max_items:
+            return False
+        session_items = len(self._session.history.items) if self._session is not None else 0
+        return max(len(self.agent.chat_ctx.items), session_items) > self.max_items + 1
+
+    async def trim(self) -> None:
+        if not self.over():
+            return
+        if self._session is not None:
+            self._session.history.truncate(max_items=self.max_items)
+        before = len(self.agent.chat_ctx.items)
+        if before > self.max_items + 1:
+            await self.agent.update_chat_ctx(self.agent.chat_ctx.copy().truncate(max_items=self.max_items))
+            self.trimmed += before - len(self.agent.chat_ctx.items)
+
+    def log_summary(self) -> None:
+        if self.trimmed:
+            logger.info(f"chat history: {self.trimmed} items trimmed, the last {self.max_items} kept")
+
+    def _on_item(self, ev) -> None:
+        if self.over() and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.trim())
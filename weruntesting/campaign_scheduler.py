@@ -0,0 +1,509 @@
+"""
+Campaign scheduler: which contact to call next, and when
+
+Replaces firing `lk dispatch create` by hand for each number. Contacts are
+queued with their timezone and a priority, and the scheduler dispatches the
+outbound-caller agent to them:
+
+- only inside the callee's local calling window (CallWindow, default 9:00-20:00
+  Monday to Saturday, in the contact's IANA timezone)
+- highest priority first among the contacts that may be called right now
+- with exponential backoff between attempts, up to `max_attempts`
+- each number once: contacts are normalized to E.164 when queued, and
+  invalid, duplicate and do-not-call numbers are skipped
+- no faster than there are free call slots on the workers (WorkerCapacity:
+  configured slots minus calls in progress, checked against the server's live
+  rooms) and no faster than `max_rate` dispatches a second (carrier CPS)
+
+Every contact lives in SQLite; memory holds only a window of the queue. The
+`waiting` heap holds the earliest-ready contacts up to a watermark, ordered by
+when they may next be called, and contacts move to the `ready` heap (ordered
+by priority) once that time has passed. Contacts past the watermark stay on
+disk until the window runs low and is refilled. Beyond that window, a queued
+contact costs 8 bytes of RAM (its number in the dedupe set).
+
+The scheduler is the only writer of its database. Call results come back
+through `complete()`, or `complete_dial()` with the DialResult of a call that
+failed to connect. The agent reports them from its job process with a
+CallReport, which writes the result to CAMPAIGN_RESULTS_DB (default
+campaign_results.db, shared by the processes on the machine) at the call's
+teardown; each step() collects them, including a failed dial's `retry_after`.
+Dispatches without a result after `call_timeout` are retried.
+
+    scheduler = CampaignScheduler("campaign.db", lk_api, capacity=WorkerCapacity(20, lk_api))
+    scheduler.add_contacts([Contact("+14155550134", "America/Los_Angeles", priority=1)])
+    await scheduler.run()
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from enum import Enum
+from functools import lru_cache
+from itertools import batched
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from livekit import api
+
+from phone_numbers import InvalidPhoneNumber, NumberSet, normalize, number_key
+from sip_retry import DialResult
+
+logger = logging.getLogger("campaign-scheduler")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    phone TEXT NOT NULL,
+    tz TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    metadata TEXT,
+    ready_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending'
+);
+CREATE INDEX IF NOT EXISTS contacts_queue ON contacts (state, ready_at, id);
+"""
+
+_RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_results (
+    contact_id INTEGER NOT NULL,
+    attempt INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    retry_after REAL,
+    PRIMARY KEY (contact_id, attempt)
+);
+"""
+
+_LOADED_ALL = (math.inf, 0)
+
+
+class CallOutcome(str, Enum):
+    ANSWERED = "answered"  # done, don't call again
+    RETRY = "retry"  # no answer, busy, voicemail: try again later
+    FAILED = "failed"  # invalid number, opted out: never call again
+
+
+@dataclass
+class Contact:
+    phone: str
+    tz: str = "UTC"
+    priority: int = 0
+    metadata: dict = field(default_factory=dict)
+
+
+@lru_cache(maxsize=1024)
+def _zone(tz: str) -> ZoneInfo:
+    return ZoneInfo(tz)
+
+
+@dataclass(frozen=True)
+class CallWindow:
+    """Local hours a callee may be called"""
+
+    start_hour: int = 9
+    end_hour: int = 20
+    weekdays: frozenset[int] = frozenset(range(6))  # Monday..Saturday
+
+    def is_open(self, when: float, tz: str) -> bool:
+        local = datetime.fromtimestamp(when, _zone(tz))
+        return local.weekday() in self.weekdays and self.start_hour <= local.hour < self.end_hour
+
+    def next_allowed(self, after: float, tz: str) -> float:
+        """The first time at or after `after` inside the window, as a Unix time"""
+        local = datetime.fromtimestamp(after, _zone(tz))
+        for _ in range(8):
+            if local.weekday() in self.weekdays and local.hour < self.end_hour:
+                if local.hour < self.start_hour:
+                    local = local.replace(hour=self.start_hour, minute=0, second=0, microsecond=0)
+                return max(local.timestamp(), after)
+            local = (local + timedelta(days=1)).replace(hour=self.start_hour, minute=0, second=0, microsecond=0)
+        raise ValueError("the call window has no allowed hours")
+
+
+def exponential_backoff(attempts: int, *, base: float = 900.0, cap: float = 4 * 3600.0) -> float:
+    """Seconds to wait before the next attempt: 15 minutes, doubling up to 4 hours"""
+    return min(base * 2 ** (attempts - 1), cap)
+
+
+class WorkerCapacity:
+    """Free call slots across the agent workers
+
+    `max_concurrent` is the workers' total call capacity. Calls in progress are
+    counted from the scheduler's own dispatches and, when `lk_api` is given,
+    from the server's live rooms (refreshed every `refresh` seconds), so calls
+    the scheduler didn't start (inbound, manual) take capacity too.
+    """
+
+    def __init__(self, max_concurrent: int, lk_api=None, *, refresh: float = 5.0):
+        self.max_concurrent = max_concurrent
+        self.lk_api = lk_api
+        self.refresh = refresh
+        self._live_rooms = 0
+        self._checked_at = -math.inf
+
+    async def available(self, in_flight: int) -> int:
+        if self.lk_api is not None and time.monotonic() - self._checked_at >= self.refresh:
+            self._checked_at = time.monotonic()
+            try:
+                rooms = await self.lk_api.room.list_rooms(api.ListRoomsRequest())
+                self._live_rooms = len(rooms.rooms)
+            except Exception as e:
+                logger.warning(f"couldn't list rooms, using the scheduler's own count: {e}")
+                self._live_rooms = 0
+        return max(self.max_concurrent - max(in_flight, self._live_rooms), 0)
+
+
+def results_path() -> str:
+    return os.getenv("CAMPAIGN_RESULTS_DB", "campaign_results.db")
+
+
+def report_result(
+    contact_id: int, attempt: int, outcome: CallOutcome | str, *, retry_after: float | None = None, path: str | None = None
+) -> None:
+    """A dispatched call's result, for the scheduler's next step() to pick up"""
+    with closing(sqlite3.connect(path or results_path(), timeout=5.0)) as db:
+        db.executescript(_RESULTS_SCHEMA)
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO call_results VALUES (?, ?, ?, ?)",
+                (contact_id, attempt, CallOutcome(outcome).value, retry_after),
+            )
+
+
+class CallReport:
+    """The agent's side of a campaign call: its result, sent when the call is torn down
+
+    A call that never gets as far as a result (the job failed) is a retry.
+    """
+
+    def __init__(self, contact_id: int, attempt: int, *, path: str | None = None):
+        self.contact_id = contact_id
+        self.attempt = attempt
+        self.path = path
+        self.outcome = CallOutcome.RETRY
+        self.retry_after: float | None = None
+
+    def set(self, outcome: CallOutcome, *, retry_after: float | None = None) -> None:
+        self.outcome = outcome
+        self.retry_after = retry_after
+
+    def dial(self, result: DialResult) -> None:
+        """A call that didn't connect, retried when its SIP failure class says to"""
+        if result.retry_after is None:
+            self.set(CallOutcome.FAILED)
+        else:
+            self.set(CallOutcome.RETRY, retry_after=result.retry_after)
+
+    async def send(self) -> None:
+        await asyncio.to_thread(
+            report_result, self.contact_id, self.attempt, self.outcome, retry_after=self.retry_after, path=self.path
+        )
+
+
+@dataclass
+class SchedulerStats:
+    added: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    do_not_call: int = 0
+    dispatched: int = 0
+    dispatch_errors: int = 0
+    answered: int = 0
+    retried: int = 0
+    failed: int = 0
+    deferred: int = 0  # ready contacts whose window closed before a slot was free
+    refills: int = 0
+
+
+class CampaignScheduler:
+    def __init__(
+        self,
+        path: str,
+        lk_api,
+        *,
+        agent_name: str = "outbound-caller",
+        campaign: str | None = None,
+        capacity: WorkerCapacity,
+        window: CallWindow | None = None,
+        region: str | None = None,  # numbers without a country code: phone_numbers.default_region()
+        dnc: NumberSet | None = None,
+        max_rate: float = 5.0,
+        max_attempts: int = 3,
+        retry_backoff=exponential_backoff,
+        call_timeout: float = 3600.0,
+        max_in_memory: int = 100_000,
+        refill_batch: int = 10_000,
+        results: str | None = None,
+        clock=time.time,
+    ):
+        self.lk_api = lk_api
+        self.agent_name = agent_name
+        self.campaign = campaign
+        self.capacity = capacity
+        self.window = window or CallWindow()
+        self.region = region
+        self.dnc = dnc if dnc is not None else NumberSet()
+        self.max_rate = max_rate
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.call_timeout = call_timeout
+        self.max_in_memory = max_in_memory
+        self.refill_batch = min(refill_batch, max_in_memory // 2)
+        self.clock = clock
+        self.stats = SchedulerStats()
+
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM contacts").fetchone()[0] or 0) + 1
+        # dispatched before a restart: results for them are lost, so they're retried
+        self._db.execute("UPDATE contacts SET state = 'pending' WHERE state = 'dispatched'")
+        self._db.commit()
+        # results the agents report (CallReport), collected at each step
+        self.results = results or results_path()
+        self._results = sqlite3.connect(self.results, timeout=5.0)
+        self._results.execute("PRAGMA journal_mode=WAL")
+        self._results.executescript(_RESULTS_SCHEMA)
+        # every number ever queued, so a contact list loaded twice doesn't call anyone twice
+        self._queued = NumberSet(
+            np.fromiter((number_key(phone) for (phone,) in self._db.execute("SELECT phone FROM contacts")), dtype=np.int64)
+        )
+
+        self._waiting: list[tuple[float, int, int]] = []  # (ready_at, id, priority)
+        self._ready: list[tuple[int, float, int]] = []  # (-priority, ready_at, id)
+        # every pending contact with (ready_at, id) <= watermark is in a heap; the rest are only on disk
+        self._watermark: tuple[float, int] = (-math.inf, 0)
+        self.in_flight: dict[int, tuple[float, int]] = {}  # contact id -> dispatched at, attempt
+        self._tokens = 0.0
+        self._tokens_at = clock()
+
+    @property
+    def in_memory(self) -> int:
+        return len(self._waiting) + len(self._ready)
+
+    def close(self) -> None:
+        self._db.close()
+        self._results.close()
+
+    def add_contacts(self, contacts, *, batch: int = 10_000) -> int:
+        now = self.clock()
+        added = 0
+        for chunk in batched(contacts, batch):
+            rows = []
+            for contact in chunk:
+                try:
+                    phone = normalize(contact.phone, self.region)
+                except InvalidPhoneNumber:
+                    self.stats.invalid += 1
+                    continue
+                if phone in self.dnc:
+                    self.stats.do_not_call += 1
+                    continue
+                if not self._queued.add(phone):
+                    self.stats.duplicates += 1
+                    continue
+                ready_at = self.window.next_allowed(now, contact.tz)
+                rows.append(
+                    (self._next_id, phone, contact.tz, contact.priority,
+                     json.dumps(contact.metadata) if contact.metadata else None, ready_at)
+                )
+                self._next_id += 1
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO contacts (id, phone, tz, priority, metadata, ready_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            for contact_id, _, _, priority, _, ready_at in rows:
+                self._enqueue(ready_at, contact_id, priority)
+            added += len(rows)
+        self.stats.added += added
+        return added
+
+    def _enqueue(self, ready_at: float, contact_id: int, priority: int) -> None:
+        if (ready_at, contact_id) > self._watermark:
+            return  # picked up by a later refill
+        heapq.heappush(self._waiting, (ready_at, contact_id, priority))
+        if self.in_memory > self.max_in_memory:
+            # keep the earliest half in memory and leave the rest on disk
+            keep = self.max_in_memory // 2 - len(self._ready)
+            self._waiting = heapq.nsmallest(max(keep, 1), self._waiting)
+            self._watermark = self._waiting[-1][:2]
+            # anything past the new watermark is reloaded by a refill, so it can't stay in memory too
+            if any((ready_at, contact_id) > self._watermark for _, ready_at, contact_id in self._ready):
+                self._ready = [entry for entry in self._ready if (entry[1], entry[2]) <= self._watermark]
+                heapq.heapify(self._ready)
+
+    def _refill(self) -> None:
+        if self._watermark == _LOADED_ALL or self.in_memory >= self.max_in_memory // 2:
+            return
+        ready_at, contact_id = self._watermark
+        rows = self._db.execute(
+            "SELECT ready_at, id, priority FROM contacts WHERE state = 'pending' AND (ready_at, id) > (?, ?) "
+            "ORDER BY ready_at, id LIMIT ?",
+            (ready_at, contact_id, self.refill_batch),
+        ).fetchall()
+        self.stats.refills += 1
+        for row in rows:
+            heapq.heappush(self._waiting, row)
+        self._watermark = rows[-1][:2] if len(rows) == self.refill_batch else _LOADED_ALL
+
+    def _promote(self, now: float) -> None:
+        while self._waiting and self._waiting[0][0] <= now:
+            ready_at, contact_id, priority = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (-priority, ready_at, contact_id))
+
+    def _take_tokens(self, now: float, wanted: int) -> int:
+        self._tokens = min(self._tokens + (now - self._tokens_at) * self.max_rate, max(self.max_rate, 1.0))
+        self._tokens_at = now
+        granted = min(int(self._tokens), wanted)
+        self._tokens -= granted
+        return granted
+
+    def next_wakeup(self) -> float | None:
+        """When the earliest waiting contact becomes callable"""
+        return self._waiting[0][0] if self._waiting else None
+
+    async def step(self) -> int:
+        """One scheduling pass; returns the number of calls dispatched"""
+        now = self.clock()
+        self._collect_results()
+        self._retry_stale(now)
+        self._refill()
+        self._promote(now)
+        if not self._ready:
+            return 0
+
+        free = await self.capacity.available(len(self.in_flight))
+        budget = self._take_tokens(now, min(free, len(self._ready)))
+        picked = [heapq.heappop(self._ready) for _ in range(min(budget, len(self._ready)))]
+        if not picked:
+            return 0
+
+        rows = self._db.execute(
+            f"SELECT id, phone, tz, priority, metadata, attempts FROM contacts WHERE id IN ({','.join('?' * len(picked))})",
+            [contact_id for _, _, contact_id in picked],
+        ).fetchall()
+        calls, deferred = [], []
+        for contact_id, phone, tz, priority, metadata, attempts in rows:
+            if self.window.is_open(now, tz):
+                calls.append((contact_id, phone, metadata, attempts + 1))
+            else:
+                # became callable but waited past the end of its window for a free slot
+                deferred.append((self.window.next_allowed(now, tz), contact_id, priority))
+        with self._db:
+            self._db.executemany(
+                "UPDATE contacts SET state = 'dispatched', attempts = ? WHERE id = ?",
+                [(attempt, contact_id) for contact_id, _, _, attempt in calls],
+            )
+            self._db.executemany("UPDATE contacts SET ready_at = ? WHERE id = ?", [(r, i) for r, i, _ in deferred])
+        for ready_at, contact_id, priority in deferred:
+            self._enqueue(ready_at, contact_id, priority)
+        self.stats.deferred += len(deferred)
+
+        for contact_id, _, _, attempt in calls:
+            self.in_flight[contact_id] = (now, attempt)
+        results = await asyncio.gather(*(self._dispatch(*call) for call in calls), return_exceptions=True)
+        for (contact_id, *_), result in zip(calls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"dispatch for contact {contact_id} failed: {result}")
+                self.stats.dispatch_errors += 1
+                self.complete(contact_id, CallOutcome.RETRY)
+        dispatched = len(calls) - sum(isinstance(result, Exception) for result in results)
+        self.stats.dispatched += dispatched
+        return dispatched
+
+    async def _dispatch(self, contact_id: int, phone: str, metadata: str | None, attempt: int) -> None:
+        dial_info = json.loads(metadata) if metadata else {}
+        dial_info.update(phone_number=phone, contact_id=contact_id, attempt=attempt)
+        if self.campaign:
+            dial_info["campaign"] = self.campaign
+        await self.lk_api.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(
+                agent_name=self.agent_name,
+                room=f"call-{contact_id}-{attempt}",
+                metadata=json.dumps(dial_info),
+            )
+        )
+
+    def complete_dial(self, contact_id: int, result: DialResult) -> None:
+        """Record a call that ended at the dialling stage, retrying when its SIP failure class says to"""
+        if result.answered:
+            self.complete(contact_id, CallOutcome.ANSWERED)
+        elif result.retry_after is None:
+            self.complete(contact_id, CallOutcome.FAILED)
+        else:
+            self.complete(contact_id, CallOutcome.RETRY, retry_after=result.retry_after)
+
+    def complete(self, contact_id: int, outcome: CallOutcome | str, *, retry_after: float | None = None) -> None:
+        """Record the result of a dispatched call
+
+        A retry waits `retry_after` seconds when given, otherwise `retry_backoff`.
+        """
+        outcome = CallOutcome(outcome)
+        self.in_flight.pop(contact_id, None)
+        row = self._db.execute("SELECT tz, priority, attempts FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+        if row is None:
+            return
+        tz, priority, attempts = row
+        if outcome == CallOutcome.RETRY and attempts >= self.max_attempts:
+            outcome = CallOutcome.FAILED
+
+        if outcome == CallOutcome.RETRY:
+            delay = self.retry_backoff(attempts) if retry_after is None else retry_after
+            ready_at = self.window.next_allowed(self.clock() + delay, tz)
+            with self._db:
+                self._db.execute("UPDATE contacts SET state = 'pending', ready_at = ? WHERE id = ?", (ready_at, contact_id))
+            self._enqueue(ready_at, contact_id, priority)
+            self.stats.retried += 1
+        else:
+            with self._db:
+                self._db.execute("UPDATE contacts SET state = ? WHERE id = ?", (outcome.value, contact_id))
+            if outcome == CallOutcome.ANSWERED:
+                self.stats.answered += 1
+            else:
+                self.stats.failed += 1
+
+    def _collect_results(self) -> None:
+        rows = self._results.execute("SELECT contact_id, attempt, outcome, retry_after FROM call_results").fetchall()
+        if not rows:
+            return
+        for contact_id, attempt, outcome, retry_after in rows:
+            # a result for an attempt already timed out and redialled is stale
+            if self.in_flight.get(contact_id, (None, None))[1] == attempt:
+                self.complete(contact_id, outcome, retry_after=retry_after)
+        with self._results:
+            self._results.executemany(
+                "DELETE FROM call_results WHERE contact_id = ? AND attempt = ?", [row[:2] for row in rows]
+            )
+
+    def _retry_stale(self, now: float) -> None:
+        stale = [contact_id for contact_id, (at, _) in self.in_flight.items() if now - at > self.call_timeout]
+        for contact_id in stale:
+            logger.warning(f"no result for contact {contact_id} after {self.call_timeout:.0f}s, retrying")
+            self.complete(contact_id, CallOutcome.RETRY)
+
+    def pending(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM contacts WHERE state = 'pending'").fetchone()[0]
+
+    async def run(self, *, tick: float = 0.2) -> None:
+        """Dispatch until cancelled"""
+        while True:
+            dispatched = await self.step()
+            if dispatched or self._ready:
+                await asyncio.sleep(tick)
+                continue
+            # nothing callable: sleep until the next contact's window opens (rechecking now and then)
+            wakeup = self.next_wakeup()
+            delay = tick if wakeup is None else min(max(wakeup - self.clock(), tick), 60.0)
+            await asyncio.sleep(delay)
@@ -0,0 +1,41 @@
+"""
+The clock the agents' timing code reads
+
+How long a teardown step, a tool or a transfer took, how long a transfer
+has been ringing, when a call started and how long it lasted: anything timed
+around awaits is read from here rather than from time.perf_counter() or
+time.time(). In production these are the same clocks. Under a
+VirtualTimeLoop (virtual_time.py), which the harness, replays and benchmarks
+run calls on, they follow the loop's clock instead, so they agree with the
+asyncio.sleep()s and wait_for()s around them: a 45-second ring timeout
+measures 45 seconds, and takes none.
+
+CPU time spent inside one call (VAD batches, audio pool lag, prewarm) is
+still measured with time.perf_counter(), which is what it means.
+"""
+from __future__ import annotations
+
+import asyncio
+import time as _time
+
+from virtual_time import VirtualTimeLoop
+
+
+def _virtual_loop() -> VirtualTimeLoop | None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:  # not on an event loop's thread
+        return None
+    return loop if isinstance(loop, VirtualTimeLoop) else None
+
+
+def monotonic() -> float:
+    """For durations and deadlines: time.perf_counter(), or the virtual loop's time"""
+    loop = _virtual_loop()
+    return loop.time() if loop is not None else _time.perf_counter()
+
+
+def time() -> float:
+    """Seconds since the epoch: time.time(), or moved on by the virtual time that has passed"""
+    loop = _virtual_loop()
+    return loop.wall_time() if loop is not None else _time.time()
@@ -13,6 +13,11 @@ vapi_env_path = parent_dir / "vapi.env"
 # Load environment variables from parent directory's vapi.env file
 load_dotenv(vapi_env_path)
 
+# Models downloaded at build time (`python interview_agent.py download-files`, the
+# turn detectors') are kept with the project, where the workers look for them (endpointing.py)
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", str(parent_dir / "models"))
+os.environ.setdefault("HF_HUB_CACHE", MODEL_CACHE_DIR)
+
 # LiveKit Configuration
 LIVEKIT_URL = os.getenv("LIVEKIT_URL")
 LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
@@ -0,0 +1,303 @@
+"""
+When a caller's turn is over: VAD, the turn detector, and the caller's pace
+
+AgentSession ends a turn in two steps: the VAD hears `min_silence_duration`
+of silence, then the session waits out its endpointing delay, the short one
+(`min_endpointing_delay`) if the turn detector thinks the caller is done and
+the long one (`max_endpointing_delay`) if not. Those delays are fixed when
+the session is built, and LiveKit's defaults (0.5s after 0.55s of VAD
+silence, up to 6s) are tuned for wideband, unhurried speech. On a phone call
+they are most of the time between the caller stopping and the agent
+answering.
+
+Both agents build their sessions with `call_endpointing()` instead, which
+gives the session:
+
+- a VAD that hands over after `vad_silence` (ENDPOINTING_VAD_SILENCE, 0.3s)
+- an `Endpointing` as its turn detector, with the session's own delays at 0
+
+Endpointing asks the turn detector (when its files have been downloaded,
+see register_turn_detector) how likely it is that the caller is done, then
+waits out the rest of the turn's delay itself, measured from when the VAD
+heard the caller stop:
+
+- `max_delay` (ENDPOINTING_MAX_DELAY, 1.5s) if the detector thinks they're
+  mid-sentence
+- `min_delay` (ENDPOINTING_MIN_DELAY, 0.2s) if it thinks they're done, or
+  `vad_delay` (ENDPOINTING_VAD_DELAY, 0.5s) without a detector to ask
+
+and adjusts both of the short ones to the caller (ENDPOINTING_ADAPTIVE=0
+turns that off):
+
+- by their pace: a caller speaking slower than `reference_pace` words per
+  second gets proportionally longer (at most twice), a faster one a little
+  shorter
+- by their pauses: once a caller has paused mid-turn, a turn isn't ended on
+  silence alone before their usual (75th percentile) pause is over
+
+A pause is the caller starting again while their turn was still being
+decided; starting again within `cutoff_window` of a turn being ended counts
+as a pause too, and as a suspected cut-off in the call's EndpointingStats.
+
+Both turn detectors' files are downloaded at build time (`download-files`,
+which install.py runs) into MODEL_CACHE_DIR, see config.py, so a worker
+never fetches them on a call; without them, turns end on the VAD and the
+caller's pace. The model runs once per worker, in the inference process
+LiveKit starts for it, and every call shares it. That process only loads
+the models registered before the worker starts, which is why the agents
+call register_turn_detector() at import.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import os
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import cache
+
+import clock
+import config  # noqa: F401 - points the model cache (HF_HUB_CACHE) at MODEL_CACHE_DIR
+from batched_vad import BatchedVAD
+from call_state import ring
+
+logger = logging.getLogger("endpointing")
+
+# turn detector model -> the module that registers its inference runner, and its class
+_MODELS = {
+    "en": ("livekit.plugins.turn_detector.english", "EnglishModel"),
+    "multilingual": ("livekit.plugins.turn_detector.multilingual", "MultilingualModel"),
+}
+_registered: set[str] = set()
+
+
+@dataclass(frozen=True)
+class EndpointingConfig:
+    vad_silence: float = 0.3  # silence before the VAD hands the turn over
+    min_delay: float = 0.2  # then: the detector thinks the caller is done
+    vad_delay: float = 0.5  # no detector to ask
+    max_delay: float = 1.5  # the detector thinks they're mid-sentence
+    reference_pace: float = 2.5  # words per second the short delays are tuned for
+    adaptive: bool = True  # adjust the short delays to each caller's pace and pauses
+    cutoff_window: float = 1.0  # caller speaking again this soon after their turn ended: it was cut off
+    pause_margin: float = 0.1  # waited past a caller's usual pause
+
+    @classmethod
+    def from_env(cls) -> EndpointingConfig:
+        default = cls()
+        number = lambda name, value: float(os.getenv(f"ENDPOINTING_{name}", value))  # noqa: E731
+        return cls(
+            vad_silence=number("VAD_SILENCE", default.vad_silence),
+            min_delay=number("MIN_DELAY", default.min_delay),
+            vad_delay=number("VAD_DELAY", default.vad_delay),
+            max_delay=number("MAX_DELAY", default.max_delay),
+            reference_pace=number("REFERENCE_PACE", default.reference_pace),
+            adaptive=os.getenv("ENDPOINTING_ADAPTIVE", "1") == "1",
+        )
+
+
+@cache
+def turn_detector_ready(model_type: str = "multilingual") -> bool:
+    """Whether a turn detector model's files are in the model cache (see MODEL_CACHE_DIR in config.py)"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        from livekit.plugins.turn_detector.models import HG_MODEL, MODEL_REVISIONS, ONNX_FILENAME
+    except ImportError:
+        return False
+    revision = MODEL_REVISIONS[model_type]
+    files = (f"onnx/{ONNX_FILENAME}", "languages.json", "tokenizer.json")
+    ready = all(isinstance(try_to_load_from_cache(HG_MODEL, name, revision=revision), str) for name in files)
+    if not ready:
+        logger.warning(f"{model_type} turn detector not in the model cache, run `download-files`; ending turns on VAD alone")
+    return ready
+
+
+def register_turn_detector(model_type: str) -> bool:
+    """Have the worker's inference process load a turn detector, if it's been downloaded
+
+    Call at import, before the worker starts; returns whether calls will have it.
+    """
+    if not turn_detector_ready(model_type):
+        return False
+    importlib.import_module(_MODELS[model_type][0])
+    _registered.add(model_type)
+    return True
+
+
+def turn_model(model_type: str):
+    """A registered turn detector for one call (the model itself is loaded once per worker), or None"""
+    if model_type not in _registered:
+        return None
+    module, name = _MODELS[model_type]
+    return getattr(importlib.import_module(module), name)()
+
+
+@dataclass(slots=True)
+class EndpointingStats:
+    """Turn endings, for one call or (ENDPOINTING_METRICS) every call in the worker"""
+
+    turns: int = 0
+    detected: int = 0  # turns the turn detector was asked about
+    pauses: int = 0  # the caller carried on after a pause
+    cutoffs: int = 0  # of those, after their turn had been ended
+    delays: deque[float] = field(default_factory=ring)  # latest turns: the VAD's silence plus ours
+
+    def merge(self, other: EndpointingStats) -> None:
+        self.turns += other.turns
+        self.detected += other.detected
+        self.pauses += other.pauses
+        self.cutoffs += other.cutoffs
+        self.delays += other.delays
+
+    def delay(self, q: float) -> float:
+        if not self.delays:
+            return 0.0
+        ordered = sorted(self.delays)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"endpointing: {self.turns} turns ({self.detected} by the turn detector), delay p50 {self.delay(0.5) * 1000:.0f}ms "
+            f"p95 {self.delay(0.95) * 1000:.0f}ms, {self.pauses} mid-turn pauses, {self.cutoffs} suspected cut-offs"
+        )
+
+
+# every call in the worker adds its stats here when it ends
+ENDPOINTING_METRICS = EndpointingStats()
+
+
+class Endpointing:
+    """One call's turn detector: the shared model's verdict, and a delay fitted to the caller
+
+    Pass it to AgentSession as `turn_detection`, with session_options() and
+    vad(); attach_session() lets it follow the caller's pace and pauses.
+    """
+
+    __slots__ = (
+        "model", "language", "config", "stats", "_pauses", "_words", "_speaking",
+        "_speaking_at", "_listening_at", "_deciding", "_ended_at",
+    )
+
+    def __init__(self, model=None, *, language: Callable[[], str | None] = lambda: None, config: EndpointingConfig | None = None):
+        self.model = model
+        self.language = language
+        self.config = config or EndpointingConfig()
+        self.stats = EndpointingStats()
+        self._pauses: deque[float] = deque(maxlen=20)
+        self._words = 0
+        self._speaking = 0.0  # seconds, the VAD's trailing silence taken off
+        self._speaking_at: float | None = None
+        self._listening_at: float | None = None  # the VAD heard the caller stop
+        self._deciding = False
+        self._ended_at: float | None = None
+
+    @property
+    def vad_silence(self) -> float:
+        return self.config.vad_silence
+
+    def vad(self) -> BatchedVAD:
+        """The call's VAD, handing over after vad_silence"""
+        return BatchedVAD.load(min_silence_duration=self.config.vad_silence)
+
+    def session_options(self) -> dict:
+        """AgentSession's own delays are off: predict_end_of_turn() waits out ours"""
+        return {"turn_detection": self, "min_endpointing_delay": 0.0, "max_endpointing_delay": 0.0}
+
+    def attach_session(self, session) -> None:
+        session.on("user_state_changed", self._on_user_state)
+        session.on("user_input_transcribed", self._on_transcript)
+
+    # what the session asks its turn detector
+
+    def supports_language(self, language: str | None) -> bool:
+        return True  # without the model's support it's VAD and pace alone
+
+    def unlikely_threshold(self, language: str | None) -> float | None:
+        return None  # the session's delays are 0 either way
+
+    async def predict_end_of_turn(self, chat_ctx) -> float:
+        self._deciding = True
+        stopped = self._listening_at if self._listening_at is not None else clock.monotonic()
+        try:
+            probability, delay, detected = await self._decide(chat_ctx)
+            await asyncio.sleep(max(stopped + delay - clock.monotonic(), 0.0))
+        finally:
+            self._deciding = False
+        self._ended_at = clock.monotonic()
+        self.stats.turns += 1
+        self.stats.detected += detected
+        self.stats.delays.append(self.config.vad_silence + delay)
+        return probability
+
+    async def _decide(self, chat_ctx) -> tuple[float, float, bool]:
+        """The detector's probability that the turn is over, the delay it calls for, and whether it was asked"""
+        language = self.language()
+        threshold = None
+        if self.model is not None and self.model.supports_language(language):
+            threshold = self.model.unlikely_threshold(language)
+        if threshold is None:
+            return 1.0, self.delay(None, None), False
+        try:
+            probability = await self.model.predict_end_of_turn(chat_ctx)
+        except Exception:
+            logger.exception("turn detector failed, ending the turn on VAD")
+            return 1.0, self.delay(None, None), False
+        return probability, self.delay(probability, threshold), True
+
+    def delay(self, probability: float | None, threshold: float | None) -> float:
+        """Silence to wait after the VAD's before ending the turn"""
+        config = self.config
+        if probability is not None and probability < threshold:
+            return config.max_delay
+        delay = config.vad_delay if probability is None else config.min_delay
+        if config.adaptive:
+            delay *= self.pace_factor()
+            if probability is None and self._pauses:
+                # on silence alone, wait out the caller's usual pause; the detector hears a pause for what it is
+                usual = sorted(self._pauses)[min(int(len(self._pauses) * 0.75), len(self._pauses) - 1)]
+                delay = max(delay, usual - config.vad_silence + config.pause_margin)
+        return min(delay, config.max_delay)
+
+    def pace(self) -> float | None:
+        """The caller's words per second of speech, once there's enough to go on"""
+        if self._words < 6 or self._speaking < 1.0:
+            return None
+        return self._words / self._speaking
+
+    def pace_factor(self) -> float:
+        pace = self.pace()
+        if pace is None:
+            return 1.0
+        return min(max(self.config.reference_pace / pace, 0.8), 2.0)
+
+    def _on_user_state(self, ev) -> None:
+        now = clock.monotonic()
+        if ev.new_state == "speaking":
+            self._speaking_at = now
+            if self._listening_at is not None:
+                paused = now - self._listening_at + self.config.vad_silence
+                cut_off = not self._deciding and self._ended_at is not None and now - self._ended_at <= self.config.cutoff_window
+                if self._deciding or cut_off:
+                    self._pauses.append(paused)
+                    self.stats.pauses += 1
+                    self.stats.cutoffs += cut_off
+            self._ended_at = None
+        elif ev.old_state == "speaking" and self._speaking_at is not None:
+            self._listening_at = now
+            self._speaking += max(now - self._speaking_at - self.config.vad_silence, 0.0)
+            self._speaking_at = None
+
+    def _on_transcript(self, ev) -> None:
+        if ev.is_final:
+            self._words += len(ev.transcript.split())
+
+    def log_summary(self) -> None:
+        self.stats.log_summary()
+        ENDPOINTING_METRICS.merge(self.stats)
+
+
+def call_endpointing(model_type: str, *, language: Callable[[], str | None] = lambda: None) -> Endpointing:
+    """A call's endpointing, with the registered turn detector of `model_type` when there is one"""
+    return Endpointing(turn_model(model_type), language=language, config=EndpointingConfig.from_env())
@@ -0,0 +1,703 @@
+"""
+In-process stand-in for the LiveKit server API, for tests and load harnesses
+
+FakeLiveKitAPI has the same shape as `api.LiveKitAPI` for the calls the
+campaign tooling makes (`agent_dispatch.create_dispatch`, `room.list_rooms`,
+`room.delete_room`, `sip.create_sip_participant`). Behind it sits a simulated
+pool of agent workers: each dispatch takes a call slot for `call_seconds`, or
+queues for a free slot when every worker is busy (as a real agent job would
+wait), and finishes with an outcome from `outcomes`. `on_call_finished(metadata, outcome)` is called as
+each simulated call ends.
+
+SIP dialling is scripted: `sip_script(request)` returns the SIP status the
+call ends with (200 for answered), and failures are raised the way the real
+API does for `wait_until_answered=True`, as TwirpErrors carrying
+`sip_status_code` / `sip_status` metadata. With `trunk_capacity`, a trunk
+also answers 503 while it carries that many answered calls, as a carrier
+enforces its concurrent-call limit from the INVITE on; a call's leg ends when
+its room is deleted.
+
+For end-to-end runs (see call_harness.py) the rooms the agents join are
+FakeRooms, from `create_room`, or `inbound_call` for a caller already on the
+line. A dial into one of them adds a SIP participant that goes through the
+`sip.callStatus` values a real leg does: dialing, ringing, then active, or
+hangup with `sip.errorCode` set. Once answered it sends the CallerAudio it was
+scripted with. `sip_script` can return a SipCall instead of a bare status, for
+ring times, caller audio and callers hanging up. `transfer_sip_participant`
+and `remove_participant` end a leg the way a REFER or a kick does. With
+`job_runner`, each dispatch runs a job (the agent's entrypoint) instead of a
+timed placeholder. Every API call can be given a round trip (`api_latency`).
+
+Once FakeWorkers have registered, dispatches go to them instead of the
+simulated pool, the way the server places jobs: offered to the available
+workers, least loaded first, until one accepts, and retried while none does.
+A FakeWorker runs a WorkerOptions' `load_fnc`, `request_fnc`,
+`load_threshold` and `drain_timeout`, and `sigterm()` drains and stops it
+as LiveKit's CLI does.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from livekit import api, rtc
+from livekit.agents import JobRequest
+from livekit.protocol import agent as agent_protocol
+from livekit.protocol import models
+
+import clock
+from bench_voicemail import SAMPLE_RATE, _beep, _silence, _speech, read_wav
+
+
+SIP_REASONS = {
+    200: "OK",
+    403: "Forbidden",
+    404: "Not Found",
+    408: "Request Timeout",
+    480: "Temporarily Unavailable",
+    486: "Busy Here",
+    487: "Request Terminated",
+    500: "Server Internal Error",
+    503: "Service Unavailable",
+    603: "Decline",
+}
+
+# sip.disconnectReason of a failed leg, for the statuses the stand-in sends
+DISCONNECT_REASONS = {486: "USER_REJECTED", 603: "USER_REJECTED", 408: "USER_UNAVAILABLE", 480: "USER_UNAVAILABLE"}
+
+
+class CallerAudio:
+    """What the far end of a call sends from the moment it answers, as 16-bit mono PCM
+
+    Scripted from ("speech", seconds[, words]), ("silence", seconds) and
+    ("beep", seconds) parts, shaped like the AMD benchmark's synthetic calls,
+    or read from a WAV file. Past its end the line is silent.
+    """
+
+    def __init__(self, pcm: np.ndarray, sample_rate: int):
+        self.pcm = pcm.astype(np.int16)
+        self.sample_rate = sample_rate
+        self._by_rate: dict[int, np.ndarray] = {sample_rate: self.pcm}
+
+    @classmethod
+    def script(cls, *parts: tuple, seed: int = 0) -> CallerAudio:
+        rng = np.random.default_rng(seed)
+        chunks = []
+        for kind, seconds, *words in parts:
+            if kind == "speech":
+                chunks.append(_speech(rng, seconds, words=words[0] if words else max(1, round(seconds * 2.5))))
+            elif kind == "silence":
+                chunks.append(_silence(rng, seconds))
+            elif kind == "beep":
+                chunks.append(_beep(seconds))
+            else:
+                raise ValueError(f"unknown caller audio part {kind!r}")
+        pcm = np.concatenate(chunks) if chunks else np.zeros(0)
+        return cls((pcm * 32767).clip(-32768, 32767), SAMPLE_RATE)
+
+    @classmethod
+    def from_wav(cls, path) -> CallerAudio:
+        return cls(*read_wav(path))
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / self.sample_rate
+
+    def at_rate(self, sample_rate: int) -> np.ndarray:
+        pcm = self._by_rate.get(sample_rate)
+        if pcm is None:
+            positions = np.arange(len(self.pcm) * sample_rate // self.sample_rate) * self.sample_rate / sample_rate
+            pcm = self._by_rate[sample_rate] = np.interp(positions, np.arange(len(self.pcm)), self.pcm).astype(np.int16)
+        return pcm
+
+    def frame(self, index: int, sample_rate: int, frame_ms: int = 20) -> rtc.AudioFrame:
+        samples = sample_rate * frame_ms // 1000
+        data = np.zeros(samples, dtype=np.int16)
+        pcm = self.at_rate(sample_rate)[index * samples : (index + 1) * samples]
+        data[: len(pcm)] = pcm
+        return rtc.AudioFrame(data.tobytes(), sample_rate, 1, samples)
+
+
+@dataclass
+class SipCall:
+    """How a dialled number behaves, as `sip_script` can return it"""
+
+    status: int = 200  # final SIP status, 200 for answered
+    setup: float = 0.0  # seconds in "dialing" before the far end rings
+    ring: float = 0.0  # seconds ringing before it answers or fails
+    audio: CallerAudio | None = None  # what the callee says once answered
+    hangup_after: float | None = None  # the callee hangs up this long after answering
+
+
+class FakeParticipant:
+    """A remote participant in a FakeRoom; SIP legs carry sip.* attributes and caller audio"""
+
+    def __init__(self, identity: str, *, attributes: dict[str, str] | None = None, audio: CallerAudio | None = None):
+        self.identity = identity
+        self.sid = f"PA_{identity}"
+        self.name = identity
+        self.kind = rtc.ParticipantKind.PARTICIPANT_KIND_SIP
+        self.attributes = attributes or {}
+        self.audio = audio
+        self.track_publications: dict = {}
+        self.invited_at: float | None = asyncio.get_running_loop().time()
+        self.answered_at: float | None = None  # loop time the caller's audio starts from
+        self.left_at: float | None = None
+        self._answered = asyncio.Event()  # also set on leaving, so nobody waits for a leg that's gone
+
+    def _answer(self) -> None:
+        self.answered_at = asyncio.get_running_loop().time()
+        self._answered.set()
+
+    def _leave(self) -> None:
+        self.left_at = asyncio.get_running_loop().time()
+        self._answered.set()
+
+
+class CallerAudioStream:
+    """A FakeParticipant's audio from the moment the stream is opened, paced as it would arrive
+
+    Stands in for `rtc.AudioStream.from_participant`. Frames before the call
+    is answered, or before the stream was opened, are never heard, as on a
+    real call. All state is kept on the stream, so cancelling a read loses nothing.
+    """
+
+    def __init__(self, participant: FakeParticipant, sample_rate: int, frame_ms: int = 20):
+        self.participant = participant
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self._index: int | None = None
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> rtc.AudioFrameEvent:
+        participant = self.participant
+        await participant._answered.wait()
+        if self._closed or participant.left_at is not None or participant.answered_at is None:
+            raise StopAsyncIteration
+        loop = asyncio.get_running_loop()
+        step = self.frame_ms / 1000
+        if self._index is None:
+            self._index = int((loop.time() - participant.answered_at) / step)
+        # a frame arrives once all of it has been spoken
+        await asyncio.sleep(max(participant.answered_at + (self._index + 1) * step - loop.time(), 0.0))
+        if self._closed or participant.left_at is not None:
+            raise StopAsyncIteration
+        self._index += 1
+        if participant.audio is None:
+            samples = self.sample_rate * self.frame_ms // 1000
+            return rtc.AudioFrameEvent(rtc.AudioFrame.create(self.sample_rate, 1, samples))
+        return rtc.AudioFrameEvent(participant.audio.frame(self._index - 1, self.sample_rate, self.frame_ms))
+
+    async def aclose(self) -> None:
+        self._closed = True
+
+
+@contextlib.contextmanager
+def fake_audio_streams():
+    """Route `rtc.AudioStream.from_participant` to CallerAudioStream for FakeParticipants"""
+    original = rtc.AudioStream.from_participant
+
+    def from_participant(*, participant, sample_rate: int = 48000, **kwargs):
+        if isinstance(participant, FakeParticipant):
+            return CallerAudioStream(participant, sample_rate)
+        return original(participant=participant, sample_rate=sample_rate, **kwargs)
+
+    with mock.patch.object(rtc.AudioStream, "from_participant", from_participant):
+        yield
+
+
+class FakeRoom(rtc.EventEmitter):
+    """The parts of `rtc.Room` a job uses; FakeLiveKitAPI adds and removes its participants"""
+
+    def __init__(self, name: str, metadata: str = ""):
+        super().__init__()
+        self.name = name
+        self.sid = f"RM_{name}"
+        self.metadata = metadata
+        self.creation_time = clock.time()
+        self.remote_participants: dict[str, FakeParticipant] = {}
+        self.local_participant = SimpleNamespace(identity="agent", sid="PA_agent", attributes={})
+        self.connected = False
+        self.closed = False
+
+    def isconnected(self) -> bool:
+        return self.connected
+
+    def _join(self, participant: FakeParticipant) -> None:
+        self.remote_participants[participant.identity] = participant
+        self.emit("participant_connected", participant)
+
+    def _set_attributes(self, participant: FakeParticipant, changed: dict[str, str]) -> None:
+        participant.attributes.update(changed)
+        self.emit("participant_attributes_changed", changed, participant)
+
+    def _leave(self, participant: FakeParticipant) -> None:
+        if self.remote_participants.pop(participant.identity, None) is participant:
+            participant._leave()
+            self.emit("participant_disconnected", participant)
+
+    def _close(self) -> None:
+        for participant in list(self.remote_participants.values()):
+            self._leave(participant)
+        self.connected = False
+        self.closed = True
+        self.emit("disconnected", "room deleted")
+
+
+@dataclass
+class FakeServerStats:
+    dispatches: int = 0
+    queued: int = 0  # dispatches that had to wait for a free worker
+    max_queue_seconds: float = 0.0
+    peak_calls: int = 0
+    finished: dict[str, int] = field(default_factory=dict)
+    sip_calls: dict[str, dict[int, int]] = field(default_factory=dict)  # trunk -> SIP status -> count
+    peak_trunk_calls: dict[str, int] = field(default_factory=dict)
+    transfers: list[str] = field(default_factory=list)  # transfer_to of each transfer_sip_participant
+    placed: dict[str, int] = field(default_factory=dict)  # FakeWorker name -> jobs it took
+    refused: int = 0  # job offers a FakeWorker turned down
+
+
+class _AgentDispatchService:
+    def __init__(self, server: FakeLiveKitAPI):
+        self._server = server
+
+    async def create_dispatch(self, req: api.CreateAgentDispatchRequest) -> api.AgentDispatch:
+        await self._server._rtt()
+        return self._server._dispatch(req)
+
+
+class _RoomService:
+    def __init__(self, server: FakeLiveKitAPI):
+        self._server = server
+
+    async def list_rooms(self, req: api.ListRoomsRequest) -> api.ListRoomsResponse:
+        await self._server._rtt()
+        names = [name for name in self._server.rooms if not req.names or name in req.names]
+        return api.ListRoomsResponse(rooms=[api.Room(name=name) for name in names])
+
+    async def delete_room(self, req: api.DeleteRoomRequest) -> api.DeleteRoomResponse:
+        await self._server._rtt()
+        self._server.rooms.pop(req.room, None)
+        self._server._hang_up(req.room)
+        room = self._server.live_rooms.pop(req.room, None)
+        if room is not None:
+            room._close()
+        return api.DeleteRoomResponse()
+
+    async def remove_participant(self, req: api.RoomParticipantIdentity) -> api.RemoveParticipantResponse:
+        await self._server._rtt()
+        room = self._server.live_rooms.get(req.room)
+        participant = room.remote_participants.get(req.identity) if room is not None else None
+        if participant is None and (req.room, req.identity) not in self._server._ringing:
+            raise api.TwirpError("not_found", "participant not found", status=404)
+        self._server._release(req.room, req.identity)
+        if participant is not None:
+            room._leave(participant)
+        return api.RemoveParticipantResponse()
+
+
+class _SipService:
+    def __init__(self, server: FakeLiveKitAPI):
+        self._server = server
+
+    async def create_sip_participant(self, req: api.CreateSIPParticipantRequest, **kwargs) -> api.SIPParticipantInfo:
+        await self._server._rtt()
+        return await self._server._dial(req)
+
+    async def transfer_sip_participant(self, req: api.TransferSIPParticipantRequest, **kwargs) -> None:
+        await self._server._rtt()
+        await self._server._transfer(req)
+
+
+class FakeLiveKitAPI:
+    def __init__(
+        self,
+        *,
+        workers: int = 2,
+        slots_per_worker: int = 4,
+        call_seconds: float | tuple[float, float] = 0.05,
+        outcomes: dict[str, float] | None = None,
+        on_call_finished=None,
+        sip_script=None,
+        trunk_capacity: dict[str, int] | None = None,
+        transfer_script=None,
+        transfer_seconds: float = 0.0,
+        job_runner=None,
+        api_latency: float = 0.0,
+        seed: int = 0,
+    ):
+        self.capacity = workers * slots_per_worker
+        self.call_seconds = call_seconds
+        self.outcomes = outcomes or {"answered": 1.0}
+        self.on_call_finished = on_call_finished
+        self.stats = FakeServerStats()
+        self.rooms: dict[str, str] = {}  # room name -> dispatch metadata
+        self.live_rooms: dict[str, FakeRoom] = {}  # rooms a job has joined
+        self.agent_dispatch = _AgentDispatchService(self)
+        self.room = _RoomService(self)
+        self.sip = _SipService(self)
+        self.sip_script = sip_script or (lambda req: 200)
+        self.trunk_capacity = trunk_capacity or {}
+        self.trunk_calls: dict[str, int] = {}  # legs per trunk, from INVITE to hangup
+        self.transfer_script = transfer_script or (lambda req: 200)
+        self.transfer_seconds = transfer_seconds
+        # async (server, room name, metadata) -> outcome, run for each dispatch in place of call_seconds
+        self.job_runner = job_runner
+        self.api_latency = api_latency
+        self._legs: dict[str, dict[str, str]] = {}  # room -> participant identity -> trunk
+        self._ringing: dict[tuple[str, str], asyncio.Task] = {}  # (room, identity) -> leg not answered yet
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._active = 0
+        self._ids = itertools.count(1)
+        self._rng = random.Random(seed)
+        self._tasks: set[asyncio.Task] = set()
+        self.agent_workers: list[FakeWorker] = []
+
+    def create_room(self, name: str, metadata: str = "") -> FakeRoom:
+        room = self.live_rooms.get(name)
+        if room is None:
+            room = self.live_rooms[name] = FakeRoom(name, metadata)
+            self.rooms.setdefault(name, metadata)
+        return room
+
+    def inbound_call(self, room_name: str, call: SipCall, *, identity: str = "sip_caller", trunk: str = "ST_inbound") -> FakeParticipant:
+        """A caller already on the line in a new room, as a dispatch rule hands it to the agent"""
+        room = self.create_room(room_name)
+        participant = FakeParticipant(
+            identity,
+            attributes={"sip.callStatus": "active", "sip.callID": f"SCL_{next(self._ids)}", "sip.trunkID": trunk},
+            audio=call.audio,
+        )
+        participant.invited_at = None  # nobody dialled it
+        self._take_leg(room_name, identity, trunk)
+        room._join(participant)
+        participant._answer()
+        if call.hangup_after is not None:
+            self._track(asyncio.create_task(self._caller_hangs_up(room, participant, call.hangup_after)))
+        return participant
+
+    async def _rtt(self) -> None:
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _dispatch(self, req: api.CreateAgentDispatchRequest) -> api.AgentDispatch:
+        self.stats.dispatches += 1
+        self.rooms[req.room] = req.metadata
+        self._track(asyncio.create_task(self._run_call(req.room, req.metadata)))
+        return api.AgentDispatch(id=f"AD_{next(self._ids)}", agent_name=req.agent_name, room=req.room, metadata=req.metadata)
+
+    async def _dial(self, req: api.CreateSIPParticipantRequest) -> api.SIPParticipantInfo:
+        trunk = req.sip_trunk_id
+        script = self.sip_script(req)
+        call = script if isinstance(script, SipCall) else SipCall(status=script)
+        full = self.trunk_calls.get(trunk, 0) >= self.trunk_capacity.get(trunk, float("inf"))
+        if full:
+            call = SipCall(status=503)
+        else:
+            self._take_leg(req.room_name, req.participant_identity, trunk)
+        per_trunk = self.stats.sip_calls.setdefault(trunk, {})
+        per_trunk[call.status] = per_trunk.get(call.status, 0) + 1
+
+        room = self.live_rooms.get(req.room_name)
+        participant = None
+        if room is not None:
+            participant = FakeParticipant(
+                req.participant_identity,
+                attributes={
+                    "sip.callStatus": "dialing",
+                    "sip.callID": f"SCL_{next(self._ids)}",
+                    "sip.trunkID": trunk,
+                    "sip.phoneNumber": req.sip_call_to,
+                },
+                audio=call.audio,
+            )
+            room._join(participant)
+        leg = self._track(asyncio.create_task(self._ring(req, call, room, participant, refused=full)))
+        self._ringing[(req.room_name, req.participant_identity)] = leg
+
+        if req.wait_until_answered:
+            # giving up on the request doesn't stop the phone ringing, only removing the participant does
+            status = await asyncio.shield(leg)
+            if status >= 300:
+                raise api.TwirpError(
+                    "unavailable" if status >= 500 else "not_found" if status == 404 else "failed_precondition",
+                    f"sip call failed: {SIP_REASONS.get(status, 'error')}",
+                    status=503 if status >= 500 else 400,
+                    metadata={"sip_status_code": str(status), "sip_status": SIP_REASONS.get(status, "")},
+                )
+        return api.SIPParticipantInfo(
+            participant_id=participant.sid if participant else f"PA_{next(self._ids)}",
+            participant_identity=req.participant_identity,
+            room_name=req.room_name,
+        )
+
+    async def _ring(self, req, call: SipCall, room: FakeRoom | None, participant: FakeParticipant | None, refused: bool) -> int:
+        key = (req.room_name, req.participant_identity)
+        try:
+            if not refused:  # a full trunk turns the INVITE away at once
+                await asyncio.sleep(call.setup)
+                if participant is not None:
+                    room._set_attributes(participant, {"sip.callStatus": "ringing"})
+                await asyncio.sleep(call.ring)
+        finally:
+            if self._ringing.get(key) is asyncio.current_task():
+                del self._ringing[key]
+        if call.status >= 300:
+            if not refused:
+                self._release(*key)
+            if participant is not None:
+                room._set_attributes(
+                    participant,
+                    {
+                        "sip.callStatus": "hangup",
+                        "sip.errorCode": str(call.status),
+                        "sip.disconnectReason": DISCONNECT_REASONS.get(call.status, "SIP_TRUNK_FAILURE"),
+                    },
+                )
+                room._leave(participant)
+            return call.status
+        if participant is not None:
+            participant._answer()
+            room._set_attributes(participant, {"sip.callStatus": "active"})
+            if call.hangup_after is not None:
+                self._track(asyncio.create_task(self._caller_hangs_up(room, participant, call.hangup_after)))
+        return call.status
+
+    async def _caller_hangs_up(self, room: FakeRoom, participant: FakeParticipant, after: float) -> None:
+        await asyncio.sleep(after)
+        if room.remote_participants.get(participant.identity) is participant:
+            room._set_attributes(participant, {"sip.callStatus": "hangup", "sip.disconnectReason": "CLIENT_INITIATED"})
+            self._release(room.name, participant.identity)
+            room._leave(participant)
+
+    async def _transfer(self, req: api.TransferSIPParticipantRequest) -> None:
+        self.stats.transfers.append(req.transfer_to)
+        await asyncio.sleep(self.transfer_seconds)
+        room = self.live_rooms.get(req.room_name)
+        participant = room.remote_participants.get(req.participant_identity) if room is not None else None
+        if participant is None:
+            raise api.TwirpError("not_found", "participant not found", status=404)
+        status = self.transfer_script(req)
+        if status >= 300:
+            raise api.TwirpError(
+                "unavailable",
+                f"transfer failed: {SIP_REASONS.get(status, 'error')}",
+                status=503,
+                metadata={"sip_status_code": str(status), "sip_status": SIP_REASONS.get(status, "")},
+            )
+        # the REFER was accepted: the carrier bridges the caller elsewhere and the leg leaves the room
+        room._set_attributes(participant, {"sip.callStatus": "hangup", "sip.disconnectReason": "CLIENT_INITIATED"})
+        self._release(req.room_name, req.participant_identity)
+        room._leave(participant)
+
+    def _take_leg(self, room: str, identity: str, trunk: str) -> None:
+        self.trunk_calls[trunk] = self.trunk_calls.get(trunk, 0) + 1
+        self.stats.peak_trunk_calls[trunk] = max(self.stats.peak_trunk_calls.get(trunk, 0), self.trunk_calls[trunk])
+        self._legs.setdefault(room, {})[identity] = trunk
+
+    def _release(self, room: str, identity: str) -> None:
+        ringing = self._ringing.pop((room, identity), None)
+        if ringing is not None and ringing is not asyncio.current_task():
+            ringing.cancel()
+        trunk = self._legs.get(room, {}).pop(identity, None)
+        if trunk is not None:
+            self.trunk_calls[trunk] -= 1
+
+    def _hang_up(self, room: str) -> None:
+        for identity in list(self._legs.get(room, ())):
+            self._release(room, identity)
+        self._legs.pop(room, None)
+
+    async def _run_call(self, room: str, metadata: str) -> None:
+        if self.agent_workers:
+            outcome = await self._run_on_worker(room, metadata)
+        else:
+            outcome = await self._run_in_slot(room, metadata)
+        self.stats.finished[outcome] = self.stats.finished.get(outcome, 0) + 1
+        self.rooms.pop(room, None)
+        if self.on_call_finished is not None:
+            self.on_call_finished(json.loads(metadata) if metadata else {}, outcome)
+
+    async def _run_in_slot(self, room: str, metadata: str) -> str:
+        loop = asyncio.get_running_loop()
+        if self._slots.locked():
+            self.stats.queued += 1
+        waited = loop.time()
+        async with self._slots:
+            self.stats.max_queue_seconds = max(self.stats.max_queue_seconds, loop.time() - waited)
+            self._active += 1
+            self.stats.peak_calls = max(self.stats.peak_calls, self._active)
+            try:
+                if self.job_runner is not None:
+                    return await self.job_runner(self, room, metadata)
+                seconds = self.call_seconds
+                if isinstance(seconds, tuple):
+                    seconds = self._rng.uniform(*seconds)
+                await asyncio.sleep(seconds)
+                return self._rng.choices(list(self.outcomes), weights=list(self.outcomes.values()))[0]
+            finally:
+                self._active -= 1
+
+    async def _run_on_worker(self, room: str, metadata: str) -> str:
+        """Offer the job to the available workers, least loaded first, until one takes it"""
+        loop = asyncio.get_running_loop()
+        waited = loop.time()
+        while True:
+            for worker in sorted((worker for worker in self.agent_workers if worker.available), key=lambda worker: worker.load):
+                job = await worker.offer(room, metadata)
+                if job is None:
+                    self.stats.refused += 1
+                    continue
+                self.stats.placed[worker.name] = self.stats.placed.get(worker.name, 0) + 1
+                self.stats.max_queue_seconds = max(self.stats.max_queue_seconds, loop.time() - waited)
+                self._active += 1
+                self.stats.peak_calls = max(self.stats.peak_calls, self._active)
+                try:
+                    await asyncio.wait({job.task})
+                finally:
+                    self._active -= 1
+                # a job the worker closed ends like one whose room was deleted
+                return "closed" if job.task.cancelled() else job.task.result()
+            if loop.time() == waited:
+                self.stats.queued += 1
+            await asyncio.sleep(UPDATE_LOAD_INTERVAL)
+
+    async def aclose(self) -> None:
+        for worker in list(self.agent_workers):
+            await worker.aclose()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# how often a worker reports its load and status, as livekit.agents.worker does
+UPDATE_LOAD_INTERVAL = 0.5
+
+
+class _FakeJobExecutor:
+    """A FakeWorker's running job, with the parts of a JobExecutor a drain uses"""
+
+    def __init__(self, job: agent_protocol.Job, task: asyncio.Task):
+        self.job = job
+        self.task = task
+
+    @property
+    def running_job(self):
+        return None if self.task.done() else SimpleNamespace(job=self.job)
+
+    async def join(self) -> None:
+        await asyncio.wait({self.task})
+
+    async def aclose(self) -> None:
+        self.task.cancel()
+        await asyncio.wait({self.task})
+
+
+class FakeWorker:
+    """An agent worker registered with a FakeLiveKitAPI, taking the dispatches it's offered
+
+    Has the parts of livekit's Worker that a load_fnc and a drain use
+    (`active_jobs`, `drain()`, `_proc_pool.processes`); each accepted job runs
+    `job_runner(server, room, metadata)`, as FakeLiveKitAPI's own does.
+    """
+
+    def __init__(
+        self,
+        server: FakeLiveKitAPI,
+        *,
+        job_runner,
+        name: str = "worker",
+        load_fnc=None,
+        request_fnc=None,
+        load_threshold: float = 0.75,
+        drain_timeout: int = 1800,
+    ):
+        self.server = server
+        self.job_runner = job_runner
+        self.name = name
+        self.load_fnc = load_fnc or (lambda worker: 0.0)
+        self.request_fnc = request_fnc or (lambda job_request: job_request.accept())
+        self.load_threshold = load_threshold
+        self.drain_timeout = drain_timeout
+        self.load = 0.0
+        self.available = True  # as the server last heard
+        self.closed = False
+        self._draining = False
+        self._proc_pool = SimpleNamespace(processes=[])
+        self._ids = itertools.count(1)
+        server.agent_workers.append(self)
+        self._load_task = asyncio.create_task(self._report_load())
+
+    @property
+    def active_jobs(self) -> list:
+        return [proc.running_job for proc in self._proc_pool.processes if proc.running_job]
+
+    async def offer(self, room: str, metadata: str) -> _FakeJobExecutor | None:
+        """The server's availability request: the job, if request_fnc accepted it"""
+        job = agent_protocol.Job(id=f"AJ_{self.name}_{next(self._ids)}", room=models.Room(name=room), metadata=metadata)
+        answer = asyncio.get_running_loop().create_future()
+
+        async def on_accept(args):
+            answer.set_result(args)
+
+        async def on_reject():
+            answer.set_result(None)
+
+        await self.request_fnc(JobRequest(job=job, on_reject=on_reject, on_accept=on_accept))
+        if not answer.done() or answer.result() is None:
+            return None
+        proc = _FakeJobExecutor(job, asyncio.create_task(self.job_runner(self.server, room, metadata)))
+        self._proc_pool.processes.append(proc)
+        proc.task.add_done_callback(lambda _: self._proc_pool.processes.remove(proc))
+        return proc
+
+    async def _update_worker_status(self) -> None:
+        self.available = not self._draining and self.load < self.load_threshold
+
+    async def _report_load(self) -> None:
+        while True:
+            self.load = self.load_fnc(self)
+            await self._update_worker_status()
+            await asyncio.sleep(UPDATE_LOAD_INTERVAL)
+
+    async def drain(self, timeout: int | None = None) -> None:
+        """Worker.drain(): reported full, then its jobs are waited for (raises TimeoutError after `timeout`)"""
+        if self._draining:
+            return
+        self._draining = True
+        await self._update_worker_status()
+        joins = asyncio.gather(*(proc.join() for proc in list(self._proc_pool.processes)))
+        if timeout:
+            await asyncio.wait_for(joins, timeout)
+        else:
+            await joins
+
+    async def sigterm(self) -> None:
+        """What LiveKit's CLI does on SIGTERM in `start` mode: drain, then close"""
+        await self.drain(timeout=self.drain_timeout)
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.available = False
+        self._load_task.cancel()
+        self.server.agent_workers.remove(self)
+        await asyncio.gather(*(proc.aclose() for proc in list(self._proc_pool.processes)))
@@ -0,0 +1,235 @@
+"""
+A local stand-in for the parts of Twilio's REST API that twilio_provision.py uses
+
+FakeTwilioAPI serves, on 127.0.0.1, an account's incoming phone numbers, SIP
+credential lists, and Elastic SIP trunks with their origination URLs,
+credential lists and numbers, in Twilio's JSON shapes, so the `twilio`
+client runs against it unchanged (twilio_provision's TWILIO_API_URL or
+`local_http_client`). Each request can be given a round trip (`latency`);
+`requests` records them all, and `peak` the most in flight at once.
+
+    with FakeTwilioAPI(numbers=["+14155550100"]) as twilio:
+        client = twilio_client("AC...", "token", twilio.url)
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ACCOUNT = r"/api/2010-04-01/Accounts/(?P<account>AC\w+)"
+TRUNK = r"/trunking/v1/Trunks/(?P<trunk>TK\w+)"
+
+
+def sid(prefix: str) -> str:
+    return f"{prefix}{uuid.uuid4().hex}"
+
+
+class TwilioError(Exception):
+    def __init__(self, status: int, code: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class FakeTwilioAPI:
+    def __init__(self, numbers: list[str] = (), latency: float = 0.0):
+        self.latency = latency
+        self.numbers = {sid("PN"): {"phone_number": number, "trunk_sid": None} for number in numbers}
+        self.trunks: dict[str, dict] = {}
+        self.credential_lists: dict[str, dict] = {}
+        self.requests: list[tuple[str, str]] = []
+        self.peak = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._routes = [
+            ("GET", rf"{ACCOUNT}/IncomingPhoneNumbers\.json", self.list_numbers),
+            ("POST", rf"{ACCOUNT}/SIP/CredentialLists\.json", self.create_credential_list),
+            ("POST", rf"{ACCOUNT}/SIP/CredentialLists/(?P<list>CL\w+)/Credentials\.json", self.create_credential),
+            ("POST", r"/trunking/v1/Trunks", self.create_trunk),
+            ("GET", TRUNK, self.fetch_trunk),
+            ("DELETE", TRUNK, self.delete_trunk),
+            ("POST", rf"{TRUNK}/CredentialLists", self.attach_credential_list),
+            ("GET", rf"{TRUNK}/OriginationUrls", self.list_originations),
+            ("POST", rf"{TRUNK}/OriginationUrls", self.create_origination),
+            ("POST", rf"{TRUNK}/OriginationUrls/(?P<origination>OU\w+)", self.update_origination),
+            ("GET", rf"{TRUNK}/PhoneNumbers", self.list_trunk_numbers),
+            ("POST", rf"{TRUNK}/PhoneNumbers", self.attach_number),
+            ("DELETE", rf"{TRUNK}/PhoneNumbers/(?P<number>PN\w+)", self.detach_number),
+        ]
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def writes(self) -> list[tuple[str, str]]:
+        return [request for request in self.requests if request[0] != "GET"]
+
+    def __enter__(self) -> FakeTwilioAPI:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+                form.update({key: values[0] for key, values in parse_qs(parsed.query).items()})
+                status, body = fake.handle(self.command, parsed.path, form)
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, method: str, path: str, form: dict) -> tuple[int, dict | None]:
+        with self._lock:
+            self.requests.append((method, path))
+            self._in_flight += 1
+            self.peak = max(self.peak, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            with self._lock:
+                for route_method, pattern, handler in self._routes:
+                    match = re.fullmatch(pattern, path)
+                    if match and route_method == method:
+                        return handler(form, **match.groupdict())
+                raise TwilioError(404, 20404, f"The requested resource {path} was not found")
+        except TwilioError as e:
+            return e.status, {"code": e.code, "message": str(e), "status": e.status}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _trunk(self, trunk: str) -> dict:
+        if trunk not in self.trunks:
+            raise TwilioError(404, 20404, f"Trunk {trunk} was not found")
+        return self.trunks[trunk]
+
+    # the account
+
+    def list_numbers(self, form, account):
+        found = [
+            {"sid": number_sid, "account_sid": account, **number}
+            for number_sid, number in self.numbers.items()
+            if form.get("PhoneNumber") in (None, number["phone_number"])
+        ]
+        return 200, {"incoming_phone_numbers": found, "next_page_uri": None, "page": 0, "page_size": 50}
+
+    def create_credential_list(self, form, account):
+        list_sid = sid("CL")
+        self.credential_lists[list_sid] = {"friendly_name": form["FriendlyName"], "credentials": {}}
+        return 201, {"sid": list_sid, "account_sid": account, "friendly_name": form["FriendlyName"]}
+
+    def create_credential(self, form, account, list):
+        if list not in self.credential_lists:
+            raise TwilioError(404, 20404, f"CredentialList {list} was not found")
+        password = form["Password"]
+        if len(password) < 12 or password.isalpha() or password.lower() == password or password.upper() == password:
+            raise TwilioError(400, 21618, "Password needs 12 characters, mixed case and a digit")
+        credential_sid = sid("CR")
+        self.credential_lists[list]["credentials"][credential_sid] = {"username": form["Username"], "password": password}
+        return 201, {"sid": credential_sid, "credential_list_sid": list, "username": form["Username"]}
+
+    # trunks
+
+    def create_trunk(self, form):
+        domain = form["DomainName"]
+        if not domain.endswith(".pstn.twilio.com") or any(t["domain_name"] == domain for t in self.trunks.values()):
+            raise TwilioError(400, 21248, f"Domain {domain} is invalid or taken")
+        trunk_sid = sid("TK")
+        self.trunks[trunk_sid] = {
+            "friendly_name": form.get("FriendlyName"),
+            "domain_name": domain,
+            "origination_urls": {},
+            "credential_lists": [],
+            "phone_numbers": [],
+        }
+        return 201, self._trunk_json(trunk_sid)
+
+    def _trunk_json(self, trunk_sid):
+        trunk = self.trunks[trunk_sid]
+        return {"sid": trunk_sid, "friendly_name": trunk["friendly_name"], "domain_name": trunk["domain_name"]}
+
+    def fetch_trunk(self, form, trunk):
+        self._trunk(trunk)
+        return 200, self._trunk_json(trunk)
+
+    def delete_trunk(self, form, trunk):
+        for number_sid in self._trunk(trunk)["phone_numbers"]:
+            self.numbers[number_sid]["trunk_sid"] = None
+        del self.trunks[trunk]
+        return 204, None
+
+    def attach_credential_list(self, form, trunk):
+        credential_lists = self._trunk(trunk)["credential_lists"]
+        list_sid = form["CredentialListSid"]
+        if list_sid not in self.credential_lists or list_sid in credential_lists:
+            raise TwilioError(400, 21240, f"CredentialList {list_sid} can't be added")
+        credential_lists.append(list_sid)
+        return 201, {"sid": list_sid, "trunk_sid": trunk}
+
+    def list_originations(self, form, trunk):
+        originations = [{"sid": key, "trunk_sid": trunk, **value} for key, value in self._trunk(trunk)["origination_urls"].items()]
+        return 200, {"origination_urls": originations, "meta": {"key": "origination_urls", "next_page_url": None}}
+
+    def create_origination(self, form, trunk):
+        origination_sid = sid("OU")
+        self._trunk(trunk)["origination_urls"][origination_sid] = {"sip_url": form["SipUrl"], "friendly_name": form["FriendlyName"]}
+        return 201, {"sid": origination_sid, "trunk_sid": trunk, "sip_url": form["SipUrl"]}
+
+    def update_origination(self, form, trunk, origination):
+        originations = self._trunk(trunk)["origination_urls"]
+        if origination not in originations:
+            raise TwilioError(404, 20404, f"OriginationUrl {origination} was not found")
+        originations[origination]["sip_url"] = form["SipUrl"]
+        return 200, {"sid": origination, "trunk_sid": trunk, **originations[origination]}
+
+    def list_trunk_numbers(self, form, trunk):
+        numbers = [
+            {"sid": number_sid, "trunk_sid": trunk, "phone_number": self.numbers[number_sid]["phone_number"]}
+            for number_sid in self._trunk(trunk)["phone_numbers"]
+        ]
+        return 200, {"phone_numbers": numbers, "meta": {"key": "phone_numbers", "next_page_url": None}}
+
+    def attach_number(self, form, trunk):
+        numbers = self._trunk(trunk)["phone_numbers"]
+        number_sid = form["PhoneNumberSid"]
+        if number_sid not in self.numbers:
+            raise TwilioError(404, 20404, f"PhoneNumber {number_sid} was not found")
+        if self.numbers[number_sid]["trunk_sid"] is not None:
+            raise TwilioError(400, 21219, f"PhoneNumber {number_sid} is already on a trunk")
+        numbers.append(number_sid)
+        self.numbers[number_sid]["trunk_sid"] = trunk
+        return 201, {"sid": number_sid, "trunk_sid": trunk, "phone_number": self.numbers[number_sid]["phone_number"]}
+
+    def detach_number(self, form, trunk, number):
+        numbers = self._trunk(trunk)["phone_numbers"]
+        if number not in numbers:
+            raise TwilioError(404, 20404, f"PhoneNumber {number} isn't on trunk {trunk}")
+        numbers.remove(number)
+        self.numbers[number]["trunk_sid"] = None
+        return 204, None
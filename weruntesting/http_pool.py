@@ -0,0 +1,144 @@
+"""
+Per-call HTTP client pool for the OpenAI plugins
+
+By default every `openai.STT`, `openai.LLM` and `openai.TTS` builds its own
+`openai.AsyncClient` and `httpx.AsyncClient`, so each call pays for TCP and TLS
+setup three times, right on the first turn. This pool keeps one httpx client
+per upstream host for the call:
+
+- all of the call's plugins share one `openai.AsyncClient` per base URL
+- connections are opened ahead of time (`preconnect`) while the room connects and the phone rings
+- a background ping keeps idle connections from expiring between turns
+- connections per host are capped
+
+It doesn't outlive the call: a job process runs one call, and httpx clients
+belong to the event loop they were opened on (a thread executor's jobs each
+have their own). The call's lifecycle cancels the keep-alive and closes it.
+
+HTTP/2 is used when the `h2` package is installed (`pip install httpx[http2]`),
+otherwise the pool falls back to HTTP/1.1 keep-alive.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import os
+from urllib.parse import urlsplit
+
+import httpx
+import openai
+
+logger = logging.getLogger("http-pool")
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HTTPClientPool:
+    """One keep-alive httpx client per host, shared by every plugin in the call"""
+
+    def __init__(
+        self,
+        *,
+        max_connections_per_host: int = 20,
+        max_keepalive_per_host: int = 10,
+        keepalive_expiry: float = 120.0,
+        ping_interval: float = 25.0,
+        http2: bool = True,
+        verify=True,
+        timeout: httpx.Timeout | None = None,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.max_keepalive_per_host = max_keepalive_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.ping_interval = ping_interval
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.verify = verify
+        # same timeouts the openai plugins use for their own clients
+        self.timeout = timeout or httpx.Timeout(connect=15.0, read=5.0, write=5.0, pool=5.0)
+
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._openai_clients: dict[str, openai.AsyncClient] = {}
+        self._keepalive_task: asyncio.Task | None = None
+
+        if http2 and not HTTP2_AVAILABLE:
+            logger.info("h2 is not installed, using HTTP/1.1 keep-alive connections")
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """The shared httpx client for the host serving `url`"""
+        key = _host_key(url)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                verify=self.verify,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_keepalive_per_host,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._clients[key] = client
+        return client
+
+    def openai_client(self, base_url: str | None = None, api_key: str | None = None) -> openai.AsyncClient:
+        """An `openai.AsyncClient` on the shared connections, to pass as `client=` to the plugins"""
+        base_url = base_url or os.getenv("OPENAI_BASE_URL") or OPENAI_BASE_URL
+        client = self._openai_clients.get(base_url)
+        if client is None:
+            # the plugins retry through livekit's own connection options
+            client = openai.AsyncClient(
+                max_retries=0,
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.client(base_url),
+            )
+            self._openai_clients[base_url] = client
+        return client
+
+    async def preconnect(self, urls: list[str] | None = None, connections: int = 1) -> None:
+        """Open connections (TCP + TLS) to each host before the first turn needs them
+
+        With HTTP/1.1 every concurrent request needs its own connection, so ask for
+        as many as the first turn issues at once; with HTTP/2 one is enough.
+        """
+        urls = urls or [*self._openai_clients] or [OPENAI_BASE_URL]
+        per_host = 1 if self.http2 else connections
+        await asyncio.gather(
+            *(self._ping(url) for url in urls for _ in range(per_host)),
+        )
+
+    def start_keepalive(self) -> asyncio.Task:
+        """Ping every host periodically so idle connections stay open between turns; aclose() stops it"""
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop(), name="http_pool_keepalive")
+        return self._keepalive_task
+
+    async def aclose(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            await asyncio.gather(self._keepalive_task, return_exceptions=True)
+            self._keepalive_task = None
+        await asyncio.gather(*(client.aclose() for client in self._clients.values()))
+        self._clients.clear()
+        self._openai_clients.clear()
+
+    async def _keepalive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await asyncio.gather(*(self._ping(host) for host in list(self._clients)))
+
+    async def _ping(self, url: str) -> None:
+        # any response will do, the point is the open connection (the plugins' prewarm does the same)
+        try:
+            await self.client(url).get(_host_key(url) + "/")
+        except httpx.HTTPError as e:
+            logger.debug(f"keep-alive ping to {url} failed: {e}")
@@ -0,0 +1,214 @@
+"""
+Hot standby for inbound interview calls
+
+An inbound call through dispatch-rule.json rings while the worker finds a job
+executor for it. With no idle executor the caller waits for one to start and
+run prewarm, then for the entrypoint, then for the LLM and TTS to write and
+speak the greeting. Standby mode takes the slow parts off the ring:
+
+- the worker keeps K idle executors that have already run prewarm (VAD model
+  loaded, HTTP pool built, greeting ready), with K following the recent
+  arrival rate: enough to cover, 99% of the time, the calls that arrive while
+  a replacement executor warms up (a Poisson quantile of rate x warm-up time)
+- the inbound greeting is synthesized once per worker process and replayed
+  from memory, so the first words don't wait on the LLM and TTS
+
+AgentSession and the plugins' HTTP clients are bound to the job's event loop,
+which LiveKit only creates once a job is assigned, so those are still built
+in the entrypoint; they take milliseconds, the parts above take seconds.
+
+Each inbound call records its ring-to-greeting time (room creation to the
+agent starting to speak), split by whether it was served from standby.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import threading
+from collections import deque
+from functools import cache
+from statistics import NormalDist
+
+import clock
+from audio_cache import synthesize_frames
+from call_state import ring
+
+logger = logging.getLogger("inbound-standby")
+
+
+def poisson_quantile(mean: float, q: float) -> int:
+    """Smallest k with P(N <= k) >= q for N ~ Poisson(mean)"""
+    if mean <= 0:
+        return 0
+    if mean > 50:  # the normal approximation is close enough, and exp(-mean) underflows later on
+        return math.ceil(mean + NormalDist().inv_cdf(q) * math.sqrt(mean))
+    k, term = 0, math.exp(-mean)
+    total = term
+    while total < q:
+        k += 1
+        term *= mean / k
+        total += term
+    return k
+
+
+class StandbySizer:
+    """How many idle executors to keep, from recent arrivals and executor warm-up time
+
+    The arrival rate is the highest over a short and a long window, so
+    standby grows as soon as calls pick up and shrinks only once they've
+    stayed quiet.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_idle: int = 4,
+        min_idle: int = 1,
+        quantile: float = 0.99,
+        windows: tuple[float, ...] = (60.0, 600.0),
+        warmup: float = 2.0,
+        clock=clock.monotonic,
+    ):
+        self.max_idle = max_idle
+        self.min_idle = min_idle
+        self.quantile = quantile
+        self.windows = windows
+        self.warmup = warmup
+        self.clock = clock
+        self._arrivals: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def record_arrival(self) -> None:
+        with self._lock:
+            self._arrivals.append(self.clock())
+
+    def observe_warmup(self, seconds: float) -> None:
+        with self._lock:
+            self.warmup += 0.2 * (seconds - self.warmup)
+
+    def arrival_rate(self) -> float:
+        """Calls per second"""
+        now = self.clock()
+        with self._lock:
+            while self._arrivals and self._arrivals[0] < now - max(self.windows):
+                self._arrivals.popleft()
+            arrivals = list(self._arrivals)
+        return max(sum(1 for at in arrivals if at >= now - window) / window for window in self.windows)
+
+    def target(self) -> int:
+        needed = poisson_quantile(self.arrival_rate() * self.warmup, self.quantile)
+        return min(max(needed, self.min_idle), self.max_idle)
+
+
+class StandbyLoad:
+    """`WorkerOptions.load_fnc` that also keeps the worker's idle executors at the sizer's target
+
+    The worker lowers its idle target on its own when it's loaded; the sizer's
+    target is applied on top, as a cap.
+    """
+
+    def __init__(self, sizer: StandbySizer, base=None):
+        from livekit.agents.worker import _DefaultLoadCalc
+
+        self.sizer = sizer
+        self.base = base or _DefaultLoadCalc.get_load
+        self._set_target = None
+        self._worker_target = sizer.max_idle
+
+    def __call__(self, worker) -> float:
+        # ProcPool has no public hook for the idle target, only the setter the worker itself uses
+        pool = worker._proc_pool
+        if self._set_target is None:
+            self._set_target = pool.set_target_idle_processes
+
+            def capped(num_idle: int) -> None:
+                self._worker_target = num_idle
+                self._set_target(min(num_idle, self.sizer.target()))
+
+            pool.set_target_idle_processes = capped
+        self._set_target(min(self._worker_target, self.sizer.target()))
+        return self.base(worker)
+
+
+_greetings: dict[str, tuple] = {}
+_greetings_lock = threading.Lock()
+
+
+def prepare_greeting(text: str, make_tts, *, timeout: float = 8.0) -> tuple | None:
+    """Synthesize `text` once per worker process, from prewarm
+
+    Prewarm runs before the executor has an event loop, so the TTS plugin is
+    built and closed inside a loop of its own. Returns None (and the call
+    falls back to a generated greeting) if synthesis fails.
+    """
+    with _greetings_lock:
+        if text in _greetings:
+            return _greetings[text]
+
+        async def synthesize():
+            tts = make_tts()
+            try:
+                return await asyncio.wait_for(synthesize_frames(tts, text), timeout)
+            finally:
+                await tts.aclose()
+
+        try:
+            frames = asyncio.run(synthesize())
+        except Exception as e:
+            logger.warning(f"couldn't pre-synthesize the greeting: {e}")
+            return None
+        _greetings[text] = frames
+        return frames
+
+
+def ring_time(room) -> float:
+    """When the inbound call's room was created, as a Unix timestamp (now if unknown)"""
+    if room.creation_time_ms:
+        return room.creation_time_ms / 1000
+    return float(room.creation_time) if room.creation_time else clock.time()
+
+
+class RingToGreeting:
+    def __init__(self):
+        # the latest calls' only: a worker takes calls for weeks
+        self.samples: dict[bool, deque[float]] = {True: ring(), False: ring()}
+
+    def observe(self, seconds: float, standby: bool) -> None:
+        self.samples[standby].append(seconds)
+
+    def track(self, session, ring_at: float, standby: bool) -> None:
+        """Record the time from `ring_at` until the session first starts speaking"""
+
+        def on_state(ev) -> None:
+            if ev.new_state == "speaking":
+                session.off("agent_state_changed", on_state)
+                seconds = clock.time() - ring_at
+                self.observe(seconds, standby)
+                logger.info(f"ring to greeting {seconds:.2f}s ({'standby' if standby else 'cold'})")
+
+        session.on("agent_state_changed", on_state)
+
+    def log_summary(self) -> None:
+        for standby, samples in self.samples.items():
+            if samples:
+                ordered = sorted(samples)
+                logger.info(
+                    f"ring to greeting, {'standby' if standby else 'cold'}: last {len(ordered)} calls, "
+                    f"p50 {ordered[len(ordered) // 2]:.2f}s, p95 {ordered[int(len(ordered) * 0.95)]:.2f}s"
+                )
+
+
+# every call in the worker records into the same samples
+RING_TO_GREETING = RingToGreeting()
+
+
+def standby_enabled() -> bool:
+    return os.getenv("INBOUND_STANDBY", "0") == "1"
+
+
+@cache
+def shared_sizer() -> StandbySizer:
+    """The worker's sizer, capped at INBOUND_STANDBY_MAX idle executors (default 4)"""
+    return StandbySizer(max_idle=int(os.getenv("INBOUND_STANDBY_MAX", "4")))
@@ -42,6 +42,21 @@ def install_requirements():
         return False
 
 
+def download_models():
+    """Download the models the agents load (turn detector, VAD) into the local model cache"""
+    print("\n🔄 Downloading models...")
+    
+    success, output = run_command(f"{sys.executable} interview_agent.py download-files")
+    
+    if success:
+        print("✅ Models downloaded to the local model cache")
+        return True
+    else:
+        print(f"❌ Model download failed: {output}")
+        print("💡 The agents will end turns on VAD alone until they're downloaded")
+        return False
+
+
 def check_env_file():
     """Check if .env file exists in parent directory"""
     parent_env = os.path.join("..", ".env")
@@ -79,6 +94,9 @@ def main():
         print("\n❌ Installation failed. Please check error messages above.")
         return
     
+    # Download models now so calls never wait on them
+    models_ok = download_models()
+    
     # Check environment file
     env_ok = check_env_file()
     
@@ -88,6 +106,7 @@ def main():
     print("="*50)
     print(f"Python Version: {'✅ OK' if python_ok else '❌ FAILED'}")
     print(f"Dependencies: {'✅ OK' if install_ok else '❌ FAILED'}")
+    print(f"Models: {'✅ OK' if models_ok else '⚠️  NOT DOWNLOADED'}")
     print(f"Environment File: {'✅ OK' if env_ok else '⚠️  MISSING'}")
     
     if python_ok and install_ok:
@@ -5,15 +5,39 @@ Includes Voice Activity Detection for proper streaming support
 """
 import config  # Import our configuration
 import asyncio
+import json
+import os
+import time
+
+import clock
+from answer_cache import CallAnswers, answer_cache_enabled, make_embedder, shared_answer_cache
+from audio_cache import play_frames
+from audio_conditioning import TELEPHONY_SAMPLE_RATE, condition_session_audio, log_stats
+from batched_vad import shared_batcher
+from call_costs import PIPELINE_PRICING, CallUsage, shared_ledger
+from call_lifecycle import CallLifecycle, TeardownStage
+from call_state import CandidateContext, HistoryWindow, JobContext
+from endpointing import call_endpointing, register_turn_detector
+from http_pool import HTTPClientPool
+from inbound_standby import RING_TO_GREETING, StandbyLoad, prepare_greeting, ring_time, shared_sizer, standby_enabled
+from languages import LANGUAGES, CallLanguage, language_for_call, prewarmed_languages
+from call_load import LoopLagMonitor, NoiseCancellationGuard, log_load
+from phone_numbers import InvalidPhoneNumber, normalize, shared_dnc
+from sip_retry import classify_attributes, dial_with_retries, shared_engine
+from worker_node import WorkerNode
 
 from livekit import agents, rtc, api
 from livekit.agents import AgentSession, Agent, RoomInputOptions
-from livekit.plugins import openai, noise_cancellation, silero
-# Removed turn detector to avoid model download issues during testing
-# from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from livekit.agents.llm import StopResponse
+from livekit.plugins import openai, noise_cancellation
+from livekit.plugins import turn_detector  # noqa: F401 - so `download-files` fetches its models
+
+# Turns end on the multilingual turn detector, loaded once per worker when it's been downloaded (see install.py)
+register_turn_detector("multilingual")
 
-# Use one of your outbound trunk IDs from `lk sip outbound list`
-OUTBOUND_TRUNK_ID = "ST_rsrCgZSnhtxo"  # Replace with your preferred trunk ID
+# Use one of your outbound trunk IDs from `lk sip outbound list`, or list several
+# (ID:capacity:region, comma-separated) in SIP_OUTBOUND_TRUNK_IDS to spread calls over them
+OUTBOUND_TRUNK_ID = os.getenv("SIP_OUTBOUND_TRUNK_ID", "ST_rsrCgZSnhtxo")
 
 class InterviewAgent(Agent):
     """
@@ -21,15 +45,63 @@ class InterviewAgent(Agent):
     This replaces your current VAPI assistant
     """
     
-    def __init__(self, job_context=None, candidate_context=None):
+    def __init__(self, job_context=None, candidate_context=None, answers=None, language=None):
+        self.language = language or CallLanguage("en")
         # Create interview instructions based on job and candidate context
-        instructions = self.create_interview_instructions(job_context, candidate_context)
+        instructions = self.create_interview_instructions(job_context, candidate_context, self.language.code)
         super().__init__(instructions=instructions)
         
         self.job_context = job_context
         self.candidate_context = candidate_context
+        # Answers to candidates' questions about this job, shared by its calls (ANSWER_CACHE=1)
+        self.answers = answers
+        self.language.on_change(self.switch_language)
+        self._switching = None
+        self._answers_switching = None
+        # The conversation the model sees, bounded for long calls (CALL_HISTORY_ITEMS)
+        self.history = HistoryWindow(self)
+
+    def switch_language(self, code):
+        """
+        Carry on in the language detected from the candidate's first words
+        """
+        print(f"🌐 Continuing the interview in {code}")
+        instructions = self.create_interview_instructions(self.job_context, self.candidate_context, code)
+        self._switching = asyncio.create_task(self.update_instructions(instructions))
+        if self.answers is not None:
+            self._answers_switching = asyncio.create_task(self.use_answers(code))
+
+    async def use_answers(self, code):
+        # loading the job's answers reads SQLite, off the call's event loop
+        self.answers.job = await asyncio.to_thread(shared_answer_cache().for_job, self.job_context, code)
+
+    def stt_node(self, audio, model_settings):
+        # Transcripts carry the call's language as a code, and an "auto" call settles on one
+        return self.language.observe(Agent.default.stt_node(self, audio, model_settings))
+
+    async def on_user_turn_completed(self, turn_ctx, new_message):
+        """
+        Answer a question the model has already answered for this job from the cache
+        """
+        if self.answers is None:
+            return
+        cached = await self.answers.lookup(new_message.text_content or "")
+        if cached is None:
+            return
+        print(f"⚡ Answering from the cache: {cached.question!r}")
+        # Without a reply from the model the question isn't added to the conversation, so add it here
+        chat_ctx = self.chat_ctx.copy()
+        chat_ctx.items.append(new_message)
+        await self.update_chat_ctx(chat_ctx)
+        self.answers.say(cached)
+        raise StopResponse()
 
-    def create_interview_instructions(self, job_context, candidate_context):
+    def tts_node(self, text, model_settings):
+        # Keep the audio of answers that will be cached
+        audio = Agent.default.tts_node(self, text, model_settings)
+        return audio if self.answers is None else self.answers.capture(audio)
+
+    def create_interview_instructions(self, job_context, candidate_context, language="en"):
         """
         Create dynamic interview instructions based on job and candidate
         This mirrors your current prompt_service.py logic
@@ -57,10 +129,10 @@ Interview flow:
             job_instructions = f"""
 
 Job Details:
-- Position: {job_context.get('job_title', 'Software Developer')}
-- Company: {job_context.get('company_name', 'Our Company')}
-- Required Skills: {', '.join(job_context.get('requirements', []))}
-- Experience Level: {job_context.get('experience_level', 'Mid-level')}
+- Position: {job_context.job_title}
+- Company: {job_context.company_name}
+- Required Skills: {', '.join(job_context.requirements)}
+- Experience Level: {job_context.experience_level}
 
 Focus your questions on these job requirements and assess the candidate's fit.
 """
@@ -70,23 +142,22 @@ Focus your questions on these job requirements and assess the candidate's fit.
             candidate_instructions = f"""
 
 Candidate Information:
-- Name: {candidate_context.get('candidate_name', 'Candidate')}
-- Experience: {candidate_context.get('experience_years', 'Unknown')} years
-- Key Skills: {', '.join(candidate_context.get('relevant_skills', []))}
+- Name: {candidate_context.candidate_name}
+- Experience: {candidate_context.experience_years} years
+- Key Skills: {', '.join(candidate_context.relevant_skills)}
 
 Use this information to personalize your questions and dig deeper into their experience.
 """
             base_instructions += candidate_instructions
-            
+        
+        base_instructions += f"\n\nLanguage: {LANGUAGES[language].instructions}\n"
         return base_instructions
 
 
-async def entrypoint(ctx: agents.JobContext):
+def load_contexts():
     """
-    Main entrypoint for the interview agent using OpenAI models
-    This will be called when a phone call comes in (similar to VAPI webhook)
+    Job and candidate context for the next call
     """
-    
     # TODO: Get job and candidate context from your database
     # Similar to how you currently fetch from MongoDB in call_executor.py
     job_context = {
@@ -101,57 +172,201 @@ async def entrypoint(ctx: agents.JobContext):
         "experience_years": 3,
         "relevant_skills": ["Python", "API Development"]
     }
+    # Compact and interned: a worker's calls share the job's strings instead of a copy each
+    return JobContext.from_record(job_context), CandidateContext.from_record(candidate_context)
+
+
+def greeting_text(job_context, candidate_context, language="en"):
+    return LANGUAGES[language].greeting.format(
+        candidate_name=candidate_context.candidate_name,
+        company_name=job_context.company_name,
+        job_title=job_context.job_title,
+    )
+
+
+def call_metadata(metadata):
+    """
+    Dispatch metadata: the number to dial, or JSON like {"phone_number": "+91...", "language": "hi"}
+    """
+    metadata = (metadata or "").strip()
+    if metadata.startswith("{"):
+        return json.loads(metadata)
+    return {"phone_number": metadata} if metadata else {}
+
+
+def make_tts(client=None):
+    return openai.TTS(
+        model="tts-1", 
+        voice="nova",  # Similar to your current "Neha" voice
+        client=client
+    )
+
+
+def prewarm(proc: agents.JobProcess):
+    """
+    Runs once per job executor, before any call is assigned to it
+    """
+    started = time.perf_counter()
+    # Load the VAD model now; every call in this process shares its batched inference
+    shared_batcher()
+    
+    if standby_enabled():
+        # Inbound callers hear a greeting synthesized once per worker, in each of CALL_LANGUAGES,
+        # instead of waiting on the LLM and TTS
+        greetings = {}
+        for language in prewarmed_languages():
+            greeting = greeting_text(*load_contexts(), language)
+            greetings[language] = (greeting, prepare_greeting(greeting, make_tts))
+        proc.userdata["greetings"] = greetings
+        shared_sizer().observe_warmup(time.perf_counter() - started)
+    proc.userdata["warm_at"] = clock.time()
+
+
+async def entrypoint(ctx: agents.JobContext):
+    """
+    Main entrypoint for the interview agent using OpenAI models
+    This will be called when a phone call comes in (similar to VAPI webhook)
+    """
+    # The call has been ringing since its room was created; with standby this
+    # executor was ready before that
+    ring_at = ring_time(ctx.job.room)
+    standby = standby_enabled() and ctx.proc.userdata["warm_at"] <= ring_at
+    if standby_enabled():
+        shared_sizer().record_arrival()
+    
+    job_context, candidate_context = load_contexts()
+    
+    # Outbound calls carry the number to dial; the interview's language comes from the
+    # metadata too (CALL_LANGUAGE if it doesn't say), or is detected ("auto")
+    metadata = call_metadata(ctx.job.metadata)
+    phone_number = metadata.get("phone_number")
+    language = CallLanguage(language_for_call(metadata))
+    print(f"🌐 Interview language: {'auto-detect' if language.detecting else language.code}")
+    
+    # All three plugins share this call's connections instead of building their own. A job
+    # process runs one call, and httpx clients belong to one event loop, so the pool is per call
+    http_pool = HTTPClientPool()
+    openai_client = http_pool.openai_client()
+    
+    # Questions earlier candidates asked about this job are answered from the cache, which
+    # job processes share through SQLite; loading the job's answers stays off the event loop
+    answers = None
+    if answer_cache_enabled():
+        answers = CallAnswers(
+            await asyncio.to_thread(shared_answer_cache().for_job, job_context, language.code),
+            make_embedder(openai_client),
+            job_context=job_context,
+            candidate_context=candidate_context,
+        )
     
     # Create the interview agent
-    interview_agent = InterviewAgent(job_context, candidate_context)
+    interview_agent = InterviewAgent(job_context, candidate_context, answers, language)
+    
+    # Use OpenAI for STT (speech-to-text), in the call's language or detecting it
+    stt = openai.STT(
+        model="whisper-1",
+        language=language.code,
+        detect_language=language.detecting,
+        client=openai_client
+    )
+    language.attach_stt(stt)
+    
+    # Use OpenAI for LLM (conversation logic)
+    llm = openai.LLM(
+        model="gpt-4o-mini",
+        temperature=0.7,
+        client=openai_client
+    )
+    
+    # Use OpenAI for TTS (text-to-speech)
+    tts = make_tts(openai_client)
+    
+    # End turns on what was said as well as silence, in any of the call languages, after a
+    # delay fitted to how the candidate speaks
+    endpointing = call_endpointing("multilingual", language=lambda: language.code)
     
     # Create AgentSession with OpenAI components + VAD for streaming
     session = AgentSession(
-        # Use OpenAI for STT (speech-to-text)
-        stt=openai.STT(
-            model="whisper-1",
-            language="en"
-        ),
-        
-        # Use OpenAI for LLM (conversation logic)
-        llm=openai.LLM(
-            model="gpt-4o-mini",
-            temperature=0.7
-        ),
-        
-        # Use OpenAI for TTS (text-to-speech)
-        tts=openai.TTS(
-            model="tts-1", 
-            voice="nova"  # Similar to your current "Neha" voice
-        ),
+        stt=stt,
+        llm=llm,
+        tts=tts,
         
         # Add VAD for voice activity detection (fixes streaming STT)
-        vad=silero.VAD.load(),
-        
-        # Turn detection removed for testing - can be added back later
-        # turn_detection=MultilingualModel(),
+        # Silero, batched with the other calls in this process
+        vad=endpointing.vad(),
+        **endpointing.session_options(),
     )
     
+    # Everything above is released in order when the call ends or fails to connect
+    lifecycle = CallLifecycle()
+    lifecycle.attach_session(session)
+    lifecycle.attach_plugins(stt, llm, tts)
+    lifecycle.attach_room(ctx.api, ctx.room.name)
+    ctx.add_shutdown_callback(lifecycle.teardown)
+    
+    # Whisper seconds, gpt-4o-mini tokens and tts-1 characters, priced when the call ends
+    # and written to SQLite from a thread
+    usage = CallUsage(call_id=ctx.room.name, campaign=os.getenv("INTERVIEW_CAMPAIGN", "interview"))
+    session.on("metrics_collected", usage.on_metrics)
+    lifecycle.on_teardown(
+        TeardownStage.FLUSH, "call cost", lambda: asyncio.to_thread(lambda: shared_ledger().finish(usage, PIPELINE_PRICING))
+    )
+    endpointing.attach_session(session)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "endpointing", endpointing.log_summary)
+    interview_agent.history.attach_session(session)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "chat history", interview_agent.history.log_summary)
+    if answers is not None:
+        answers.attach_session(session)
+        lifecycle.on_teardown(TeardownStage.FLUSH, "answer cache", answers.log_summary)
+    
+    # Open the API connections while the room connects and the phone rings, not on the first turn
+    lifecycle.track_task(asyncio.create_task(http_pool.preconnect(connections=3)))
+    lifecycle.track_task(http_pool.start_keepalive())
+    # closed once the plugins using its connections are
+    lifecycle.on_teardown(TeardownStage.FLUSH, "http pool", http_pool.aclose)
+    
     # Connect to the room first
     await ctx.connect()
     
     # Check if this is an outbound call (has phone number in metadata)
-    phone_number = ctx.job.metadata
     if phone_number:
         print(f"📞 Making outbound call to: {phone_number}")
         
+        # Don't spend a SIP attempt on a number that can't or mustn't be called
+        try:
+            clean_phone_number = normalize(phone_number)
+        except InvalidPhoneNumber as e:
+            print(f"❌ Not dialling: {e}")
+            await lifecycle.teardown("invalid phone number")
+            return
+        if clean_phone_number in shared_dnc():
+            print(f"🚫 Not dialling {clean_phone_number}: on the do-not-call list")
+            await lifecycle.teardown("do not call")
+            return
+        
         # Create SIP participant for outbound call using correct API
         try:
-            clean_phone_number = phone_number.strip('\'"')
             user_identity = "phone_user"
             
-            await ctx.api.sip.create_sip_participant(api.CreateSIPParticipantRequest(
-                room_name=ctx.room.name,
-                sip_trunk_id=OUTBOUND_TRUNK_ID,
-                sip_call_to=clean_phone_number,
-                participant_identity=user_identity,
-            ))
-            print(f"✅ SIP participant creation initiated for {clean_phone_number}")
+            # Busy / no answer / invalid numbers end here; a full or failing trunk is
+            # retried straight away on the next healthiest one
+            dial = await dial_with_retries(
+                ctx.api,
+                api.CreateSIPParticipantRequest(
+                    room_name=ctx.room.name,
+                    sip_call_to=clean_phone_number,
+                    participant_identity=user_identity,
+                ),
+                await asyncio.to_thread(shared_engine, OUTBOUND_TRUNK_ID),
+                region=os.getenv("SIP_REGION"),
+            )
+            if not dial.answered:
+                retry = f"retry in {dial.retry_after:.0f}s" if dial.retry_after is not None else "not worth retrying"
+                print(f"❌ Call to {clean_phone_number} failed: {dial.outcome.value} on {dial.trunk_id or 'no free trunk'} ({retry})")
+                await lifecycle.teardown(f"sip {dial.outcome.value}")
+                return
+            print(f"✅ SIP participant answered on {dial.trunk_id} for {clean_phone_number}")
+            lifecycle.on_teardown(TeardownStage.FLUSH, "trunk lease", dial.lease.aclose)
             
             # Wait for participant to connect
             participant = await ctx.wait_for_participant(identity=user_identity)
@@ -177,11 +392,11 @@ async def entrypoint(ctx: agents.JobContext):
                     print("✅ Call connected successfully!")
                     break
                 elif call_status == "hangup":
-                    print(f"❌ Call hung up. Reason: {disconnect_reason}")
+                    print(f"❌ Call hung up ({classify_attributes(participant.attributes).value}). Reason: {disconnect_reason}")
                     print(f"🔍 Check Twilio console for call logs")
                     break
                 elif call_status == "failed":
-                    print(f"❌ Call failed. Error: {error_code}")
+                    print(f"❌ Call failed ({classify_attributes(participant.attributes).value}). Error: {error_code}")
                     print(f"🔍 Reason: {disconnect_reason}")
                     break
                 elif call_status == "automation":
@@ -203,7 +418,7 @@ async def entrypoint(ctx: agents.JobContext):
                 print("   - Phone number not associated with Twilio SIP trunk")
                 print("   - Twilio account permissions or balance issues") 
                 print("   - Network connectivity between LiveKit and Twilio")
-                print(f"   - Check Twilio console for trunk {OUTBOUND_TRUNK_ID}")
+                print(f"   - Check Twilio console for trunk {dial.trunk_id}")
             
             # Print all participant attributes for debugging
             print("🔍 All participant attributes:")
@@ -215,29 +430,58 @@ async def entrypoint(ctx: agents.JobContext):
             print(f"❌ Failed to create SIP participant: {e}")
             import traceback
             print(f"📊 Full error: {traceback.format_exc()}")
+            await lifecycle.teardown("sip participant failed")
             return
     else:
         print("📱 Inbound call - waiting for caller to connect")
     
     # Start the agent session
+    nc_options = noise_cancellation.BVCTelephony()
     await session.start(
         room=ctx.room,
         agent=interview_agent,
         room_input_options=RoomInputOptions(
+            # Keep the caller at telephony rate, the conditioning stage upsamples it
+            audio_sample_rate=TELEPHONY_SAMPLE_RATE,
             # Enhanced noise cancellation for phone calls
-            noise_cancellation=noise_cancellation.BVCTelephony(),
+            noise_cancellation=nc_options,
         ),
     )
     
+    # Upsample the caller's audio to 16kHz for Whisper and Silero, de-jittering it only if it arrives in bursts
+    conditioned = condition_session_audio(session, out_rate=16000)
+    # Noise cancellation is dropped for this call if its event loop can't keep up in real time
+    monitor = LoopLagMonitor()
+    load = monitor.register(ctx.room.name)
+    monitor.start()
+    nc_guard = NoiseCancellationGuard(conditioned.source, nc_options, monitor, load)
+    nc_guard.start()
+    lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "audio conditioning", conditioned.aclose)
+    lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "nc guard", nc_guard.aclose)
+    lifecycle.on_teardown(TeardownStage.CLOSE_MODELS, "loop lag monitor", monitor.aclose)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "audio stats", lambda: log_stats(conditioned.stats))
+    lifecycle.on_teardown(TeardownStage.FLUSH, "audio load", lambda: log_load(load, conditioned.stats))
+    
     # For outbound calls, wait a moment for the call to connect before greeting
     if phone_number:
         print("⏳ Waiting for call to connect...")
         await asyncio.sleep(3)  # Give time for call to connect
     
     # Start the interview with a greeting
-    greeting_message = f"Hello {candidate_context['candidate_name']}, and welcome to your interview with {job_context['company_name']}. I'm an AI interviewer and I'll be conducting your interview for the {job_context['job_title']} position today. This should take about 10-15 minutes. Are you ready to begin?"
+    greeting_message = greeting_text(job_context, candidate_context, language.code)
+    
+    if not phone_number:
+        RING_TO_GREETING.track(session, ring_at, standby)
+        lifecycle.on_teardown(TeardownStage.FLUSH, "ring to greeting", RING_TO_GREETING.log_summary)
     
-    await session.generate_reply(instructions=greeting_message)
+    # Replay the greeting prepared in prewarm when it's still the right one
+    cached_text, cached_frames = ctx.proc.userdata.get("greetings", {}).get(language.code, (None, None))
+    if not phone_number and cached_frames and cached_text == greeting_message:
+        print("⚡ Playing pre-synthesized greeting")
+        await session.say(greeting_message, audio=play_frames(cached_frames))
+    else:
+        await session.generate_reply(instructions=greeting_message)
+    usage.completed = True
 
 
 if __name__ == "__main__":
@@ -245,8 +489,28 @@ if __name__ == "__main__":
     Run the interview agent using OpenAI models
     This replaces your current run_vapi.py
     """
+    # Hot standby (INBOUND_STANDBY=1) keeps prewarmed executors idle for inbound calls,
+    # as many as the recent arrival rate needs
+    standby_options = {}
+    if standby_enabled():
+        standby_options = dict(num_idle_processes=shared_sizer().max_idle, load_fnc=StandbyLoad(shared_sizer()))
+    
+    # Region and capacity labels (WORKER_REGION, WORKER_CAPACITY), and on SIGTERM a drain
+    # that lets interviews finish (WORKER_DRAIN_TIMEOUT) before a redeploy stops the worker
+    node = WorkerNode(base=standby_options.pop("load_fnc", None))
+    
+    # Each call runs in its own process, so one crashing call can't take others down.
+    # INTERVIEW_JOB_THREADS=1 runs them as threads of one process instead, sharing the batched VAD
+    executor_type = agents.JobExecutorType.PROCESS
+    if os.getenv("INTERVIEW_JOB_THREADS", "0") == "1":
+        executor_type = agents.JobExecutorType.THREAD
+
     # Add agent_name for explicit dispatch (required for telephony)
-    agents.cli.run_app(agents.WorkerOptions(
+    node.run_app(agents.WorkerOptions(
         entrypoint_fnc=entrypoint,
-        agent_name="interview-agent"  # Required for SIP dispatch
+        prewarm_fnc=prewarm,
+        job_executor_type=executor_type,
+        agent_name="interview-agent",  # Required for SIP dispatch
+        **standby_options,
+        **node.options()
     )) 
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+The language an interview is held in
+
+Candidates speak Hindi or English (or both). Each call's language comes from
+its dispatch metadata (`{"phone_number": "+91...", "language": "hi"}`), or
+CALL_LANGUAGE for calls whose metadata doesn't say (inbound ones), and sets:
+
+- Whisper's language, so it neither guesses nor translates
+- the interviewer's instructions and greeting
+- which cached answers the call may use (answer_cache.py)
+
+`"language": "auto"` lets Whisper detect it from the candidate's first
+words instead: the greeting is in English, and the first final transcript
+long enough to go on (within `detect_for` seconds) settles the call's
+language (`detect_for` counts from when the session starts listening);
+Whisper is then pinned to it for the rest of the call.
+
+Turns end on the multilingual turn detector (livekit/turn-detector,
+v0.2.0-intl) when its files are in the model cache, see endpointing.py. It
+runs once per worker and every call and language shares it.
+
+Per worker, each language also has its greeting synthesized in prewarm (see
+inbound_standby.py), so a Hindi caller is greeted as fast as an English one.
+The OpenAI plugins themselves stay per call, over the worker's shared HTTP
+pool: a session listens to its plugins' `metrics_collected`, and a plugin
+shared between calls would bill every call for the others' usage.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+
+from livekit.agents import stt
+
+import clock
+
+logger = logging.getLogger("languages")
+
+AUTO = "auto"
+
+
+@dataclass(frozen=True, slots=True)
+class Language:
+    code: str  # ISO 639-1, as Whisper takes it and the turn detector's thresholds are keyed
+    name: str  # as Whisper reports a detected language
+    greeting: str  # formatted with the candidate's and job's details
+    instructions: str  # added to the interviewer's instructions
+
+
+LANGUAGES = {
+    "en": Language(
+        "en",
+        "english",
+        "Hello {candidate_name}, and welcome to your interview with {company_name}. I'm an AI interviewer and I'll be "
+        "conducting your interview for the {job_title} position today. This should take about 10-15 minutes. "
+        "Are you ready to begin?",
+        "Conduct the interview in English.",
+    ),
+    "hi": Language(
+        "hi",
+        "hindi",
+        "नमस्ते {candidate_name}, {company_name} के साथ आपके इंटरव्यू में आपका स्वागत है। मैं एक AI इंटरव्यूअर हूँ "
+        "और आज {job_title} पद के लिए आपका इंटरव्यू लूँगी। इसमें लगभग 10-15 मिनट लगेंगे। क्या आप शुरू करने के लिए तैयार हैं?",
+        "Conduct the interview in Hindi, written in Devanagari so it's spoken naturally. Candidates often mix Hindi and "
+        "English: keep technical terms in English, and follow the candidate if they switch to English.",
+    ),
+}
+_BY_NAME = {language.name: language.code for language in LANGUAGES.values()}
+# spoken Hindi and Urdu are close enough that Whisper often names Hindi speech Urdu
+_BY_NAME["urdu"] = "hi"
+
+
+def language_code(language: str | None) -> str | None:
+    """A supported language's code from a code or Whisper's name for it ("hindi"), else None"""
+    if not language:
+        return None
+    language = language.lower()
+    base = language.split("-")[0]  # hi-IN
+    return base if base in LANGUAGES else _BY_NAME.get(language)
+
+
+def default_language() -> str:
+    """CALL_LANGUAGE: the language of calls whose metadata doesn't set one (default en, or auto)"""
+    language = os.getenv("CALL_LANGUAGE", "en")
+    return language if language == AUTO else language_code(language) or "en"
+
+
+def prewarmed_languages() -> list[str]:
+    """CALL_LANGUAGES: the languages each worker prepares greetings for (default en,hi)"""
+    codes = [language_code(code.strip()) for code in os.getenv("CALL_LANGUAGES", "en,hi").split(",")]
+    return [code for code in dict.fromkeys(codes) if code]
+
+
+def language_for_call(metadata: dict) -> str:
+    """The call's language code, or AUTO, from its dispatch metadata"""
+    requested = metadata.get("language")
+    if not requested:
+        return default_language()
+    if requested == AUTO:
+        return AUTO
+    code = language_code(requested)
+    if code is None:
+        logger.warning(f"unsupported language {requested!r}, using {default_language()}")
+        return default_language()
+    return code
+
+
+class CallLanguage:
+    """The language of one call: fixed, or detected from what the candidate says first
+
+    Wraps the agent's stt_node. Whisper reports a language by name; the
+    events passed on carry its code, which is what the turn detector's
+    per-language thresholds are keyed by.
+    """
+
+    __slots__ = ("detecting", "code", "detect_for", "min_words", "_started", "_stt", "_on_change")
+
+    def __init__(self, language: str, *, detect_for: float = 10.0, min_words: int = 3, fallback: str = "en"):
+        self.detecting = language == AUTO
+        self.code = fallback if self.detecting else language
+        self.detect_for = detect_for
+        self.min_words = min_words
+        self._started: float | None = None
+        self._stt = None
+        self._on_change = []
+
+    @property
+    def language(self) -> Language:
+        return LANGUAGES[self.code]
+
+    def attach_stt(self, plugin) -> None:
+        """The call's STT, pinned to the language once it's detected"""
+        self._stt = plugin
+
+    def on_change(self, callback) -> None:
+        """callback(code), when detection settles on a language other than the fallback"""
+        self._on_change.append(callback)
+
+    async def observe(self, events: AsyncIterable):
+        if self._started is None:
+            self._started = clock.time()
+        async for ev in events:
+            if isinstance(ev, stt.SpeechEvent) and ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT and ev.alternatives:
+                heard = ev.alternatives[0]
+                code = language_code(heard.language)
+                if self.detecting:
+                    self._detect(code, heard.text)
+                heard.language = code or heard.language
+            yield ev
+
+    def _detect(self, code: str | None, text: str) -> None:
+        if code is not None and len(text.split()) >= self.min_words:
+            logger.info(f"call language detected: {code}")
+            self._settle(code)
+        elif clock.time() - self._started >= self.detect_for:
+            logger.info(f"no language detected in {self.detect_for:.0f}s, staying with {self.code}")
+            self._settle(self.code)
+
+    def _settle(self, code: str) -> None:
+        self.detecting = False
+        changed, self.code = code != self.code, code
+        if self._stt is not None:
+            self._stt.update_options(language=code)
+        if changed:
+            for callback in self._on_change:
+                callback(code)
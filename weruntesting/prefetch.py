@@ -0,0 +1,311 @@
+"""
+Speculative replies for the predictable turns of a confirmation call
+
+Most dental-confirmation calls go one of a few ways once the patient has
+heard the appointment time: they confirm it, want to move it, want to talk
+to someone at the office, or want to get off the phone. The agent's line for
+each of those is known before the patient finishes speaking, so there is no
+need to wait for the model to write it and speak it:
+
+- a lightweight intent classifier (weighted phrases, no model) runs on every
+  partial transcript while the patient speaks
+- once a live branch is confidently ahead, its line (filled in with the
+  call's details) is synthesized through the session's TTS in the background
+- when the turn ends and the final transcript classifies the same way, the
+  agent plays the ready audio straight away instead of asking the model;
+  anything else (a miss) is answered by the model as usual
+
+Which branches are live depends on what was last said: all four after the
+greeting, only "end" after a confirmation, none after the agent offered a
+transfer or asked for a new day (the model handles those, with its tools).
+Each call's hit rate, the syntheses it never played, and the latency saved per
+turn (the model's time to first audio, as its metrics report it, less any
+wait for the audio) are added to PREFETCH_METRICS for the worker.
+
+    prefetch = ResponsePrefetcher(name="Jayden", appointment_time="Tuesday at 10:00 AM")
+    prefetch.attach_session(session)  # needs a session with a TTS and streamed STT
+    session.on("user_input_transcribed", prefetch.on_transcript)
+    session.on("metrics_collected", prefetch.on_metrics)
+    ...
+    reply = await prefetch.take(new_message.text_content)  # in on_user_turn_completed
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from enum import Enum
+
+from livekit import rtc
+from livekit.agents.metrics import LLMMetrics, RealtimeModelMetrics
+
+import clock
+from audio_cache import play_frames, synthesize_frames
+from call_state import ring
+
+logger = logging.getLogger("prefetch")
+
+
+class Intent(str, Enum):
+    CONFIRM = "confirm"
+    RESCHEDULE = "reschedule"
+    TRANSFER = "transfer"
+    END = "end"
+    OTHER = "other"
+
+
+# phrase -> weight, matched as whole words in the normalized transcript
+INTENT_PHRASES: dict[Intent, dict[str, float]] = {
+    Intent.CONFIRM: {
+        "yes": 0.6, "yeah": 0.6, "yep": 0.6, "sure": 0.5, "correct": 0.7, "perfect": 0.5, "okay": 0.3, "great": 0.3,
+        "that works": 1.0, "works for me": 1.0, "sounds good": 1.0, "that's fine": 1.0, "i'll be there": 1.2,
+        "see you then": 1.0, "confirm": 1.0, "still good": 1.0,
+    },
+    Intent.RESCHEDULE: {
+        "reschedule": 1.5, "move it": 1.2, "different time": 1.2, "different day": 1.2, "another time": 1.0,
+        "another day": 1.0, "can't make it": 1.5, "cannot make it": 1.5, "won't make it": 1.2, "push it": 1.0,
+        "instead": 0.8, "change": 0.7, "later": 0.5, "earlier": 0.5, "doesn't work": 1.2, "not going to work": 1.2,
+        "can't come": 1.5, "cannot come": 1.5, "can't do": 1.2, "won't be able": 1.2, "need to change": 1.5,
+    },
+    Intent.TRANSFER: {
+        "transfer": 1.5, "real person": 1.5, "human": 1.2, "representative": 1.2, "front desk": 1.2,
+        "receptionist": 1.2, "operator": 1.0, "someone": 0.6, "talk to": 0.6, "speak to": 0.6, "speak with": 0.6,
+    },
+    Intent.END: {
+        "goodbye": 1.5, "bye": 1.2, "that's all": 1.2, "that's it": 1.0, "nothing else": 1.2, "no thanks": 1.0,
+        "no thank you": 1.0, "not interested": 1.2, "stop calling": 1.5, "thank you": 0.4, "thanks": 0.4,
+    },
+}
+# a goodbye ends the call, so END wins only without a hint of anything else, and this far ahead
+END_MARGIN = 0.5
+_NOT_WORDS = re.compile(r"[^a-z' ]+")
+
+
+def normalize(text: str) -> str:
+    """Lower case, straight apostrophes, words separated by single spaces (and padded with one)"""
+    text = _NOT_WORDS.sub(" ", text.lower().replace("’", "'"))
+    return f" {' '.join(text.split())} "
+
+
+def classify(text: str) -> tuple[Intent, float]:
+    """The likeliest intent of a (partial) transcript and a confidence between 0 and 1
+
+    Each intent scores the weights of its phrases found in the text; the
+    confidence is the winner's share of all the scores, scaled down while the
+    winner's own score is under 1 (a lone "yes" is 0.6, "yes that works" 1.0).
+    A confirm or reschedule cue (any but the fillers, "okay" and "great")
+    rules END out: "no thanks, I can't come Tuesday" wants a new day. END
+    short of END_MARGIN ahead is OTHER.
+    """
+    words = normalize(text)
+    scores = {
+        intent: sum(weight for phrase, weight in phrases.items() if f" {phrase} " in words)
+        for intent, phrases in INTENT_PHRASES.items()
+    }
+    cues = [
+        phrase for intent in (Intent.CONFIRM, Intent.RESCHEDULE)
+        for phrase, weight in INTENT_PHRASES[intent].items() if weight >= 0.5 and f" {phrase} " in words
+    ]
+    if cues:
+        del scores[Intent.END]
+    total = sum(scores.values())
+    if not total:
+        return Intent.OTHER, 0.0
+    intent = max(scores, key=scores.get)
+    if intent is Intent.END and scores[intent] - max(s for i, s in scores.items() if i is not intent) < END_MARGIN:
+        return Intent.OTHER, 0.0
+    return intent, scores[intent] / total * min(scores[intent], 1.0)
+
+
+@dataclass(frozen=True)
+class Branch:
+    text: str  # the agent's line, a template filled in with the call's details
+    then: tuple[Intent, ...] = ()  # branches that can follow it
+
+
+DENTAL_BRANCHES = {
+    Intent.CONFIRM: Branch(
+        "Great, you're all set for {appointment_time}. Is there anything else I can help you with?",
+        then=(Intent.END,),
+    ),
+    Intent.RESCHEDULE: Branch("No problem, let's find a time that works better. What day would suit you?"),
+    Intent.TRANSFER: Branch("Of course. Would you like me to transfer you to someone at the office now?"),
+    Intent.END: Branch("Thanks for your time, {name}. Have a great day, goodbye!"),
+}
+# live after the greeting, which asks whether the appointment still works
+OPENING = (Intent.CONFIRM, Intent.RESCHEDULE, Intent.TRANSFER, Intent.END)
+# live after a turn the model answered: whatever it said, a goodbye is still a goodbye
+AFTER_MODEL = (Intent.END,)
+# the model's time to first audio until its metrics say otherwise
+DEFAULT_MODEL_LATENCY = 0.8
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("PREFETCH_RESPONSES", "0") == "1"
+
+
+@dataclass(slots=True)
+class PrefetchStats:
+    """Prefetch outcomes, for one call or (PREFETCH_METRICS) every call in the worker"""
+
+    turns: int = 0
+    hits: int = 0
+    syntheses: int = 0
+    wasted: int = 0  # synthesized but never played
+    saved: deque[float] = field(default_factory=ring)  # latest hits: model time to first audio less the wait for ours
+    saved_seconds: float = 0.0  # over every hit
+    by_intent: Counter = field(default_factory=Counter)  # hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.turns if self.turns else 0.0
+
+    @property
+    def saved_per_turn(self) -> float:
+        return self.saved_seconds / self.turns if self.turns else 0.0
+
+    def merge(self, other: PrefetchStats) -> None:
+        self.turns += other.turns
+        self.hits += other.hits
+        self.syntheses += other.syntheses
+        self.wasted += other.wasted
+        self.saved += other.saved
+        self.saved_seconds += other.saved_seconds
+        self.by_intent.update(other.by_intent)
+
+    def log_summary(self) -> None:
+        logger.info(
+            f"prefetch: {self.hits}/{self.turns} turns hit ({self.hit_rate:.0%}), "
+            f"{self.saved_per_turn * 1000:.0f}ms saved per turn, {self.wasted}/{self.syntheses} syntheses unused"
+        )
+
+
+# every call in the worker adds its stats here when it ends
+PREFETCH_METRICS = PrefetchStats()
+
+
+@dataclass
+class PrefetchedReply:
+    intent: Intent
+    text: str
+    frames: tuple[rtc.AudioFrame, ...]
+
+
+class ResponsePrefetcher:
+    """One call's branches: synthesized from partial transcripts, handed over when the turn matches"""
+
+    def __init__(
+        self,
+        branches: dict[Intent, Branch] = DENTAL_BRANCHES,
+        *,
+        opening: tuple[Intent, ...] = OPENING,
+        after_model: tuple[Intent, ...] = AFTER_MODEL,
+        min_confidence: float = 0.5,
+        metrics: PrefetchStats = PREFETCH_METRICS,
+        **details: str,
+    ):
+        self.branches = branches
+        self.details = details
+        self.after_model = after_model
+        self.min_confidence = min_confidence
+        self.metrics = metrics
+        self.live = opening
+        self.stats = PrefetchStats()
+        self.model_latency = DEFAULT_MODEL_LATENCY
+        self._replies = 0
+        self._texts = {intent: branch.text.format(**details) for intent, branch in branches.items()}
+        self._audio: dict[Intent, asyncio.Task] = {}
+        self._played: set[Intent] = set()
+        self._session = None
+        self._closed = False
+
+    def attach_session(self, session) -> None:
+        """The session whose TTS synthesizes the branches and which plays them"""
+        self._session = session
+
+    @property
+    def session(self):
+        return self._session
+
+    def update(self, **details: str) -> None:
+        """The call's details changed (e.g. a reschedule): re-render the lines, dropping stale audio"""
+        self.details.update(details)
+        for intent, branch in self.branches.items():
+            text = branch.text.format(**self.details)
+            if text != self._texts[intent]:
+                self._texts[intent] = text
+                stale = self._audio.pop(intent, None)
+                if stale is not None:
+                    stale.cancel()
+
+    def on_transcript(self, ev) -> None:
+        """`user_input_transcribed` handler: start synthesizing the branch a partial transcript points at"""
+        if ev.is_final or self._closed or self._session is None or self._session.tts is None:
+            return
+        intent, confidence = classify(ev.transcript)
+        if intent in self.live and confidence >= self.min_confidence and intent not in self._audio:
+            self.stats.syntheses += 1
+            self._audio[intent] = asyncio.create_task(self._synthesize(intent), name=f"prefetch_{intent.value}")
+
+    def on_metrics(self, ev) -> None:
+        """`metrics_collected` handler: track the model's time to first audio, which a hit saves"""
+        m = ev.metrics
+        if isinstance(m, (RealtimeModelMetrics, LLMMetrics)) and m.ttft > 0:
+            self._replies += 1
+            self.model_latency = m.ttft if self._replies == 1 else 0.7 * self.model_latency + 0.3 * m.ttft
+
+    async def take(self, transcript: str) -> PrefetchedReply | None:
+        """At the end of a turn: the prefetched reply if the final transcript matches one, else None
+
+        Waits for audio still being synthesized for up to the model's latency,
+        beyond which the model would have been as quick.
+        """
+        self.stats.turns += 1
+        intent, confidence = classify(transcript)
+        live, self.live = self.live, self.after_model
+        task = self._audio.get(intent)
+        if intent not in live or confidence < self.min_confidence or task is None:
+            return None
+        started = clock.monotonic()
+        try:
+            frames = await asyncio.wait_for(asyncio.shield(task), self.model_latency)
+        except TimeoutError:
+            logger.info(f"prefetched {intent.value} audio wasn't ready in {self.model_latency:.2f}s")
+            return None
+        if frames is None:
+            self._audio.pop(intent, None)  # synthesis failed, try again next time
+            return None
+        waited = clock.monotonic() - started
+        self.live = self.branches[intent].then
+        self._played.add(intent)
+        self.stats.hits += 1
+        self.stats.by_intent[intent.value] += 1
+        saved = max(self.model_latency - waited, 0.0)
+        self.stats.saved.append(saved)
+        self.stats.saved_seconds += saved
+        return PrefetchedReply(intent, self._texts[intent], frames)
+
+    def say(self, reply: PrefetchedReply, **kwargs):
+        """Play a prefetched reply on the attached session; returns its speech handle"""
+        return self._session.say(reply.text, audio=play_frames(reply.frames), **kwargs)
+
+    async def aclose(self) -> None:
+        """End of call: stop pending syntheses and add this call's stats to the worker's"""
+        if self._closed:
+            return
+        self._closed = True
+        for task in self._audio.values():
+            task.cancel()
+        self.stats.wasted = len(self._audio.keys() - self._played)
+        self.metrics.merge(self.stats)
+        self.stats.log_summary()
+
+    async def _synthesize(self, intent: Intent) -> tuple[rtc.AudioFrame, ...] | None:
+        try:
+            return await synthesize_frames(self._session.tts, self._texts[intent])
+        except Exception as e:
+            logger.warning(f"prefetching the {intent.value} reply failed: {e}")
+            return None
@@ -0,0 +1,353 @@
+"""
+Appointment schedule store for the check_availability / reschedule tools
+
+Appointments live in SQLite so every worker process sees the same schedule.
+Each process also keeps an in-memory index per provider: appointment start and
+end times in two sorted arrays (a provider's appointments never overlap, so
+both stay sorted together). "Is this slot free" is one bisect, and "next free
+slots" walks forward from a time, jumping over booked runs instead of trying
+every slot, so availability answers take microseconds without touching SQLite.
+
+Writes go to SQLite first, in an immediate transaction that re-checks the slot
+against the database and updates the row only if its version hasn't changed
+since the caller read it (optimistic concurrency). Two calls booking the same
+slot at once, from any process, can't both succeed: the loser gets SlotTaken
+or StaleAppointment. Every write stamps its row with the next sequence number,
+and each write transaction first applies the rows other processes wrote since
+this index last saw one, so the index catches up on every write, not only on
+a conflict, without reloading the schedule.
+
+Times are naive clinic-local datetimes, kept internally as whole minutes since
+2000-01-01.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import cache
+
+logger = logging.getLogger("schedule-store")
+
+EPOCH = datetime(2000, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+MAX_APPOINTMENT_MINUTES = 240
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    patient TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS appointments_provider_start ON appointments (provider, start);
+CREATE INDEX IF NOT EXISTS appointments_patient ON appointments (patient);
+CREATE INDEX IF NOT EXISTS appointments_seq ON appointments (seq);
+"""
+
+_NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM appointments)"
+
+
+class ScheduleConflict(Exception):
+    """A write lost a race with another call"""
+
+
+class SlotTaken(ScheduleConflict):
+    pass
+
+
+class StaleAppointment(ScheduleConflict):
+    """The appointment changed since it was read"""
+
+
+def to_minutes(when: datetime) -> int:
+    return (when - EPOCH) // timedelta(minutes=1)
+
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+
+@dataclass(frozen=True)
+class Appointment:
+    id: int
+    provider: str
+    patient: str
+    start: datetime
+    minutes: int
+    version: int
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(minutes=self.minutes)
+
+
+@dataclass(frozen=True)
+class ClinicHours:
+    """Bookable hours: slots on a fixed grid, within opening hours on working days"""
+
+    open_hour: int = 9
+    close_hour: int = 17
+    slot_minutes: int = 30
+    weekdays: frozenset[int] = frozenset(range(5))  # Monday..Friday
+
+    def is_open(self, start: int, minutes: int) -> bool:
+        day, minute = divmod(start, MINUTES_PER_DAY)
+        return (
+            (EPOCH.weekday() + day) % 7 in self.weekdays
+            and minute % self.slot_minutes == 0
+            and minute >= self.open_hour * 60
+            and minute + minutes <= self.close_hour * 60
+        )
+
+    def next_opening(self, start: int, minutes: int) -> int:
+        """First slot on the grid at or after `start` that fits in opening hours"""
+        start = -(-start // self.slot_minutes) * self.slot_minutes
+        for _ in range(8):
+            day, minute = divmod(start, MINUTES_PER_DAY)
+            if (EPOCH.weekday() + day) % 7 in self.weekdays:
+                minute = max(minute, self.open_hour * 60)
+                if minute + minutes <= self.close_hour * 60:
+                    return day * MINUTES_PER_DAY + minute
+            start = (day + 1) * MINUTES_PER_DAY
+        raise ValueError("the clinic has no opening hours that fit this appointment")
+
+
+@dataclass
+class _ProviderIndex:
+    starts: list[int] = field(default_factory=list)
+    ends: list[int] = field(default_factory=list)
+    ids: list[int] = field(default_factory=list)
+
+    def insert(self, start: int, end: int, appointment_id: int) -> None:
+        i = bisect.bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, appointment_id)
+
+    def remove(self, start: int, appointment_id: int) -> None:
+        i = bisect.bisect_left(self.starts, start)
+        while self.ids[i] != appointment_id:
+            i += 1
+        del self.starts[i], self.ends[i], self.ids[i]
+
+    def first_conflict(self, start: int, end: int, ignore: int | None = None) -> int | None:
+        """Index of the first appointment overlapping [start, end), if any"""
+        i = bisect.bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.ids[i] != ignore:
+                return i
+            i += 1
+        return None
+
+
+class ScheduleStore:
+    """SQLite-backed appointments with an in-memory availability index"""
+
+    def __init__(self, path: str, *, hours: ClinicHours | None = None):
+        self.path = path
+        self.hours = hours or ClinicHours()
+        # the tools call in from worker threads; one lock keeps the index and connection consistent
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.appointments: dict[int, Appointment] = {}
+        self._providers: dict[str, _ProviderIndex] = {}
+        self._by_patient: dict[str, set[int]] = {}
+        self._seq = 0  # the latest write this index has seen
+        self._load()
+
+    def _load(self) -> None:
+        self.appointments.clear()
+        self._providers.clear()
+        self._by_patient.clear()
+        # one read transaction, so the rows and the sequence number they're as of agree
+        self._db.execute("BEGIN")
+        try:
+            self._seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM appointments").fetchone()[0]
+            query = "SELECT id, provider, patient, start, minutes, version FROM appointments ORDER BY provider, start"
+            rows = self._db.execute(query).fetchall()
+        finally:
+            self._db.execute("COMMIT")
+        for row in rows:
+            appointment_id, provider_name, patient, start, minutes, version = row
+            index = self._providers.setdefault(provider_name, _ProviderIndex())
+            # rows arrive sorted, so appending keeps the arrays sorted
+            index.starts.append(start)
+            index.ends.append(start + minutes)
+            index.ids.append(appointment_id)
+            self._remember(Appointment(appointment_id, provider_name, patient, from_minutes(start), minutes, version))
+
+    def _catch_up(self) -> None:
+        """Apply the rows written since this index last saw a write, from any process; in a write transaction"""
+        rows = self._db.execute(
+            "SELECT id, provider, patient, start, minutes, version, seq FROM appointments WHERE seq > ? ORDER BY seq",
+            (self._seq,),
+        ).fetchall()
+        for appointment_id, provider, patient, start, minutes, version, seq in rows:
+            index = self._providers.setdefault(provider, _ProviderIndex())
+            known = self.appointments.get(appointment_id)
+            if known is not None:
+                index.remove(to_minutes(known.start), appointment_id)
+                self._forget(known)
+            index.insert(start, start + minutes, appointment_id)
+            self._remember(Appointment(appointment_id, provider, patient, from_minutes(start), minutes, version))
+            self._seq = seq
+
+    def _remember(self, appointment: Appointment) -> None:
+        self.appointments[appointment.id] = appointment
+        self._by_patient.setdefault(appointment.patient, set()).add(appointment.id)
+
+    def _forget(self, appointment: Appointment) -> None:
+        ids = self._by_patient.get(appointment.patient)
+        if ids is not None:
+            ids.discard(appointment.id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def for_patient(self, patient: str, after: datetime) -> Appointment | None:
+        """The patient's next appointment starting after `after`"""
+        with self._lock:
+            upcoming = [
+                self.appointments[i] for i in self._by_patient.get(patient, ()) if self.appointments[i].start >= after
+            ]
+        return min(upcoming, key=lambda appointment: appointment.start, default=None)
+
+    def is_free(self, provider: str, start: datetime, minutes: int, *, ignore: int | None = None) -> bool:
+        begin = to_minutes(start)
+        if not self.hours.is_open(begin, minutes):
+            return False
+        with self._lock:
+            index = self._providers.get(provider)
+            return index is None or index.first_conflict(begin, begin + minutes, ignore) is None
+
+    def next_free_slots(self, provider: str, after: datetime, *, count: int = 3, minutes: int = 30) -> list[datetime]:
+        """The first `count` bookable starts for `provider` at or after `after`"""
+        slots: list[int] = []
+        start = self.hours.next_opening(to_minutes(after), minutes)
+        with self._lock:
+            index = self._providers.get(provider, _ProviderIndex())
+            while len(slots) < count:
+                conflict = index.first_conflict(start, start + minutes)
+                if conflict is None:
+                    slots.append(start)
+                    start += self.hours.slot_minutes
+                else:
+                    # skip the whole booked appointment rather than each slot under it
+                    start = index.ends[conflict]
+                start = self.hours.next_opening(start, minutes)
+        return [from_minutes(slot) for slot in slots]
+
+    def add(self, provider: str, patient: str, start: datetime, minutes: int = 30) -> Appointment:
+        if minutes > MAX_APPOINTMENT_MINUTES:
+            raise ValueError(f"appointments are at most {MAX_APPOINTMENT_MINUTES} minutes")
+        begin = to_minutes(start)
+        if not self.hours.is_open(begin, minutes):
+            raise ValueError(f"{start:%A %H:%M} is outside clinic hours")
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._catch_up()
+                self._check_free_in_db(provider, begin, minutes, ignore=None)
+                cursor = self._db.execute(
+                    f"INSERT INTO appointments (provider, patient, start, minutes, seq) VALUES (?, ?, ?, ?, {_NEXT_SEQ})",
+                    (provider, patient, begin, minutes),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                # a conflict's loser has caught up with the write that beat it; BEGIN itself
+                # can fail (the database is locked), with nothing to roll back
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+            self._seq += 1
+            appointment = Appointment(cursor.lastrowid, provider, patient, from_minutes(begin), minutes, 1)
+            self._providers.setdefault(provider, _ProviderIndex()).insert(begin, begin + minutes, appointment.id)
+            self._remember(appointment)
+            return appointment
+
+    def add_many(self, rows) -> int:
+        """Bulk-load (provider, patient, start, minutes) rows, trusting they don't overlap"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.executemany(
+                    f"INSERT INTO appointments (provider, patient, start, minutes, seq) VALUES (?, ?, ?, ?, {_NEXT_SEQ})",
+                    ((provider, patient, to_minutes(start), minutes) for provider, patient, start, minutes in rows),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._load()
+            return cursor.rowcount
+
+    def reschedule(self, appointment: Appointment, new_start: datetime) -> Appointment:
+        """Move `appointment` (as read, version included) to `new_start`
+
+        Raises SlotTaken if another booking got there first and StaleAppointment
+        if the appointment itself changed since it was read.
+        """
+        begin = to_minutes(new_start)
+        if not self.hours.is_open(begin, appointment.minutes):
+            raise ValueError(f"{new_start:%A %H:%M} is outside clinic hours")
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._catch_up()
+                self._check_free_in_db(appointment.provider, begin, appointment.minutes, ignore=appointment.id)
+                cursor = self._db.execute(
+                    f"UPDATE appointments SET start = ?, version = version + 1, seq = {_NEXT_SEQ} WHERE id = ? AND version = ?",
+                    (begin, appointment.id, appointment.version),
+                )
+                if cursor.rowcount != 1:
+                    raise StaleAppointment(f"appointment {appointment.id} changed during the call")
+                self._db.execute("COMMIT")
+            except BaseException:
+                # a conflict's loser has caught up with the write that beat it; BEGIN itself
+                # can fail (the database is locked), with nothing to roll back
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+            self._seq += 1
+
+            index = self._providers[appointment.provider]
+            # caught up, the index holds the row as it was before this write
+            index.remove(to_minutes(self.appointments[appointment.id].start), appointment.id)
+            index.insert(begin, begin + appointment.minutes, appointment.id)
+            moved = Appointment(
+                appointment.id,
+                appointment.provider,
+                appointment.patient,
+                from_minutes(begin),
+                appointment.minutes,
+                appointment.version + 1,
+            )
+            self._remember(moved)
+            return moved
+
+    def _check_free_in_db(self, provider: str, begin: int, minutes: int, ignore: int | None) -> None:
+        taken = self._db.execute(
+            "SELECT 1 FROM appointments WHERE provider = ? AND start > ? AND start < ? "
+            "AND start + minutes > ? AND id IS NOT ? LIMIT 1",
+            (provider, begin - MAX_APPOINTMENT_MINUTES, begin + minutes, begin, ignore),
+        ).fetchone()
+        if taken:
+            raise SlotTaken(f"{from_minutes(begin):%A %B %d %H:%M} was just booked by someone else")
+
+
+@cache
+def shared_store() -> ScheduleStore:
+    """The worker's store, opened once per process at SCHEDULE_DB_PATH (in prewarm, before its call)"""
+    return ScheduleStore(os.getenv("SCHEDULE_DB_PATH", "schedule.db"))
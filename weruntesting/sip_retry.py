@@ -0,0 +1,356 @@
+"""
+SIP failure classification and retry policy
+
+A failed outbound call used to end with its SIP status in the logs. Here every
+outcome is sorted into one class, and each class has its own retry policy:
+
+    busy            486 / 600, the callee rejected: retry in ~10 minutes
+    no-answer       408 / 480 / 487, rang out: retry in ~30 minutes
+    invalid         404 / 484 / 604..., the number doesn't exist: never retry
+    trunk-capacity  503 / too many calls: retry now, on another trunk
+    carrier-error   other 4xx/5xx from the carrier: retry soon, on another trunk
+
+TrunkHealth learns a score per trunk from recent outcomes: calls that reached
+the callee (answered, busy, no answer) count for the trunk, and capacity and
+carrier errors count against it. Old outcomes decay with a half-life, so a
+trunk that recovers gets traffic back. Outcomes can be kept in a small SQLite
+file so each job process starts from what earlier calls learned.
+
+dial_with_retries() takes each attempt's trunk from the engine's TrunkPool
+(see trunk_pool.py), runs the quick retries (other trunks, seconds apart)
+inside the job, and returns a DialResult saying if and when the call should be
+retried later. The campaign scheduler takes that delay via complete_dial().
+When every trunk is at capacity nothing is dialled, and the result asks for a
+short retry instead. The pool's and the health's SQLite work runs in threads,
+off the call's event loop; the answered call's lease is renewed until it's
+released.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import cache
+
+from livekit import api
+
+import clock
+from trunk_pool import Trunk, TrunkLease, TrunkPool, TrunksFull, parse_trunks
+
+logger = logging.getLogger("sip-retry")
+
+
+class SipOutcome(str, Enum):
+    ANSWERED = "answered"
+    BUSY = "busy"
+    NO_ANSWER = "no-answer"
+    INVALID = "invalid"
+    TRUNK_CAPACITY = "trunk-capacity"
+    CARRIER_ERROR = "carrier-error"
+
+
+_BY_STATUS = {
+    486: SipOutcome.BUSY,
+    600: SipOutcome.BUSY,
+    603: SipOutcome.BUSY,  # declined
+    408: SipOutcome.NO_ANSWER,
+    480: SipOutcome.NO_ANSWER,
+    487: SipOutcome.NO_ANSWER,
+    404: SipOutcome.INVALID,
+    410: SipOutcome.INVALID,
+    484: SipOutcome.INVALID,
+    485: SipOutcome.INVALID,
+    604: SipOutcome.INVALID,
+    503: SipOutcome.TRUNK_CAPACITY,
+}
+
+# reason phrases carriers put on generic status codes
+_BY_TEXT = (
+    ("busy", SipOutcome.BUSY),
+    ("no answer", SipOutcome.NO_ANSWER),
+    ("not answered", SipOutcome.NO_ANSWER),
+    ("capacity", SipOutcome.TRUNK_CAPACITY),
+    ("too many", SipOutcome.TRUNK_CAPACITY),
+    ("limit", SipOutcome.TRUNK_CAPACITY),
+    ("not found", SipOutcome.INVALID),
+    ("invalid", SipOutcome.INVALID),
+)
+
+# LiveKit's participant disconnect reasons for SIP legs
+_BY_DISCONNECT_REASON = {
+    "USER_REJECTED": SipOutcome.BUSY,
+    "USER_UNAVAILABLE": SipOutcome.NO_ANSWER,
+    "CONNECTION_TIMEOUT": SipOutcome.NO_ANSWER,
+    "SIP_TRUNK_FAILURE": SipOutcome.CARRIER_ERROR,
+}
+
+
+def classify_sip(status_code: int | None, text: str = "") -> SipOutcome:
+    if status_code is not None and 200 <= status_code < 300:
+        return SipOutcome.ANSWERED
+    if status_code in _BY_STATUS:
+        return _BY_STATUS[status_code]
+    text = text.lower()
+    for hint, outcome in _BY_TEXT:
+        if hint in text:
+            return outcome
+    return SipOutcome.CARRIER_ERROR
+
+
+def classify_twirp(error: api.TwirpError) -> SipOutcome:
+    """Classify a failed create_sip_participant(wait_until_answered=True)"""
+    status = error.metadata.get("sip_status_code")
+    if not status:
+        if error.code == "resource_exhausted":
+            return SipOutcome.TRUNK_CAPACITY
+        if error.code == "deadline_exceeded":
+            return SipOutcome.NO_ANSWER
+    return classify_sip(int(status) if status else None, f"{error.metadata.get('sip_status', '')} {error.message}")
+
+
+def classify_attributes(attributes: dict[str, str]) -> SipOutcome | None:
+    """Classify a SIP participant from its sip.* attributes; None while the call is still in progress"""
+    status = attributes.get("sip.callStatus")
+    if status == "active":
+        return SipOutcome.ANSWERED
+    if status not in ("hangup", "failed"):
+        return None
+    error_code = attributes.get("sip.errorCode")
+    if error_code and error_code.isdigit():
+        return classify_sip(int(error_code))
+    reason = attributes.get("sip.disconnectReason", "")
+    return _BY_DISCONNECT_REASON.get(reason.upper()) or classify_sip(None, reason)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    delay: float = 0.0
+    multiplier: float = 2.0
+    max_delay: float = 3600.0
+    switch_trunk: bool = False  # the failure is the trunk's, so try another one
+
+    def delay_for(self, attempt: int) -> float:
+        return min(self.delay * self.multiplier ** (attempt - 1), self.max_delay)
+
+
+DEFAULT_POLICIES = {
+    SipOutcome.BUSY: RetryPolicy(max_attempts=3, delay=600.0, max_delay=3600.0),
+    SipOutcome.NO_ANSWER: RetryPolicy(max_attempts=3, delay=1800.0, max_delay=4 * 3600.0),
+    SipOutcome.INVALID: RetryPolicy(max_attempts=1),
+    SipOutcome.TRUNK_CAPACITY: RetryPolicy(max_attempts=5, delay=2.0, max_delay=60.0, switch_trunk=True),
+    SipOutcome.CARRIER_ERROR: RetryPolicy(max_attempts=3, delay=5.0, multiplier=3.0, max_delay=300.0, switch_trunk=True),
+}
+
+_GOOD_FOR_TRUNK = {SipOutcome.ANSWERED, SipOutcome.BUSY, SipOutcome.NO_ANSWER}
+_BAD_FOR_TRUNK = {SipOutcome.TRUNK_CAPACITY, SipOutcome.CARRIER_ERROR}
+
+
+class TrunkHealth:
+    """Time-decayed success score per trunk, learned from call outcomes"""
+
+    def __init__(
+        self,
+        *,
+        half_life: float = 600.0,
+        prior: tuple[float, float] = (4.0, 1.0),  # pseudo-counts of (reached callee, trunk failure)
+        path: str | None = None,
+        clock=clock.time,
+    ):
+        self.half_life = half_life
+        self.prior = prior
+        self.clock = clock
+        self._counts: dict[str, list[float]] = {}  # trunk -> [good, bad, as of]
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=1.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS trunk_outcomes (trunk TEXT, good INTEGER, at REAL)")
+            self._load()
+
+    def _load(self) -> None:
+        since = self.clock() - 8 * self.half_life  # older outcomes weigh under 0.4%
+        rows = self._db.execute("SELECT trunk, good, at FROM trunk_outcomes WHERE at >= ? ORDER BY at", (since,))
+        for trunk, good, at in rows:
+            self._add(trunk, bool(good), at)
+        self._db.execute("DELETE FROM trunk_outcomes WHERE at < ?", (since,))
+
+    def _add(self, trunk: str, good: bool, at: float) -> None:
+        counts = self._counts.setdefault(trunk, [0.0, 0.0, at])
+        decay = 0.5 ** (max(at - counts[2], 0.0) / self.half_life)
+        counts[0] *= decay
+        counts[1] *= decay
+        counts[2] = max(at, counts[2])
+        counts[0 if good else 1] += 1.0
+
+    def record(self, trunk: str, outcome: SipOutcome) -> None:
+        if outcome in _GOOD_FOR_TRUNK:
+            good = True
+        elif outcome in _BAD_FOR_TRUNK:
+            good = False
+        else:
+            return  # an invalid number says nothing about the trunk
+        now = self.clock()
+        with self._lock:
+            self._add(trunk, good, now)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT INTO trunk_outcomes VALUES (?, ?, ?)", (trunk, int(good), now))
+                except sqlite3.Error as e:
+                    logger.warning(f"couldn't persist trunk outcome: {e}")
+
+    def score(self, trunk: str) -> float:
+        """Estimated chance a call on `trunk` gets through to the callee"""
+        prior_good, prior_bad = self.prior
+        with self._lock:
+            good, bad, at = self._counts.get(trunk, (0.0, 0.0, 0.0))
+        decay = 0.5 ** (max(self.clock() - at, 0.0) / self.half_life)
+        return (good * decay + prior_good) / ((good + bad) * decay + prior_good + prior_bad)
+
+
+@dataclass
+class RetryDecision:
+    retry: bool
+    delay: float = 0.0
+    trunk_id: str | None = None
+
+
+class RetryEngine:
+    def __init__(
+        self,
+        trunks: list[str | Trunk],
+        *,
+        policies=None,
+        health: TrunkHealth | None = None,
+        pool: TrunkPool | None = None,
+    ):
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.health = health or TrunkHealth()
+        self.pool = pool or TrunkPool(
+            [trunk if isinstance(trunk, Trunk) else Trunk(trunk) for trunk in trunks], health=self.health
+        )
+        self.trunks = list(self.pool.trunks)
+
+    def pick_trunk(self, exclude=()) -> str:
+        """The healthiest trunk not in `exclude` (or the healthiest overall if all are excluded)"""
+        candidates = [trunk for trunk in self.trunks if trunk not in exclude] or self.trunks
+        return max(candidates, key=self.health.score)
+
+    def record(self, trunk: str, outcome: SipOutcome) -> None:
+        self.health.record(trunk, outcome)
+
+    def decide(self, outcome: SipOutcome, attempt: int, trunk: str, tried=()) -> RetryDecision:
+        """Whether and when to make attempt `attempt + 1` after `outcome` on `trunk`"""
+        if outcome == SipOutcome.ANSWERED:
+            return RetryDecision(retry=False)
+        policy = self.policies[outcome]
+        if attempt >= policy.max_attempts:
+            return RetryDecision(retry=False)
+        delay = policy.delay_for(attempt)
+        next_trunk = trunk
+        if policy.switch_trunk:
+            exclude = {trunk, *tried}
+            next_trunk = self.pick_trunk(exclude=exclude)
+            if next_trunk not in exclude:
+                delay = 0.0  # an untried trunk doesn't need to wait out this one's problem
+        return RetryDecision(retry=True, delay=delay, trunk_id=next_trunk)
+
+
+@dataclass
+class DialResult:
+    answered: bool
+    outcome: SipOutcome
+    trunk_id: str | None
+    attempts: int
+    retry_after: float | None = None  # seconds until the next attempt should be made, None for never
+    history: list[tuple[str, SipOutcome]] = field(default_factory=list)
+    lease: TrunkLease | None = None  # the answered call's trunk slot, aclose() it when the call ends
+
+
+async def dial_with_retries(
+    lk_api,
+    request: api.CreateSIPParticipantRequest,
+    engine: RetryEngine,
+    *,
+    region: str | None = None,
+    attempt: int = 1,
+    max_wait: float = 30.0,
+    sleep=asyncio.sleep,
+) -> DialResult:
+    """Dial `request` (wait_until_answered is forced on), retrying in-job while retries are quick
+
+    `attempt` is the number of this call attempt across the whole campaign,
+    so retry limits hold across dispatches. Retries that should wait longer
+    than `max_wait` are handed back in the result instead. `region` picks
+    trunks local to the call when they have room.
+    """
+    request.wait_until_answered = True
+    history: list[tuple[str, SipOutcome]] = []
+    avoid: set[str] = set()
+    while True:
+        try:
+            lease = await engine.pool.lease(region, avoid=avoid)
+        except TrunksFull as e:
+            logger.warning(f"not dialling {request.sip_call_to}: {e}")
+            return DialResult(
+                answered=False,
+                outcome=SipOutcome.TRUNK_CAPACITY,
+                trunk_id=history[-1][0] if history else None,
+                attempts=attempt,
+                retry_after=engine.policies[SipOutcome.TRUNK_CAPACITY].delay_for(attempt),
+                history=history,
+            )
+        trunk = lease.trunk_id
+        request.sip_trunk_id = trunk
+        try:
+            await lk_api.sip.create_sip_participant(request)
+            outcome = SipOutcome.ANSWERED
+        except api.TwirpError as e:
+            outcome = classify_twirp(e)
+            logger.info(
+                f"call to {request.sip_call_to} on {trunk}: {outcome.value} "
+                f"(SIP {e.metadata.get('sip_status_code')} {e.metadata.get('sip_status')})"
+            )
+        except BaseException:
+            await asyncio.shield(lease.aclose())
+            raise
+        if outcome != SipOutcome.ANSWERED:
+            await lease.aclose()
+        await asyncio.to_thread(engine.record, trunk, outcome)
+        history.append((trunk, outcome))
+
+        decision = engine.decide(outcome, attempt, trunk, tried=[t for t, _ in history])
+        if outcome == SipOutcome.ANSWERED or not decision.retry or decision.delay > max_wait:
+            return DialResult(
+                answered=outcome == SipOutcome.ANSWERED,
+                outcome=outcome,
+                trunk_id=trunk,
+                attempts=attempt,
+                retry_after=decision.delay if decision.retry else None,
+                history=history,
+                lease=lease if outcome == SipOutcome.ANSWERED else None,
+            )
+        await sleep(decision.delay)
+        attempt += 1
+        if engine.policies[outcome].switch_trunk:
+            avoid.add(trunk)
+
+
+@cache
+def shared_engine(default_trunk: str | None = None) -> RetryEngine:
+    """The process's engine, over SIP_OUTBOUND_TRUNK_IDS or `default_trunk`
+
+    SIP_OUTBOUND_TRUNK_IDS lists `ID[:capacity[:region]]` entries,
+    comma-separated. Outcomes are shared between job processes through
+    TRUNK_HEALTH_DB (default trunk_health.db), and calls in flight per trunk
+    through TRUNK_POOL_DB (default trunk_pool.db).
+    """
+    trunks = parse_trunks(os.getenv("SIP_OUTBOUND_TRUNK_IDS", "")) or [Trunk(default_trunk)]
+    health = TrunkHealth(path=os.getenv("TRUNK_HEALTH_DB", "trunk_health.db"))
+    pool = TrunkPool(trunks, path=os.getenv("TRUNK_POOL_DB", "trunk_pool.db"), health=health)
+    return RetryEngine(trunks, health=health, pool=pool)
@@ -0,0 +1,300 @@
+"""
+Tests for the cache of answers to candidates' questions about a job
+
+Run directly (python test_answer_cache.py) or through pytest.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from livekit import rtc
+
+import clock
+import virtual_time
+from answer_cache import (
+    AnswerCache,
+    AnswerStore,
+    CallAnswers,
+    HashingEmbedder,
+    JobAnswers,
+    VectorIndex,
+    is_cacheable_question,
+    normalize_question,
+)
+from call_harness import local_environment
+from call_replay import CallerTurn, Recording, replay
+from fake_livekit import CallerAudio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import interview_agent  # noqa: E402
+
+JOB = {"job_title": "Python Developer", "company_name": "Tech Company", "salary": "120-140k"}
+
+
+def random_unit(n, dim, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeSession:
+    def __init__(self):
+        self.handlers = {}
+        self.said = []
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def say(self, text, audio=None):
+        self.said.append((text, audio is not None))
+
+    def user_state(self, old, new):
+        self.handlers["user_state_changed"](SimpleNamespace(old_state=old, new_state=new))
+
+    def reply(self, text, interrupted=False):
+        item = SimpleNamespace(role="assistant", text_content=text, interrupted=interrupted)
+        self.handlers["conversation_item_added"](SimpleNamespace(item=item))
+
+
+def test_only_questions_about_the_job_are_cacheable():
+    assert normalize_question("Um, what's the SALARY range?") == "whats the salary range"
+    assert is_cacheable_question("What's the salary range?")
+    assert is_cacheable_question("is the role remote")
+    assert is_cacheable_question("The team, how big is it?")
+    assert not is_cacheable_question("Yes I'm ready"), "an answer, not a question"
+    assert not is_cacheable_question("Salary?"), "too short to match on"
+    assert not is_cacheable_question("Sorry, can you repeat the question?"), "about the conversation"
+    assert not is_cacheable_question("What did you mean by that?")
+
+
+def test_index_finds_the_closest_question_exactly_and_through_ivf():
+    vectors = random_unit(6000, 64)
+    exact, ivf = VectorIndex(64, ivf_from=10**9), VectorIndex(64, ivf_from=10**9)
+    for vector in vectors:
+        exact.add(vector)
+        ivf.add(vector)
+    ivf.build()
+    queries = vectors[:200] + 0.05 * random_unit(200, 64, seed=1)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    found = [ivf.search(q)[0] for q in queries]
+    assert [exact.search(q)[0] for q in queries] == list(range(200))
+    assert sum(slot == i for i, slot in enumerate(found)) >= 190, "near duplicates are found through the lists"
+    # added after the build: searched exactly alongside the lists
+    extra = random_unit(1, 64, seed=2)[0]
+    slot = ivf.add(extra)
+    assert ivf.search(extra)[0] == slot
+    ivf.remove(5)
+    assert ivf.search(vectors[5])[0] != 5 and ivf.search(vectors[5])[1] < 0.9
+
+
+def test_answers_expire_and_are_dropped_when_the_job_changes():
+    embed = HashingEmbedder().embed_sync
+    cache = AnswerCache(threshold=HashingEmbedder.threshold, ttl=100.0)
+    job = cache.for_job(JOB)
+    salary, remote = embed([normalize_question("What is the salary range for this role?"), "is the role remote"])
+    assert job.store("what is the salary range for this role", salary, "120 to 140 thousand.", None, now=0.0)
+    assert not job.store("what is the salary range for this role", salary, "Again.", None, now=1.0), "already cached"
+    assert job.lookup(embed([normalize_question("What's the salary range for this role?")])[0], now=50.0).answer == "120 to 140 thousand."
+    assert job.lookup(remote, now=50.0) is None
+    assert job.lookup(salary, now=150.0) is None and len(job) == 0, "expired"
+    job.store("what is the salary range for this role", salary, "120 to 140 thousand.", None, now=200.0)
+    assert cache.for_job(dict(JOB)) is job
+    changed = cache.for_job({**JOB, "salary": "130-150k"})
+    assert changed is not job and len(changed) == 0 and changed.lookup(salary, now=200.0) is None
+
+
+def test_full_job_evicts_the_oldest_and_over_budget_audio_is_dropped():
+    vectors = random_unit(25, 32)
+    frame = SimpleNamespace(data=b"\0" * 1000)
+    job = JobAnswers("job", "fp", threshold=0.95, max_entries=20, max_audio_bytes=5000)
+    for i, vector in enumerate(vectors):
+        job.store(f"question {i}", vector, f"answer {i}", (frame, frame), now=float(i))
+    assert len(job) <= 20 and job.audio_bytes <= 5000
+    assert job.lookup(vectors[0], now=30.0) is None, "the oldest went first"
+    assert job.lookup(vectors[24], now=30.0).answer == "answer 24"
+    assert job.lookup(vectors[24], now=30.0).frames is None, "spoken by TTS once the audio budget is spent"
+
+
+def test_job_processes_share_answers_through_the_store():
+    embed = HashingEmbedder().embed_sync
+    remote = embed(["is the role remote"])[0]
+    frames = tuple(
+        rtc.AudioFrame(data=bytes([i]) * 960, sample_rate=24000, num_channels=1, samples_per_channel=480) for i in range(3)
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "answers.db")
+
+        def process():
+            # what a fresh job process gets: its own cache over the shared file
+            return AnswerCache(threshold=HashingEmbedder.threshold, store=AnswerStore(path))
+
+        first, second = process().for_job(JOB), process().for_job(JOB)
+        assert second.lookup(remote, now=clock.time()) is None
+        assert first.store("is the role remote", remote, "Yes, fully remote.", frames, now=clock.time())
+        found = second.lookup(remote, now=clock.time())
+        assert found is not None and found.answer == "Yes, fully remote.", "stored by another process"
+        assert [bytes(frame.data) for frame in found.frames] == [bytes(frame.data) for frame in frames]
+        assert not second.store("is the role remote", remote, "Again.", None, now=clock.time()), "already cached"
+        later = process().for_job(JOB)
+        assert len(later) == 1 and later.lookup(remote, now=clock.time()).answer == "Yes, fully remote."
+        assert len(process().for_job({**JOB, "salary": "130-150k"})) == 0
+        assert len(process().for_job(JOB)) == 0, "dropped once the job changed"
+
+
+def test_call_stores_whole_impersonal_answers_with_their_audio():
+    async def run():
+        job = JobAnswers("job", "fp", threshold=HashingEmbedder.threshold)
+        session = FakeSession()
+        answers = CallAnswers(job, HashingEmbedder(), job_context=JOB, candidate_context={"candidate_name": "Jayden"})
+        answers.attach_session(session)
+
+        async def tts():
+            for _ in range(3):
+                yield SimpleNamespace(data=b"\0" * 960)
+
+        assert await answers.lookup("Is the role remote?") is None
+        assert len([frame async for frame in answers.capture(tts())]) == 3
+        session.reply("Yes, fully remote.", interrupted=True)
+        assert len(job) == 0, "cut off, not a whole answer"
+        assert await answers.lookup("How big is the team, Jayden?") is None
+        session.reply("Jayden, it's six people.")
+        assert len(job) == 0, "names the candidate"
+        assert await answers.lookup("I have five years of Python") is None
+        session.reply("Great.")
+        assert len(job) == 0, "not a question"
+
+        assert await answers.lookup("Is the role remote?") is None
+        [frame async for frame in answers.capture(tts())]
+        session.reply("Yes, fully remote.")
+        cached = await answers.lookup("So is the role remote?")
+        answers.say(cached)
+        return answers, session, cached
+
+    answers, session, cached = virtual_time.run(run())
+    assert cached.answer == "Yes, fully remote." and len(cached.frames) == 3
+    assert session.said == [("Yes, fully remote.", True)], "played from its audio"
+    assert (answers.lookups, answers.hits, answers.stored) == (4, 1, 1)
+
+
+def test_answers_with_a_candidate_s_details_are_not_stored():
+    candidate = {"candidate_name": "Jayden Ross", "current_company": "Acme Labs", "relevant_skills": ["Python"]}
+    answers = CallAnswers(JobAnswers("job", "fp", threshold=0.8), HashingEmbedder(), job_context=JOB, candidate_context=candidate)
+    assert not answers.is_personal("Yes, fully remote.")
+    assert not answers.is_personal("The range is 120-140k at Tech Company."), "from the job_context"
+    assert not answers.is_personal("Python, mostly."), "the job's too"
+    assert answers.is_personal("Ross, it's six people."), "the candidate's name"
+    assert answers.is_personal("Much like your team at Acme."), "from the candidate's context"
+    assert answers.is_personal("We'd meet on Tuesday."), "a date"
+    assert answers.is_personal("The range is 95 thousand."), "a number the job doesn't give"
+    assert answers.is_personal("You'd report to Priya."), "a name the job doesn't give"
+
+
+def test_lookups_stay_within_the_turn_budget():
+    class Slow(HashingEmbedder):
+        calls = 0
+
+        async def embed(self, texts):
+            self.calls += 1
+            await asyncio.sleep(0.2)
+            return self.embed_sync(texts)
+
+    async def run():
+        session, embedder = FakeSession(), Slow()
+        answers = CallAnswers(JobAnswers("job", "fp", threshold=0.8), embedder, embed_timeout=0.3, turn_budget=0.8)
+        answers.attach_session(session)
+        finished = []
+        for endpointing in (0.1, 0.7, 0.75):
+            session.user_state("speaking", "listening")
+            ended = clock.monotonic()
+            await asyncio.sleep(endpointing)
+            await answers.lookup("Is the role remote?")
+            finished.append(clock.monotonic() - ended)
+        return answers, embedder.calls, finished
+
+    answers, calls, finished = virtual_time.run(run())
+    assert all(elapsed <= 0.8 + 1e-9 for elapsed in finished), finished
+    # embedded in time, then cut short at the budget, then not tried with so little of it left
+    assert calls == 2 and answers.lookups == 1 and answers.skipped == 1
+
+
+def test_slow_embedding_falls_back_to_the_model():
+    class Slow(HashingEmbedder):
+        async def embed(self, texts):
+            await asyncio.sleep(1.0)
+            return self.embed_sync(texts)
+
+    answers = CallAnswers(JobAnswers("job", "fp", threshold=0.8), Slow(), embed_timeout=0.3)
+    assert virtual_time.run(answers.lookup("Is the role remote?")) is None
+    assert answers.lookups == 0
+
+
+def interview_call(name, question):
+    """An inbound candidate who says they're ready, then asks `question`"""
+    words = len(question.split())
+    audio = CallerAudio.script(("silence", 6.0), ("speech", 0.9, 3), ("silence", 5.0), ("speech", words * 0.3, words), ("silence", 6.0))
+    return Recording(
+        name=name,
+        audio=audio,
+        agent="interview",
+        inbound=True,
+        hangup_after=audio.duration,
+        caller=[CallerTurn(6.0, 6.9, "Yes I'm ready"), CallerTurn(11.9, 11.9 + words * 0.3, question)],
+        replies=["Welcome, are you ready?", "Great, tell me about yourself.", "Yes, it's fully remote.", "Thanks."],
+    )
+
+
+def test_second_candidate_is_answered_from_the_cache():
+    first = interview_call("first", "Is this role fully remote?")
+    second = interview_call("second", "Is this role fully remote, then?")
+
+    async def run():
+        model = await replay(first)
+        # the next call gets a fresh job process, with nothing in memory
+        interview_agent.shared_answer_cache.cache_clear()
+        return model, await replay(second)
+
+    environment = {"ANSWER_CACHE": "1", "ANSWER_CACHE_EMBEDDER": "hashing"}
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, interview_agent.entrypoint), mock.patch.dict(os.environ, environment):
+        model, cached = virtual_time.run(run())
+        job = interview_agent.shared_answer_cache().for_job(interview_agent.load_contexts()[0])
+        assert len(job) == 1 and job.hits == 1
+    assert model.error is None and cached.error is None
+    said = [text for speaker, text in cached.transcript if speaker == "agent"]
+    assert said[-1] == "Yes, it's fully remote.", "the first candidate's answer"
+    assert len(model.turns) == len(cached.turns) == 2
+    # the model's latency, replaced by the TTS's (to within a 20ms caller frame)
+    assert abs((model.turns[1] - cached.turns[1]) - (0.5 - 0.25)) <= 0.021, (model.turns, cached.turns)
+
+
+def main():
+    tests = [
+        test_only_questions_about_the_job_are_cacheable,
+        test_index_finds_the_closest_question_exactly_and_through_ivf,
+        test_answers_expire_and_are_dropped_when_the_job_changes,
+        test_full_job_evicts_the_oldest_and_over_budget_audio_is_dropped,
+        test_job_processes_share_answers_through_the_store,
+        test_call_stores_whole_impersonal_answers_with_their_audio,
+        test_answers_with_a_candidate_s_details_are_not_stored,
+        test_lookups_stay_within_the_turn_budget,
+        test_slow_embedding_falls_back_to_the_model,
+        test_second_candidate_is_answered_from_the_cache,
+    ]
+    print("🧪 Testing the answer cache")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Tests for SIP input audio conditioning (resampler, and the jitter buffer when it goes in)
+
+Run directly (python test_audio_conditioning.py) or through pytest.
+"""
+import asyncio
+
+import numpy as np
+from livekit import rtc
+
+from audio_conditioning import ConditionedAudioInput, JitterBuffer, Resampler
+from bench_audio_conditioning import CPU_BUDGET, run_stream, synth_trace
+import virtual_time
+
+FRAME = 160  # 20ms at 8kHz
+
+
+def _tone(samples, freq=300, rate=8000):
+    return (8000 * np.sin(2 * np.pi * freq * np.arange(samples) / rate)).astype(np.int16)
+
+
+def test_resampler_is_continuous_across_frames():
+    pcm = _tone(FRAME * 10)
+    for out_rate in (16000, 24000):
+        resampler = Resampler(8000, out_rate)
+        out = np.concatenate([resampler.process(pcm[i:i + FRAME]) for i in range(0, len(pcm), FRAME)])
+        assert len(out) == len(pcm) * out_rate // 8000
+        # every output sample lies on the line between two neighbouring input samples,
+        # so a 300Hz tone can't jump by more than one input step anywhere, frame edges included
+        assert np.max(np.abs(np.diff(out.astype(np.int32)))) <= np.max(np.abs(np.diff(pcm.astype(np.int32))))
+        # and the tone is still at 300Hz
+        spectrum = np.abs(np.fft.rfft(out[out_rate // 10:]))
+        peak = np.argmax(spectrum) * out_rate / len(out[out_rate // 10:])
+        assert abs(peak - 300) < 15, peak
+
+
+def test_steady_arrivals_are_never_concealed():
+    buffer = JitterBuffer()
+    pcm = _tone(FRAME)
+    for i in range(500):
+        buffer.push(pcm, i * 0.02)
+        buffer.pop()
+    assert buffer.stats.concealed == 0
+    assert buffer.stats.dropped == 0
+    assert buffer.stats.target_depth == buffer.min_frames
+
+
+def test_lost_frames_are_concealed_with_a_fade():
+    buffer = JitterBuffer(min_delay_ms=20)
+    pcm = _tone(FRAME)
+    frames = []
+    for i in range(100):
+        if i not in (40, 41):  # two frames lost
+            buffer.push(pcm, i * 0.02)
+        frames.append(buffer.pop())
+    concealed = [frame for frame, was_concealed in frames if was_concealed]
+    assert buffer.stats.concealed == 2
+    # concealment fades the last good frame rather than going silent straight away
+    assert 0 < np.abs(concealed[0]).max() < np.abs(pcm).max()
+    assert np.abs(concealed[1]).max() < np.abs(concealed[0]).max()
+
+
+def test_latency_stays_under_the_cap():
+    buffer = JitterBuffer(max_delay_ms=120)
+    pcm = _tone(FRAME)
+    # a 400ms stall, then everything it held back arrives at once
+    for _ in range(20):
+        buffer.push(pcm, 1.0)
+    assert buffer.depth <= buffer.max_frames
+    assert buffer.stats.dropped == 20 - buffer.max_frames
+    # and the burst raised the target depth, within the cap
+    assert buffer.min_frames < buffer.stats.target_depth <= buffer.max_frames
+
+
+def test_cpu_per_stream_within_budget():
+    rng = np.random.default_rng(3)
+    trace, _ = synth_trace(rng, 20, jitter_ms=40, loss=0.02)
+    stats, added = run_stream(trace, out_rate=24000, max_delay_ms=120)
+    assert stats.cpu_seconds / 20 < CPU_BUDGET
+    assert stats.underrun_rate < 0.1
+    assert added <= 0.12
+
+
+class FakeRoomInput:
+    """Yields 10ms 8kHz frames, `burst` at a time every `burst` * 10ms: steady at 1, a jittery SIP leg at 5"""
+
+    def __init__(self, frames, burst=5):
+        self._frames = frames
+        self.burst = burst
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._frames:
+            await asyncio.sleep(3600)
+        if len(self._frames) % self.burst == 0:
+            await asyncio.sleep(0.01 * self.burst)
+        return self._frames.pop(0)
+
+    def on_attached(self):
+        pass
+
+    def on_detached(self):
+        pass
+
+
+async def _play(burst, count):
+    frames = [rtc.AudioFrame(_tone(80).tobytes(), 8000, 1, 80) for _ in range(200)]
+    conditioned = ConditionedAudioInput(FakeRoomInput(frames, burst), out_rate=24000)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    out = []
+    for _ in range(count):
+        out.append(await conditioned.__anext__())
+        out[-1].at = loop.time() - started
+    await conditioned.aclose()
+    return conditioned, out
+
+
+def test_steady_input_passes_straight_through():
+    conditioned, out = virtual_time.run(_play(burst=1, count=30))
+    assert not conditioned.buffering and conditioned.stats.buffered_runs == 0
+    assert conditioned.stats.passed == 30 and conditioned.stats.played == 0
+    # each 10ms frame is handed on as it arrives, upsampled, with no playout delay added
+    assert all(frame.sample_rate == 24000 and frame.samples_per_channel == 240 for frame in out)
+    assert all(abs(frame.at - 0.01 * (i + 1)) < 0.005 for i, frame in enumerate(out)), [frame.at for frame in out]
+
+
+def test_bursty_input_is_played_on_a_steady_clock():
+    conditioned, out = virtual_time.run(_play(burst=5, count=120))
+    # handed on as they came until the jitter estimate passed the threshold, then buffered
+    assert conditioned.buffering and conditioned.stats.buffered_runs == 1
+    assert conditioned.stats.passed > 0 and conditioned.stats.played > 0
+    ticks = [frame.at for frame in out if frame.samples_per_channel == 480]
+    # once the buffer is in, 20ms frames on a 20ms clock, regardless of how bursty the input is
+    assert len(ticks) > 10 and np.allclose(np.diff(ticks), 0.02, atol=0.005), np.diff(ticks)
+
+
+def main():
+    tests = [
+        test_resampler_is_continuous_across_frames,
+        test_steady_arrivals_are_never_concealed,
+        test_lost_frames_are_concealed_with_a_fade,
+        test_latency_stays_under_the_cap,
+        test_cpu_per_stream_within_budget,
+        test_steady_input_passes_straight_through,
+        test_bursty_input_is_played_on_a_steady_clock,
+    ]
+    print("🧪 Testing SIP audio conditioning")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Tests for the worker-level batched VAD
+
+Run directly (python test_batched_vad.py) or through pytest.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.vad import VADEventType
+from livekit.plugins.silero import onnx_model
+
+from batched_vad import BatchedModel, BatchedVAD, VADBatcher
+from bench_batched_vad import synth_windows
+
+
+def _reference(session, windows):
+    """One stream run on its own, carrying its state from window to window"""
+    state = np.zeros((2, 1, 128), dtype=np.float32)
+    context = np.zeros((1, 64), dtype=np.float32)
+    probs = []
+    for window in windows:
+        x = np.concatenate((context, window[None]), axis=1)
+        out, state = session.run(None, {"input": x, "state": state, "sr": np.array(16000, dtype=np.int64)})
+        context = x[:, -64:]
+        probs.append(out.item())
+    return np.array(probs)
+
+
+def test_batched_results_match_separate_streams():
+    session = onnx_model.new_inference_session(True)
+    rng = np.random.default_rng(1)
+    # different audio per stream, so any state leaking between streams shows up
+    inputs = [synth_windows(rng, 2) * scale for scale in (0.2, 1.0, 2.0)]
+    expected = [_reference(session, windows) for windows in inputs]
+
+    batcher = VADBatcher(session, initial_slots=2)  # forces a grow while registering
+    models = [BatchedModel(batcher) for _ in inputs]
+    results = [[] for _ in inputs]
+
+    def feed(i):
+        for window in inputs[i]:
+            results[i].append(models[i](window))
+
+    threads = [threading.Thread(target=feed, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    for got, want in zip(results, expected):
+        np.testing.assert_allclose(got, want, atol=1e-4)
+    assert batcher.stats.mean_batch > 1.5, batcher.stats
+
+
+def test_closing_a_stream_never_leaves_another_waiting():
+    session = onnx_model.new_inference_session(True)
+    batcher = VADBatcher(session, max_wait=5.0)
+    fast, gone = BatchedModel(batcher), BatchedModel(batcher)
+    window = np.zeros(512, dtype=np.float32)
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fast(window)))
+    thread.start()
+    # the batch is waiting for `gone`'s window; closing it must release the batch right away
+    gone.close()
+    thread.join(timeout=1.0)
+    batcher.close()
+    assert result, "inference was still waiting on a closed stream"
+    assert batcher.active_streams == 1
+
+
+class GatedSession:
+    """Holds each run until `gate` opens; the probability is the window's last sample"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def run(self, _, feeds):
+        self.entered.set()
+        self.gate.wait()
+        return feeds["input"][:, -1:], feeds["state"]
+
+
+def test_a_reused_slot_only_wakes_on_its_own_window():
+    session = GatedSession()
+    batcher = VADBatcher(session, max_wait=0.0)
+    old, _other = BatchedModel(batcher), BatchedModel(batcher)
+    results = {}
+
+    def infer(name, model, value):
+        results[name] = model(np.full(512, value, dtype=np.float32))
+
+    stale = threading.Thread(target=infer, args=("old", old, 0.25))
+    stale.start()
+    assert session.entered.wait(1.0)
+    # the old stream closes mid-run and a new one takes its slot
+    slot = old._slot
+    old.close()
+    new = BatchedModel(batcher)
+    assert new._slot == slot
+    fresh = threading.Thread(target=infer, args=("new", new, 0.75))
+    fresh.start()
+    time.sleep(0.05)
+    session.gate.set()
+    stale.join(timeout=1.0)
+    fresh.join(timeout=1.0)
+    batcher.close()
+    assert results == {"old": 0.25, "new": 0.75}, "the stale batch woke the slot's new stream"
+
+
+def test_vad_stream_runs_through_the_batcher():
+    async def run():
+        batcher = VADBatcher(onnx_model.new_inference_session(True))
+        vads = [BatchedVAD.load(batcher=batcher) for _ in range(2)]
+        streams = [vad.stream() for vad in vads]
+        audio = (synth_windows(np.random.default_rng(2), 1).ravel() * 32767).astype(np.int16)
+        for stream in streams:
+            for chunk in np.split(audio, len(audio) // 256):
+                stream.push_frame(rtc.AudioFrame(chunk.tobytes(), 16000, 1, len(chunk)))
+            stream.end_input()
+
+        async def collect(stream):
+            return [event async for event in stream if event.type == VADEventType.INFERENCE_DONE]
+
+        events = await asyncio.gather(*(collect(stream) for stream in streams))
+        await asyncio.gather(*(stream.aclose() for stream in streams))
+        return batcher, events
+
+    batcher, events = asyncio.run(run())
+    assert all(len(stream_events) == 31 for stream_events in events)
+    assert batcher.stats.windows == 62
+    assert batcher.active_streams == 0, "closed streams should give their slots back"
+    batcher.close()
+
+
+def main():
+    tests = [
+        test_batched_results_match_separate_streams,
+        test_closing_a_stream_never_leaves_another_waiting,
+        test_a_reused_slot_only_wakes_on_its_own_window,
+        test_vad_stream_runs_through_the_batcher,
+    ]
+    print("🧪 Testing batched VAD")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
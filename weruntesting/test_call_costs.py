@@ -0,0 +1,132 @@
+"""
+Tests for per-call usage and cost accounting
+
+Run directly (python test_call_costs.py) or through pytest.
+"""
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+from livekit.agents import metrics
+
+from call_costs import PIPELINE_PRICING, REALTIME_PRICING, CallUsage, CostLedger, Pricing
+
+
+def event(m):
+    return SimpleNamespace(metrics=m)
+
+
+def llm(prompt, cached, completion):
+    return event(metrics.LLMMetrics(
+        label="openai.LLM", request_id="r", timestamp=0.0, duration=0.5, ttft=0.2, cancelled=False,
+        completion_tokens=completion, prompt_tokens=prompt, prompt_cached_tokens=cached,
+        total_tokens=prompt + completion, tokens_per_second=50.0,
+    ))
+
+
+def realtime(text_in, audio_in, cached_text, cached_audio, text_out, audio_out):
+    Details = metrics.RealtimeModelMetrics
+    return event(metrics.RealtimeModelMetrics(
+        label="openai.realtime", request_id="r", timestamp=0.0, duration=1.0, ttft=0.3, cancelled=False,
+        input_tokens=text_in + audio_in, output_tokens=text_out + audio_out,
+        total_tokens=text_in + audio_in + text_out + audio_out, tokens_per_second=40.0,
+        input_token_details=Details.InputTokenDetails(
+            audio_tokens=audio_in, text_tokens=text_in, image_tokens=0, cached_tokens=cached_text + cached_audio,
+            cached_tokens_details=Details.CachedTokenDetails(audio_tokens=cached_audio, text_tokens=cached_text, image_tokens=0),
+        ),
+        output_token_details=Details.OutputTokenDetails(text_tokens=text_out, audio_tokens=audio_out, image_tokens=0),
+    ))
+
+
+VAD = event(metrics.VADMetrics(label="vad", timestamp=0.0, idle_time=0.0, inference_duration_total=0.01, inference_count=32))
+
+
+def test_realtime_tokens_priced_by_kind():
+    usage = CallUsage(call_id="call-1")
+    usage.on_metrics(realtime(text_in=1000, audio_in=2000, cached_text=400, cached_audio=1000, text_out=100, audio_out=500))
+    usage.on_metrics(VAD)
+    usage.finish()
+    assert (usage.text_input_tokens, usage.audio_input_tokens, usage.cached_input_tokens) == (600, 1000, 1400)
+    expected = (600 * 5.0 + 1400 * 2.5 + 100 * 20.0 + 1000 * 40.0 + 500 * 80.0) / 1e6
+    assert abs(usage.cost(REALTIME_PRICING) - expected) < 1e-9
+
+
+def test_pipeline_usage_and_call_minutes():
+    usage = CallUsage(call_id="call-2", started=1000.0)
+    usage.on_metrics(llm(prompt=1200, cached=1000, completion=80))
+    usage.on_metrics(event(metrics.STTMetrics(label="stt", request_id="r", timestamp=0.0, duration=0.4, audio_duration=90.0, streamed=False)))
+    usage.on_metrics(event(metrics.TTSMetrics(
+        label="tts", request_id="r", timestamp=0.0, ttfb=0.2, duration=1.0, audio_duration=3.0,
+        cancelled=False, characters_count=400, streamed=False,
+    )))
+    usage.call_seconds = 120.0
+    pricing = Pricing(**{**PIPELINE_PRICING.__dict__, "call_minute": 0.01})
+    expected = (200 * 0.15 + 1000 * 0.075 + 80 * 0.6 + 400 * 15.0) / 1e6 + 1.5 * 0.006 + 2 * 0.01
+    assert abs(usage.cost(pricing) - expected) < 1e-12
+
+
+def test_metrics_events_do_not_allocate():
+    usage = CallUsage(call_id="call-3")
+    events = [VAD, llm(100, 0, 10)]
+    for ev in events:  # first touch of every counter
+        usage.on_metrics(ev)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(50_000):
+        usage.on_metrics(VAD)
+    usage.on_metrics(events[1])
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.traceback[0].filename.endswith("call_costs.py"))
+    # counters are swapped for new int objects, nothing accumulates per event
+    assert grown < 256, f"{grown} bytes kept by the aggregation path over 50k events"
+
+
+def test_ledger_writes_each_call_and_queries_the_campaign():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "costs.db")
+        ledger = CostLedger(path)
+        pricing = Pricing(call_minute=1.0)
+        for i, (minutes, completed) in enumerate([(2, True), (1, False), (4, True)]):
+            usage = CallUsage(call_id=f"call-{i}", campaign="recall", completed=completed)
+            usage.call_seconds = minutes * 60.0
+            ledger.finish(usage, pricing)
+            assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM call_costs").fetchone()[0] == i + 1
+        # the failed call's minute is spread over the two completed ones
+        assert ledger.cost_per_completed_call("recall") == 3.5
+
+        # another worker process's call counts as soon as it's written
+        usage = CallUsage(call_id="call-3", campaign="recall", completed=True)
+        usage.call_seconds = 60.0
+        CostLedger(path).finish(usage, pricing)
+        assert ledger.cost_per_completed_call("recall") == 8 / 3
+        totals = ledger.campaign("recall")
+        assert (totals.calls, totals.completed) == (4, 3)
+        assert ledger.cost_per_completed_call("other") is None
+
+
+def main():
+    tests = [
+        test_realtime_tokens_priced_by_kind,
+        test_pipeline_usage_and_call_minutes,
+        test_metrics_events_do_not_allocate,
+        test_ledger_writes_each_call_and_queries_the_campaign,
+    ]
+    print("🧪 Testing call cost accounting")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
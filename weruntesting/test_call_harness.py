@@ -0,0 +1,246 @@
+"""
+Tests for the local LiveKit/SIP stand-in and the end-to-end call harness, run in virtual time
+
+Run directly (python test_call_harness.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import wave
+from unittest import mock
+
+from livekit import api
+
+from call_harness import CallReport, LocalWorker, SessionScript, check_budgets, local_environment, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+import sip_retry
+from sip_retry import SipOutcome, classify_attributes
+from warm_transfer import HUMAN_AGENT_IDENTITY
+import virtual_time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+import interview_agent  # noqa: E402
+
+# "Hello?", a pause long enough for AMD to call it a person, then one sentence
+HUMAN = CallerAudio.script(("silence", 0.2), ("speech", 0.5, 1), ("silence", 1.2), ("speech", 0.6, 2), ("silence", 3.0))
+MACHINE = CallerAudio.script(("silence", 0.2), ("speech", 4.0, 10), ("beep", 0.5))
+DIAL_INFO = {"phone_number": "+1 (415) 555-0134", "transfer_to": "+14155550100"}
+
+
+def run_locally(coro_fn):
+    """Run coro_fn() in virtual time, in a fresh local environment; returns its result and the (call_id, completed) cost rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        with local_environment(tmp, agent.entrypoint, interview_agent.entrypoint):
+            result = virtual_time.run(coro_fn())
+        costs = os.path.join(tmp, "call_costs.db")
+        rows = []
+        if os.path.exists(costs):
+            rows = sqlite3.connect(costs).execute("SELECT call_id, completed FROM call_costs").fetchall()
+    return result, rows
+
+
+def test_sip_leg_moves_through_call_statuses():
+    async def run():
+        seen = []
+        server = FakeLiveKitAPI(sip_script=lambda req: SipCall(status=486 if req.participant_identity == "busy" else 200, setup=0.02, ring=0.05))
+        room = server.create_room("room-1")
+        room.on("participant_attributes_changed", lambda changed, p: seen.append((p.identity, changed.get("sip.callStatus"))))
+        for identity in ("callee", "busy"):
+            await server.sip.create_sip_participant(
+                api.CreateSIPParticipantRequest(room_name="room-1", sip_trunk_id="ST_1", sip_call_to="+14155550134", participant_identity=identity)
+            )
+        dialing = {identity: p.attributes["sip.callStatus"] for identity, p in room.remote_participants.items()}
+        busy = room.remote_participants["busy"]
+        in_use = dict(server.trunk_calls)
+        await asyncio.sleep(0.15)
+        return seen, dialing, busy, in_use, server, room
+
+    (seen, dialing, busy, in_use, server, room), _ = run_locally(run)
+    assert dialing == {"callee": "dialing", "busy": "dialing"}
+    assert in_use == {"ST_1": 2}, "a ringing leg already holds a trunk channel"
+    assert [status for identity, status in seen if identity == "callee"] == ["ringing", "active"]
+    assert [status for identity, status in seen if identity == "busy"] == ["ringing", "hangup"]
+    assert classify_attributes(busy.attributes) == SipOutcome.BUSY
+    assert list(room.remote_participants) == ["callee"] and server.trunk_calls == {"ST_1": 1}
+
+
+def test_outbound_agent_runs_end_to_end():
+    async def run():
+        server = FakeLiveKitAPI(sip_script=lambda req: SipCall(setup=0.05, ring=0.2, audio=HUMAN), api_latency=0.005)
+        report = await run_call(
+            agent.entrypoint, server, metadata=json.dumps(DIAL_INFO), script=SessionScript(tools={1: "end_call"}), timeout=15
+        )
+        return report, server
+
+    (report, server), rows = run_locally(run)
+    assert report.error is None and report.outcome == "room deleted"
+    # AMD heard a person, the greeting went out, then the one caller turn got a reply before end_call
+    assert report.spoken == ["greet the patient and introduce yourself", "[reply to caller turn 1]"]
+    assert report.tool_calls == ["end_call"]
+    assert 0.25 <= report.dial < 0.4
+    assert 1.3 < report.answer_to_greeting < 2.5
+    assert report.heard > 0, "the caller was never attached to the model after AMD"
+    script = SessionScript()
+    assert len(report.turns) == 1 and script.endpointing + script.reply_latency <= report.turns[0] < 1.5
+    assert server.stats.sip_calls == {"ST_local": {200: 1}} and server.trunk_calls == {"ST_local": 0}
+    assert server.live_rooms == {}
+    assert rows == [(report.room, 1)], "the call's cost wasn't recorded as a completed call"
+
+
+def test_voicemail_and_busy_calls_end_without_a_conversation():
+    async def run():
+        machine = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=0.1, audio=MACHINE))
+        voicemail = await run_call(agent.entrypoint, machine, metadata=json.dumps(DIAL_INFO), timeout=15)
+        with tempfile.NamedTemporaryFile(suffix=".wav") as message:
+            with wave.open(message.name, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(16000)
+                wav.writeframes(bytes(16000))
+            with mock.patch.dict(os.environ, VOICEMAIL_MESSAGE_PATH=message.name):
+                machine = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=0.1, audio=MACHINE))
+                left = await run_call(agent.entrypoint, machine, metadata=json.dumps(DIAL_INFO), timeout=15)
+        finished = []
+        worker = LocalWorker(agent.entrypoint, timeout=15)
+        busy = FakeLiveKitAPI(
+            sip_script=lambda req: SipCall(status=486, ring=0.1),
+            job_runner=worker,
+            on_call_finished=lambda metadata, outcome: finished.append(metadata["phone_number"]),
+        )
+        await busy.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(agent_name="outbound-caller", room="busy-1", metadata=json.dumps(DIAL_INFO))
+        )
+        while not finished:
+            await asyncio.sleep(0.02)
+        return voicemail, left, worker.reports[0], finished, busy
+
+    (voicemail, left, busy, finished, server), rows = run_locally(run)
+    assert voicemail.outcome == "room deleted" and voicemail.spoken == [] and voicemail.turns == []
+    assert voicemail.dial is not None and voicemail.answer_to_greeting is None
+    assert voicemail.heard == 0.0 and left.heard == 0.0, "the model heard the greeting"
+    assert left.spoken == ["[pre-recorded voicemail message]"] and left.outcome == "room deleted"
+    # 0.2s of silence and a 4s greeting, then the beep: the message starts once the beep has
+    assert 4.7 <= left.answer_to_greeting < 5.0, f"message started {left.answer_to_greeting:.2f}s into the greeting"
+    assert busy.dial is None and busy.spoken == [] and busy.error is None
+    assert finished == [DIAL_INFO["phone_number"]]
+    assert server.stats.sip_calls == {"ST_local": {486: 1}} and server.trunk_calls == {"ST_local": 0}
+    assert sorted(completed for _, completed in rows) == [0, 0, 0]
+
+
+def test_cold_transfer_hands_the_caller_over():
+    async def run():
+        server = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=0.1, audio=HUMAN))
+        report = await run_call(
+            agent.entrypoint,
+            server,
+            metadata=json.dumps({**DIAL_INFO, "transfer_mode": "cold"}),
+            script=SessionScript(tools={1: "transfer_call"}),
+            timeout=15,
+        )
+        return report, server
+
+    (report, server), _ = run_locally(run)
+    assert report.tool_calls == ["transfer_call"]
+    assert server.stats.transfers == ["tel:+14155550100"]
+    assert report.spoken[-1] == "let the user know you'll be transferring them"
+    # the REFER took the caller's leg out of the room, which ends the job
+    assert report.outcome == "participant disconnected"
+    assert server.trunk_calls == {"ST_local": 0}
+
+
+def test_warm_transfer_holds_both_trunk_slots_until_the_bridge_ends():
+    async def run():
+        def sip_script(req):
+            if req.participant_identity == HUMAN_AGENT_IDENTITY:
+                return SipCall(ring=0.5, audio=HUMAN)
+            return SipCall(ring=0.1, audio=HUMAN, hangup_after=20.0)
+
+        server = FakeLiveKitAPI(sip_script=sip_script)
+        pool = sip_retry.shared_engine(os.environ["SIP_OUTBOUND_TRUNK_IDS"]).pool
+        leases = []
+
+        async def watch():
+            while True:
+                await asyncio.sleep(1.0)
+                leases.append((sum(pool.outstanding().values()), sum(server.trunk_calls.values())))
+
+        watcher = asyncio.create_task(watch())
+        report = await run_call(
+            agent.entrypoint,
+            server,
+            metadata=json.dumps({**DIAL_INFO, "transfer_mode": "warm"}),
+            script=SessionScript(tools={1: "transfer_call"}),
+            timeout=60,
+        )
+        await asyncio.sleep(1.0)
+        watcher.cancel()
+        return report, server, leases, pool.outstanding()
+
+    (report, server, leases, after), _ = run_locally(run)
+    assert report.tool_calls == ["transfer_call"] and server.stats.transfers == []
+    assert report.outcome == "room deleted", "when a side hung up, the other one too"
+    # the agent left after the summary; both legs kept their trunk slots while bridged
+    assert (2, 2) in leases and all(held == legs for held, legs in leases), leases
+    assert sum(after.values()) == 0 and server.trunk_calls == {"ST_local": 0}
+
+
+def test_interview_agent_answers_an_inbound_call():
+    async def run():
+        worker = LocalWorker(interview_agent.entrypoint, prewarm=interview_agent.prewarm)
+        server = FakeLiveKitAPI()
+        caller = CallerAudio.script(("silence", 1.0), ("speech", 0.6, 2), ("silence", 2.0))
+        server.inbound_call("inbound-1", SipCall(audio=caller, hangup_after=3.2))
+        report = await run_call(interview_agent.entrypoint, server, room_name="inbound-1", proc=worker.proc, timeout=15)
+        keepalives = [task for task in asyncio.all_tasks() if task.get_name() == "http_pool_keepalive"]
+        return report, keepalives
+
+    (report, keepalives), rows = run_locally(run)
+    assert report.error is None and report.outcome == "participant disconnected"
+    assert keepalives == [], "the call's HTTP keep-alive outlived it"
+    assert report.spoken[0].startswith("Hello Test Candidate")
+    assert report.dial is None, "nobody dialled an inbound call"
+    assert report.answer_to_greeting < 1.0
+    assert len(report.turns) == 1
+    assert rows == [(report.room, 1)]
+
+
+def test_budgets_flag_regressions():
+    fast = CallReport(room="a", dial=0.4, answer_to_greeting=0.8, turns=[0.9, 1.0], teardown=0.01)
+    slow = CallReport(room="b", dial=0.5, answer_to_greeting=2.0, turns=[1.1], teardown=0.02, error="RuntimeError: boom")
+    assert check_budgets([fast], {"answer_to_greeting": 1.0, "turn": 1.2}) == []
+    failures = check_budgets([fast, slow], {"answer_to_greeting": 1.0, "turn": 1.2, "teardown": 0.1})
+    assert failures[0] == "b: RuntimeError: boom"
+    assert [f.split(":")[0] for f in failures[1:]] == ["answer_to_greeting"]
+    assert check_budgets([CallReport(room="c")], {"dial": 1.0}) == ["dial: no samples"]
+
+
+def main():
+    tests = [
+        test_sip_leg_moves_through_call_statuses,
+        test_outbound_agent_runs_end_to_end,
+        test_voicemail_and_busy_calls_end_without_a_conversation,
+        test_cold_transfer_hands_the_caller_over,
+        test_warm_transfer_holds_both_trunk_slots_until_the_bridge_ends,
+        test_interview_agent_answers_an_inbound_call,
+        test_budgets_flag_regressions,
+    ]
+    print("🧪 Testing the local LiveKit/SIP stand-in end to end")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
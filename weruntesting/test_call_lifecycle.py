@@ -0,0 +1,178 @@
+"""
+Tests for ordered call teardown
+
+Uses in-process stand-ins for the session, plugin clients and room API, and
+checks that nothing (tasks, sockets, buffered audio frames) survives teardown.
+Run directly (python test_call_lifecycle.py) or through pytest.
+"""
+import asyncio
+import gc
+import socket
+import weakref
+
+from call_lifecycle import CallLifecycle, TeardownStage
+
+
+class FakeFrame:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeIO:
+    def __init__(self, events):
+        self.audio_enabled = True
+        self._events = events
+
+    def set_audio_enabled(self, enabled):
+        self.audio_enabled = enabled
+        self._events.append("audio off")
+
+
+class FakeSession:
+    """Holds buffered frames and a forwarding task, like a running AgentSession"""
+
+    def __init__(self, events):
+        self.input = FakeIO(events)
+        self.output = FakeIO(events)
+        self.buffered_frames = [FakeFrame(b"\x00" * 640) for _ in range(50)]
+        self.forward_task = asyncio.create_task(asyncio.sleep(3600))
+        self._events = events
+
+    async def aclose(self):
+        self.forward_task.cancel()
+        await asyncio.gather(self.forward_task, return_exceptions=True)
+        self.buffered_frames.clear()
+        self._events.append("session closed")
+
+
+class FakePlugin:
+    """A model client holding a real socket, like an HTTP/websocket connection"""
+
+    def __init__(self, events, delay=0.0):
+        self.sock, self._peer = socket.socketpair()
+        self._events = events
+        self._delay = delay
+
+    async def aclose(self):
+        await asyncio.sleep(self._delay)
+        self.sock.close()
+        self._peer.close()
+        self._events.append("plugin closed")
+
+
+class FakeRoomAPI:
+    def __init__(self, events):
+        self.deleted = []
+        self._events = events
+        self.room = self
+
+    async def delete_room(self, request):
+        self.deleted.append(request.room)
+        self._events.append("room deleted")
+
+
+async def _build_call(events, **lifecycle_kwargs):
+    lifecycle = CallLifecycle(**lifecycle_kwargs)
+    session = FakeSession(events)
+    plugins = [FakePlugin(events), FakePlugin(events)]
+    room_api = FakeRoomAPI(events)
+    lifecycle.attach_session(session)
+    lifecycle.attach_plugins(*plugins)
+    lifecycle.on_teardown(TeardownStage.FLUSH, "metrics", lambda: events.append("metrics flushed"))
+    lifecycle.attach_room(room_api, "call-room")
+    # a dial/session-start task still in flight when the call fails
+    lifecycle.track_task(asyncio.create_task(asyncio.sleep(3600)))
+    return lifecycle, session, plugins, room_api
+
+
+def test_teardown_releases_everything():
+    async def run():
+        events = []
+        lifecycle, session, plugins, room_api = await _build_call(events)
+        frame_ref = weakref.ref(session.buffered_frames[0])
+
+        report = await lifecycle.teardown("hangup")
+
+        assert report.clean, report
+        assert asyncio.all_tasks() == {asyncio.current_task()}, "tasks survived teardown"
+        assert all(plugin.sock.fileno() == -1 for plugin in plugins), "sockets survived teardown"
+        gc.collect()
+        assert frame_ref() is None, "audio frames survived teardown"
+        assert room_api.deleted == ["call-room"]
+        return events, report
+
+    events, report = asyncio.run(run())
+    # stop audio, then models, then flush, then the room
+    assert events.index("audio off") < events.index("session closed")
+    assert events.index("plugin closed") < events.index("metrics flushed")
+    assert events[-1] == "room deleted"
+    print(f"   slot release latency: {report.slot_release_latency * 1000:.2f}ms")
+
+
+def test_teardown_is_time_bounded():
+    async def run():
+        events = []
+        lifecycle, _, _, room_api = await _build_call(events, step_timeout=0.1)
+        lifecycle.attach_plugins(FakePlugin(events, delay=30))  # a model connection that hangs
+
+        report = await lifecycle.teardown("hangup")
+        assert room_api.deleted == ["call-room"], "room must still be deleted after a stuck step"
+        return report
+
+    report = asyncio.run(run())
+    assert [step.name for step in report.steps if step.timed_out] == ["FakePlugin"]
+    assert report.slot_release_latency < 1.0
+
+
+def test_teardown_runs_once():
+    async def run():
+        events = []
+        lifecycle, _, _, room_api = await _build_call(events)
+        first, second = await asyncio.gather(lifecycle.teardown("hangup"), lifecycle.teardown("shutdown"))
+        third = await lifecycle.teardown("late")
+        assert first is second is third
+        assert room_api.deleted == ["call-room"]
+        assert first.reason == "hangup"
+
+    asyncio.run(run())
+
+
+def test_failing_step_does_not_stop_teardown():
+    async def run():
+        events = []
+        lifecycle, _, _, room_api = await _build_call(events)
+
+        def broken_recorder():
+            raise RuntimeError("disk full")
+
+        lifecycle.on_teardown(TeardownStage.FLUSH, "recorder", broken_recorder)
+        report = await lifecycle.teardown("hangup")
+        assert [step.error for step in report.steps if step.error] == ["disk full"]
+        assert room_api.deleted == ["call-room"]
+
+    asyncio.run(run())
+
+
+def main():
+    tests = [
+        test_teardown_releases_everything,
+        test_teardown_is_time_bounded,
+        test_teardown_runs_once,
+        test_failing_step_does_not_stop_teardown,
+    ]
+    print("🧪 Testing call teardown")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
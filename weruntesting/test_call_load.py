@@ -0,0 +1,152 @@
+"""
+Tests for the loop lag monitor, the noise cancellation guard and the per-call load report
+
+Run directly (python test_call_load.py) or through pytest.
+"""
+import asyncio
+import time
+from unittest import mock
+
+import call_load
+from audio_conditioning import JitterStats
+from call_load import LoopLagMonitor, NoiseCancellationGuard, _restart_room_stream, log_load
+
+
+def test_monitor_sees_the_loop_fall_behind():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01, smoothing=0.5)
+        load = monitor.register("call")
+        monitor.start()
+        await asyncio.sleep(0.1)
+        calm = monitor.saturated
+        for _ in range(5):
+            time.sleep(0.03)  # work that holds the loop past the monitor's timer
+            await asyncio.sleep(0)
+        behind = monitor.saturated
+        await monitor.aclose()
+        return calm, behind, load
+
+    calm, behind, load = asyncio.run(run())
+    assert not calm and behind
+    assert load.peak_lag > 0.010
+
+
+class FakeMonitor:
+    def __init__(self):
+        self.saturated = False
+        self.lag = 0.02
+        self._monitor = LoopLagMonitor()
+
+    def claim_nc_change(self, now, spacing):
+        return self._monitor.claim_nc_change(now, spacing)
+
+
+def test_guard_bypasses_one_call_at_a_time_and_recovers():
+    async def run():
+        monitor = FakeMonitor()
+        switched = {}
+
+        def restart(room_input, noise_cancellation):
+            switched[room_input] = noise_cancellation
+
+        loads = [monitor._monitor.register(f"call-{i}") for i in range(3)]
+        guards = [
+            NoiseCancellationGuard(f"input-{i}", "bvc", monitor, load, check_interval=0.05, recover_after=0.1, restart=restart)
+            for i, load in enumerate(loads)
+        ]
+        for guard in guards:
+            guard.start()
+
+        monitor.saturated = True
+        await asyncio.sleep(0.07)
+        shed_first = sum(load.nc_bypassed for load in loads)
+        await asyncio.sleep(0.25)
+        shed_all = sum(load.nc_bypassed for load in loads)
+
+        monitor.saturated = False
+        await asyncio.sleep(0.6)
+        for guard in guards:
+            await guard.aclose()
+        return shed_first, shed_all, loads, switched
+
+    shed_first, shed_all, loads, switched = asyncio.run(run())
+    assert shed_first == 1, "NC should be shed from one call at a time"
+    assert shed_all == 3
+    assert not any(load.nc_bypassed for load in loads)
+    assert set(switched.values()) == {"bvc"}
+
+
+class FakeRoomInput:
+    """The parts of RoomIO's participant audio input the restart touches"""
+
+    def __init__(self):
+        self._noise_cancellation = "bvc"
+        self._participant_identity = "caller"
+        self._publication = type("Publication", (), {"track": "track", "sid": "TR_1"})()
+        self._room = type("Room", (), {"remote_participants": {"caller": "participant"}})()
+        self.streams = []
+
+    def _close_stream(self):
+        self._publication, publication = None, self._publication
+        self.closed = publication
+
+    def _on_track_available(self, track, publication, participant):
+        self._publication = publication
+        self.streams.append((track, participant, self._noise_cancellation))
+        return True
+
+
+def test_restart_recreates_the_room_stream_without_nc():
+    room_input = FakeRoomInput()
+    assert _restart_room_stream(room_input, None)
+    assert room_input.streams == [("track", "participant", None)]
+    assert _restart_room_stream(room_input, "bvc")
+    assert room_input.streams[-1] == ("track", "participant", "bvc")
+
+
+def test_restart_leaves_unknown_room_io_versions_alone():
+    room_input = FakeRoomInput()
+    with mock.patch.object(call_load, "agents_version", "1.2.0"):
+        assert not _restart_room_stream(room_input, None)
+        guard = NoiseCancellationGuard(room_input, "bvc", LoopLagMonitor(), call_load.CallLoad("call"))
+        guard.start()
+    assert room_input.streams == [] and room_input._noise_cancellation == "bvc"
+    assert guard._task is None, "the guard shouldn't watch a call it can't switch"
+
+
+def test_load_report_counts_the_call_s_late_dropped_and_concealed_frames():
+    load = call_load.CallLoad("call-1", peak_lag=0.004, nc_bypasses=1)
+    audio = JitterStats(received=500, late=3, dropped=2, concealed=7)
+    with mock.patch.object(call_load.logger, "info") as info:
+        log_load(load, audio)
+        log_load(load)
+    with_audio, without = (call.args[0] for call in info.call_args_list)
+    assert "peak event loop lag 4.0ms" in with_audio and "bypassed 1x" in with_audio
+    assert "caller frames 3 late, 2 dropped, 7 concealed of 500" in with_audio
+    assert "caller frames" not in without
+
+
+def main():
+    tests = [
+        test_monitor_sees_the_loop_fall_behind,
+        test_guard_bypasses_one_call_at_a_time_and_recovers,
+        test_restart_recreates_the_room_stream_without_nc,
+        test_restart_leaves_unknown_room_io_versions_alone,
+        test_load_report_counts_the_call_s_late_dropped_and_concealed_frames,
+    ]
+    print("🧪 Testing loop lag monitor and NC guard")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
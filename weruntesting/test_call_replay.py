@@ -0,0 +1,125 @@
+"""
+Tests for replaying recorded calls through the agents in virtual time
+
+Run directly (python test_call_replay.py) or through pytest.
+"""
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from bench_replay import synthetic_recording, write_corpus
+from call_replay import REPLAY_SCRIPT, CallerTurn, Recording, load_recording, recordings, replay_corpus, replay_file, save_recording
+from fake_livekit import CallerAudio
+
+GREETING = "Hello Test Candidate, and welcome to your interview. I'm an AI interviewer. Are you ready to begin?"
+
+
+def interview_recording():
+    """An inbound caller who talks over the greeting, then pauses for 0.4s mid-answer"""
+    audio = CallerAudio.script(
+        ("silence", 2.0), ("speech", 1.2, 4), ("silence", 2.5),
+        ("speech", 0.9, 3), ("silence", 0.4), ("speech", 0.9, 3), ("silence", 4.0),
+    )
+    return Recording(
+        name="barge-in",
+        audio=audio,
+        agent="interview",
+        inbound=True,
+        hangup_after=audio.duration,
+        caller=[CallerTurn(2.0, 3.2, "wait can you repeat"), CallerTurn(5.7, 7.9, "I have five years of Python")],
+        transcript=[
+            ("agent", GREETING),
+            ("caller", "wait can you repeat"),
+            ("agent", "Of course."),
+            ("caller", "I have five years of Python"),
+            ("agent", "Thanks."),
+        ],
+    )
+
+
+def test_recording_round_trips_through_wav_and_json():
+    recording = synthetic_recording("call-1", seed=3, turns=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_recording(tmp, recording)
+        loaded = load_recording(path.with_suffix(".json"))
+        assert recordings(tmp) == [path]
+    assert np.array_equal(loaded.audio.pcm, recording.audio.pcm) and loaded.audio.sample_rate == 16000
+    assert (loaded.caller, loaded.transcript, loaded.replies) == (recording.caller, recording.transcript, recording.replies)
+    assert loaded.tools == {2: "end_call"} and loaded.metadata == recording.metadata
+    # STT hears every recorded turn a detected turn overlaps
+    first, second = loaded.caller[1], loaded.caller[2]
+    assert loaded.transcribe(first.start + 0.1, first.end + 0.06) == first.text
+    assert loaded.transcribe(first.start, second.end) == f"{first.text} {second.text}"
+    assert loaded.transcribe(0.0, 0.1) == ""
+
+
+def test_replay_matches_its_recording_faster_than_real_time():
+    recording = synthetic_recording("dental", seed=7, turns=3, barge_in=0.0, pause=0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_recording(tmp, recording)
+        result = replay_file(path)
+        again = replay_file(path)
+    assert result.error is None and result.outcome == "room deleted", "end_call after the last turn deletes the room"
+    assert result.diff == [], "\n".join(result.diff)
+    assert result.interruptions == 0
+    assert len(result.turns) == 3
+    assert all(abs(turn - (REPLAY_SCRIPT.endpointing + REPLAY_SCRIPT.reply_latency)) < 0.05 for turn in result.turns)
+    assert result.call_seconds > recording.audio.duration - 1.0
+    assert result.call_seconds / result.wall_seconds > 10, f"only {result.call_seconds / result.wall_seconds:.1f}x real time"
+    assert (again.transcript, again.turns) == (result.transcript, result.turns), "replays aren't deterministic"
+
+
+def test_interruptions_and_split_turns_show_in_the_diff():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_recording(tmp, interview_recording())
+        result = replay_file(path)
+        # the interviewer's turns end on its own endpointing (endpointing.py), not the script's
+        with mock.patch.dict(os.environ, {"ENDPOINTING_VAD_DELAY": "0", "ENDPOINTING_ADAPTIVE": "0"}):
+            hasty = replay_file(path)
+    assert result.error is None and result.outcome == "participant disconnected"
+    assert result.interruptions == 1
+    said = result.transcript[0][1]
+    assert GREETING.startswith(said) and 10 < len(said) < len(GREETING), "the greeting wasn't cut where the caller talked over it"
+    assert result.diff[3:] == [f"-agent: {GREETING}", f"+agent: {said}", " caller: wait can you repeat"]
+    # a 0.3s endpointing ends the turn at the pause, and the reply gets talked over too
+    assert [text for speaker, text in hasty.transcript if speaker == "caller"].count("I have five years of Python") == 2
+    assert hasty.interruptions == 2
+    assert "+caller: I have five years of Python" in hasty.diff
+
+
+def test_corpus_replays_across_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_corpus(tmp, 3, seed=11, turns=2)
+        paths = recordings(tmp)
+        parallel = replay_corpus(paths, processes=2)
+        serial = replay_corpus(paths, processes=1)
+    assert [r.name for r in parallel] == [p.name for p in paths]
+    assert all(r.error is None for r in parallel)
+    assert [r.transcript for r in parallel] == [r.transcript for r in serial]
+
+
+def main():
+    tests = [
+        test_recording_round_trips_through_wav_and_json,
+        test_replay_matches_its_recording_faster_than_real_time,
+        test_interruptions_and_split_turns_show_in_the_diff,
+        test_corpus_replays_across_processes,
+    ]
+    print("🧪 Testing call replay")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Tests for compact per-call state: records, the chat history window and memory per call
+
+Run directly (python test_call_state.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+from unittest import mock
+
+from livekit.agents import Agent, llm
+
+import virtual_time
+from bench_call_memory import CALL_BUDGET, measure
+from call_state import CandidateContext, DialInfo, HistoryWindow, JobContext, ring
+
+
+class FakeSession:
+    def __init__(self):
+        self.handlers = {}
+        self.history = llm.ChatContext.empty()
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+
+def test_records_are_compact_and_round_trip():
+    record = {"job_title": "Python Developer", "company_name": "Tech Company", "requirements": ["Python", "FastAPI"], "salary": "18 LPA"}
+    first, second = (JobContext.from_record(json.loads(json.dumps(record))) for _ in range(2))
+    assert first == second and first.requirements == ("Python", "FastAPI")
+    assert first.company_name is second.company_name, "interned: calls share one copy"
+    assert first.to_dict() == {**record, "experience_level": "Mid-level"}
+    assert not hasattr(first, "__dict__")
+
+    candidate = CandidateContext.from_record({"candidate_name": None, "experience_years": 3})
+    assert candidate.candidate_name == "Candidate" and candidate.experience_years == 3
+    dial = DialInfo.from_record({"phone_number": "+14155550123", "prefetch": True, "language": "en"})
+    assert dial.transfer_mode == "warm" and dial.prefetch and dial.region is None
+    assert dial.to_dict()["language"] == "en"
+    assert DialInfo.from_record(None) == DialInfo()
+
+    samples = ring(3)
+    samples.extend([1, 2, 3, 4])
+    assert list(samples) == [2, 3, 4]
+
+
+def test_history_window_keeps_the_instructions_and_the_latest_items():
+    async def run():
+        agent = Agent(instructions="You are an interviewer.")
+        # the instructions, as the session's activity puts them in front
+        agent._chat_ctx.add_message(role="system", content=agent.instructions)
+        history = HistoryWindow(agent, max_items=4)
+        session = FakeSession()
+        history.attach_session(session)
+        for n in range(10):
+            # the session adds each item to its own history and to the agent's
+            item = session.history.add_message(role="user" if n % 2 else "assistant", content=f"line {n}")
+            agent._chat_ctx.insert(item)
+            session.handlers["conversation_item_added"](None)
+            await asyncio.sleep(0)
+        return agent, session, history
+
+    agent, session, history = virtual_time.run(run())
+    items = agent.chat_ctx.items
+    assert items[0].role == "system" and items[0].text_content == "You are an interviewer."
+    assert [item.text_content for item in items[1:]] == ["line 6", "line 7", "line 8", "line 9"]
+    assert history.trimmed == 6
+    assert [item.text_content for item in session.history.items] == ["line 6", "line 7", "line 8", "line 9"]
+
+    with mock.patch.dict(os.environ, {"CALL_HISTORY_ITEMS": "0"}):
+        session = FakeSession()
+        HistoryWindow(Agent(instructions="")).attach_session(session)
+    assert not session.handlers, "0 keeps the whole history"
+
+
+def test_long_calls_stay_within_the_memory_budget():
+    for kind in ("interview", "outbound"):
+        windowed, items, session_items = asyncio.run(measure(kind, 10, 30.0, window=True))
+        unbounded, _, _ = asyncio.run(measure(kind, 10, 30.0, window=False))
+        assert windowed < CALL_BUDGET, f"{kind}: {windowed / 1024:.1f} KiB a call"
+        assert items == 60 + 1 and session_items == 60 and unbounded > 2 * windowed
+
+
+def main():
+    tests = [
+        test_records_are_compact_and_round_trip,
+        test_history_window_keeps_the_instructions_and_the_latest_items,
+        test_long_calls_stay_within_the_memory_budget,
+    ]
+    print("🧪 Testing per-call state")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
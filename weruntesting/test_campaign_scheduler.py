@@ -0,0 +1,229 @@
+"""
+Tests for the campaign scheduler, against the fake LiveKit dispatch API
+
+Run directly (python test_campaign_scheduler.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from campaign_scheduler import CallOutcome, CallReport, CampaignScheduler, Contact, WorkerCapacity
+from sip_retry import DialResult, SipOutcome
+from fake_livekit import FakeLiveKitAPI
+from phone_numbers import NumberSet
+
+# Monday 12:00 UTC: 17:30 in Kolkata, 04:00 in Los Angeles
+NOON_UTC = datetime(2025, 3, 3, 12, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now=NOON_UTC):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingAPI:
+    """Accepts every dispatch and remembers who was called"""
+
+    def __init__(self):
+        self.called = []
+        self.agent_dispatch = self
+
+    async def create_dispatch(self, req):
+        self.called.append(json.loads(req.metadata))
+
+
+def make_scheduler(lk_api, clock, **kwargs):
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    kwargs.setdefault("capacity", WorkerCapacity(100))
+    kwargs.setdefault("max_rate", 1000.0)
+    return CampaignScheduler(path, lk_api, clock=clock, results=f"{path}-results", **kwargs)
+
+
+def test_calls_only_inside_the_callee_local_window():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock)
+        scheduler.add_contacts([Contact("+911234567890", "Asia/Kolkata"), Contact("+13105550100", "America/Los_Angeles")])
+        clock.now += 1
+        await scheduler.step()
+        first = [call["phone_number"] for call in lk_api.called]
+        # 9:00 in Los Angeles (PST, UTC-8)
+        clock.now = datetime(2025, 3, 3, 17, tzinfo=timezone.utc).timestamp()
+        await scheduler.step()
+        return first, [call["phone_number"] for call in lk_api.called]
+
+    first, later = asyncio.run(run())
+    assert first == ["+911234567890"]
+    assert later == ["+911234567890", "+13105550100"]
+
+
+def test_highest_priority_first_within_capacity():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock, capacity=WorkerCapacity(1))
+        scheduler.add_contacts([Contact(f"+1415555010{p}", priority=p) for p in (1, 3, 2)])
+        clock.now += 1
+        for _ in range(3):
+            await scheduler.step()
+            assert len(scheduler.in_flight) == 1, "more calls than free slots"
+            scheduler.complete(lk_api.called[-1]["contact_id"], CallOutcome.ANSWERED)
+        return [call["phone_number"] for call in lk_api.called]
+
+    assert asyncio.run(run()) == ["+14155550103", "+14155550102", "+14155550101"]
+
+
+def test_retry_backoff_then_give_up():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock, max_attempts=2)
+        scheduler.add_contacts([Contact("+14155550101")])
+        clock.now += 1
+        await scheduler.step()
+        scheduler.complete(lk_api.called[-1]["contact_id"], CallOutcome.RETRY)
+        clock.now += 600
+        early = await scheduler.step()
+        clock.now += 301  # past the 15 minute backoff
+        retried = await scheduler.step()
+        scheduler.complete(lk_api.called[-1]["contact_id"], CallOutcome.RETRY)
+        clock.now += 86400
+        after_max = await scheduler.step()
+        return early, retried, after_max, lk_api.called, scheduler.stats
+
+    early, retried, after_max, called, stats = asyncio.run(run())
+    assert (early, retried, after_max) == (0, 1, 0)
+    assert [call["attempt"] for call in called] == [1, 2]
+    assert stats.failed == 1
+
+
+def test_agents_report_results_back():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock, capacity=WorkerCapacity(2))
+        scheduler.add_contacts([Contact("+14155550101"), Contact("+14155550102"), Contact("+14155550103")])
+        clock.now += 1
+        await scheduler.step()
+        first, second = lk_api.called
+        # what each call's job reports at its teardown
+        answered = CallReport(first["contact_id"], first["attempt"], path=scheduler.results)
+        answered.set(CallOutcome.ANSWERED)
+        busy = CallReport(second["contact_id"], second["attempt"], path=scheduler.results)
+        busy.dial(DialResult(answered=False, outcome=SipOutcome.BUSY, trunk_id=None, attempts=1, retry_after=120.0))
+        await answered.send()
+        await busy.send()
+        await scheduler.step()
+        third = lk_api.called[-1]
+        clock.now += 121
+        await scheduler.step()
+        # a result for an attempt that's no longer the one in flight changes nothing
+        await CallReport(third["contact_id"], 7, path=scheduler.results).send()
+        await scheduler.step()
+        return lk_api.called, scheduler
+
+    called, scheduler = asyncio.run(run())
+    assert [call["phone_number"] for call in called] == ["+14155550101", "+14155550102", "+14155550103", "+14155550102"]
+    assert called[-1]["attempt"] == 2, "the busy number again after its SIP retry_after"
+    assert scheduler.stats.answered == 1 and scheduler.stats.retried == 1
+    assert scheduler.in_flight.keys() == {called[2]["contact_id"], called[3]["contact_id"]}
+
+
+def test_memory_stays_bounded_and_every_contact_is_called_once():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock, max_in_memory=100, refill_batch=40)
+        peak = 0
+        for start in range(0, 2000, 250):
+            scheduler.add_contacts(Contact(f"+1415{2_000_000 + i:07d}", priority=i % 7) for i in range(start, start + 250))
+            peak = max(peak, scheduler.in_memory)
+        clock.now += 1
+        while await scheduler.step():
+            clock.now += 1  # refill the dispatch rate limiter
+            peak = max(peak, scheduler.in_memory)
+            for call in lk_api.called[-100:]:
+                scheduler.complete(call["contact_id"], CallOutcome.ANSWERED)
+        return peak, [call["contact_id"] for call in lk_api.called]
+
+    peak, called = asyncio.run(run())
+    assert peak <= 100
+    assert sorted(called) == list(range(1, 2001))
+
+
+def test_dispatch_rate_follows_free_worker_slots():
+    async def run():
+        clock = FakeClock()
+        scheduler = None
+        lk_api = FakeLiveKitAPI(
+            workers=2,
+            slots_per_worker=2,
+            call_seconds=(0.01, 0.03),
+            outcomes={"answered": 0.8, "retry": 0.2},
+            on_call_finished=lambda metadata, outcome: scheduler.complete(metadata["contact_id"], outcome),
+        )
+        scheduler = make_scheduler(lk_api, clock, capacity=WorkerCapacity(4, lk_api, refresh=0.0), retry_backoff=lambda n: 0.0)
+        scheduler.add_contacts(Contact(f"+1415{2_000_000 + i:07d}") for i in range(30))
+        clock.now += 1
+        task = asyncio.create_task(scheduler.run(tick=0.005))
+        while scheduler.stats.answered + scheduler.stats.failed < 30:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await lk_api.aclose()
+        return lk_api.stats
+
+    stats = asyncio.run(run())
+    assert stats.queued == 0, "dispatched more calls than the workers could take"
+    assert stats.peak_calls == 4
+
+
+def test_invalid_duplicate_and_do_not_call_numbers_are_skipped():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock, region="US", dnc=NumberSet.from_numbers(["+14155550199"]))
+        scheduler.add_contacts(
+            [
+                Contact("(415) 555-0101"),
+                Contact("+1 415 555 0101"),  # the same number, typed differently
+                Contact("415-555-0199"),  # on the do-not-call list
+                Contact("not a number"),
+                Contact("'+44 20 7946 0018'", "Europe/London"),
+            ]
+        )
+        clock.now += 1
+        await scheduler.step()
+        return [call["phone_number"] for call in lk_api.called], scheduler.stats
+
+    called, stats = asyncio.run(run())
+    assert called == ["+14155550101", "+442079460018"]
+    assert (stats.duplicates, stats.do_not_call, stats.invalid) == (1, 1, 1)
+
+
+def main():
+    tests = [
+        test_calls_only_inside_the_callee_local_window,
+        test_highest_priority_first_within_capacity,
+        test_retry_backoff_then_give_up,
+        test_agents_report_results_back,
+        test_memory_stays_bounded_and_every_contact_is_called_once,
+        test_dispatch_rate_follows_free_worker_slots,
+        test_invalid_duplicate_and_do_not_call_numbers_are_skipped,
+    ]
+    print("🧪 Testing campaign scheduler")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Tests for endpointing: when a caller's turn is over
+
+Run directly (python test_endpointing.py) or through pytest.
+"""
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import endpointing
+import virtual_time
+from bench_endpointing import ScriptedTurnDetector, paced_recording
+from bench_replay import CALLER_LINES
+from call_replay import replay_file, save_recording
+from endpointing import Endpointing, EndpointingConfig, call_endpointing, register_turn_detector, turn_model
+
+
+class FakeSession:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def user_state(self, old, new):
+        self.handlers["user_state_changed"](SimpleNamespace(old_state=old, new_state=new))
+
+    def transcript(self, text):
+        self.handlers["user_input_transcribed"](SimpleNamespace(transcript=text, is_final=True))
+
+
+class FixedModel:
+    def __init__(self, probability):
+        self.probability = probability
+
+    def supports_language(self, language):
+        return language == "en"
+
+    def unlikely_threshold(self, language):
+        return 0.5
+
+    async def predict_end_of_turn(self, chat_ctx):
+        return self.probability
+
+
+async def speak(session, seconds, text):
+    session.user_state("listening", "speaking")
+    await asyncio.sleep(seconds)
+    session.user_state("speaking", "listening")
+    session.transcript(text)
+
+
+def test_delay_follows_the_detector_and_the_callers_pace():
+    config = EndpointingConfig(vad_silence=0.3, min_delay=0.2, vad_delay=0.5, max_delay=1.5, reference_pace=2.5)
+    ending = Endpointing(config=config)
+    assert ending.delay(0.1, 0.5) == 1.5, "mid-sentence"
+    assert ending.delay(0.9, 0.5) == 0.2
+    assert ending.delay(None, None) == 0.5, "no detector"
+    assert ending.session_options()["min_endpointing_delay"] == ending.session_options()["max_endpointing_delay"] == 0.0
+
+    session = FakeSession()
+    ending.attach_session(session)
+    # 10 words in 8.3s of speech, less the VAD's trailing silence: 1.25 words a second
+    virtual_time.run(speak(session, 8.3, "so I think I have about five years of Python"))
+    assert abs(ending.pace() - 1.25) < 1e-6
+    assert abs(ending.delay(0.9, 0.5) - 0.4) < 1e-6 and abs(ending.delay(None, None) - 1.0) < 1e-6, "twice as long"
+    fixed = Endpointing(config=EndpointingConfig(adaptive=False))
+    fixed._words, fixed._speaking = 10, 8.0
+    assert fixed.delay(None, None) == 0.5
+
+
+def test_turn_ends_after_the_delay_and_pauses_are_learned():
+    async def run():
+        ending = Endpointing(FixedModel(0.9), language=lambda: "fr", config=EndpointingConfig())
+        session = FakeSession()
+        ending.attach_session(session)
+        await speak(session, 1.0, "bonjour")
+        started = asyncio.get_running_loop().time()
+        # unsupported language: VAD and pace
+        assert await ending.predict_end_of_turn(None) == 1.0
+        waited = asyncio.get_running_loop().time() - started
+        assert abs(waited - 0.5) < 1e-6, waited
+        assert ending.stats.detected == 0
+
+        ending.language = lambda: "en"
+        await asyncio.sleep(2.0)
+        await speak(session, 1.0, "I have five")
+        deciding = asyncio.create_task(ending.predict_end_of_turn(None))
+        await asyncio.sleep(0.1)
+        # they carry on 0.4s after they stopped: a pause, and the session cancels the decision
+        session.user_state("listening", "speaking")
+        deciding.cancel()
+        await asyncio.gather(deciding, return_exceptions=True)
+        await asyncio.sleep(1.0)
+        session.user_state("speaking", "listening")
+        assert await ending.predict_end_of_turn(None) == 0.9
+        # a turn ended, and they carried on 0.8s after they stopped: cut off
+        await asyncio.sleep(0.3)
+        session.user_state("listening", "speaking")
+        return ending
+
+    ending = virtual_time.run(run())
+    assert (ending.stats.turns, ending.stats.detected, ending.stats.pauses, ending.stats.cutoffs) == (2, 1, 2, 1)
+    assert [round(pause, 3) for pause in ending._pauses] == [0.4, 0.8]
+    # silence alone waits out their usual pause, the detector's verdict doesn't
+    assert abs(ending.delay(None, None) - (0.8 - 0.3 + 0.1)) < 1e-6
+    assert ending.delay(0.9, 0.5) == 0.2
+
+
+def test_turn_detector_is_only_used_once_downloaded():
+    with mock.patch.object(endpointing, "turn_detector_ready", lambda model_type: False):
+        assert not register_turn_detector("en")
+    assert turn_model("en") is None
+    with mock.patch.dict(os.environ, {"ENDPOINTING_MIN_DELAY": "0.1", "ENDPOINTING_ADAPTIVE": "0"}):
+        ending = call_endpointing("en")
+    assert ending.model is None and ending.config.min_delay == 0.1 and not ending.config.adaptive
+
+
+def test_slow_caller_is_not_cut_off_mid_sentence():
+    """A caller who stops to think: silence alone ends their turns early, the turn detector doesn't"""
+    recording = paced_recording("slow", seed=3, agent="interview", turns=4, pause=1.0)
+    lines = CALLER_LINES["interview"]
+
+    def heard(environment, detector=None):
+        with mock.patch.dict(os.environ, environment), mock.patch.object(endpointing, "turn_model", lambda model_type: detector):
+            result = replay_file(path)
+        assert result.error is None, result.error
+        return sum(speaker == "caller" for speaker, _ in result.transcript), result.turns
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_recording(tmp, recording)
+        fixed, _ = heard({"ENDPOINTING_VAD_SILENCE": "0.5", "ENDPOINTING_VAD_DELAY": "0", "ENDPOINTING_ADAPTIVE": "0"})
+        detected, turns = heard({}, ScriptedTurnDetector(lines))
+    assert fixed > len(recording.caller), "split at the pauses"
+    assert detected == len(recording.caller) == len(turns)
+    assert max(turns) < 1.0 + 0.5, "the caller's last word to the reply: the delays and the model's latency"
+
+
+def main():
+    tests = [
+        test_delay_follows_the_detector_and_the_callers_pace,
+        test_turn_ends_after_the_delay_and_pauses_are_learned,
+        test_turn_detector_is_only_used_once_downloaded,
+        test_slow_caller_is_not_cut_off_mid_sentence,
+    ]
+    print("🧪 Testing endpointing")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Tests for the per-call HTTP client pool
+
+Uses the local HTTPS stand-in from bench_http_pool.py (needs the openssl CLI).
+Run directly (python test_http_pool.py) or through pytest.
+"""
+import asyncio
+import ssl
+import tempfile
+
+from bench_http_pool import FakeOpenAIServer, make_certificate
+from http_pool import HTTPClientPool
+
+
+def test_plugins_share_one_client_per_host():
+    async def run():
+        pool = HTTPClientPool(max_connections_per_host=7)
+        first = pool.openai_client("https://api.openai.com/v1", api_key="sk-test")
+        second = pool.openai_client("https://api.openai.com/v1", api_key="sk-test")
+        assert first is second
+        assert pool.client("https://api.openai.com/v1/audio/speech") is pool.client("https://api.openai.com/v1")
+        assert pool.client("https://api.openai.com") is not pool.client("https://example.com")
+        pool_limits = pool.client("https://api.openai.com")._transport._pool
+        assert pool_limits._max_connections == 7
+        await pool.aclose()
+
+    asyncio.run(run())
+
+
+def test_preconnect_and_keepalive_reuse_connections():
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cert, key = make_certificate(tmp)
+            server = FakeOpenAIServer(cert, key, rtt=0.0)
+            port = await server.start()
+            base_url = f"https://127.0.0.1:{port}/v1"
+
+            pool = HTTPClientPool(verify=ssl.create_default_context(cafile=str(cert)), ping_interval=0.05)
+            await pool.preconnect([base_url])
+            assert server.connections == 1
+
+            pool.start_keepalive()
+            await asyncio.sleep(0.2)
+            for path in ("/audio/transcriptions", "/chat/completions", "/audio/speech"):
+                response = await pool.client(base_url).post(base_url + path, json={})
+                assert response.status_code == 200
+
+            # pings and the whole first turn ran over the preconnected connection
+            assert server.requests >= 5
+            assert server.connections == 1
+
+            await pool.aclose()
+            assert pool._keepalive_task is None
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    tests = [
+        test_plugins_share_one_client_per_host,
+        test_preconnect_and_keepalive_reuse_connections,
+    ]
+    print("🧪 Testing the shared HTTP client pool")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
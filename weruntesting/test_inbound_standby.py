@@ -0,0 +1,164 @@
+"""
+Tests for inbound hot standby: executor sizing, greeting pre-synthesis and ring-to-greeting tracking
+
+Run directly (python test_inbound_standby.py) or through pytest.
+"""
+import math
+import threading
+import time
+from types import SimpleNamespace
+
+from livekit import rtc
+
+from inbound_standby import RingToGreeting, StandbyLoad, StandbySizer, poisson_quantile, prepare_greeting
+from test_campaign_scheduler import FakeClock
+
+
+class FakeTTS:
+    """Yields two silent frames per synthesize() and counts the requests"""
+
+    requests = 0
+
+    def __init__(self):
+        self.closed = False
+
+    def synthesize(self, text):
+        FakeTTS.requests += 1
+        return _FakeStream()
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _FakeStream:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        for _ in range(2):
+            yield SimpleNamespace(frame=rtc.AudioFrame.create(24000, 1, 480))
+
+
+class FakeSession:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def off(self, event, handler):
+        self.handlers[event].remove(handler)
+
+    def emit(self, event, ev):
+        for handler in list(self.handlers.get(event, ())):
+            handler(ev)
+
+
+def test_poisson_quantile_matches_the_distribution():
+    for mean in (0.1, 1.0, 4.0, 20.0):
+        k = poisson_quantile(mean, 0.99)
+        cdf = lambda n: sum(math.exp(-mean) * mean**i / math.factorial(i) for i in range(n + 1))
+        assert cdf(k) >= 0.99 and (k == 0 or cdf(k - 1) < 0.99), (mean, k)
+    assert poisson_quantile(0.0, 0.99) == 0
+    assert 100 < poisson_quantile(100.0, 0.99) < 130
+
+
+def test_sizer_follows_the_arrival_rate():
+    clock = FakeClock(0.0)
+    sizer = StandbySizer(max_idle=8, min_idle=1, warmup=2.0, windows=(60.0, 600.0), clock=clock)
+    assert sizer.target() == 1  # quiet worker keeps one warm
+
+    for _ in range(120):  # a burst: 2 calls a second
+        clock.now += 0.5
+        sizer.record_arrival()
+    busy = sizer.target()
+    assert poisson_quantile(2.0 * 2.0, 0.99) > 8 and busy == 8  # capped at max_idle
+
+    clock.now += 120  # the short window has emptied, the long one still remembers
+    assert 1 < sizer.target() < busy
+    clock.now += 600
+    assert sizer.target() == 1
+
+    sizer.observe_warmup(12.0)  # slower warm-ups need more standby for the same rate
+    assert sizer.warmup > 2.0
+
+
+def test_load_fnc_caps_the_worker_idle_target():
+    clock = FakeClock(0.0)
+    sizer = StandbySizer(max_idle=6, clock=clock)
+    targets = []
+    pool = SimpleNamespace(set_target_idle_processes=targets.append, target_idle_processes=6)
+    worker = SimpleNamespace(_proc_pool=pool)
+    load = StandbyLoad(sizer, base=lambda worker: 0.25)
+
+    assert load(worker) == 0.25 and targets[-1] == 1
+    pool.set_target_idle_processes(4)  # the worker lowers its own target under load
+    assert targets[-1] == 1
+    for _ in range(60):
+        sizer.record_arrival()
+    load(worker)
+    assert targets[-1] == 4, "standby above what the worker has room for"
+
+
+def test_greeting_synthesized_once_outside_any_event_loop():
+    FakeTTS.requests = 0
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(prepare_greeting("Hello from the test", FakeTTS))) for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeTTS.requests == 1
+    assert all(frames is results[0] and len(frames) == 2 for frames in results)
+
+    class BrokenTTS(FakeTTS):
+        def synthesize(self, text):
+            raise RuntimeError("no network")
+
+    assert prepare_greeting("Another greeting", BrokenTTS) is None
+
+
+def test_ring_to_greeting_recorded_on_first_speech():
+    metrics = RingToGreeting()
+    session = FakeSession()
+    metrics.track(session, time.time() - 1.5, standby=True)
+    session.emit("agent_state_changed", SimpleNamespace(new_state="thinking"))
+    session.emit("agent_state_changed", SimpleNamespace(new_state="speaking"))
+    session.emit("agent_state_changed", SimpleNamespace(new_state="speaking"))
+    assert len(metrics.samples[True]) == 1 and 1.5 <= metrics.samples[True][0] < 2.5
+    assert not metrics.samples[False]
+    metrics.log_summary()
+
+
+def main():
+    tests = [
+        test_poisson_quantile_matches_the_distribution,
+        test_sizer_follows_the_arrival_rate,
+        test_load_fnc_caps_the_worker_idle_target,
+        test_greeting_synthesized_once_outside_any_event_loop,
+        test_ring_to_greeting_recorded_on_first_speech,
+    ]
+    print("🧪 Testing inbound hot standby")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Tests for per-call interview languages: selection, detection and prewarmed greetings
+
+Run directly (python test_languages.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from livekit.agents import stt
+
+import virtual_time
+from call_harness import LocalWorker, local_environment, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+from languages import AUTO, CallLanguage, language_code, language_for_call, prewarmed_languages
+from test_inbound_standby import FakeTTS
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import interview_agent  # noqa: E402
+
+
+class FakeSTT:
+    def __init__(self):
+        self.language = ""
+
+    def update_options(self, *, language):
+        self.language = language
+
+
+def final(text, language):
+    return stt.SpeechEvent(type=stt.SpeechEventType.FINAL_TRANSCRIPT, alternatives=[stt.SpeechData(language, text)])
+
+
+async def heard(call_language, *events):
+    async def source():
+        for ev in events:
+            yield ev
+
+    return [ev async for ev in call_language.observe(source())]
+
+
+async def _after(seconds, ev):
+    await asyncio.sleep(seconds)
+    yield ev
+
+
+def test_call_language_comes_from_metadata_or_the_default():
+    assert [language_code(name) for name in ("hi", "HI-in", "hindi", "urdu", "english", "fr", None)] == [
+        "hi", "hi", "hi", "hi", "en", None, None,
+    ]
+    assert language_for_call({"language": "hi"}) == "hi"
+    assert language_for_call({"language": "auto"}) == AUTO
+    assert language_for_call({}) == "en"
+    with mock.patch.dict(os.environ, {"CALL_LANGUAGE": "hi", "CALL_LANGUAGES": "hi, en, xx, hi"}):
+        assert language_for_call({}) == "hi"
+        assert language_for_call({"language": "klingon"}) == "hi", "unsupported: the default"
+        assert prewarmed_languages() == ["hi", "en"]
+    assert interview_agent.call_metadata("+919073554610") == {"phone_number": "+919073554610"}
+    assert interview_agent.call_metadata('{"phone_number": "+919073554610", "language": "hi"}')["language"] == "hi"
+    assert interview_agent.call_metadata("") == {}
+
+
+def test_transcripts_carry_language_codes():
+    language = CallLanguage("hi")
+    events = virtual_time.run(heard(language, final("मेरा नाम राहुल है", "hindi"), final("okay", "")))
+    assert [ev.alternatives[0].language for ev in events] == ["hi", ""]
+    assert language.code == "hi" and not language.detecting
+
+
+def test_auto_detection_settles_on_the_first_real_sentence():
+    language, whisper, changes = CallLanguage(AUTO), FakeSTT(), []
+    language.attach_stt(whisper)
+    language.on_change(changes.append)
+    assert language.detecting and language.code == "en"
+    virtual_time.run(heard(language, final("हाँ", "hindi")))
+    assert language.detecting, "one word is too little to go on"
+    virtual_time.run(heard(language, final("जी मैं तैयार हूँ", "urdu"), final("Yes I am ready", "english")))
+    assert not language.detecting and language.code == "hi" and changes == ["hi"]
+    assert whisper.language == "hi", "Whisper is pinned for the rest of the call"
+
+    async def silent_start():
+        language = CallLanguage(AUTO, detect_for=10.0)
+        language.attach_stt(whisper)
+        events = language.observe(_after(11.0, final("ok", "english")))
+        return language, [ev async for ev in events]
+
+    language, _ = virtual_time.run(silent_start())
+    assert not language.detecting and language.code == "en" and whisper.language == "en"
+
+
+def test_detected_language_switches_the_interviewer():
+    async def run():
+        language = CallLanguage(AUTO)
+        agent = interview_agent.InterviewAgent(*interview_agent.load_contexts(), language=language)
+        assert "Conduct the interview in English." in agent.instructions
+        await heard(language, final("जी मैं बिल्कुल तैयार हूँ", "hindi"))
+        await agent._switching
+        return agent
+
+    agent = virtual_time.run(run())
+    assert "Conduct the interview in Hindi" in agent.instructions
+
+
+def test_hindi_callers_are_greeted_as_fast_as_english_ones():
+    """With standby, each language's greeting is ready before the call"""
+    caller = CallerAudio.script(("silence", 5.0), ("speech", 0.6, 2), ("silence", 2.0))
+    environment = {"INBOUND_STANDBY": "1", "CALL_LANGUAGES": "en,hi"}
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, interview_agent.entrypoint):
+        with mock.patch.dict(os.environ, environment):
+            FakeTTS.requests = 0
+            with mock.patch.object(interview_agent, "make_tts", FakeTTS):
+                worker = LocalWorker(interview_agent.entrypoint, prewarm=interview_agent.prewarm)
+
+            async def call(room, metadata):
+                server = FakeLiveKitAPI()
+                server.inbound_call(room, SipCall(audio=caller, hangup_after=7.6))
+                return await run_call(interview_agent.entrypoint, server, metadata=metadata, room_name=room, proc=worker.proc, timeout=20)
+
+            english = virtual_time.run(call("inbound-en", ""))
+            hindi = virtual_time.run(call("inbound-hi", json.dumps({"language": "hi"})))
+    assert FakeTTS.requests == 2, "one greeting per language, synthesized in prewarm"
+    assert english.error is None and hindi.error is None
+    assert english.spoken[0].startswith("Hello Test Candidate") and hindi.spoken[0].startswith("नमस्ते Test Candidate")
+    assert hindi.answer_to_greeting == english.answer_to_greeting < 0.5
+    assert hindi.turns == english.turns
+
+
+def main():
+    tests = [
+        test_call_language_comes_from_metadata_or_the_default,
+        test_transcripts_carry_language_codes,
+        test_auto_detection_settles_on_the_first_real_sentence,
+        test_detected_language_switches_the_interviewer,
+        test_hindi_callers_are_greeted_as_fast_as_english_ones,
+    ]
+    print("🧪 Testing interview languages")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
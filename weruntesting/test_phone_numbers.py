@@ -0,0 +1,104 @@
+"""
+Tests for phone number normalization and number sets
+
+Run directly (python test_phone_numbers.py) or through pytest.
+"""
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from phone_numbers import InvalidPhoneNumber, NumberSet, normalize, number_key
+
+
+def test_normalizes_common_formats_to_e164():
+    cases = {
+        ("'(415) 555-0134'", "US"): "+14155550134",  # quoted, as interview_agent gets it in metadata
+        ("1-415-555-0134", "US"): "+14155550134",
+        ("+1 415 555 0134 ext. 12", "US"): "+14155550134",
+        ("011 44 20 7946 0018", "US"): "+442079460018",
+        ("+44 (0)20 7946 0018", "US"): "+442079460018",
+        ("020 7946 0018", "GB"): "+442079460018",
+        ("0091 98765 43210", "GB"): "+919876543210",
+        ("098765 43210", "IN"): "+919876543210",
+        ("0412 345 678", "AU"): "+61412345678",
+        ("tel:+380441234567", "US"): "+380441234567",  # no local rules, generic E.164 check
+        # PHONE_REGION, India unless set
+        ("98765 43210", None): "+919876543210",
+        ("91 98765 43210", None): "+919876543210",  # the country code without its "+"
+        ("1-415-555-0134", None): "+14155550134",
+    }
+    for (raw, region), expected in cases.items():
+        assert normalize(raw, region) == expected, (raw, region)
+    with mock.patch.dict(os.environ, PHONE_REGION="us"):
+        assert normalize("(415) 555-0134") == "+14155550134"
+
+
+def test_rejects_numbers_that_cannot_be_dialled():
+    for raw in ("", "not a number", "555-0134", "+1 415 055 0134", "+91123456789", "+0123456789", "(415) 555-013"):
+        try:
+            normalize(raw)
+        except InvalidPhoneNumber:
+            continue
+        raise AssertionError(f"{raw!r} was accepted")
+
+
+def test_home_numbers_win_over_a_missing_plus():
+    # Indian mobiles that also read as a Philippine, New Zealand or Singapore number without its "+"
+    for raw in ("6321234567", "6421234567", "65 9123 4567", "6591234567"):
+        assert normalize(raw) == f"+91{raw.replace(' ', '')}", raw
+    assert normalize("+65 9123 4567") == "+6591234567"
+    assert normalize("65 9123 4567", "US") == "+6591234567", "not a US number, so the \"+\" was left off"
+
+
+def test_number_set_membership_adds_and_round_trip():
+    numbers = NumberSet.from_numbers(["+14155550134", "+442079460018"])
+    numbers.merge_at = 4
+    assert "+14155550134" in numbers and "+14155550135" not in numbers
+
+    assert numbers.add("+919876543210")
+    assert not numbers.add("+919876543210")
+    for i in range(10):  # crosses the merge threshold
+        numbers.add(f"+1415555{1000 + i}")
+    assert len(numbers) == 13
+    assert "+919876543210" in numbers and "+14155551009" in numbers
+
+    keys = np.array([number_key("+442079460018"), number_key("+442079460019")])
+    assert numbers.contains_keys(keys).tolist() == [True, False]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dnc.npy")
+        numbers.save(path)
+        assert len(NumberSet.load(path)) == 13
+
+        text = os.path.join(tmp, "dnc.txt")
+        with open(text, "w") as f:
+            f.write("+1 (415) 555-0134\nnot a number\n\n+44 20 7946 0018\n")
+        loaded = NumberSet.load(text)
+        assert len(loaded) == 2 and "+14155550134" in loaded
+
+
+def main():
+    tests = [
+        test_normalizes_common_formats_to_e164,
+        test_rejects_numbers_that_cannot_be_dialled,
+        test_home_numbers_win_over_a_missing_plus,
+        test_number_set_membership_adds_and_round_trip,
+    ]
+    print("🧪 Testing phone number normalization")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Tests for prefetched replies to the predictable turns of a confirmation call
+
+Run directly (python test_prefetch.py) or through pytest.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from livekit.agents.metrics import RealtimeModelMetrics
+
+import virtual_time
+from call_harness import local_environment
+from call_replay import CallerTurn, Recording, replay
+from fake_livekit import CallerAudio
+from prefetch import Intent, PrefetchStats, ResponsePrefetcher, classify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+
+DIAL_INFO = {"phone_number": "+14155550134", "transfer_to": "+14155550100"}
+
+
+class CountingTTS:
+    """One 20ms frame per character, after `latency` seconds; counts what it was asked to say"""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.texts = []
+
+    def synthesize(self, text):
+        self.texts.append(text)
+        tts = self
+
+        class Stream:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                pass
+
+            async def __aiter__(self):
+                await asyncio.sleep(tts.latency)
+                for _ in text:
+                    yield SimpleNamespace(frame=None)
+
+        return Stream()
+
+
+def partial(text, final=False):
+    return SimpleNamespace(transcript=text, is_final=final)
+
+
+def test_classifier_reads_partial_transcripts():
+    assert classify("Yes that works for me")[0] == Intent.CONFIRM
+    assert classify("Yes that works for me")[1] == 1.0
+    assert classify("yes")[1] < classify("yes that works")[1], "one word is less certain than a phrase"
+    assert classify("Can we move it to Thursday instead")[0] == Intent.RESCHEDULE
+    assert classify("yes but I can't make it")[0] == Intent.RESCHEDULE
+    assert classify("Could I talk to someone at the front desk")[0] == Intent.TRANSFER
+    assert classify("No thanks, that's all. Bye!")[0] == Intent.END
+    # a goodbye only without a hint of wanting anything else
+    assert classify("No thank you, I can't come on Tuesday")[0] == Intent.RESCHEDULE
+    assert classify("No thanks, I need to change it")[0] == Intent.RESCHEDULE
+    assert classify("Yes, that's it.")[0] == Intent.CONFIRM
+    assert classify("thanks") == (Intent.OTHER, 0.0), "not far enough ahead"
+    assert classify("Sorry what time was that again") == (Intent.OTHER, 0.0)
+    # too little to go on: "okay" and "thank you" pull different ways
+    assert classify("Okay great thank you")[1] < 0.5
+
+
+def test_prefetcher_synthesizes_live_branches_and_hands_them_over():
+    async def run():
+        tts = CountingTTS()
+        metrics = PrefetchStats()
+        prefetch = ResponsePrefetcher(metrics=metrics, name="Jayden", appointment_time="Tuesday at 10:00 AM")
+        prefetch.attach_session(SimpleNamespace(tts=tts))
+        prefetch.on_metrics(SimpleNamespace(metrics=SimpleNamespace(ttft=0.6)))  # not a model's metrics, ignored
+        assert prefetch.model_latency == 0.8
+
+        # the patient is still talking: "yes" alone isn't enough, "yes that works" is
+        prefetch.on_transcript(partial("Yes"))
+        prefetch.on_transcript(partial("Yes that works"))
+        prefetch.on_transcript(partial("Yes that works for me"))
+        await asyncio.sleep(0.05)
+        assert tts.texts == ["Great, you're all set for Tuesday at 10:00 AM. Is there anything else I can help you with?"]
+        reply = await prefetch.take("Yes that works for me, thanks")
+        assert reply.intent == Intent.CONFIRM and len(reply.frames) == len(tts.texts[0])
+        # it was still synthesizing when the turn ended, so part of the model's latency went on waiting
+        assert abs(prefetch.stats.saved[0] - (0.8 - 0.15)) < 1e-6
+
+        # after a confirmation only a goodbye is predictable
+        prefetch.on_transcript(partial("Actually can I reschedule"))
+        assert len(tts.texts) == 1
+        assert await prefetch.take("Actually can I reschedule") is None, "a miss goes to the model"
+        prefetch.on_transcript(partial("Okay bye"))
+        await asyncio.sleep(0.05)
+        prefetch.update(name="Jay")  # drops the goodbye, which has the name in it
+        prefetch.on_transcript(partial("Okay bye now"))
+        await asyncio.sleep(1.0)
+        assert tts.texts[1:] == [
+            "Thanks for your time, Jayden. Have a great day, goodbye!",
+            "Thanks for your time, Jay. Have a great day, goodbye!",
+        ]
+        # the realtime model's metrics set the latency a hit saves
+        prefetch.on_metrics(SimpleNamespace(metrics=RealtimeModelMetrics.model_construct(ttft=0.5)))
+        assert prefetch.model_latency == 0.5
+        assert (await prefetch.take("Okay bye now")).text.endswith("Jay. Have a great day, goodbye!")
+        assert prefetch.stats.saved[-1] == 0.5
+        await prefetch.aclose()
+        return metrics
+
+    metrics = virtual_time.run(run())
+    assert (metrics.turns, metrics.hits, metrics.syntheses) == (3, 2, 3)
+    assert metrics.wasted == 0, "the stale goodbye was dropped, not left unplayed"
+    assert metrics.by_intent == {"confirm": 1, "end": 1}
+    assert abs(metrics.hit_rate - 2 / 3) < 1e-9 and abs(metrics.saved_per_turn - (0.65 + 0.5) / 3) < 1e-6
+
+
+def confirmation_recording(name, lines):
+    """An outbound call: "Hello?", then `lines`, each after the agent has had time to answer"""
+    parts, caller, t = [("silence", 0.2), ("speech", 0.5, 1)], [CallerTurn(0.2, 0.7, "Hello?")], 0.7
+    for line in lines:
+        words = len(line.split())
+        parts += [("silence", 9.0), ("speech", words * 0.3, words)]
+        caller.append(CallerTurn(round(t + 9.0, 3), round(t + 9.0 + words * 0.3, 3), line))
+        t += 9.0 + words * 0.3
+    parts.append(("silence", 8.0))
+    audio = CallerAudio.script(*parts)
+    return Recording(name=name, audio=audio, metadata=dict(DIAL_INFO), hangup_after=audio.duration, caller=caller)
+
+
+def test_prefetched_replies_play_as_soon_as_the_turn_ends():
+    recording = confirmation_recording("confirm", ["Yes that works for me", "Sorry what was the address again", "No thanks that's all"])
+    prefetching = Recording(**{**recording.__dict__, "metadata": {**DIAL_INFO, "prefetch": True}})
+
+    async def run():
+        return await replay(recording), await replay(prefetching)
+
+    # turns end after the same 0.5s of silence in both modes, so only the replies differ
+    endpointing = {"ENDPOINTING_VAD_SILENCE": "0.5", "ENDPOINTING_VAD_DELAY": "0", "ENDPOINTING_ADAPTIVE": "0"}
+    with tempfile.TemporaryDirectory() as tmp, local_environment(tmp, agent.entrypoint), mock.patch.dict(os.environ, endpointing):
+        model, prefetched = virtual_time.run(run())
+    assert model.error is None and prefetched.error is None
+    said = [text for speaker, text in prefetched.transcript if speaker == "agent"]
+    # the confirmation and the goodbye were ready, the question went to the model
+    assert said[1].startswith("Great, you're all set for") and said[3].endswith("goodbye!")
+    assert said[2] == "[reply to caller turn 2]"
+    assert said[4].startswith("You have just said goodbye."), "the model gets the turn after the goodbye"
+    assert prefetched.outcome == "participant disconnected", "and the prefetched goodbye doesn't hang up"
+    assert len(model.turns) == len(prefetched.turns) == 3
+    saved = [before - after for before, after in zip(model.turns, prefetched.turns)]
+    assert [round(s, 1) for s in saved] == [0.5, 0.0, 0.5], saved
+
+
+def main():
+    tests = [
+        test_classifier_reads_partial_transcripts,
+        test_prefetcher_synthesizes_live_branches_and_hands_them_over,
+        test_prefetched_replies_play_as_soon_as_the_turn_ends,
+    ]
+    print("🧪 Testing response prefetch")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
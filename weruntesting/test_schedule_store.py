@@ -0,0 +1,136 @@
+"""
+Tests for the appointment schedule store
+
+Run directly (python test_schedule_store.py) or through pytest.
+"""
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from schedule_store import ScheduleStore, SlotTaken, StaleAppointment
+
+# a Monday
+MONDAY = datetime(2025, 3, 3)
+
+
+def temp_db():
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    return path
+
+
+def test_next_free_slots_skip_bookings_and_closed_hours():
+    store = ScheduleStore(temp_db())
+    for hour, minute in ((9, 0), (9, 30), (10, 30)):
+        store.add("dr-lee", f"+1555000{hour}{minute}", MONDAY.replace(hour=hour, minute=minute))
+    store.add("dr-lee", "+15550001600", MONDAY.replace(hour=16), minutes=60)
+
+    assert store.next_free_slots("dr-lee", MONDAY, count=2) == [
+        MONDAY.replace(hour=10),
+        MONDAY.replace(hour=11),
+    ]
+    # Monday is full from 4pm, the weekend is closed: next is Tuesday 9am
+    friday_evening = datetime(2025, 3, 7, 17)
+    assert store.next_free_slots("dr-lee", MONDAY.replace(hour=15, minute=45), count=1) == [datetime(2025, 3, 4, 9)]
+    assert store.next_free_slots("dr-lee", friday_evening, count=1) == [datetime(2025, 3, 10, 9)]
+    # another provider's bookings don't count
+    assert store.next_free_slots("dr-kim", MONDAY, count=1) == [MONDAY.replace(hour=9)]
+    assert not store.is_free("dr-lee", MONDAY.replace(hour=16, minute=30), 30)
+    assert not store.is_free("dr-kim", datetime(2025, 3, 8, 10), 30)  # Saturday
+
+
+def test_reschedule_persists_and_checks_the_version():
+    path = temp_db()
+    store = ScheduleStore(path)
+    booked = store.add("dr-lee", "+15550001111", MONDAY.replace(hour=9))
+    moved = store.reschedule(booked, MONDAY.replace(hour=14))
+    assert moved.version == booked.version + 1
+    assert store.is_free("dr-lee", MONDAY.replace(hour=9), 30)
+
+    reopened = ScheduleStore(path)
+    assert reopened.for_patient("+15550001111", MONDAY) == moved
+
+    # rescheduling from the old read loses to the write that already happened
+    try:
+        store.reschedule(booked, MONDAY.replace(hour=15))
+    except StaleAppointment:
+        pass
+    else:
+        raise AssertionError("stale version was accepted")
+
+
+def test_simultaneous_calls_cannot_take_the_same_slot():
+    path = temp_db()
+    setup = ScheduleStore(path)
+    first = setup.add("dr-lee", "+15550001111", MONDAY.replace(hour=9))
+    second = setup.add("dr-lee", "+15550002222", MONDAY.replace(hour=10))
+
+    # two worker processes, each with its own index
+    stores = [ScheduleStore(path), ScheduleStore(path)]
+    wanted = MONDAY.replace(hour=11)
+    assert all(store.is_free("dr-lee", wanted, 30) for store in stores)
+
+    results = []
+    barrier = threading.Barrier(2)
+
+    def book(store, appointment):
+        barrier.wait()
+        try:
+            results.append(store.reschedule(appointment, wanted))
+        except SlotTaken:
+            results.append("taken")
+
+    threads = [
+        threading.Thread(target=book, args=(stores[0], stores[0].appointments[first.id])),
+        threading.Thread(target=book, args=(stores[1], stores[1].appointments[second.id])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count("taken") == 1, results
+    # the losing process refreshed its index and no longer offers the slot
+    assert not any(store.is_free("dr-lee", wanted, 30) for store in stores)
+
+
+def test_writes_catch_the_index_up_with_other_processes():
+    path = temp_db()
+    ours, theirs = ScheduleStore(path), ScheduleStore(path)
+    booked = ours.add("dr-lee", "+15550001111", MONDAY.replace(hour=9))
+    theirs.add("dr-kim", "+15550002222", MONDAY.replace(hour=9))
+    theirs.reschedule(theirs.appointments[booked.id], MONDAY.replace(hour=13))
+    assert ours.is_free("dr-kim", MONDAY.replace(hour=9), 30), "reads don't touch SQLite"
+
+    # an unrelated booking of ours applies their writes to our index, without reloading it
+    ours.add("dr-lee", "+15550003333", MONDAY.replace(hour=15))
+    assert not ours.is_free("dr-kim", MONDAY.replace(hour=9), 30)
+    assert ours.is_free("dr-lee", MONDAY.replace(hour=9), 30) and not ours.is_free("dr-lee", MONDAY.replace(hour=13), 30)
+    assert ours.for_patient("+15550001111", MONDAY).version == booked.version + 1
+    assert ours.appointments == ScheduleStore(path).appointments
+
+
+def main():
+    tests = [
+        test_next_free_slots_skip_bookings_and_closed_hours,
+        test_reschedule_persists_and_checks_the_version,
+        test_simultaneous_calls_cannot_take_the_same_slot,
+        test_writes_catch_the_index_up_with_other_processes,
+    ]
+    print("🧪 Testing schedule store")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Tests for SIP failure classification, trunk health and the retry engine
+
+Run directly (python test_sip_retry.py) or through pytest.
+"""
+import asyncio
+import os
+import tempfile
+
+from livekit import api
+
+from campaign_scheduler import Contact
+from fake_livekit import FakeLiveKitAPI
+from sip_retry import (
+    RetryEngine,
+    SipOutcome,
+    TrunkHealth,
+    classify_attributes,
+    classify_sip,
+    classify_twirp,
+    dial_with_retries,
+)
+from test_campaign_scheduler import FakeClock, RecordingAPI, make_scheduler
+
+
+def make_engine(trunks=("ST_a", "ST_b"), clock=None):
+    return RetryEngine(list(trunks), health=TrunkHealth(clock=clock or FakeClock()))
+
+
+def request(number="+14155550134"):
+    return api.CreateSIPParticipantRequest(room_name="call-1", sip_call_to=number, participant_identity="phone_user")
+
+
+async def no_sleep(seconds):
+    pass
+
+
+def test_classifies_codes_errors_and_attributes():
+    assert classify_sip(200) == SipOutcome.ANSWERED
+    assert classify_sip(486) == SipOutcome.BUSY
+    assert classify_sip(480) == SipOutcome.NO_ANSWER
+    assert classify_sip(404) == SipOutcome.INVALID
+    assert classify_sip(503) == SipOutcome.TRUNK_CAPACITY
+    assert classify_sip(403) == SipOutcome.CARRIER_ERROR
+    assert classify_sip(500, "Call limit reached") == SipOutcome.TRUNK_CAPACITY
+
+    error = api.TwirpError("failed_precondition", "sip call failed", status=400, metadata={"sip_status_code": "486", "sip_status": "Busy Here"})
+    assert classify_twirp(error) == SipOutcome.BUSY
+    assert classify_twirp(api.TwirpError("resource_exhausted", "too busy", status=429)) == SipOutcome.TRUNK_CAPACITY
+
+    assert classify_attributes({"sip.callStatus": "ringing"}) is None
+    assert classify_attributes({"sip.callStatus": "active"}) == SipOutcome.ANSWERED
+    assert classify_attributes({"sip.callStatus": "failed", "sip.errorCode": "404"}) == SipOutcome.INVALID
+    assert classify_attributes({"sip.callStatus": "hangup", "sip.disconnectReason": "USER_UNAVAILABLE"}) == SipOutcome.NO_ANSWER
+
+
+def test_policy_per_failure_class():
+    engine = make_engine()
+    assert not engine.decide(SipOutcome.INVALID, 1, "ST_a").retry
+
+    busy = engine.decide(SipOutcome.BUSY, 1, "ST_a")
+    assert busy.retry and busy.delay >= 600 and busy.trunk_id == "ST_a"
+    assert engine.decide(SipOutcome.BUSY, 2, "ST_a").delay > busy.delay
+    assert not engine.decide(SipOutcome.BUSY, 3, "ST_a").retry
+
+    capacity = engine.decide(SipOutcome.TRUNK_CAPACITY, 1, "ST_a")
+    assert capacity.retry and capacity.delay == 0 and capacity.trunk_id == "ST_b"
+    # with every trunk tried, wait out the problem instead
+    assert engine.decide(SipOutcome.TRUNK_CAPACITY, 2, "ST_b", tried=["ST_a"]).delay > 0
+
+
+def test_trunk_health_steers_away_and_recovers():
+    clock = FakeClock(0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "health.db")
+        health = TrunkHealth(path=path, half_life=60.0, clock=clock)
+        engine = RetryEngine(["ST_a", "ST_b"], health=health)
+        for _ in range(10):
+            engine.record("ST_a", SipOutcome.CARRIER_ERROR)
+            engine.record("ST_b", SipOutcome.ANSWERED)
+        engine.record("ST_a", SipOutcome.INVALID)  # not the trunk's fault
+        assert engine.pick_trunk() == "ST_b"
+        assert health.score("ST_a") < 0.4 < 0.8 < health.score("ST_b")
+
+        # a new job process starts from what earlier calls learned
+        reloaded = TrunkHealth(path=path, half_life=60.0, clock=clock)
+        assert abs(reloaded.score("ST_a") - health.score("ST_a")) < 1e-9
+
+        clock.now += 600  # ten half-lives later both are back near the prior
+        assert abs(health.score("ST_a") - health.score("ST_b")) < 0.05
+
+
+def test_dial_switches_trunk_on_capacity_and_hands_back_long_retries():
+    async def run():
+        full = {"ST_a"}
+        lk_api = FakeLiveKitAPI(sip_script=lambda req: 503 if req.sip_trunk_id in full else 200)
+        answered = await dial_with_retries(lk_api, request(), make_engine(), sleep=no_sleep)
+
+        lk_api.sip_script = lambda req: 486
+        busy = await dial_with_retries(lk_api, request(), make_engine(), sleep=no_sleep)
+
+        lk_api.sip_script = lambda req: 404
+        invalid = await dial_with_retries(lk_api, request(), make_engine(), sleep=no_sleep)
+        return lk_api.stats, answered, busy, invalid
+
+    stats, answered, busy, invalid = asyncio.run(run())
+    assert answered.answered and answered.trunk_id == "ST_b" and answered.attempts == 2
+    assert [outcome for _, outcome in answered.history] == [SipOutcome.TRUNK_CAPACITY, SipOutcome.ANSWERED]
+    assert stats.sip_calls["ST_a"][503] == 1 and stats.sip_calls["ST_b"] == {200: 1}
+
+    assert not busy.answered and busy.outcome == SipOutcome.BUSY and busy.retry_after >= 600
+    assert len(busy.history) == 1, "a busy callee is not redialled within the job"
+
+    assert invalid.outcome == SipOutcome.INVALID and invalid.retry_after is None
+
+
+def test_scheduler_takes_retry_delay_from_the_dial_result():
+    async def run():
+        clock, lk_api = FakeClock(), RecordingAPI()
+        scheduler = make_scheduler(lk_api, clock)
+        scheduler.add_contacts([Contact("+911234567890", "Asia/Kolkata"), Contact("+919876543210", "Asia/Kolkata")])
+        clock.now += 1
+        await scheduler.step()
+        busy, invalid = (call["contact_id"] for call in lk_api.called)
+
+        fake = FakeLiveKitAPI(sip_script=lambda req: 486 if req.sip_call_to == "+911234567890" else 404)
+        scheduler.complete_dial(busy, await dial_with_retries(fake, request("+911234567890"), make_engine(), sleep=no_sleep))
+        scheduler.complete_dial(invalid, await dial_with_retries(fake, request("+919876543210"), make_engine(), sleep=no_sleep))
+
+        clock.now += 300
+        await scheduler.step()
+        early = len(lk_api.called)
+        clock.now += 600
+        await scheduler.step()
+        return scheduler.stats, early, lk_api.called
+
+    stats, early, called = asyncio.run(run())
+    assert stats.failed == 1 and stats.retried == 1
+    assert early == 2, "busy callee redialled before its retry delay"
+    assert len(called) == 3 and called[-1]["phone_number"] == "+911234567890"
+
+
+def main():
+    tests = [
+        test_classifies_codes_errors_and_attributes,
+        test_policy_per_failure_class,
+        test_trunk_health_steers_away_and_recovers,
+        test_dial_switches_trunk_on_capacity_and_hands_back_long_retries,
+        test_scheduler_takes_retry_delay_from_the_dial_result,
+    ]
+    print("🧪 Testing SIP retry policy")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Tests for the function-tool runtime, using fake slow tools
+
+Run directly (python test_tool_runtime.py) or through pytest.
+"""
+import asyncio
+import time
+
+from livekit.agents import RunContext, function_tool
+from livekit.agents.llm import ToolError, find_function_tools
+from livekit.agents.llm.utils import build_legacy_openai_schema
+
+from tool_runtime import ToolMetrics, ToolRuntime, timed_tool
+
+
+class FakeSession:
+    def __init__(self, tts=True):
+        self.tts = object() if tts else None
+        self.said = []
+
+    def say(self, text, audio=None, add_to_chat_ctx=True):
+        self.said.append((text, audio is not None))
+
+
+class FakeAgent:
+    """An agent whose tools stand in for slow backends"""
+
+    def __init__(self, **runtime_kwargs):
+        self.tool_runtime = ToolRuntime(metrics=ToolMetrics(), **runtime_kwargs)
+        self.order = []
+
+    @function_tool()
+    @timed_tool(deadline=0.2)
+    async def lookup(self, ctx: RunContext, day: str, delay: float = 0.05):
+        """Look up free appointment slots
+
+        Args:
+            day: the day to check
+        """
+        await asyncio.sleep(delay)
+        return f"slots on {day}"
+
+    @function_tool()
+    @timed_tool(deadline=1.0, filler=True)
+    async def slow_lookup(self, ctx: RunContext, delay: float):
+        """A lookup behind a slow backend"""
+        await asyncio.sleep(delay)
+        return "done"
+
+    @function_tool()
+    @timed_tool(deadline=1.0, serial="call-control")
+    async def hangup(self, ctx: RunContext):
+        """End the call"""
+        self.order.append("hangup start")
+        await asyncio.sleep(0.05)
+        self.order.append("hangup end")
+
+    @function_tool()
+    @timed_tool(deadline=1.0, serial="call-control")
+    async def transfer(self, ctx: RunContext):
+        """Transfer the call"""
+        self.order.append("transfer start")
+        await asyncio.sleep(0.05)
+        self.order.append("transfer end")
+
+
+def test_deadline_turns_a_stuck_tool_into_a_tool_error():
+    async def run():
+        agent = FakeAgent()
+        started = time.perf_counter()
+        try:
+            await agent.lookup(None, "monday", delay=5)
+        except ToolError as e:
+            return agent, time.perf_counter() - started, e
+        raise AssertionError("no ToolError")
+
+    agent, elapsed, error = asyncio.run(run())
+    assert elapsed < 0.5
+    assert "taking too long" in error.message
+    latency = agent.tool_runtime.metrics.tools["lookup"]
+    assert latency.calls == 1 and latency.timeouts == 1
+
+
+def test_independent_tools_run_concurrently():
+    async def run():
+        agent = FakeAgent()
+        started = time.perf_counter()
+        # livekit starts each tool call of a turn as its own task, like this
+        results = await asyncio.gather(*(agent.lookup(None, day, delay=0.1) for day in ("mon", "tue", "wed")))
+        return agent, results, time.perf_counter() - started
+
+    agent, results, elapsed = asyncio.run(run())
+    assert results == ["slots on mon", "slots on tue", "slots on wed"]
+    assert elapsed < 0.2, "independent tools should overlap"
+    latency = agent.tool_runtime.metrics.tools["lookup"]
+    assert latency.calls == 3 and latency.quantile(0.5) == 0.25
+
+
+def test_serial_group_runs_one_at_a_time():
+    async def run():
+        agent = FakeAgent()
+        await asyncio.gather(agent.hangup(None), agent.transfer(None))
+        return agent.order
+
+    order = asyncio.run(run())
+    assert order in (
+        ["hangup start", "hangup end", "transfer start", "transfer end"],
+        ["transfer start", "transfer end", "hangup start", "hangup end"],
+    ), order
+
+
+def test_filler_only_for_slow_tools():
+    async def run(delay, **kwargs):
+        agent = FakeAgent(filler_after=0.1, **kwargs)
+        session = FakeSession()
+        agent.tool_runtime.attach_session(session)
+        await agent.slow_lookup(None, delay=delay)
+        await asyncio.sleep(0.15)  # a filler still pending would have fired by now
+        return session.said
+
+    assert asyncio.run(run(0.02)) == []
+    assert asyncio.run(run(0.3)) == [("One moment while I check that.", False)]
+    # cached audio is used when configured
+    assert asyncio.run(run(0.3, filler_frames=("frame",))) == [("One moment while I check that.", True)]
+
+
+def test_tool_schema_is_unchanged():
+    agent = FakeAgent()
+    tools = {tool.__name__: tool for tool in find_function_tools(agent)}
+    schema = build_legacy_openai_schema(tools["lookup"], internally_tagged=True)
+    assert schema["name"] == "lookup"
+    assert schema["description"].startswith("Look up free appointment slots")
+    assert set(schema["parameters"]["properties"]) == {"day", "delay"}
+
+
+def main():
+    tests = [
+        test_deadline_turns_a_stuck_tool_into_a_tool_error,
+        test_independent_tools_run_concurrently,
+        test_serial_group_runs_one_at_a_time,
+        test_filler_only_for_slow_tools,
+        test_tool_schema_is_unchanged,
+    ]
+    print("🧪 Testing function tool runtime")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Tests for the outbound SIP trunk pool, against the fake SIP API
+
+Run directly (python test_trunk_pool.py) or through pytest.
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+
+from livekit import api
+
+from fake_livekit import FakeLiveKitAPI
+from sip_retry import RetryEngine, SipOutcome, TrunkHealth, dial_with_retries
+from trunk_pool import Trunk, TrunkPool, TrunksFull, parse_trunks
+from test_campaign_scheduler import FakeClock
+import virtual_time
+
+TRUNKS = [Trunk("ST_us1", 4, "us"), Trunk("ST_us2", 2, "us"), Trunk("ST_eu1", 3, "eu")]
+
+
+def test_parses_trunk_config():
+    assert parse_trunks("ST_a:30:us, ST_b::eu,ST_c,") == [Trunk("ST_a", 30, "us"), Trunk("ST_b", region="eu"), Trunk("ST_c")]
+
+
+def test_least_outstanding_with_locality_then_refuses():
+    pool = TrunkPool(TRUNKS)
+    leases = [pool.acquire("us") for _ in range(6)]
+    # spread by load per unit of capacity, never onto the other region while ours has room
+    assert sorted(lease.trunk_id for lease in leases) == ["ST_us1"] * 4 + ["ST_us2"] * 2
+    leases += [pool.acquire("us") for _ in range(3)]  # local trunks full, spill over
+    assert [lease.trunk_id for lease in leases[6:]] == ["ST_eu1"] * 3
+    assert pool.available() == 0
+    try:
+        pool.acquire("us")
+        raise AssertionError("dialled with every trunk full")
+    except TrunksFull:
+        pass
+
+    leases[0].release()
+    leases[0].release()  # idempotent
+    assert pool.outstanding()["ST_us1"] == 3
+    assert pool.acquire("eu").trunk_id == "ST_us1"
+
+
+def test_avoids_failed_and_unhealthy_trunks():
+    clock = FakeClock(0.0)
+    health = TrunkHealth(clock=clock)
+    pool = TrunkPool([Trunk("ST_a", 10), Trunk("ST_b", 10)], health=health, clock=clock)
+    assert pool.acquire(avoid={"ST_a"}).trunk_id == "ST_b"
+    for _ in range(20):
+        health.record("ST_b", SipOutcome.CARRIER_ERROR)
+    # ST_b is idle but failing; ST_a takes the calls until it's much busier
+    assert [pool.acquire().trunk_id for _ in range(3)] == ["ST_a"] * 3
+
+
+def test_expired_leases_free_their_slot():
+    clock = FakeClock(0.0)
+    pool = TrunkPool([Trunk("ST_a", 1)], lease_ttl=60.0, clock=clock)
+    pool.acquire()  # a job that died without releasing
+    try:
+        pool.acquire()
+        raise AssertionError("slot not held")
+    except TrunksFull:
+        pass
+    clock.now += 61
+    assert pool.acquire().trunk_id == "ST_a"
+
+
+def test_held_leases_are_renewed_and_dead_ones_expire():
+    async def run():
+        pool = TrunkPool([Trunk("ST_a", 2)], lease_ttl=60.0)
+        held = await pool.lease()
+        dead = await pool.lease()
+        dead._heartbeat.cancel()  # its job died without releasing
+        await asyncio.sleep(150.0)  # a long call, or one bridged to a human
+        outstanding = pool.outstanding()
+        await held.aclose()
+        await asyncio.sleep(0)
+        return outstanding, pool.outstanding(), held._heartbeat.cancelled()
+
+    during, after, stopped = virtual_time.run(run())
+    assert during == {"ST_a": 1}, "the held lease expired, or the dead one didn't"
+    assert after == {"ST_a": 0} and stopped
+
+
+def test_threads_never_overbook():
+    pool = TrunkPool([Trunk("ST_a", 5), Trunk("ST_b", 5)])
+    held, refused = [], []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(50):
+            try:
+                held.append(pool.acquire())
+            except TrunksFull:
+                refused.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(held) == 10 and len(refused) == 390
+
+
+def test_a_locked_pool_reports_the_lock():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pool.db")
+        pool = TrunkPool([Trunk("ST_a", 3)], path=path)
+        pool._db.execute("PRAGMA busy_timeout = 0")
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            pool.acquire()
+        except sqlite3.OperationalError as e:
+            error = str(e)
+        else:
+            raise AssertionError("acquired a slot while another process held the pool")
+        other.execute("ROLLBACK")
+        assert "locked" in error, error
+        assert pool.acquire().trunk.id == "ST_a"
+        other.close()
+
+
+def _acquire_in_process(path, results):
+    pool = TrunkPool([Trunk("ST_a", 3), Trunk("ST_b", 3)], path=path)
+    taken = 0
+    for _ in range(20):
+        try:
+            pool.acquire()
+            taken += 1
+        except TrunksFull:
+            pass
+    results.put(taken)
+
+
+def test_job_processes_share_the_pool():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pool.db")
+        TrunkPool([Trunk("ST_a", 3)], path=path)  # create the schema before the race
+        results = multiprocessing.get_context("spawn").Queue()
+        processes = [
+            multiprocessing.get_context("spawn").Process(target=_acquire_in_process, args=(path, results)) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert sum(results.get() for _ in processes) == 6
+
+
+def test_load_stays_within_carrier_limits():
+    """Many concurrent calls through dial_with_retries never hit a carrier's concurrent-call limit"""
+
+    async def run():
+        rng = random.Random(5)
+        lk_api = FakeLiveKitAPI(trunk_capacity={trunk.id: trunk.capacity for trunk in TRUNKS})
+        engine = RetryEngine(TRUNKS)
+        refused = 0
+
+        async def call(i):
+            nonlocal refused
+            await asyncio.sleep(rng.uniform(0, 0.05))
+            request = api.CreateSIPParticipantRequest(room_name=f"call-{i}", sip_call_to="+14155550134", participant_identity="phone_user")
+            result = await dial_with_retries(lk_api, request, engine, region="us")
+            if not result.answered:
+                assert result.outcome == SipOutcome.TRUNK_CAPACITY and not result.history
+                refused += 1
+                return
+            await asyncio.sleep(rng.uniform(0.005, 0.03))
+            await lk_api.room.delete_room(api.DeleteRoomRequest(room=f"call-{i}"))
+            await result.lease.aclose()
+
+        await asyncio.gather(*(call(i) for i in range(300)))
+        return lk_api.stats, engine.pool, refused
+
+    stats, pool, refused = asyncio.run(run())
+    assert all(503 not in per_status for per_status in stats.sip_calls.values()), stats.sip_calls
+    assert stats.peak_trunk_calls == {trunk.id: trunk.capacity for trunk in TRUNKS}
+    assert 0 < refused < 300
+    assert sum(pool.outstanding().values()) == 0
+
+
+def main():
+    tests = [
+        test_parses_trunk_config,
+        test_least_outstanding_with_locality_then_refuses,
+        test_avoids_failed_and_unhealthy_trunks,
+        test_expired_leases_free_their_slot,
+        test_held_leases_are_renewed_and_dead_ones_expire,
+        test_threads_never_overbook,
+        test_a_locked_pool_reports_the_lock,
+        test_job_processes_share_the_pool,
+        test_load_stays_within_carrier_limits,
+    ]
+    print("🧪 Testing SIP trunk pool")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
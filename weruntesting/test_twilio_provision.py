@@ -0,0 +1,147 @@
+"""
+Tests for Twilio provisioning: trunks, credentials and numbers, against the local fake Twilio API
+
+Run directly (python test_twilio_provision.py) or through pytest.
+"""
+import json
+import os
+import stat
+import tempfile
+
+from fake_twilio import FakeTwilioAPI
+from twilio_provision import Provisioner, TrunkPlan, generate_credential, load_plan, load_state, save_state, twilio_client, write_livekit_configs
+
+ACCOUNT = "AC" + "0" * 32
+NUMBERS = [f"+1415555{i:04d}" for i in range(40)]
+PLAN = [TrunkPlan("interview", tuple(NUMBERS[:20])), TrunkPlan("outbound", tuple(NUMBERS[20:]))]
+
+
+def provision(twilio, state, plan=PLAN, sip_host="example.sip.livekit.cloud", workers=8, refresh=False):
+    provisioner = Provisioner(lambda: twilio_client(ACCOUNT, "token", twilio.url), state, sip_host=sip_host, workers=workers)
+    return provisioner.apply(plan, refresh=refresh)
+
+
+def test_credentials_and_plans():
+    credentials = [generate_credential("Interview Agent") for _ in range(50)]
+    assert len({password for _, password in credentials}) == 50, "a credential of its own per trunk"
+    username, password = credentials[0]
+    assert username.startswith("interview-agent-") and len(password) >= 12
+    assert any(c.isupper() for c in password) and any(c.islower() for c in password) and any(c.isdigit() for c in password)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plan.json")
+        with open(path, "w") as f:
+            json.dump({"trunks": [{"name": "interview", "numbers": ["+1 (415) 555-0100", "98765 43210"]}]}, f)
+        assert load_plan(path) == [TrunkPlan("interview", ("+14155550100", "+919876543210"))]
+
+
+def test_provisions_many_numbers_concurrently():
+    with FakeTwilioAPI(numbers=NUMBERS, latency=0.01) as twilio, tempfile.TemporaryDirectory() as tmp:
+        state = load_state(os.path.join(tmp, "twilio-state.json"))
+        report = provision(twilio, state, workers=8)
+        assert not report.failures, report.failures
+        assert 1 < twilio.peak <= 8, f"{twilio.peak} requests at once"
+
+        trunks = {trunk["friendly_name"]: trunk for trunk in twilio.trunks.values()}
+        for entry in PLAN:
+            trunk = trunks[entry.name]
+            assert sorted(twilio.numbers[sid]["phone_number"] for sid in trunk["phone_numbers"]) == sorted(entry.numbers)
+            assert [origination["sip_url"] for origination in trunk["origination_urls"].values()] == [
+                "sip:example.sip.livekit.cloud;transport=tcp"
+            ]
+            (credential_list,) = trunk["credential_lists"]
+            (credential,) = twilio.credential_lists[credential_list]["credentials"].values()
+            assert credential["password"] == state["trunks"][entry.name]["password"]
+        assert state["trunks"]["interview"]["password"] != state["trunks"]["outbound"]["password"]
+
+        path = os.path.join(tmp, "twilio-state.json")
+        save_state(path, state)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        configs = write_livekit_configs(state, PLAN, os.path.join(tmp, "livekit"))
+        assert len(configs) == 4
+        with open(os.path.join(tmp, "livekit", "outbound-outbound.json")) as f:
+            outbound = json.load(f)["trunk"]
+        assert outbound["address"] == state["trunks"]["outbound"]["domain"] and outbound["auth_password"]
+
+        written = len(twilio.writes())
+        report = provision(twilio, load_state(path))
+        assert not report.changes and len(twilio.writes()) == written, "a re-run changes nothing"
+
+
+def test_reruns_apply_only_the_diff():
+    with FakeTwilioAPI(numbers=NUMBERS) as twilio:
+        state = {}
+        provision(twilio, state)
+        before = len(twilio.requests)
+        plan = [
+            TrunkPlan("interview", tuple(NUMBERS[1:20]) + (NUMBERS[20],)),  # one dropped, one moved in
+            TrunkPlan("outbound", tuple(NUMBERS[21:])),
+        ]
+        report = provision(twilio, state, plan, sip_host="new.sip.livekit.cloud")
+        assert not report.failures, report.failures
+        calls = twilio.requests[before:]
+        assert sorted(method for method, _ in calls) == ["DELETE", "DELETE", "POST", "POST", "POST"], calls
+        assert sorted(report.changes) == sorted(
+            [
+                f"{NUMBERS[0]}: interview -> -",
+                f"{NUMBERS[20]}: outbound -> interview",
+                "trunk interview now originates to sip:new.sip.livekit.cloud;transport=tcp",
+                "trunk outbound now originates to sip:new.sip.livekit.cloud;transport=tcp",
+            ]
+        )
+        number_sid = state["numbers"][NUMBERS[20]]
+        assert twilio.numbers[number_sid]["trunk_sid"] == state["trunks"]["interview"]["sid"]
+
+
+def test_refresh_repairs_changes_made_in_the_console():
+    with FakeTwilioAPI(numbers=NUMBERS[:4]) as twilio:
+        plan = [TrunkPlan("interview", tuple(NUMBERS[:2])), TrunkPlan("outbound", tuple(NUMBERS[2:4]))]
+        state = {}
+        provision(twilio, state, plan)
+        interview = state["trunks"]["interview"]
+        # someone takes a number off in the console, and deletes the other trunk
+        twilio.handle("DELETE", f"/trunking/v1/Trunks/{interview['sid']}/PhoneNumbers/{state['numbers'][NUMBERS[0]]}", {})
+        twilio.handle("DELETE", f"/trunking/v1/Trunks/{state['trunks']['outbound']['sid']}", {})
+        password = interview["password"]
+
+        assert not provision(twilio, state, plan).changes, "the cache alone doesn't see it"
+        report = provision(twilio, state, plan, refresh=True)
+        assert not report.failures, report.failures
+        assert f"{NUMBERS[0]}: - -> interview" in report.changes
+        assert any(change.startswith("created trunk outbound") for change in report.changes)
+        assert state["trunks"]["interview"]["password"] == password, "the kept trunk keeps its credential"
+        assert sorted(number["trunk_sid"] is not None for number in twilio.numbers.values()) == [True] * 4
+
+
+def test_failures_are_reported_and_the_rest_goes_ahead():
+    with FakeTwilioAPI(numbers=NUMBERS[:2]) as twilio:
+        state = {}
+        report = provision(twilio, state, [TrunkPlan("interview", (NUMBERS[0], "+14155559999", NUMBERS[1]))])
+        assert report.failures == ["+14155559999: not a number on this account"]
+        assert sorted(state["trunks"]["interview"]["numbers"]) == NUMBERS[:2]
+
+
+def main():
+    tests = [
+        test_credentials_and_plans,
+        test_provisions_many_numbers_concurrently,
+        test_reruns_apply_only_the_diff,
+        test_refresh_repairs_changes_made_in_the_console,
+        test_failures_are_reported_and_the_rest_goes_ahead,
+    ]
+    print("🧪 Testing Twilio provisioning")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Tests for the virtual-time event loop and the agents' clock
+
+Run directly (python test_virtual_time.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import clock
+import virtual_time
+from call_harness import LocalWorker, local_environment, run_call
+from fake_livekit import CallerAudio, FakeLiveKitAPI, SipCall
+from virtual_time import VirtualTimeLoop, VirtualTimePolicy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import agent  # noqa: E402
+import interview_agent  # noqa: E402
+
+
+def test_sleeps_and_timeouts_take_no_wall_time():
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        woke = []
+
+        async def sleeper(seconds):
+            await asyncio.sleep(seconds)
+            woke.append(round(loop.time() - started, 6))
+
+        try:
+            await asyncio.wait_for(asyncio.gather(sleeper(3600), sleeper(0.02), sleeper(45)), timeout=900)
+        except TimeoutError:
+            pass
+        return woke, loop.time() - started
+
+    wall = time.perf_counter()
+    woke, elapsed = virtual_time.run(run())
+    assert time.perf_counter() - wall < 0.5
+    assert woke == [0.02, 45.0], "timers fired out of order or at the wrong time"
+    assert abs(elapsed - 900) < 1e-6
+
+
+def test_executor_work_stops_the_clock():
+    def work():
+        time.sleep(0.05)
+        return "done"
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        events = []
+
+        async def tick():
+            await asyncio.sleep(0.01)
+            events.append(("tick", round(loop.time() - started, 6)))
+
+        async def job():
+            events.append((await loop.run_in_executor(None, work), round(loop.time() - started, 6)))
+
+        await asyncio.gather(tick(), job())
+        return events
+
+    for inline in (True, False):
+        events = virtual_time.run(run(), inline_executor=inline)
+        # 50ms of real work took no virtual time, and the tick still came 10ms in
+        assert sorted(events) == [("done", 0.0), ("tick", 0.01)], (inline, events)
+
+
+def test_clock_follows_a_virtual_loop_only():
+    async def run():
+        before = (clock.monotonic(), clock.time())
+        await asyncio.sleep(120)
+        return clock.monotonic() - before[0], clock.time() - before[1]
+
+    assert [round(x, 6) for x in virtual_time.run(run())] == [120.0, 120.0]
+    # outside a virtual loop it's the real clocks
+    assert abs(clock.time() - time.time()) < 0.01 and abs(clock.monotonic() - time.perf_counter()) < 0.01
+
+    # suites that call asyncio.run() themselves get virtual loops through the policy
+    async def half_a_minute():
+        await asyncio.sleep(30)
+        return asyncio.get_running_loop()
+
+    policy = asyncio.get_event_loop_policy()
+    asyncio.set_event_loop_policy(VirtualTimePolicy())
+    try:
+        wall = time.perf_counter()
+        assert isinstance(asyncio.run(half_a_minute()), VirtualTimeLoop)
+        assert time.perf_counter() - wall < 0.5
+    finally:
+        asyncio.set_event_loop_policy(policy)
+
+
+def test_ring_timeout_and_outbound_interview_run_in_virtual_time():
+    caller = CallerAudio.script(("silence", 4.5), *[("speech", 2.0, 5), ("silence", 8.0)] * 6)
+
+    async def run():
+        # nobody picks up for 45s, then the carrier gives up
+        unanswered = FakeLiveKitAPI(sip_script=lambda req: SipCall(status=480, ring=45.0))
+        missed = await run_call(agent.entrypoint, unanswered, metadata=json.dumps({"phone_number": "+14155550134"}), timeout=120)
+        # the interviewer's outbound path: ring, poll until active, wait 3s, greet, then a minute of conversation
+        answered = FakeLiveKitAPI(sip_script=lambda req: SipCall(ring=20.0, audio=caller, hangup_after=caller.duration))
+        worker = LocalWorker(interview_agent.entrypoint, prewarm=interview_agent.prewarm)
+        interview = await run_call(interview_agent.entrypoint, answered, metadata="+14155550134", proc=worker.proc, timeout=300)
+        return missed, unanswered, interview
+
+    wall = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        with local_environment(tmp, agent.entrypoint, interview_agent.entrypoint):
+            missed, unanswered, interview = virtual_time.run(run())
+        costs = sqlite3.connect(os.path.join(tmp, "call_costs.db"))
+        seconds = dict(costs.execute("SELECT call_id, call_seconds FROM call_costs").fetchall())
+    wall = time.perf_counter() - wall
+    assert missed.error is None and missed.spoken == [] and unanswered.stats.sip_calls == {"ST_local": {480: 1}}
+    assert interview.error is None and interview.outcome == "participant disconnected"
+    assert abs(interview.dial - 20.0) < 0.1
+    assert interview.answer_to_greeting > 3.0, "the outbound interview waits 3s before greeting"
+    assert len(interview.turns) == 6
+    # timed by the agents' clock, the call lasted as long as it did in virtual time
+    assert seconds[interview.room] > 20.0 + caller.duration - 1.0
+    assert seconds[missed.room] >= 45.0
+    assert wall < 15.0, f"{wall:.1f}s of wall time"
+
+
+def main():
+    tests = [
+        test_sleeps_and_timeouts_take_no_wall_time,
+        test_executor_work_stops_the_clock,
+        test_clock_follows_a_virtual_loop_only,
+        test_ring_timeout_and_outbound_interview_run_in_virtual_time,
+    ]
+    print("🧪 Testing virtual time")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
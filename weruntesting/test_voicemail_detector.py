@@ -0,0 +1,109 @@
+"""
+Tests for early-media answering machine detection
+
+Run directly (python test_voicemail_detector.py) or through pytest.
+"""
+import numpy as np
+
+from bench_voicemail import SAMPLE_RATE, _beep, _silence, _speech, synth_call
+from voicemail_detector import AMDConfig, AnsweredBy, EarlyMediaClassifier, GreetingEnd, classify_pcm
+
+
+def _pcm(*parts):
+    return (np.concatenate(parts) * 32767).clip(-32768, 32767).astype(np.int16)
+
+
+def test_short_greeting_is_human():
+    rng = np.random.default_rng(1)
+    result = classify_pcm(_pcm(_silence(rng, 0.4), _speech(rng, 0.6, words=2), _silence(rng, 2.0)), SAMPLE_RATE)
+    assert result.answered_by == AnsweredBy.HUMAN, result
+    assert result.decision_time < 2.0
+
+
+def test_long_greeting_is_machine():
+    rng = np.random.default_rng(2)
+    result = classify_pcm(_pcm(_silence(rng, 0.2), _speech(rng, 4.0, words=10)), SAMPLE_RATE)
+    assert result.answered_by == AnsweredBy.MACHINE, result
+    # decided while the greeting is still playing, long before it ends
+    assert result.decision_time < 2.5
+
+
+def test_beep_is_machine():
+    rng = np.random.default_rng(3)
+    result = classify_pcm(_pcm(_silence(rng, 0.3), _beep(0.6), _silence(rng, 1.0)), SAMPLE_RATE)
+    assert result.answered_by == AnsweredBy.MACHINE
+    assert result.reason == "voicemail beep detected" and result.beep
+
+
+def test_silence_is_left_to_the_agent():
+    rng = np.random.default_rng(4)
+    result = classify_pcm(_pcm(_silence(rng, 4.0)), SAMPLE_RATE)
+    assert result.answered_by == AnsweredBy.UNKNOWN
+
+
+def test_result_is_sticky_once_decided():
+    rng = np.random.default_rng(5)
+    classifier = EarlyMediaClassifier(SAMPLE_RATE, AMDConfig(greeting=1.0))
+    pcm = _pcm(_speech(rng, 2.0, words=5))
+    step = SAMPLE_RATE // 50
+    for start in range(0, len(pcm), step):
+        classifier.push_frame(pcm[start:start + step])
+    first = classifier.result
+    assert first is not None and first.answered_by == AnsweredBy.MACHINE
+    assert classifier.push_frame(pcm[:step]) is first
+
+
+def test_greeting_ends_after_the_beep_or_the_silence():
+    rng = np.random.default_rng(7)
+    step = SAMPLE_RATE // 50
+
+    def follow(pcm):
+        greeting = GreetingEnd(SAMPLE_RATE)
+        for start in range(0, len(pcm), step):
+            if greeting.push_frame(pcm[start:start + step]) is not None:
+                break
+        return greeting.reason, greeting.elapsed
+
+    # the rest of a greeting after AMD decided, then its beep
+    reason, elapsed = follow(_pcm(_speech(rng, 2.5, words=6), _beep(0.5), _silence(rng, 2.0)))
+    assert reason == "beep" and 3.0 <= elapsed < 3.1, (reason, elapsed)
+    reason, elapsed = follow(_pcm(_speech(rng, 2.5, words=6), _silence(rng, 3.0)))
+    assert reason == "silence" and 3.5 <= elapsed < 4.0, (reason, elapsed)
+
+
+def test_synthetic_corpus_accuracy():
+    rng = np.random.default_rng(6)
+    correct = 0
+    for i in range(40):
+        label = "human" if i % 2 == 0 else "machine"
+        result = classify_pcm(synth_call(rng, label), SAMPLE_RATE)
+        correct += result.answered_by.value == label
+    assert correct >= 36, f"only {correct}/40 calls classified correctly"
+
+
+def main():
+    tests = [
+        test_short_greeting_is_human,
+        test_long_greeting_is_machine,
+        test_beep_is_machine,
+        test_greeting_ends_after_the_beep_or_the_silence,
+        test_silence_is_left_to_the_agent,
+        test_result_is_sticky_once_decided,
+        test_synthetic_corpus_accuracy,
+    ]
+    print("🧪 Testing answering machine detection")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
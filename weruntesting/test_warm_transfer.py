@@ -0,0 +1,109 @@
+"""
+Tests for cold and warm call transfers against the SIP stand-in
+
+Run directly (python test_warm_transfer.py) or through pytest.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from bench_transfer import FakeSIP, FakeSession, make_transfer
+from warm_transfer import HUMAN_AGENT_IDENTITY, CallSummary
+
+
+def test_warm_dials_while_agent_is_talking():
+    async def run():
+        sip = FakeSIP(ring_seconds=4.0)
+        session = FakeSession(speech_seconds=3.0)
+        result = await make_transfer(sip).warm(session, "+15550199", "Jayden wants to reschedule.")
+        return sip, session, result
+
+    sip, session, result = asyncio.run(run())
+    assert result.connected
+    assert sip.dialled == ["+15550199"] and sip.transferred == []
+    # ring (4s) overlaps the announcement (3s): the human answers at ~4s, not 7s
+    assert result.time_to_human < 0.06
+    assert session.spoken[1] == "[hold prompt]"
+    assert session.speeches[1].interrupted, "hold prompt must stop once the human answers"
+    assert "Jayden wants to reschedule." in session.spoken[2]
+
+
+def test_no_hold_prompt_when_human_answers_first():
+    async def run():
+        session = FakeSession(speech_seconds=3.0)
+        await make_transfer(FakeSIP(ring_seconds=1.0)).warm(session, "+15550199", "summary")
+        return session
+
+    session = asyncio.run(run())
+    assert "[hold prompt]" not in session.spoken
+
+
+def test_unanswered_warm_transfer_hangs_up_the_human_leg():
+    async def run():
+        sip = FakeSIP(ring_seconds=1.0, answers=False)
+        transfer = make_transfer(sip, answer_timeout=0.05)
+        result = await transfer.warm(FakeSession(speech_seconds=1.0), "+15550199", "summary")
+        return transfer, result
+
+    transfer, result = asyncio.run(run())
+    assert not result.connected
+    assert transfer.lk_api.room.removed == [HUMAN_AGENT_IDENTITY]
+
+
+def test_cancelled_warm_transfer_hangs_up_the_human_leg():
+    async def run():
+        transfer = make_transfer(FakeSIP(ring_seconds=1.0, answers=False))
+        task = asyncio.create_task(transfer.warm(FakeSession(speech_seconds=1.0), "+15550199", "summary"))
+        await asyncio.sleep(0.05)  # the human's phone is ringing, the tool runs out of time
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return transfer, task
+
+    transfer, task = asyncio.run(run())
+    assert task.cancelled() and not transfer.bridged
+    assert transfer.lk_api.room.removed == [HUMAN_AGENT_IDENTITY]
+
+
+def test_cold_transfer_is_sequential():
+    async def run():
+        sip = FakeSIP(ring_seconds=4.0, refer_overhead=0.0)
+        return await make_transfer(sip).cold(FakeSession(speech_seconds=3.0), "+15550199")
+
+    result = asyncio.run(run())
+    assert result.connected
+    assert result.time_to_human >= 0.07
+
+
+def test_summary_keeps_recent_patient_turns():
+    summary = CallSummary("Jayden", "next Tuesday at 3pm", max_turns=2)
+    for role, text in [("assistant", "Hi!"), ("user", "one"), ("user", "two"), ("user", "three")]:
+        summary.add_message(SimpleNamespace(role=role, text_content=text))
+    rendered = summary.render()
+    assert "next Tuesday at 3pm" in rendered
+    assert '"two"' in rendered and '"three"' in rendered and '"one"' not in rendered
+
+
+def main():
+    tests = [
+        test_warm_dials_while_agent_is_talking,
+        test_no_hold_prompt_when_human_answers_first,
+        test_unanswered_warm_transfer_hangs_up_the_human_leg,
+        test_cancelled_warm_transfer_hangs_up_the_human_leg,
+        test_cold_transfer_is_sequential,
+        test_summary_keeps_recent_patient_turns,
+    ]
+    print("🧪 Testing call transfers")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
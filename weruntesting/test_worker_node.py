@@ -0,0 +1,131 @@
+"""
+Tests for worker node labels and drain mode, on the stand-in server with simulated calls
+
+Run directly (python test_worker_node.py) or through pytest.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from livekit import api
+
+import virtual_time
+from fake_livekit import FakeLiveKitAPI, FakeWorker
+from worker_node import NodeLabels, WorkerNode
+
+
+async def simulated_call(server, room, metadata):
+    await asyncio.sleep(json.loads(metadata)["seconds"])
+    return "answered"
+
+
+async def dispatch(server, room, seconds):
+    await server.agent_dispatch.create_dispatch(
+        api.CreateAgentDispatchRequest(agent_name="interview-agent", room=room, metadata=json.dumps({"seconds": seconds}))
+    )
+
+
+def test_labels_shape_the_load_and_the_jobs_taken():
+    with mock.patch.dict(os.environ, {"WORKER_REGION": "", "SIP_REGION": "india", "WORKER_CAPACITY": "4", "WORKER_DRAIN_TIMEOUT": "90"}):
+        node = WorkerNode(base=lambda worker: 0.1)
+    assert node.labels == NodeLabels("india", 4)
+    options = node.options()
+    assert options["load_fnc"] is node and options["drain_timeout"] == 90
+
+    worker = SimpleNamespace(active_jobs=[object(), object()])
+    assert node(worker) == 0.75 * 2 / 4, "half full: half the threshold"
+    worker.active_jobs = [object()] * 4
+    assert node(worker) > options["load_threshold"], "full: past the threshold"
+    worker.active_jobs = []
+    assert node(worker) == 0.1, "the CPU load when it's higher"
+    assert NodeLabels("india", 4).attributes() == {"node.region": "india", "node.capacity": "4"}
+
+
+def test_rolling_deploy_drains_the_old_node():
+    async def run(status_path):
+        started = asyncio.get_running_loop().time()
+        server = FakeLiveKitAPI()
+        nodes = {
+            name: WorkerNode(NodeLabels("india", 4), base=lambda worker: 0.0, deadline=120, status_path=status_path if name == "old" else "")
+            for name in ("old", "new")
+        }
+        old, new = (
+            node.worker_class(FakeWorker)(server, job_runner=simulated_call, name=name, **node.options()) for name, node in nodes.items()
+        )
+        for i in range(4):
+            await dispatch(server, f"call-{i}", 60.0)
+            await asyncio.sleep(1.0)
+        placed = dict(server.stats.placed)
+
+        deploy = asyncio.create_task(old.sigterm())
+        await asyncio.sleep(1.0)
+        draining = json.load(open(status_path))
+        for i in range(4, 6):
+            await dispatch(server, f"call-{i}", 20.0)
+        await asyncio.sleep(1.0)
+        # an offer the server sent before it heard the old node was full
+        late = await old.offer("late-call", json.dumps({"seconds": 1.0}))
+        await deploy
+        stopped = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(30.0)
+        await server.aclose()
+        return server, nodes["old"], placed, draining, late, stopped
+
+    with tempfile.TemporaryDirectory() as tmp:
+        status_path = os.path.join(tmp, "worker-status.json")
+        server, node, placed, draining, late, stopped = virtual_time.run(run(status_path))
+        drained = json.load(open(status_path))
+    assert placed == {"old": 2, "new": 2}, "the least loaded node first"
+    assert draining == {"region": "india", "capacity": 4, "draining": True, "active_calls": 2}
+    assert server.stats.placed == {"old": 2, "new": 4}, "no new calls on the draining node"
+    assert late is None and node.refused == 1
+    assert 60.0 < stopped < 63.0, "stopped once its calls were done"
+    assert node.ended == 0 and drained["active_calls"] == 0
+    assert server.stats.finished == {"answered": 6}
+
+
+def test_calls_still_up_at_the_deadline_are_ended():
+    async def run():
+        started = asyncio.get_running_loop().time()
+        server = FakeLiveKitAPI()
+        node = WorkerNode(NodeLabels(), base=lambda worker: 0.0, deadline=30, status_path="")
+        worker = node.worker_class(FakeWorker)(server, job_runner=simulated_call, **node.options())
+        assert node.worker is worker, "attached as it's constructed"
+        await asyncio.sleep(0)
+        await dispatch(server, "long-call", 300.0)
+        await asyncio.sleep(1.0)
+        await worker.sigterm()
+        stopped = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(0)
+        return server, node, stopped
+
+    server, node, stopped = virtual_time.run(run())
+    assert node.ended == 1 and 30.0 < stopped < 32.0
+    assert server.stats.finished == {"closed": 1}
+
+
+def main():
+    tests = [
+        test_labels_shape_the_load_and_the_jobs_taken,
+        test_rolling_deploy_drains_the_old_node,
+        test_calls_still_up_at_the_deadline_are_ended,
+    ]
+    print("🧪 Testing worker node labels and drain mode")
+    print("=" * 50)
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'🎉 All tests passed!' if not failed else f'⚠️  {failed} test(s) failed'}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    main()
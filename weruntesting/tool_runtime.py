@@ -0,0 +1,179 @@
+"""
+Runtime policies for function tools: deadlines, concurrency, filler, latency
+
+livekit already starts every tool call of a turn as its own task. This layer
+adds what the SIP and scheduling tools need on top:
+
+- a deadline per tool: a tool that overruns is cancelled and the model gets a
+  ToolError it can apologise with, instead of the caller sitting in silence
+- serial groups: tools that touch the same state (hanging up, transferring)
+  run one at a time; everything else still runs concurrently
+- an optional filler phrase ("one moment...") if a tool is still running after
+  `filler_after` seconds, played from cached audio when configured
+- a latency histogram per tool name, shared by every call in the process
+
+    class MyAgent(Agent):
+        def __init__(self):
+            self.tool_runtime = ToolRuntime()
+
+        @function_tool()
+        @timed_tool(deadline=5.0, filler=True)
+        async def lookup(self, ctx: RunContext, day: str): ...
+
+`@timed_tool` goes under `@function_tool()`; the tool keeps its signature and
+docstring, so the schema the model sees is unchanged.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import functools
+import logging
+import math
+from dataclasses import dataclass, field
+
+from livekit.agents.llm import ToolError
+
+import clock
+from audio_cache import play_frames
+
+logger = logging.getLogger("tool-runtime")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+@dataclass
+class ToolLatency:
+    """Fixed-bucket latency histogram for one tool"""
+
+    counts: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+
+    def observe(self, seconds: float, outcome: str = "ok") -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.calls += 1
+        self.total_seconds += seconds
+        if outcome == "error":
+            self.errors += 1
+        elif outcome == "timeout":
+            self.timeouts += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class ToolMetrics:
+    def __init__(self):
+        self.tools: dict[str, ToolLatency] = {}
+
+    def observe(self, name: str, seconds: float, outcome: str = "ok") -> None:
+        self.tools.setdefault(name, ToolLatency()).observe(seconds, outcome)
+
+    def log_summary(self) -> None:
+        for name, latency in sorted(self.tools.items()):
+            logger.info(
+                f"tool {name}: {latency.calls} calls, p50 <= {latency.quantile(0.5)}s, "
+                f"p95 <= {latency.quantile(0.95)}s, {latency.timeouts} timed out, {latency.errors} failed"
+            )
+
+
+# every call in the worker records into the same histograms
+TOOL_METRICS = ToolMetrics()
+
+
+@dataclass
+class ToolPolicy:
+    deadline: float
+    filler: bool = False
+    serial: str | None = None
+
+
+class ToolRuntime:
+    """Runs one agent's tool calls under their policies"""
+
+    def __init__(
+        self,
+        *,
+        metrics: ToolMetrics = TOOL_METRICS,
+        filler_text: str = "One moment while I check that.",
+        filler_frames: tuple | None = None,
+        filler_after: float = 1.0,
+    ):
+        self.metrics = metrics
+        self.filler_text = filler_text
+        self.filler_frames = filler_frames
+        self.filler_after = filler_after
+        self._session = None
+        self._serial_locks: dict[str, asyncio.Lock] = {}
+
+    def attach_session(self, session) -> None:
+        """The session fillers are spoken on"""
+        self._session = session
+
+    async def run(self, name: str, policy: ToolPolicy, call):
+        """Run `call()` (the tool's coroutine function) under `policy`"""
+        started = clock.monotonic()
+        filler = None
+        if policy.filler:
+            filler = asyncio.create_task(self._filler_after_delay(), name=f"tool_filler_{name}")
+        outcome = "ok"
+        deadline = asyncio.timeout(policy.deadline)
+        try:
+            async with deadline:
+                if policy.serial is None:
+                    return await call()
+                # the deadline includes waiting for the group, a stuck hangup shouldn't hold up a transfer forever
+                async with self._serial_locks.setdefault(policy.serial, asyncio.Lock()):
+                    return await call()
+        except TimeoutError:
+            if not deadline.expired():
+                outcome = "error"
+                raise
+            outcome = "timeout"
+            logger.warning(f"tool {name} missed its {policy.deadline}s deadline")
+            raise ToolError(f"{name} is taking too long right now; apologise and offer to try again") from None
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            if filler is not None:
+                filler.cancel()
+            self.metrics.observe(name, clock.monotonic() - started, outcome)
+
+    async def _filler_after_delay(self) -> None:
+        await asyncio.sleep(self.filler_after)
+        session = self._session
+        if session is None:
+            return
+        if self.filler_frames:
+            session.say(self.filler_text, audio=play_frames(self.filler_frames), add_to_chat_ctx=False)
+        elif session.tts is not None:
+            session.say(self.filler_text, add_to_chat_ctx=False)
+        # a realtime-only session has no TTS, and without cached audio there is nothing to play
+
+
+def timed_tool(*, deadline: float, filler: bool = False, serial: str | None = None):
+    """Run an agent's tool method through `self.tool_runtime` with these limits"""
+    policy = ToolPolicy(deadline=deadline, filler=filler, serial=serial)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            return await self.tool_runtime.run(fn.__name__, policy, lambda: fn(self, *args, **kwargs))
+
+        wrapper.tool_policy = policy
+        return wrapper
+
+    return decorator
@@ -0,0 +1,223 @@
+"""
+Outbound SIP trunk pool
+
+Every outbound call used to go out on one trunk (a hardcoded ID in
+interview_agent.py, SIP_OUTBOUND_TRUNK_ID in agent.py), so the whole call
+volume was bounded by that trunk's concurrent-call limit, and going over it
+showed up as failed calls inside SIP. The pool knows every trunk's capacity
+and region and hands out a lease per call leg:
+
+- trunks in the call's region are preferred while any of them has room
+- among those, the trunk with the fewest outstanding calls per unit of
+  capacity wins, with capacity discounted by the trunk's learned health (a
+  trunk that fails fast would otherwise look idle and attract traffic)
+- when every trunk is full, acquire() raises TrunksFull and nothing is dialled
+
+Agent jobs run in separate processes, so outstanding calls are kept as lease
+rows in a small SQLite file shared by the workers on a machine, taken and
+counted in one immediate transaction. A lease is released when the call ends.
+Leases taken with lease() on a call's event loop are renewed every
+`heartbeat` seconds for as long as they are held (through a warm transfer's
+bridge too), and expire `lease_ttl` after the last renewal, so a job that
+died without releasing frees its slots within a minute. The SQLite work runs
+in a thread, off the call's loop.
+
+Trunks are configured as `ID[:capacity[:region]]`, comma-separated:
+
+    SIP_OUTBOUND_TRUNK_IDS="ST_us1:30:us,ST_us2:30:us,ST_eu1:10:eu"
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+
+import clock
+
+logger = logging.getLogger("trunk-pool")
+
+UNLIMITED = 1_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trunk_leases (
+    id TEXT PRIMARY KEY,
+    trunk TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trunk_leases_trunk ON trunk_leases (trunk);
+"""
+
+
+class TrunksFull(Exception):
+    """Every trunk that could take the call is at its concurrent-call limit"""
+
+
+@dataclass(frozen=True)
+class Trunk:
+    id: str
+    capacity: int = UNLIMITED
+    region: str | None = None
+
+
+def parse_trunks(spec: str) -> list[Trunk]:
+    """Parse `ID[:capacity[:region]]` entries, comma-separated"""
+    trunks = []
+    for entry in spec.split(","):
+        parts = [part.strip() for part in entry.split(":")]
+        if not parts[0]:
+            continue
+        capacity = int(parts[1]) if len(parts) > 1 and parts[1] else UNLIMITED
+        region = parts[2] if len(parts) > 2 and parts[2] else None
+        trunks.append(Trunk(parts[0], capacity, region))
+    return trunks
+
+
+class TrunkLease:
+    """One call leg's slot on a trunk; release() and aclose() are idempotent"""
+
+    def __init__(self, pool: TrunkPool, lease_id: str, trunk: Trunk):
+        self.pool = pool
+        self.id = lease_id
+        self.trunk = trunk
+        self.released = False
+        self._heartbeat: asyncio.Task | None = None
+
+    @property
+    def trunk_id(self) -> str:
+        return self.trunk.id
+
+    def start_heartbeat(self) -> None:
+        """Keep the lease from expiring while it's held, on the running loop"""
+        if self._heartbeat is None and not self.released:
+            self._heartbeat = asyncio.create_task(self._renew(), name=f"trunk_lease_{self.trunk_id}")
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self.pool.heartbeat)
+            await asyncio.to_thread(self.pool._renew, self.id)
+
+    def _stop(self) -> bool:
+        if self.released:
+            return False
+        self.released = True
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        return True
+
+    def release(self) -> None:
+        if self._stop():
+            self.pool._release(self.id)
+
+    async def aclose(self) -> None:
+        """release(), with the SQLite write off the event loop"""
+        if self._stop():
+            await asyncio.to_thread(self.pool._release, self.id)
+
+    def __enter__(self) -> TrunkLease:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class TrunkPool:
+    def __init__(
+        self,
+        trunks: list[Trunk],
+        *,
+        path: str = ":memory:",
+        health=None,
+        lease_ttl: float = 60.0,
+        heartbeat: float | None = None,
+        clock=clock.time,
+    ):
+        if not trunks:
+            raise ValueError("at least one outbound trunk is needed")
+        self.trunks = {trunk.id: trunk for trunk in trunks}
+        self.health = health
+        self.lease_ttl = lease_ttl
+        self.heartbeat = lease_ttl / 3 if heartbeat is None else heartbeat
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _score(self, trunk: Trunk, outstanding: int, region: str | None) -> tuple:
+        health = self.health.score(trunk.id) if self.health is not None else 1.0
+        load = (outstanding + 1) / (trunk.capacity * max(health, 0.01))
+        return (region is not None and trunk.region != region, load)
+
+    def _choose(self, outstanding: dict[str, int], region: str | None, avoid) -> Trunk | None:
+        free = [trunk for trunk in self.trunks.values() if outstanding.get(trunk.id, 0) < trunk.capacity]
+        preferred = [trunk for trunk in free if trunk.id not in avoid] or free
+        if not preferred:
+            return None
+        return min(preferred, key=lambda trunk: self._score(trunk, outstanding.get(trunk.id, 0), region))
+
+    def acquire(self, region: str | None = None, *, avoid=()) -> TrunkLease:
+        """Lease a slot on the best trunk for a call in `region`
+
+        Trunks in `avoid` (e.g. ones this call already failed on) are only
+        used when no other trunk has room. Raises TrunksFull when none has.
+        """
+        now = self.clock()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("DELETE FROM trunk_leases WHERE expires < ?", (now,))
+                outstanding = dict(self._db.execute("SELECT trunk, COUNT(*) FROM trunk_leases GROUP BY trunk"))
+                trunk = self._choose(outstanding, region, avoid)
+                if trunk is None:
+                    raise TrunksFull(f"all {len(self.trunks)} outbound trunks are at capacity")
+                lease_id = uuid.uuid4().hex
+                self._db.execute("INSERT INTO trunk_leases VALUES (?, ?, ?)", (lease_id, trunk.id, now + self.lease_ttl))
+                self._db.execute("COMMIT")
+            except BaseException:
+                # BEGIN itself can fail (the database is locked), with nothing to roll back
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+        return TrunkLease(self, lease_id, trunk)
+
+    async def lease(self, region: str | None = None, *, avoid=()) -> TrunkLease:
+        """acquire() from an event loop: taken in a thread, then renewed until it's released"""
+        lease = await asyncio.to_thread(self.acquire, region, avoid=avoid)
+        lease.start_heartbeat()
+        return lease
+
+    def _renew(self, lease_id: str) -> None:
+        with self._lock:
+            try:
+                renewed = self._db.execute(
+                    "UPDATE trunk_leases SET expires = ? WHERE id = ?", (self.clock() + self.lease_ttl, lease_id)
+                ).rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"couldn't renew trunk lease {lease_id}: {e}")
+                return
+        if not renewed:
+            logger.warning(f"trunk lease {lease_id} expired before it was renewed")
+
+    def _release(self, lease_id: str) -> None:
+        with self._lock:
+            try:
+                self._db.execute("DELETE FROM trunk_leases WHERE id = ?", (lease_id,))
+            except sqlite3.Error as e:
+                logger.warning(f"couldn't release trunk lease {lease_id}: {e}")
+
+    def outstanding(self) -> dict[str, int]:
+        """Calls in flight per trunk, across every process sharing the pool"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT trunk, COUNT(*) FROM trunk_leases WHERE expires >= ? GROUP BY trunk", (self.clock(),)
+            )
+            counts = dict(rows)
+        return {trunk_id: counts.get(trunk_id, 0) for trunk_id in self.trunks}
+
+    def available(self) -> int:
+        """Free call slots over all trunks"""
+        return sum(max(self.trunks[trunk_id].capacity - count, 0) for trunk_id, count in self.outstanding().items())
@@ -0,0 +1,354 @@
+"""
+Provision Twilio numbers for the agents through the REST API, for many numbers at once
+
+twilio_setup.py writes a TwiML bin and has you paste it into the console and
+point each number at it by hand. Twilio has no API for TwiML bins; the way
+its API sends a number's calls to LiveKit is an Elastic SIP trunk (the setup
+LiveKit documents for Twilio), which is what this provisions from a plan of
+trunks and their numbers:
+
+- a trunk per plan entry, originating to LiveKit's SIP host, as the TwiML
+  bin's <Dial><Sip> did
+- a credential list on each trunk holding its own generated username and
+  password, for LiveKit's outbound trunk to authenticate with (no shared,
+  hard-coded password)
+- the plan's numbers on their trunk, which routes their calls in place of a
+  voice URL
+
+The REST calls run concurrently on a bounded thread pool (`--workers`,
+TWILIO_CONCURRENCY, default 8). What's been provisioned is kept in a state
+file (TWILIO_STATE_PATH, twilio-state.json, readable only by you since it
+holds the credentials), so a re-run makes only the calls for what changed:
+new trunks and numbers, numbers moved between trunks or dropped from the
+plan, a new SIP host. `--refresh` reads the trunks' numbers and origination
+back from Twilio first, for changes made in the console. For each trunk it
+writes LiveKit's inbound and outbound trunk configs to `--out`, for
+`lk sip inbound create` and `lk sip outbound create`.
+
+With TWILIO_API_URL (or `--api-url`) set, requests go there instead of to
+Twilio, e.g. to fake_twilio.py's server.
+
+A plan is JSON: {"trunks": [{"name": "interview", "numbers": ["+14155550100", ...]}]}
+
+Usage:
+    python twilio_provision.py plan.json
+    python twilio_provision.py --numbers +14155550100 +14155550101 --trunk interview
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+from phone_numbers import normalize
+
+logger = logging.getLogger("twilio-provision")
+
+
+@dataclass(frozen=True, slots=True)
+class TrunkPlan:
+    name: str
+    numbers: tuple[str, ...] = ()
+
+
+def load_plan(path: str) -> list[TrunkPlan]:
+    with open(path) as f:
+        plan = json.load(f)
+    return [TrunkPlan(trunk["name"], tuple(normalize(number) for number in trunk.get("numbers", ()))) for trunk in plan["trunks"]]
+
+
+def sip_host() -> str:
+    """LiveKit's SIP host: LIVEKIT_SIP_HOST, or the host of LIVEKIT_URL"""
+    host = os.getenv("LIVEKIT_SIP_HOST")
+    if host:
+        return host
+    url = os.getenv("LIVEKIT_URL", "")
+    return urlparse(url).hostname or url
+
+
+def generate_credential(name: str) -> tuple[str, str]:
+    """A username and password of a trunk's own, as strong as Twilio asks (12+ characters, mixed case, a digit)"""
+    username = f"{re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'trunk'}-{secrets.token_hex(4)}"
+    alphabet = string.ascii_letters + string.digits
+    while True:
+        password = "".join(secrets.choice(alphabet) for _ in range(24))
+        if any(c.islower() for c in password) and any(c.isupper() for c in password) and any(c.isdigit() for c in password):
+            return username, password
+
+
+def load_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"trunks": {}, "numbers": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: dict) -> None:
+    """Written whole, readable only by the owner: it holds the trunks' passwords"""
+    partial = f"{path}.tmp"
+    with os.fdopen(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(partial, path)
+
+
+def twilio_client(account_sid: str, auth_token: str, api_url: str | None = None):
+    from twilio.rest import Client
+
+    return Client(account_sid, auth_token, http_client=local_http_client(api_url) if api_url else None)
+
+
+def local_http_client(api_url: str):
+    """A twilio HttpClient sending https://<domain>.twilio.com/<path> to <api_url>/<domain>/<path>"""
+    from twilio.http.http_client import TwilioHttpClient
+
+    class LocalHttpClient(TwilioHttpClient):
+        def request(self, method, url, *args, **kwargs):
+            parsed = urlparse(url)
+            url = f"{api_url.rstrip('/')}/{parsed.hostname.split('.')[0]}{parsed.path}"
+            return super().request(method, url, *args, **kwargs)
+
+    return LocalHttpClient()
+
+
+@dataclass
+class ProvisionReport:
+    changes: list[str] = field(default_factory=list)
+    failures: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class Provisioner:
+    """Brings Twilio in line with a plan, starting from the cached state, with at most `workers` requests at once
+
+    `client_factory()` makes a twilio Client; each worker thread has its own.
+    """
+
+    def __init__(self, client_factory, state: dict, *, sip_host: str, workers: int = 8):
+        self.client_factory = client_factory
+        self.state = state
+        self.state.setdefault("trunks", {})
+        self.state.setdefault("numbers", {})  # the account's numbers -> their SIDs, looked up once
+        self.sip_url = f"sip:{sip_host};transport=tcp"
+        self.workers = workers
+        self.report = ProvisionReport()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.client_factory()
+        return client
+
+    def apply(self, plan: list[TrunkPlan], *, refresh: bool = False) -> ProvisionReport:
+        started = time.perf_counter()
+        trunks = self.state["trunks"]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="twilio") as pool:
+            if refresh:
+                self._run(pool, [(self._refresh, name) for name in list(trunks)])
+            for entry in plan:
+                trunks.setdefault(entry.name, {"numbers": []})
+            # the trunks first: a number is put on one by its SID
+            self._run(pool, [(self._ensure_trunk, entry.name) for entry in plan if self._trunk_changes(entry.name)])
+            wanted = {number: entry.name for entry in plan for number in entry.numbers}
+            current = {number: name for name, trunk in trunks.items() for number in trunk["numbers"]}
+            moves = [
+                (self._move, number, current.get(number), wanted.get(number))
+                for number in sorted(wanted.keys() | current.keys())
+                if current.get(number) != wanted.get(number)
+            ]
+            self._run(pool, moves)
+        for name in trunks.keys() - {entry.name for entry in plan}:
+            logger.info(f"trunk {name} isn't in the plan: its numbers were taken off it, the trunk is left")
+        self.report.seconds = time.perf_counter() - started
+        return self.report
+
+    def _run(self, pool: ThreadPoolExecutor, tasks: list[tuple]) -> None:
+        for future in [pool.submit(*task) for task in tasks]:
+            future.result()
+
+    def _changed(self, change: str) -> None:
+        with self._lock:
+            self.report.changes.append(change)
+
+    def _failed(self, what: str, error: Exception) -> None:
+        logger.error(f"{what}: {error}")
+        with self._lock:
+            self.report.failures.append(f"{what}: {error}")
+
+    def _trunk_changes(self, name: str) -> bool:
+        trunk = self.state["trunks"][name]
+        steps = ("sid", "credential_list_sid", "credential_sid", "credential_attached", "origination_sid")
+        return not all(trunk.get(step) for step in steps) or trunk.get("sip_url") != self.sip_url
+
+    def _ensure_trunk(self, name: str) -> None:
+        """Whichever of the trunk's parts are missing or out of date; each is recorded as soon as it's made"""
+        trunk = self.state["trunks"][name]
+        twilio = self.client
+        try:
+            if not trunk.get("sid"):
+                slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "trunk"
+                created = twilio.trunking.v1.trunks.create(friendly_name=name, domain_name=f"{slug}-{secrets.token_hex(3)}.pstn.twilio.com")
+                trunk.update(sid=created.sid, domain=created.domain_name)
+                self._changed(f"created trunk {name} ({created.domain_name})")
+            if not trunk.get("credential_list_sid"):
+                trunk["credential_list_sid"] = twilio.api.v2010.account.sip.credential_lists.create(friendly_name=f"{name} livekit").sid
+            if not trunk.get("credential_sid"):
+                username, password = generate_credential(name)
+                credentials = twilio.api.v2010.account.sip.credential_lists(trunk["credential_list_sid"]).credentials
+                trunk.update(credential_sid=credentials.create(username=username, password=password).sid, username=username, password=password)
+                self._changed(f"generated a credential for trunk {name}")
+            if not trunk.get("credential_attached"):
+                twilio.trunking.v1.trunks(trunk["sid"]).credentials_lists.create(credential_list_sid=trunk["credential_list_sid"])
+                trunk["credential_attached"] = True
+            if not trunk.get("origination_sid"):
+                origination = twilio.trunking.v1.trunks(trunk["sid"]).origination_urls.create(
+                    weight=1, priority=1, enabled=True, friendly_name="LiveKit", sip_url=self.sip_url
+                )
+                trunk.update(origination_sid=origination.sid, sip_url=self.sip_url)
+                self._changed(f"trunk {name} originates to {self.sip_url}")
+            elif trunk.get("sip_url") != self.sip_url:
+                twilio.trunking.v1.trunks(trunk["sid"]).origination_urls(trunk["origination_sid"]).update(sip_url=self.sip_url)
+                trunk["sip_url"] = self.sip_url
+                self._changed(f"trunk {name} now originates to {self.sip_url}")
+        except Exception as e:
+            self._failed(f"trunk {name}", e)
+
+    def _move(self, number: str, old: str | None, new: str | None) -> None:
+        """Take `number` off trunk `old`, then put it on trunk `new` (either may be None)"""
+        trunks = self.state["trunks"]
+        if new is not None and not trunks[new].get("sid"):
+            return  # the trunk failed, and was reported
+        twilio = self.client
+        try:
+            sid = self.state["numbers"].get(number)
+            if sid is None:
+                found = twilio.incoming_phone_numbers.list(phone_number=number, limit=1)
+                if not found:
+                    raise LookupError("not a number on this account")
+                sid = self.state["numbers"][number] = found[0].sid
+            if old is not None:
+                twilio.trunking.v1.trunks(trunks[old]["sid"]).phone_numbers(sid).delete()
+                with self._lock:
+                    trunks[old]["numbers"].remove(number)
+            if new is not None:
+                twilio.trunking.v1.trunks(trunks[new]["sid"]).phone_numbers.create(phone_number_sid=sid)
+                with self._lock:
+                    trunks[new]["numbers"].append(number)
+            self._changed(f"{number}: {old or '-'} -> {new or '-'}")
+        except Exception as e:
+            self._failed(number, e)
+
+    def _refresh(self, name: str) -> None:
+        """The trunk's numbers and origination as Twilio has them now"""
+        trunk = self.state["trunks"][name]
+        if not trunk.get("sid"):
+            return
+        twilio = self.client
+        try:
+            remote = twilio.trunking.v1.trunks(trunk["sid"])
+            remote.fetch()
+            numbers = remote.phone_numbers.list()
+            originations = remote.origination_urls.list()
+        except Exception as e:
+            if getattr(e, "status", None) == 404:
+                # deleted in the console: made again from scratch, with a new credential
+                with self._lock:
+                    self.state["trunks"][name] = {"numbers": []}
+                return
+            self._failed(f"refreshing trunk {name}", e)
+            return
+        with self._lock:
+            trunk["numbers"] = sorted(number.phone_number for number in numbers)
+            for number in numbers:
+                self.state["numbers"][number.phone_number] = number.sid
+            ours = [origination for origination in originations if origination.sid == trunk.get("origination_sid")]
+            if ours:
+                trunk["sip_url"] = ours[0].sip_url
+            else:
+                trunk.pop("origination_sid", None)
+
+
+def write_livekit_configs(state: dict, plan: list[TrunkPlan], directory: str) -> list[str]:
+    """Each trunk's inbound and outbound trunk configs for LiveKit; the outbound one holds its credential"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for entry in plan:
+        trunk = state["trunks"].get(entry.name, {})
+        if not trunk.get("password"):
+            continue
+        configs = {
+            "inbound": {"trunk": {"name": f"{entry.name} inbound", "numbers": list(entry.numbers)}},
+            "outbound": {
+                "trunk": {
+                    "name": f"{entry.name} outbound",
+                    "address": trunk["domain"],
+                    "numbers": list(entry.numbers),
+                    "auth_username": trunk["username"],
+                    "auth_password": trunk["password"],
+                }
+            },
+        }
+        for kind, config in configs.items():
+            path = os.path.join(directory, f"{entry.name}-{kind}.json")
+            with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(config, f, indent=2)
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision Twilio SIP trunks and numbers for the agents")
+    parser.add_argument("plan", nargs="?", help='JSON: {"trunks": [{"name": ..., "numbers": [...]}]}')
+    parser.add_argument("--numbers", nargs="+", default=[], help="numbers for one trunk, instead of a plan")
+    parser.add_argument("--trunk", default="interview", help="that trunk's name")
+    parser.add_argument("--state", default=os.getenv("TWILIO_STATE_PATH", "twilio-state.json"))
+    parser.add_argument("--out", default="livekit-trunks", help="where LiveKit's trunk configs are written")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("TWILIO_CONCURRENCY", "8")))
+    parser.add_argument("--refresh", action="store_true", help="read the trunks back from Twilio before applying")
+    parser.add_argument("--api-url", default=os.getenv("TWILIO_API_URL"))
+    parser.add_argument("--sip-host", default=None, help="default: LIVEKIT_SIP_HOST, or LIVEKIT_URL's host")
+    args = parser.parse_args()
+
+    import config
+
+    plan = load_plan(args.plan) if args.plan else [TrunkPlan(args.trunk, tuple(normalize(number) for number in args.numbers))]
+    state = load_state(args.state)
+    provisioner = Provisioner(
+        lambda: twilio_client(config.TWILIO_ACCOUNT_SID or "", config.TWILIO_AUTH_TOKEN or "", args.api_url),
+        state,
+        sip_host=args.sip_host or sip_host(),
+        workers=args.workers,
+    )
+    try:
+        report = provisioner.apply(plan, refresh=args.refresh)
+    finally:
+        save_state(args.state, state)
+
+    print("\n📞 TWILIO PROVISIONING")
+    print("=" * 60)
+    numbers = sum(len(entry.numbers) for entry in plan)
+    print(f"{len(plan)} trunks, {numbers} numbers: {len(report.changes)} changes in {report.seconds:.1f}s")
+    for change in report.changes:
+        print(f"✅ {change}")
+    for failure in report.failures:
+        print(f"❌ {failure}")
+    if not report.changes and not report.failures:
+        print("✅ Nothing to change")
+    for path in write_livekit_configs(state, plan, args.out):
+        print(f"📄 {path}")
+    return not report.failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
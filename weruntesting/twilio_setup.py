@@ -19,6 +19,7 @@ Prerequisites:
 import json
 import os
 import config  # Import our fixed config
+from twilio_provision import generate_credential
 
 def create_inbound_trunk_config():
     """Create the inbound trunk configuration for LiveKit"""
@@ -31,9 +32,14 @@ def create_inbound_trunk_config():
         return None
         
     # Generate username/password for SIP authentication
-    # These will be used in both LiveKit trunk and TwiML bin
-    sip_username = "interview_trunk_user"
-    sip_password = "secure_trunk_pass_2025"  # Use a secure password
+    # These will be used in both LiveKit trunk and TwiML bin; a re-run keeps the ones
+    # already in inbound-trunk.json, so the TwiML bin pasted earlier still matches
+    if os.path.exists('inbound-trunk.json'):
+        with open('inbound-trunk.json') as f:
+            existing = json.load(f)["trunk"]
+        sip_username, sip_password = existing["auth_username"], existing["auth_password"]
+    else:
+        sip_username, sip_password = generate_credential("interview")
     
     trunk_config = {
         "trunk": {
@@ -44,8 +50,8 @@ def create_inbound_trunk_config():
         }
     }
     
-    # Save configuration to file
-    with open('inbound-trunk.json', 'w') as f:
+    # Save configuration to file, readable only by you: it holds the password
+    with os.fdopen(os.open('inbound-trunk.json', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
         json.dump(trunk_config, f, indent=2)
     
     print(f"✅ Created inbound trunk configuration for {phone_number}")
@@ -142,6 +148,9 @@ SIP Credentials:
 - Ensure your LiveKit agent is running with agent_name="interview-agent"
 - Check LiveKit dashboard for incoming SIP calls
 - Verify TwiML bin credentials match inbound trunk
+
+To set up many numbers through Twilio's API instead, with a trunk and credential each:
+   python twilio_provision.py --numbers {phone_number} --trunk interview
 """
     
     # Save instructions to file (UTF-8 encoding for Windows compatibility)
@@ -0,0 +1,103 @@
+"""
+Virtual time for asyncio, to run calls faster than real time
+
+VirtualTimeLoop is a selector event loop whose clock only moves when nothing
+is left to do: rather than blocking in select() until the next timer is due,
+it moves its clock to that timer and carries on. Code that paces itself on
+the loop (asyncio.sleep, wait_for, call_later, loop.time()) runs the same
+steps in the same order as in real time, without the waiting, so a call's
+jitter buffer, endpointing and ring timeouts behave as they would live.
+
+Work handed to run_in_executor (the audio processing pool, asyncio.to_thread)
+runs inline on the loop's thread by default: the clock has to stand still
+until it's done either way, so its results never come back "late", and a
+thread hop per audio frame would only add cost. With `inline_executor=False`
+it runs on the executor as usual and the clock waits for it. Sockets are
+still polled, and with nothing scheduled at all the loop blocks as usual.
+
+time.time() and time.perf_counter() are not virtual; the agents' timing code
+reads clock.py, which follows this loop when it's the one running.
+VirtualTimePolicy makes every new event loop virtual, for suites that call
+asyncio.run() themselves.
+
+    report = virtual_time.run(run_call(agent.entrypoint, server, ...))
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("virtual-time")
+
+
+class _VirtualSelector:
+    """Wraps the loop's selector so a blocking select() advances the clock instead"""
+
+    def __init__(self, selector, loop: VirtualTimeLoop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout: float | None = None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None or self._loop._in_executor:
+            # nothing scheduled, or a thread still owes the loop a result: wait for it for real
+            return self._selector.select(None)
+        self._loop._now += timeout
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start: float | None = None, *, inline_executor: bool = True):
+        super().__init__()
+        # start from the real clocks, so nothing mistakes an early time for "unset"
+        self.started = self._now = time.monotonic() if start is None else start
+        self.wall_started = time.time()
+        self.inline_executor = inline_executor
+        self._in_executor = 0
+        self._selector = _VirtualSelector(self._selector, self)
+
+    def time(self) -> float:
+        return self._now
+
+    def wall_time(self) -> float:
+        """time.time(), moved on by the virtual time that has passed"""
+        return self.wall_started + self._now - self.started
+
+    def run_in_executor(self, executor, func, *args):
+        if self.inline_executor:
+            future = self.create_future()
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        future = super().run_in_executor(executor, func, *args)
+        self._in_executor += 1
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, future) -> None:
+        self._in_executor -= 1
+
+
+class VirtualTimePolicy(asyncio.DefaultEventLoopPolicy):
+    """`asyncio.set_event_loop_policy(VirtualTimePolicy())`: every loop from here on is virtual"""
+
+    def __init__(self, *, inline_executor: bool = True):
+        super().__init__()
+        self.inline_executor = inline_executor
+
+    def new_event_loop(self) -> VirtualTimeLoop:
+        return VirtualTimeLoop(inline_executor=self.inline_executor)
+
+
+def run(main, *, debug: bool | None = None, inline_executor: bool = True):
+    """asyncio.run(), on a VirtualTimeLoop"""
+    with asyncio.Runner(debug=debug, loop_factory=lambda: VirtualTimeLoop(inline_executor=inline_executor)) as runner:
+        return runner.run(main)
@@ -0,0 +1,299 @@
+"""
+Early-media answering machine detection
+
+Classifies the first few seconds of caller audio as a human or a voicemail
+greeting before the realtime model is allowed to hear (and bill for) anything.
+
+The classifier is intentionally lightweight: an energy VAD with an adaptive
+noise floor feeds a cadence state machine modelled on classic telephony AMD.
+A human usually answers with a short "Hello?" and then waits, while a
+machine plays a long uninterrupted greeting (often ending in a beep).
+Once it has said "machine", wait_for_greeting_end() keeps listening to the
+greeting until its beep (or the silence after it), so a message left on
+the machine isn't talked over and cut off by the recording starting late.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from enum import Enum
+
+import numpy as np
+from livekit import rtc
+
+logger = logging.getLogger("voicemail-detector")
+
+
+class AnsweredBy(str, Enum):
+    HUMAN = "human"
+    MACHINE = "machine"
+    UNKNOWN = "unknown"
+
+
+@dataclass
+class AMDConfig:
+    """Timing thresholds (seconds) for the cadence state machine"""
+
+    initial_silence: float = 2.5  # nobody spoke after answering
+    greeting: float = 1.5  # a single utterance longer than this is a machine
+    after_greeting_silence: float = 0.8  # silence after a short greeting means a human
+    total_analysis: float = 5.0  # give up and hand the call to the agent
+    min_word: float = 0.1  # shorter energy bursts are clicks, not speech
+    between_words_silence: float = 0.05  # gaps shorter than this join words together
+    maximum_words: int = 4  # humans rarely say more than this before pausing
+    speech_margin_db: float = 12.0  # energy above the noise floor counted as speech
+    min_speech_dbfs: float = -45.0  # never treat anything quieter as speech
+    beep_min_duration: float = 0.25  # a pure tone at least this long is a voicemail beep
+    greeting_end_silence: float = 1.2  # silence after a machine's greeting when it has no beep
+    max_greeting: float = 30.0  # stop waiting for a greeting to end after this long
+
+
+@dataclass
+class AMDResult:
+    answered_by: AnsweredBy
+    reason: str
+    decision_time: float  # seconds of caller audio consumed before deciding
+    words: int
+    longest_utterance: float
+    beep: bool = False  # decided on the beep, so the greeting is already over
+
+
+class _SpeechLevel:
+    """Energy VAD over an adaptive noise floor, shared by the classifier and the greeting follower"""
+
+    def __init__(self, config: AMDConfig):
+        self.config = config
+        self.noise_floor_db = -60.0
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(samples * samples)) + 1e-9)
+        level_db = 20.0 * np.log10(rms)
+        speech = level_db > self.noise_floor_db + self.config.speech_margin_db and level_db > self.config.min_speech_dbfs
+        if not speech:
+            # track the line noise slowly so a loud line doesn't look like speech
+            self.noise_floor_db += 0.05 * (level_db - self.noise_floor_db)
+        return speech
+
+
+def _is_tone(samples: np.ndarray) -> bool:
+    # a voicemail beep is a near-pure tone: almost all spectral energy sits in one bin
+    if len(samples) < 64:
+        return False
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    peak = int(np.argmax(spectrum))
+    lo, hi = max(peak - 2, 0), peak + 3
+    return float(np.sum(spectrum[lo:hi] ** 2) / (np.sum(spectrum**2) + 1e-12)) > 0.9
+
+
+class EarlyMediaClassifier:
+    """Incremental AMD classifier fed with 16-bit mono PCM frames"""
+
+    def __init__(self, sample_rate: int, config: AMDConfig | None = None):
+        self.sample_rate = sample_rate
+        self.config = config or AMDConfig()
+        self.result: AMDResult | None = None
+
+        self._elapsed = 0.0
+        self._level = _SpeechLevel(self.config)
+        self._in_word = False
+        self._utterance_start = 0.0
+        self._silence_run = 0.0
+        self._word_run = 0.0
+        self._words = 0
+        self._heard_speech = False
+        self._longest = 0.0
+        self._tone_run = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def push_frame(self, pcm: np.ndarray) -> AMDResult | None:
+        """Consume one frame of int16 samples, returning the result once decided"""
+        if self.result is not None:
+            return self.result
+
+        duration = len(pcm) / self.sample_rate
+        if duration <= 0:
+            return None
+
+        samples = pcm.astype(np.float32) * (1.0 / 32768.0)
+        is_speech = self._level.is_speech(samples)
+        self._elapsed += duration
+        self._track_tone(samples, is_speech, duration)
+        self._advance(is_speech, duration)
+
+        if self.result is None and self._elapsed >= self.config.total_analysis:
+            self._decide(AnsweredBy.UNKNOWN, "analysis window exhausted")
+        return self.result
+
+    def finish(self) -> AMDResult:
+        """Force a decision when the audio ends before the classifier decided"""
+        if self.result is None:
+            if self._in_word:
+                self._advance(False, self.config.after_greeting_silence)
+        if self.result is None:
+            self._decide(AnsweredBy.UNKNOWN, "audio ended before a decision")
+        return self.result
+
+    def _track_tone(self, samples: np.ndarray, is_speech: bool, duration: float) -> None:
+        self._tone_run = self._tone_run + duration if is_speech and _is_tone(samples) else 0.0
+        if self._tone_run >= self.config.beep_min_duration:
+            self._decide(AnsweredBy.MACHINE, "voicemail beep detected", beep=True)
+
+    def _advance(self, is_speech: bool, duration: float) -> None:
+        cfg = self.config
+        if self.result is not None:
+            return
+
+        if is_speech:
+            if not self._heard_speech or self._silence_run >= cfg.after_greeting_silence:
+                self._utterance_start = self._elapsed - duration
+            self._heard_speech = True
+            self._in_word = True
+            self._word_run += duration
+            self._silence_run = 0.0
+            utterance = self._elapsed - self._utterance_start
+            self._longest = max(self._longest, utterance)
+            if utterance >= cfg.greeting:
+                self._decide(AnsweredBy.MACHINE, "long greeting")
+            return
+
+        self._silence_run += duration
+        if self._in_word and self._silence_run >= cfg.between_words_silence:
+            if self._word_run >= cfg.min_word:
+                self._words += 1
+                if self._words >= cfg.maximum_words:
+                    self._decide(AnsweredBy.MACHINE, "too many words")
+                    return
+            self._word_run = 0.0
+            self._in_word = False
+
+        if not self._heard_speech:
+            if self._silence_run >= cfg.initial_silence:
+                self._decide(AnsweredBy.UNKNOWN, "initial silence")
+        elif self._words and self._silence_run >= cfg.after_greeting_silence:
+            self._decide(AnsweredBy.HUMAN, "short greeting followed by silence")
+
+    def _decide(self, answered_by: AnsweredBy, reason: str, beep: bool = False) -> None:
+        self.result = AMDResult(
+            answered_by=answered_by,
+            reason=reason,
+            decision_time=self._elapsed,
+            words=self._words,
+            longest_utterance=self._longest,
+            beep=beep,
+        )
+
+
+class GreetingEnd:
+    """Follows a machine's greeting after the AMD decision, until it's safe to leave a message
+
+    The greeting is over once its beep has finished, or, for machines
+    without one, after `greeting_end_silence` of silence following speech.
+    """
+
+    def __init__(self, sample_rate: int, config: AMDConfig | None = None):
+        self.sample_rate = sample_rate
+        self.config = config or AMDConfig()
+        self.reason: str | None = None
+
+        self.elapsed = 0.0
+        self._level = _SpeechLevel(self.config)
+        self._tone_run = 0.0
+        self._silence_run = 0.0
+
+    def push_frame(self, pcm: np.ndarray) -> str | None:
+        """Consume one frame of int16 samples, returning why the greeting ended once it has"""
+        if self.reason is not None:
+            return self.reason
+
+        duration = len(pcm) / self.sample_rate
+        if duration <= 0:
+            return None
+
+        samples = pcm.astype(np.float32) * (1.0 / 32768.0)
+        is_speech = self._level.is_speech(samples)
+        self.elapsed += duration
+        if is_speech and _is_tone(samples):
+            self._tone_run += duration
+            self._silence_run = 0.0
+        elif self._tone_run >= self.config.beep_min_duration:
+            self.reason = "beep"  # the recording starts as the beep stops
+        else:
+            self._tone_run = 0.0
+            self._silence_run = 0.0 if is_speech else self._silence_run + duration
+            if self._silence_run >= self.config.greeting_end_silence:
+                self.reason = "silence"
+        if self.reason is None and self.elapsed >= self.config.max_greeting:
+            self.reason = "greeting too long"
+        return self.reason
+
+
+def classify_pcm(
+    pcm: np.ndarray, sample_rate: int, *, frame_ms: int = 20, config: AMDConfig | None = None
+) -> AMDResult:
+    """Run the classifier over a whole buffer, as the benchmark and tests do"""
+    classifier = EarlyMediaClassifier(sample_rate, config)
+    step = sample_rate * frame_ms // 1000
+    for start in range(0, len(pcm), step):
+        if classifier.push_frame(pcm[start : start + step]) is not None:
+            break
+    return classifier.finish()
+
+
+async def detect_answering_machine(
+    participant, *, config: AMDConfig | None = None, sample_rate: int = 16000
+) -> AMDResult:
+    """Listen to a freshly answered SIP participant and classify who picked up"""
+    classifier = EarlyMediaClassifier(sample_rate, config)
+    stream = rtc.AudioStream.from_participant(
+        participant=participant,
+        track_source=rtc.TrackSource.SOURCE_MICROPHONE,
+        sample_rate=sample_rate,
+        num_channels=1,
+    )
+    try:
+        async with asyncio.timeout(classifier.config.total_analysis + 2.0):
+            async for event in stream:
+                pcm = np.frombuffer(event.frame.data, dtype=np.int16)
+                if classifier.push_frame(pcm) is not None:
+                    break
+    except TimeoutError:
+        logger.warning("no caller audio arrived during answering machine detection")
+    finally:
+        await stream.aclose()
+
+    result = classifier.finish()
+    logger.info(
+        f"answering machine detection: {result.answered_by.value} "
+        f"({result.reason}, decided after {result.decision_time:.2f}s)"
+    )
+    return result
+
+
+async def wait_for_greeting_end(
+    participant, *, config: AMDConfig | None = None, sample_rate: int = 16000
+) -> str:
+    """Keep listening to a voicemail greeting until its beep or the silence after it"""
+    greeting = GreetingEnd(sample_rate, config)
+    stream = rtc.AudioStream.from_participant(
+        participant=participant,
+        track_source=rtc.TrackSource.SOURCE_MICROPHONE,
+        sample_rate=sample_rate,
+        num_channels=1,
+    )
+    try:
+        async with asyncio.timeout(greeting.config.max_greeting + 2.0):
+            async for event in stream:
+                if greeting.push_frame(np.frombuffer(event.frame.data, dtype=np.int16)) is not None:
+                    break
+    except TimeoutError:
+        logger.warning("no caller audio arrived while waiting for the voicemail greeting to end")
+    finally:
+        await stream.aclose()
+
+    reason = greeting.reason or "audio ended"
+    logger.info(f"voicemail greeting ended ({reason}) after {greeting.elapsed:.2f}s more")
+    return reason
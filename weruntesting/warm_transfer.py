@@ -0,0 +1,190 @@
+"""
+Cold and warm call transfers to a human agent
+
+Cold transfer (the original behaviour): the agent finishes telling the caller
+they're being transferred, then the SIP leg is REFERed to the human's number.
+The caller waits through both steps back to back.
+
+Warm transfer: the human is dialled into the same room the moment the transfer
+is confirmed, while the agent is still talking. The caller hears a cached hold
+prompt if the human hasn't answered when the agent stops talking. When the human
+answers, they are already bridged with the caller, and the agent reads them a
+summary of the call (kept up to date during the call) before it leaves. A
+transfer that doesn't connect, for whatever reason, hangs the human's leg up.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from livekit import api
+
+import clock
+from audio_cache import loop_frames
+
+logger = logging.getLogger("warm-transfer")
+
+HUMAN_AGENT_IDENTITY = "human-agent"
+
+
+@dataclass
+class TransferResult:
+    mode: str
+    connected: bool
+    time_to_human: float  # seconds from the transfer starting to the human being on the line
+    error: str | None = None
+
+
+class CallSummary:
+    """Running extractive summary of the call, ready before a transfer is requested"""
+
+    __slots__ = ("name", "appointment_time", "max_turns", "max_chars", "_patient_turns")
+
+    def __init__(self, name: str, appointment_time: str, max_turns: int = 3, max_chars: int = 160):
+        self.name = name
+        self.appointment_time = appointment_time
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self._patient_turns: list[str] = []
+
+    def add_message(self, item) -> None:
+        """Record a chat item; hook to the session's `conversation_item_added` event"""
+        if getattr(item, "role", None) != "user":
+            return
+        text = (item.text_content or "").strip()
+        if not text:
+            return
+        self._patient_turns.append(text[: self.max_chars])
+        del self._patient_turns[: -self.max_turns]
+
+    def render(self) -> str:
+        summary = f"{self.name} is calling about their appointment on {self.appointment_time}."
+        if self._patient_turns:
+            said = " Then: ".join(f'"{turn}"' for turn in self._patient_turns)
+            summary += f" Most recently they said: {said}"
+        return summary
+
+
+class CallTransfer:
+    """Runs a cold or warm transfer for one SIP participant in a room"""
+
+    def __init__(
+        self,
+        *,
+        lk_api,
+        room_name: str,
+        trunk_id: str | None,
+        participant_identity: str,
+        hold_frames: tuple | None = None,
+        answer_timeout: float = 30.0,
+    ):
+        self.lk_api = lk_api
+        self.room_name = room_name
+        self.trunk_id = trunk_id
+        self.participant_identity = participant_identity
+        self.hold_frames = hold_frames
+        self.answer_timeout = answer_timeout
+        self.bridged = False  # the human answered a warm transfer and shares the room with the caller
+
+    async def cold(self, session, transfer_to: str) -> TransferResult:
+        started = clock.monotonic()
+        # let the message play fully before transferring
+        await session.generate_reply(instructions="let the user know you'll be transferring them")
+        try:
+            await self.lk_api.sip.transfer_sip_participant(
+                api.TransferSIPParticipantRequest(
+                    room_name=self.room_name,
+                    participant_identity=self.participant_identity,
+                    transfer_to=f"tel:{transfer_to}",
+                )
+            )
+        except Exception as e:
+            return TransferResult("cold", False, clock.monotonic() - started, str(e))
+        return TransferResult("cold", True, clock.monotonic() - started)
+
+    async def warm(self, session, transfer_to: str, summary: str) -> TransferResult:
+        started = clock.monotonic()
+        dial = asyncio.create_task(
+            self.lk_api.sip.create_sip_participant(
+                api.CreateSIPParticipantRequest(
+                    room_name=self.room_name,
+                    sip_trunk_id=self.trunk_id,
+                    sip_call_to=transfer_to,
+                    participant_identity=HUMAN_AGENT_IDENTITY,
+                    participant_name="Human agent",
+                    wait_until_answered=True,
+                )
+            ),
+            name="warm_transfer_dial",
+        )
+
+        hold = None
+        try:
+            # the human's phone rings while the agent is still talking
+            await session.generate_reply(
+                instructions="let the user know you're connecting them to a colleague now, and to stay on the line"
+            )
+            if not dial.done() and self.hold_frames:
+                hold = session.say(
+                    "[hold prompt]",
+                    audio=loop_frames(self.hold_frames),
+                    add_to_chat_ctx=False,
+                )
+            remaining = max(self.answer_timeout - (clock.monotonic() - started), 0.0)
+            await asyncio.wait_for(dial, timeout=remaining)
+        except asyncio.TimeoutError:
+            return TransferResult("warm", False, clock.monotonic() - started, "human agent did not answer")
+        except Exception as e:
+            return TransferResult("warm", False, clock.monotonic() - started, str(e))
+        finally:
+            if hold is not None and not hold.done():
+                hold.interrupt()
+            if not dial.done() or dial.cancelled() or dial.exception() is not None:
+                # not answered, failed, or the transfer was cancelled (e.g. the tool's deadline): the
+                # human's leg mustn't be left ringing, or connected to a call nobody is in
+                dial.cancel()
+                await asyncio.shield(self._hang_up_human())
+        self.bridged = True
+
+        # both SIP legs are in the same room now, so the human can already hear the caller
+        result = TransferResult("warm", True, clock.monotonic() - started)
+        logger.info(f"human agent answered after {result.time_to_human:.2f}s")
+
+        await session.generate_reply(
+            instructions=(
+                "a colleague has just joined the call. Briefly tell them, in one or two sentences: "
+                f"{summary} Then tell the patient they are in good hands and say goodbye."
+            )
+        )
+        return result
+
+    async def wait_for_bridge_end(self, room) -> None:
+        """After a warm transfer: until the caller or the human leaves the room"""
+        legs = {self.participant_identity, HUMAN_AGENT_IDENTITY}
+        left = asyncio.Event()
+
+        def on_disconnected(participant):
+            if participant.identity in legs:
+                left.set()
+
+        def on_room_closed(*_):
+            left.set()
+
+        room.on("participant_disconnected", on_disconnected)
+        room.on("disconnected", on_room_closed)
+        try:
+            if legs <= room.remote_participants.keys():
+                await left.wait()
+        finally:
+            room.off("participant_disconnected", on_disconnected)
+            room.off("disconnected", on_room_closed)
+
+    async def _hang_up_human(self) -> None:
+        # cancelling the dial request doesn't stop the phone ringing, removing the participant does
+        try:
+            await self.lk_api.room.remove_participant(
+                api.RoomParticipantIdentity(room=self.room_name, identity=HUMAN_AGENT_IDENTITY)
+            )
+        except Exception as e:
+            logger.warning(f"could not hang up the unanswered transfer leg: {e}")
@@ -0,0 +1,220 @@
+"""
+Node labels and drain mode, for rolling deploys of the agent workers
+
+A deploy stops a worker with SIGTERM. LiveKit's CLI then drains it (in
+`start` mode; `dev` exits at once): the worker tells the server it's full
+and waits for its jobs, up to `drain_timeout`. Two things go wrong on the
+way. A job the server offered just before it saw the worker full is still
+accepted, so a new call lands on a node that's going away. And when the
+timeout runs out the process exits with its calls still up, without their
+teardown (transcripts, usage, the call ledger).
+
+WorkerNode is both agents' `load_fnc` and `request_fnc` (see options()), and
+its run_app() starts the worker with a drain of its own in place of
+Worker.drain():
+
+- job requests are refused from the moment the drain starts
+- active calls get until WORKER_DRAIN_TIMEOUT (default 600s) to finish;
+  past it, the ones left are ended the way a room closing ends them, so
+  their teardown runs, and the worker shuts down as usual
+- the active-call count is logged while draining, and written with the
+  node's labels and whether it's draining to WORKER_STATUS_PATH if set, for
+  a pre-stop hook or the orchestrator to watch
+
+The CLI has no hook for the drain, so run_app() has it construct a subclass
+of its Worker (see worker_class()), on the releases in WORKER_VERSIONS; on
+any other, LiveKit's own drain runs and the labels still apply.
+
+Node labels are WORKER_REGION (default SIP_REGION) and WORKER_CAPACITY (calls
+the node takes, 0 for no limit). LiveKit's worker registration has no field
+for labels, so they go where the protocol lets a worker say them: capacity
+into the load the worker reports, so the server, which sends each job to
+the least loaded worker, fills nodes up to their capacity and skips full
+ones; both into the agent participant's attributes and the status file.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+import clock
+
+logger = logging.getLogger("worker-node")
+
+# worker_class() and the drain deadline use Worker internals as they are in these releases
+WORKER_VERSIONS = ("1.1.",)
+# what a node at capacity reports, above any load_threshold, so the server counts it full
+FULL_LOAD = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class NodeLabels:
+    region: str | None = None
+    capacity: int = 0  # calls; 0 for no limit
+
+    @classmethod
+    def from_env(cls) -> NodeLabels:
+        return cls(
+            region=os.getenv("WORKER_REGION") or os.getenv("SIP_REGION") or None,
+            capacity=int(os.getenv("WORKER_CAPACITY", "0")),
+        )
+
+    def attributes(self) -> dict[str, str]:
+        """The agent participant's attributes in each call this node takes"""
+        return {"node.region": self.region or "", "node.capacity": str(self.capacity)}
+
+
+def drain_timeout() -> float:
+    """WORKER_DRAIN_TIMEOUT: seconds active calls get to finish after SIGTERM"""
+    return float(os.getenv("WORKER_DRAIN_TIMEOUT", "600"))
+
+
+class WorkerNode:
+    """A worker's `load_fnc` and `request_fnc`: its labels, and drain mode on SIGTERM
+
+    `base` is the load function it wraps (LiveKit's CPU load by default).
+    """
+
+    def __init__(
+        self,
+        labels: NodeLabels | None = None,
+        *,
+        deadline: float | None = None,
+        base=None,
+        load_threshold: float = 0.75,
+        status_path: str | None = None,
+        report_every: float = 10.0,
+    ):
+        from livekit.agents.worker import _DefaultLoadCalc
+
+        if not 0 < load_threshold < FULL_LOAD:
+            raise ValueError(f"load_threshold must be between 0 and {FULL_LOAD}, got {load_threshold}")
+        self.labels = labels or NodeLabels.from_env()
+        self.deadline = drain_timeout() if deadline is None else deadline
+        self.base = base or _DefaultLoadCalc.get_load
+        self.load_threshold = load_threshold
+        self.status_path = os.getenv("WORKER_STATUS_PATH") if status_path is None else status_path
+        self.report_every = report_every
+        self.worker = None
+        self.draining = False
+        self.refused = 0  # job requests turned away while draining or full
+        self.ended = 0  # calls still up at the drain deadline
+        self._written = None
+
+    def options(self) -> dict:
+        """WorkerOptions for a node: our load and request functions, and LiveKit's drain timeout set to ours"""
+        return {
+            "load_fnc": self,
+            "request_fnc": self.request,
+            "load_threshold": self.load_threshold,
+            "drain_timeout": int(self.deadline),
+        }
+
+    def worker_class(self, base):
+        """`base` (LiveKit's Worker) with this node attached as it's constructed, and our drain for its own"""
+        node = self
+
+        class NodeWorker(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                node.worker = self
+
+            async def drain(self, timeout: int | None = None) -> None:
+                await node.drain(super().drain)
+
+        return NodeWorker
+
+    def run_app(self, options) -> None:
+        """cli.run_app(options), options built with options(), and the worker it constructs drained by this node"""
+        from livekit.agents import __version__ as agents_version, cli
+        from livekit.agents.cli import _run
+
+        if agents_version.startswith(WORKER_VERSIONS) and hasattr(_run, "Worker"):
+            _run.Worker = self.worker_class(_run.Worker)
+        else:
+            logger.warning(f"can't take over the drain on livekit-agents {agents_version}, LiveKit's own drain runs on SIGTERM")
+        cli.run_app(options)
+
+    def active_calls(self) -> int:
+        return len(self.worker.active_jobs) if self.worker is not None else 0
+
+    def __call__(self, worker) -> float:
+        self.worker = self.worker or worker
+        load = self.base(worker)
+        if self.labels.capacity:
+            # filling up raises the load towards the threshold; at capacity it's past it, and the server stops sending calls
+            active = self.active_calls()
+            full = active >= self.labels.capacity
+            load = max(load, FULL_LOAD if full else self.load_threshold * active / self.labels.capacity)
+        self.write_status()
+        return load
+
+    async def request(self, job_request) -> None:
+        """Take a job, unless draining, or at capacity in the moment before the server hears it"""
+        full = self.labels.capacity and self.active_calls() >= self.labels.capacity
+        if self.draining or full:
+            self.refused += 1
+            logger.info(f"refusing job {job_request.id}: {'draining' if self.draining else 'at capacity'}")
+            await job_request.reject()
+            return
+        await job_request.accept(attributes=self.labels.attributes())
+
+    async def drain(self, worker_drain) -> None:
+        """Refuse new calls, let the active ones finish until the deadline, then end the rest
+
+        `worker_drain` is the worker's own Worker.drain(): it reports the worker
+        full and joins its jobs, and runs for as long as they do.
+        """
+        worker = self.worker
+        if self.draining:
+            return
+        self.draining = True
+        ends = clock.monotonic() + self.deadline
+        logger.info(f"draining: no new calls, {self.active_calls()} active ones have {self.deadline:.0f}s to finish")
+        joined = asyncio.ensure_future(worker_drain())
+        self.write_status()
+        joins: dict = {}
+        while self.active_calls() and clock.monotonic() < ends:
+            for proc in worker._proc_pool.processes:
+                if proc.running_job and proc not in joins:
+                    joins[proc] = asyncio.ensure_future(proc.join())
+            timeout = min(self.report_every, ends - clock.monotonic())
+            pending = [f for f in (joined, *joins.values()) if not f.done()]
+            if pending:
+                await asyncio.wait(pending, timeout=timeout)
+            else:
+                # joined, but still listed as running for a moment
+                await asyncio.sleep(min(timeout, 1.0))
+            self.write_status()
+            if self.active_calls():
+                logger.info(f"draining: {self.active_calls()} calls left, {max(ends - clock.monotonic(), 0):.0f}s to the deadline")
+        left = [proc for proc in worker._proc_pool.processes if proc.running_job]
+        if left:
+            self.ended = len(left)
+            logger.warning(f"drain deadline: ending {len(left)} calls")
+            await asyncio.gather(*(proc.aclose() for proc in left), return_exceptions=True)
+        await asyncio.gather(joined, *joins.values(), return_exceptions=True)
+        self.write_status()
+        logger.info(f"drained: {self.refused} job requests refused, {self.ended} calls ended at the deadline")
+
+    def status(self) -> dict:
+        return {
+            "region": self.labels.region,
+            "capacity": self.labels.capacity,
+            "draining": self.draining,
+            "active_calls": self.active_calls(),
+        }
+
+    def write_status(self) -> None:
+        """The node's status to WORKER_STATUS_PATH, when it has changed"""
+        status = self.status()
+        if not self.status_path or status == self._written:
+            return
+        partial = f"{self.status_path}.tmp"
+        with open(partial, "w") as f:
+            json.dump(status, f)
+        os.replace(partial, self.status_path)
+        self._written = status